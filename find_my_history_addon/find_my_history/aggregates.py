@@ -0,0 +1,75 @@
+"""Resolution planning for time-bucketed location queries."""
+
+import logging
+import math
+import re
+from datetime import datetime
+from typing import Optional, Union
+
+from find_my_history.timeutils import to_epoch
+
+_LOGGER = logging.getLogger(__name__)
+
+# Bucket sizes the planner chooses from, in seconds
+RESOLUTION_LADDER = (60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400)
+
+# Fastest polling interval; a range this short per max_points fits raw
+MIN_POLL_INTERVAL = 60
+
+DEFAULT_MAX_POINTS = 10000
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_DURATION_RE = re.compile(r"^(\d+)([smhd]?)$")
+
+
+def parse_every(value: Union[str, int, float]) -> int:
+    """
+    Parse a bucket size such as "5m", "1h" or a number of seconds.
+
+    Raises:
+        ValueError: Unparseable or non-positive duration
+    """
+    match = _DURATION_RE.match(str(value).strip().lower())
+    if not match:
+        raise ValueError(f"Invalid resolution: {value}")
+    seconds = int(match.group(1)) * _UNITS[match.group(2) or "s"]
+    if seconds <= 0:
+        raise ValueError("Resolution must be positive")
+    return seconds
+
+
+def flux_duration(seconds: int) -> str:
+    """Format seconds as a Flux duration literal."""
+    for unit in ("d", "h", "m"):
+        if seconds % _UNITS[unit] == 0:
+            return f"{seconds // _UNITS[unit]}{unit}"
+    return f"{seconds}s"
+
+
+def plan_resolution(
+    start_time: datetime,
+    end_time: datetime,
+    max_points: int = DEFAULT_MAX_POINTS,
+    devices: int = 1
+) -> Optional[int]:
+    """
+    Pick a bucket size that keeps a range within max_points.
+
+    Args:
+        start_time: Range start
+        end_time: Range end
+        max_points: Maximum rows the client wants
+        devices: Number of devices in the result
+
+    Returns:
+        Bucket size in seconds, or None if raw points already fit
+    """
+    span = max(0.0, to_epoch(end_time) - to_epoch(start_time))
+    budget = max(1, max_points // max(1, devices))
+    if span / MIN_POLL_INTERVAL <= budget:
+        return None
+    for step in RESOLUTION_LADDER:
+        if math.ceil(span / step) <= budget:
+            return step
+    # Beyond the ladder, grow in whole days
+    return int(math.ceil(span / budget / 86400)) * 86400
@@ -1,24 +1,110 @@
 """HTTP API server for Lovelace card backend."""
 
+import asyncio
 import json
 import logging
 import os
+import tempfile
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from aiohttp import web
 import aiohttp_cors
 
+from find_my_history.aggregates import parse_every, plan_resolution
+from find_my_history.backfill import DEFAULT_BACKFILL_DAYS, Backfiller
+from find_my_history.broadcaster import Broadcaster
 from find_my_history.ha_client import HomeAssistantClient
 from find_my_history.influxdb_client import InfluxDBLocationClient
 from find_my_history.device_prefs import get_device_prefs
+from find_my_history.export import EXPORT_FORMATS, export_chunks
+from find_my_history.geocoder import Geocoder
+from find_my_history.importer import IMPORT_FORMATS, detect_format, import_file
 from find_my_history.zone_detector import ZoneDetector
+from find_my_history.heatmap import (
+    DEFAULT_MAX_GAP_SECONDS, DEFAULT_PRECISION, MAX_PRECISION, MIN_PRECISION, build_heatmap,
+)
+from find_my_history.log_utils import log_queue_depth
+from find_my_history.metrics import API_REQUEST_SECONDS, CONTENT_TYPE, REGISTRY, counter, gauge
+from find_my_history.places import DEFAULT_EPS, DEFAULT_MIN_DWELL, cluster_places
+from find_my_history.playback import build_playback, frame_times
+from find_my_history.reclassify import Reclassifier
+from find_my_history.result_cache import ClosedRangeCache
+from find_my_history.scheduler import PollScheduler
+from find_my_history.tiles import CLIENT_MAX_AGE, DEFAULT_TILE_LAYERS, TileProxy
+from find_my_history.timeutils import to_epoch
+from find_my_history.transitions import ZoneTransitionTracker
+from find_my_history.visits import MIN_VISIT_DURATION, VisitTracker, detect_visits, filter_visits
 
 _LOGGER = logging.getLogger(__name__)
 
+# Seconds the HA device_tracker list is reused by /api/devices
+DEVICE_LIST_TTL = 300
+
+# Seconds between keep-alive comments on idle event streams
+STREAM_KEEPALIVE = 15
+
+# Bytes copied per step when spooling an upload to disk
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
 # Path to static files
 STATIC_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'www')
 
 
+@web.middleware
+async def metrics_middleware(request: web.Request, handler) -> web.StreamResponse:
+    """Time every handler, labelled by route pattern rather than path."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        resource = request.match_info.route.resource
+        API_REQUEST_SECONDS.labels(
+            request.method,
+            resource.canonical if resource is not None else "unmatched",
+            str(status),
+        ).observe(time.perf_counter() - started)
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO timestamp query parameter (raises ValueError if invalid)."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _parse_time_range(
+    request: web.Request, default: timedelta = timedelta(days=1)
+) -> Tuple[datetime, datetime]:
+    """
+    Parse start/end query parameters, defaulting to the last `default` period.
+
+    Raises:
+        ValueError: If a timestamp is invalid
+    """
+    try:
+        start_time = _parse_timestamp(request.query.get("start"))
+    except ValueError:
+        raise ValueError("Invalid start timestamp format")
+    try:
+        end_time = _parse_timestamp(request.query.get("end"))
+    except ValueError:
+        raise ValueError("Invalid end timestamp format")
+
+    if not end_time:
+        end_time = datetime.utcnow()
+    if not start_time:
+        start_time = end_time - default
+    return start_time, end_time
+
+
 class LocationHistoryAPI:
     """HTTP API server for location history data."""
 
@@ -26,7 +112,13 @@ class LocationHistoryAPI:
         self,
         ha_client: HomeAssistantClient,
         influx_client: InfluxDBLocationClient,
-        port: int = 8080
+        port: int = 8080,
+        geocoder: Optional[Geocoder] = None,
+        tile_proxy: Optional[TileProxy] = None,
+        reclassifier: Optional[Reclassifier] = None,
+        transition_tracker: Optional[ZoneTransitionTracker] = None,
+        scheduler: Optional[PollScheduler] = None,
+        track_visits: bool = True
     ):
         """
         Initialize API server.
@@ -35,15 +127,62 @@ class LocationHistoryAPI:
             ha_client: Home Assistant API client
             influx_client: InfluxDB client
             port: Port to listen on
+            geocoder: Reverse geocoder shared by all clients (default settings if omitted)
+            tile_proxy: Caching map tile proxy (tiles load straight from upstream if omitted)
+            reclassifier: Background zone reclassification job (status only)
+            transition_tracker: Zone enter/exit state machine whose events are streamed
+            scheduler: Polling schedule of the main loop (status only)
+            track_visits: Keep visits in memory from stored fixes (only useful
+                in the process that writes them)
         """
         self.ha_client = ha_client
         self.influx_client = influx_client
         self.port = port
-        self.app = web.Application()
+        self.app = web.Application(middlewares=[metrics_middleware])
         
         # Initialize zone detector
         zones = ha_client.get_zones()
         self.zone_detector = ZoneDetector(zones)
+
+        # Cached HA device_tracker states for the device list
+        self._trackers: List[Dict] = []
+        self._trackers_fetched_at = float("-inf")
+
+        # Results for time ranges that can no longer change
+        self.heatmap_cache = ClosedRangeCache("heatmap")
+        self.places_cache = ClosedRangeCache("places")
+        self.playback_cache = ClosedRangeCache("playback", max_entries=32)
+
+        # Reverse geocoding proxy shared by all browser sessions
+        self.geocoder = geocoder or Geocoder()
+        self.tile_proxy = tile_proxy
+
+        # Stay-point detection kept up to date by every stored fix
+        self.visit_tracker = VisitTracker() if track_visits else None
+        if self.visit_tracker is not None:
+            influx_client.add_write_listener(self.visit_tracker.on_write)
+
+        # Live fixes and zone changes pushed to /api/stream subscribers
+        self.broadcaster = Broadcaster()
+        influx_client.add_write_listener(self.broadcaster.on_write)
+
+        # Hysteresis-filtered zone enter/exit events go out on the stream too
+        if transition_tracker is not None:
+            transition_tracker.add_listener(self._publish_transition)
+
+        # Rewritten history makes cached results stale
+        self.reclassifier = reclassifier
+        if reclassifier is not None:
+            reclassifier.add_listener(self.invalidate_caches)
+
+        self.scheduler = scheduler
+
+        # Recovers polling gaps from HA's recorder history
+        self.backfiller = Backfiller(ha_client, influx_client, self.zone_detector)
+
+        # One bulk import at a time; progress is readable while it runs
+        self._import_lock = threading.Lock()
+        self.import_status: Optional[Dict] = None
         
         self._setup_routes()
 
@@ -69,7 +208,26 @@ class LocationHistoryAPI:
         self.app.router.add_post("/api/devices/toggle", self.toggle_device)
         self.app.router.add_post("/api/devices/update", self.update_device_location)
         self.app.router.add_get("/api/stats", self.get_stats)
+        self.app.router.add_get("/api/heatmap", self.get_heatmap)
+        self.app.router.add_get("/api/visits", self.get_visits)
+        self.app.router.add_get("/api/places", self.get_places)
+        self.app.router.add_get("/api/trips", self.get_trips)
+        self.app.router.add_get("/api/transitions", self.get_transitions)
+        self.app.router.add_get("/api/playback", self.get_playback)
+        self.app.router.add_get("/api/geocode", self.get_geocode)
+        self.app.router.add_get("/api/stream", self.stream_events)
+        self.app.router.add_get("/api/export", self.export_locations)
+        self.app.router.add_post("/api/import", self.import_locations)
+        self.app.router.add_get("/api/import", self.get_import_status)
+        self.app.router.add_post("/api/backfill", self.start_backfill)
+        self.app.router.add_get("/api/backfill", self.get_backfill_status)
+        self.app.router.add_get("/api/reclassify", self.get_reclassify_status)
+        self.app.router.add_get("/api/scheduler", self.get_scheduler_status)
+        self.app.router.add_get("/api/cache", self.get_cache_stats)
+        self.app.router.add_get("/api/tiles", self.get_tile_layers)
+        self.app.router.add_get("/tiles/{layer}/{z}/{x}/{y}", self.get_tile)
         self.app.router.add_get("/health", self.health_check)
+        self.app.router.add_get("/metrics", self.get_metrics)
         
         # Static files and index page
         self.app.router.add_get("/", self.serve_index)
@@ -86,6 +244,71 @@ class LocationHistoryAPI:
         """Health check endpoint."""
         return web.json_response({"status": "ok"})
 
+    async def get_metrics(self, request: web.Request) -> web.Response:
+        """Prometheus text exposition of latencies, counters, cache and queue state."""
+        try:
+            return web.Response(
+                text=REGISTRY.render(self._scrape_metrics()),
+                headers={"Content-Type": CONTENT_TYPE},
+            )
+        except Exception as e:
+            _LOGGER.error(f"Error in get_metrics: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    def _scrape_metrics(self) -> List[str]:
+        """Gauges and cache counters read from their owners at scrape time."""
+        window = self.influx_client.hot_window.stats()
+        caches = {
+            "hot_window": window,
+            "heatmap": self.heatmap_cache.stats(),
+            "places": self.places_cache.stats(),
+            "playback": self.playback_cache.stats(),
+            "geocode": self.geocoder.stats(),
+        }
+        if self.tile_proxy is not None:
+            caches["tiles"] = self.tile_proxy.stats()
+        stream = self.broadcaster.stats()
+        families = [
+            counter(
+                "find_my_history_cache_hits_total", "Cache hits",
+                [({"cache": name}, stats["hits"]) for name, stats in caches.items()],
+            ),
+            counter(
+                "find_my_history_cache_misses_total", "Cache misses",
+                [({"cache": name}, stats["misses"]) for name, stats in caches.items()],
+            ),
+            gauge(
+                "find_my_history_cache_entries", "Entries held by each cache (points for the hot window)",
+                [({"cache": name}, stats.get("entries", stats.get("points", 0)))
+                 for name, stats in caches.items()],
+            ),
+            gauge(
+                "find_my_history_queue_depth", "Items waiting in internal queues",
+                [
+                    ({"queue": "geocoder"}, caches["geocode"]["queue_depth"]),
+                    ({"queue": "stream"}, stream["queued"]),
+                    ({"queue": "logging"}, log_queue_depth()),
+                ],
+            ),
+            gauge(
+                "find_my_history_stream_subscribers", "Connected /api/stream clients",
+                [({}, stream["subscribers"])],
+            ),
+            counter(
+                "find_my_history_stream_dropped_total", "Stream clients dropped for falling behind",
+                [({}, stream["dropped"])],
+            ),
+        ]
+        if self.scheduler is not None:
+            families.append(gauge(
+                "find_my_history_device_consecutive_failures", "Consecutive failed polls per device",
+                [({"device_id": device_id}, state["consecutive_failures"])
+                 for device_id, state in self.scheduler.stats().items()],
+            ))
+        return families
+
     async def serve_index(self, request: web.Request) -> web.Response:
         """Serve the main HTML page."""
         index_path = os.path.join(STATIC_PATH, 'index.html')
@@ -105,12 +328,17 @@ class LocationHistoryAPI:
             start: Start timestamp (ISO format, optional)
             end: End timestamp (ISO format, optional)
             limit: Maximum results (default: 1000)
+            motion: "true" to add distance_from_prev, speed_kmh, heading and motion
+            resolution: Bucket size such as "5m" or "1h" (alias: every), or "auto"
+                        to pick one from the range and max_points (default: raw points)
+            max_points: Row budget for resolution=auto (default: limit)
         """
         try:
             device_id = request.query.get("device_id")
             start_str = request.query.get("start")
             end_str = request.query.get("end")
             limit = int(request.query.get("limit", 1000))
+            annotate = request.query.get("motion", "false").lower() in ("true", "1", "yes")
 
             start_time = None
             end_time = None
@@ -131,14 +359,30 @@ class LocationHistoryAPI:
                         {"error": "Invalid end timestamp format"}, status=400
                     )
 
+            every = None
+            resolution = request.query.get("resolution") or request.query.get("every")
+            try:
+                if resolution == "auto":
+                    max_points = int(request.query.get("max_points", limit))
+                    range_start, range_end = _parse_time_range(request, default=timedelta(days=30))
+                    # Without device_id every device with stored fixes shares the budget
+                    devices = 1 if device_id else len(self.influx_client.last_known)
+                    every = plan_resolution(range_start, range_end, max_points, devices=devices)
+                elif resolution:
+                    every = parse_every(resolution)
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
             locations = self.influx_client.query_locations(
                 device_id=device_id,
                 start_time=start_time,
                 end_time=end_time,
-                limit=limit
+                limit=limit,
+                annotate=annotate,
+                every=every
             )
 
-            return web.json_response({"locations": locations})
+            return web.json_response({"locations": locations, "resolution": every})
 
         except Exception as e:
             _LOGGER.error(f"Error in get_locations: {e}", exc_info=True)
@@ -157,42 +401,88 @@ class LocationHistoryAPI:
                 {"error": str(e)}, status=500
             )
 
+    def _get_ha_trackers(self, refresh: bool = False) -> List[Dict]:
+        """
+        Get device_tracker states from HA, cached for DEVICE_LIST_TTL seconds.
+
+        A failed refresh keeps serving the previous list.
+        """
+        now = time.monotonic()
+        if refresh or now - self._trackers_fetched_at >= DEVICE_LIST_TTL:
+            trackers = self.ha_client.get_all_device_trackers()
+            if trackers:
+                self._trackers = trackers
+                self._trackers_fetched_at = now
+        return self._trackers
+
     async def get_devices(self, request: web.Request) -> web.Response:
-        """Get list of all device_tracker entities with tracking status."""
+        """
+        Get list of all device_tracker entities with tracking status.
+
+        Positions come from the last-known index, so no HA round-trip is needed
+        per request; the HA tracker list is only used to discover untracked
+        devices and is cached.
+
+        Query params:
+            refresh: Force refreshing the HA tracker list (optional)
+        """
         try:
-            devices = []
             prefs = get_device_prefs()
-            
-            # Try to get device trackers from HA
-            trackers = self.ha_client.get_all_device_trackers()
-            
-            if trackers:
-                for tracker in trackers:
-                    entity_id = tracker.get("entity_id", "")
-                    if entity_id.startswith("device_tracker."):
-                        devices.append({
-                            "entity_id": entity_id,
-                            "name": tracker.get("attributes", {}).get("friendly_name", entity_id),
-                            "state": tracker.get("state"),
-                            "is_tracked": prefs.is_tracked(entity_id),
-                            "interval_minutes": prefs.get_interval(entity_id, 5),
-                        })
-            
-            # If no devices from HA, try to get unique devices from InfluxDB
-            if not devices:
+            refresh = request.query.get("refresh", "").lower() in ("1", "true", "yes")
+            last_known = self.influx_client.last_known.all()
+
+            # entity_id -> (name, state)
+            entries: Dict[str, Dict] = {}
+            for tracker in self._get_ha_trackers(refresh):
+                entity_id = tracker.get("entity_id", "")
+                if entity_id.startswith("device_tracker."):
+                    entries[entity_id] = {
+                        "name": tracker.get("attributes", {}).get("friendly_name", entity_id),
+                        "state": tracker.get("state"),
+                    }
+
+            for entity_id, fix in last_known.items():
+                if entity_id not in entries:
+                    entries[entity_id] = {
+                        "name": fix.get("device_name") or entity_id,
+                        "state": fix["zone_name"] if fix.get("in_zone") else "not_home",
+                    }
+
+            for entity_id in prefs.get_tracked_devices():
+                if entity_id not in entries:
+                    entries[entity_id] = {
+                        "name": entity_id.replace("device_tracker.", "").replace("_", " ").title(),
+                        "state": "unknown",
+                    }
+
+            # If nothing is known yet, try to get unique devices from InfluxDB
+            if not entries:
                 try:
-                    influx_devices = self.influx_client.get_unique_devices()
-                    for device_id in influx_devices:
-                        devices.append({
-                            "entity_id": device_id,
+                    for device_id in self.influx_client.get_unique_devices():
+                        entries[device_id] = {
                             "name": device_id.replace("device_tracker.", "").replace("_", " ").title(),
                             "state": "unknown",
-                            "is_tracked": prefs.is_tracked(device_id),
-                            "interval_minutes": prefs.get_interval(device_id, 5),
-                        })
+                        }
                 except Exception as e:
                     _LOGGER.warning(f"Could not get devices from InfluxDB: {e}")
 
+            devices = []
+            for entity_id, entry in entries.items():
+                fix = last_known.get(entity_id)
+                devices.append({
+                    "entity_id": entity_id,
+                    "name": entry["name"],
+                    "state": entry["state"],
+                    "is_tracked": prefs.is_tracked(entity_id),
+                    "interval_minutes": prefs.get_interval(entity_id, 5),
+                    "last_location": {
+                        key: fix[key] for key in (
+                            "time", "latitude", "longitude", "accuracy", "in_zone",
+                            "zone_name", "battery_level", "battery_state",
+                        )
+                    } if fix else None,
+                })
+
             # Sort: tracked devices first, then alphabetically
             devices.sort(key=lambda d: (not d["is_tracked"], d["name"].lower()))
 
@@ -423,6 +713,690 @@ class LocationHistoryAPI:
                 {"error": str(e)}, status=500
             )
 
+    async def get_heatmap(self, request: web.Request) -> web.Response:
+        """
+        Get dwell-weighted heatmap cells.
+
+        Query params:
+            device_id: Device entity ID (optional, all devices if omitted)
+            start: Start timestamp (ISO format, optional, default: 24h before end)
+            end: End timestamp (ISO format, optional, default: now)
+            precision: Geohash precision 1-9 (default: 7, ~150m cells)
+            max_gap: Maximum seconds a single fix may account for (default: 1800)
+        """
+        try:
+            device_id = request.query.get("device_id")
+            try:
+                start_time, end_time = _parse_time_range(request)
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
+            try:
+                precision = int(request.query.get("precision", DEFAULT_PRECISION))
+                max_gap = float(request.query.get("max_gap", DEFAULT_MAX_GAP_SECONDS))
+            except ValueError:
+                return web.json_response(
+                    {"error": "precision and max_gap must be numbers"}, status=400
+                )
+            if not MIN_PRECISION <= precision <= MAX_PRECISION:
+                return web.json_response(
+                    {"error": f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}"},
+                    status=400
+                )
+
+            # The last fix of an open range holds until now, not the future
+            range_end = min(to_epoch(end_time), to_epoch(datetime.utcnow()))
+
+            def compute() -> Dict:
+                columns = self.influx_client.query_columns(
+                    device_id=device_id,
+                    start_time=start_time,
+                    end_time=end_time
+                )
+                return build_heatmap(columns, range_end, precision, max_gap)
+
+            key = (device_id, to_epoch(start_time), to_epoch(end_time), precision, max_gap)
+            loop = asyncio.get_running_loop()
+            heatmap = await loop.run_in_executor(
+                None, self.heatmap_cache.get_or_compute, key, end_time, compute
+            )
+
+            return web.json_response(dict(
+                heatmap,
+                device_id=device_id,
+                period={"start": start_time.isoformat(), "end": end_time.isoformat()},
+            ))
+
+        except Exception as e:
+            _LOGGER.error(f"Error in get_heatmap: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def get_visits(self, request: web.Request) -> web.Response:
+        """
+        Get visits (stay points) for a device.
+
+        Query params:
+            device_id: Device entity ID (required)
+            start: Start timestamp (ISO format, optional, default: 24h before end)
+            end: End timestamp (ISO format, optional, default: now)
+            min_duration: Minimum visit length in seconds (default: 300,
+                          0 returns every segment so each fix maps to one)
+        """
+        try:
+            device_id = request.query.get("device_id")
+            if not device_id:
+                return web.json_response(
+                    {"error": "device_id parameter required"}, status=400
+                )
+            try:
+                start_time, end_time = _parse_time_range(request)
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+            try:
+                min_duration = float(request.query.get("min_duration", MIN_VISIT_DURATION))
+            except ValueError:
+                return web.json_response(
+                    {"error": "min_duration must be a number"}, status=400
+                )
+
+            visits = None
+            if self.visit_tracker is not None:
+                visits = self.visit_tracker.visits(device_id, start_time, end_time, min_duration)
+            if visits is None:
+                def compute() -> List[Dict]:
+                    columns = self.influx_client.query_columns(
+                        device_id=device_id,
+                        start_time=start_time,
+                        end_time=end_time
+                    )
+                    detected = detect_visits(
+                        columns["time"], columns["latitude"], columns["longitude"],
+                        columns["zone_name"], min_duration=min_duration
+                    )
+                    return filter_visits(detected, start_time, end_time, min_duration)
+
+                loop = asyncio.get_running_loop()
+                visits = await loop.run_in_executor(None, compute)
+
+            return web.json_response({"device_id": device_id, "visits": visits})
+
+        except Exception as e:
+            _LOGGER.error(f"Error in get_visits: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def get_places(self, request: web.Request) -> web.Response:
+        """
+        Get most visited places, ranked by visits and total dwell time.
+
+        Query params:
+            device_id: Device entity ID (optional, all devices if omitted)
+            start: Start timestamp (ISO format, optional, default: 30 days before end)
+            end: End timestamp (ISO format, optional, default: now)
+            eps: Place radius in meters (default: 100)
+            min_dwell: Seconds spent around a spot before it counts as a place (default: 600)
+            limit: Maximum places returned (default: 20)
+        """
+        try:
+            device_id = request.query.get("device_id")
+            try:
+                start_time, end_time = _parse_time_range(request, default=timedelta(days=30))
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
+            try:
+                eps = float(request.query.get("eps", DEFAULT_EPS))
+                min_dwell = float(request.query.get("min_dwell", DEFAULT_MIN_DWELL))
+                limit = int(request.query.get("limit", 20))
+            except ValueError:
+                return web.json_response(
+                    {"error": "eps, min_dwell and limit must be numbers"}, status=400
+                )
+            if eps <= 0:
+                return web.json_response({"error": "eps must be positive"}, status=400)
+
+            range_end = min(to_epoch(end_time), to_epoch(datetime.utcnow()))
+
+            def compute() -> List[Dict]:
+                columns = self.influx_client.query_columns(
+                    device_id=device_id,
+                    start_time=start_time,
+                    end_time=end_time
+                )
+                return cluster_places(columns, range_end, eps=eps, min_dwell=min_dwell, limit=limit)
+
+            key = (device_id, to_epoch(start_time), to_epoch(end_time), eps, min_dwell, limit)
+            loop = asyncio.get_running_loop()
+            places = await loop.run_in_executor(
+                None, self.places_cache.get_or_compute, key, end_time, compute
+            )
+
+            return web.json_response({
+                "device_id": device_id,
+                "period": {"start": start_time.isoformat(), "end": end_time.isoformat()},
+                "places": places,
+            })
+
+        except Exception as e:
+            _LOGGER.error(f"Error in get_places: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def get_playback(self, request: web.Request) -> web.Response:
+        """
+        Get a device track resampled into evenly spaced playback frames.
+
+        Query params:
+            device_id: Device entity ID (required)
+            start: Start timestamp (ISO format, optional, default: 24h before end)
+            end: End timestamp (ISO format, optional, default: now)
+            frames: Number of frames (default: 1000, max: 5000)
+            step: Seconds between frames (overrides frames)
+        """
+        try:
+            device_id = request.query.get("device_id")
+            if not device_id:
+                return web.json_response(
+                    {"error": "device_id parameter required"}, status=400
+                )
+            try:
+                start_time, end_time = _parse_time_range(request)
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+            try:
+                frames = int(request.query["frames"]) if "frames" in request.query else None
+                step = float(request.query["step"]) if "step" in request.query else None
+            except ValueError:
+                return web.json_response(
+                    {"error": "frames and step must be numbers"}, status=400
+                )
+
+            start = to_epoch(start_time)
+            end = min(to_epoch(end_time), to_epoch(datetime.utcnow()))
+            try:
+                frame_times(start, end, frames, step)
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
+            def compute() -> Dict:
+                columns = self.influx_client.query_columns(
+                    device_id=device_id,
+                    start_time=start_time,
+                    end_time=end_time
+                )
+                return build_playback(columns, start, end, frames, step)
+
+            key = (device_id, start, to_epoch(end_time), frames, step)
+            loop = asyncio.get_running_loop()
+            playback = await loop.run_in_executor(
+                None, self.playback_cache.get_or_compute, key, end_time, compute
+            )
+
+            return web.json_response(dict(playback, device_id=device_id))
+
+        except Exception as e:
+            _LOGGER.error(f"Error in get_playback: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def get_trips(self, request: web.Request) -> web.Response:
+        """
+        Get finished trips.
+
+        Query params:
+            device_id: Device entity ID (optional)
+            start: Start timestamp (ISO format, optional, default: 7 days before end)
+            end: End timestamp (ISO format, optional, default: now)
+            limit: Maximum results (default: 1000)
+        """
+        try:
+            device_id = request.query.get("device_id")
+            try:
+                start_time, end_time = _parse_time_range(request, default=timedelta(days=7))
+                limit = int(request.query.get("limit", 1000))
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
+            trips = self.influx_client.query_trips(
+                device_id=device_id,
+                start_time=start_time,
+                end_time=end_time,
+                limit=limit
+            )
+
+            return web.json_response({"trips": trips})
+
+        except Exception as e:
+            _LOGGER.error(f"Error in get_trips: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def get_transitions(self, request: web.Request) -> web.Response:
+        """
+        Get zone enter/exit events, newest first.
+
+        Query params:
+            device_id: Device entity ID (optional)
+            zone: Zone name (optional)
+            event: enter or exit (optional)
+            start: Start timestamp (ISO format, optional, default: 7 days before end)
+            end: End timestamp (ISO format, optional, default: now)
+            limit: Maximum results (default: 1000)
+        """
+        try:
+            device_id = request.query.get("device_id")
+            zone_name = request.query.get("zone")
+            event = request.query.get("event")
+            if event is not None and event not in ("enter", "exit"):
+                return web.json_response({"error": "event must be enter or exit"}, status=400)
+            try:
+                start_time, end_time = _parse_time_range(request, default=timedelta(days=7))
+                limit = int(request.query.get("limit", 1000))
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
+            transitions = self.influx_client.query_transitions(
+                device_id=device_id,
+                zone_name=zone_name,
+                event=event,
+                start_time=start_time,
+                end_time=end_time,
+                limit=limit
+            )
+
+            return web.json_response({"transitions": transitions})
+
+        except Exception as e:
+            _LOGGER.error(f"Error in get_transitions: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def get_geocode(self, request: web.Request) -> web.Response:
+        """
+        Reverse geocode a coordinate through the shared cache.
+
+        Query params:
+            lat: Latitude (required)
+            lon: Longitude (required)
+        """
+        try:
+            try:
+                latitude = float(request.query["lat"])
+                longitude = float(request.query["lon"])
+            except (KeyError, ValueError):
+                return web.json_response(
+                    {"error": "lat and lon parameters required"}, status=400
+                )
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                return web.json_response({"error": "Coordinates out of range"}, status=400)
+
+            place = await self.geocoder.lookup(latitude, longitude)
+            if place is None:
+                return web.json_response({"error": "Geocoding upstream unavailable"}, status=502)
+
+            return web.json_response(place)
+
+        except Exception as e:
+            _LOGGER.error(f"Error in get_geocode: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def get_tile_layers(self, request: web.Request) -> web.Response:
+        """Base map layers for the UI, pointing at the tile proxy when enabled."""
+        if self.tile_proxy is not None:
+            layers = self.tile_proxy.layer_templates()
+        else:
+            layers = [
+                {"name": name, **layer} for name, layer in DEFAULT_TILE_LAYERS.items()
+            ]
+        return web.json_response({"proxied": self.tile_proxy is not None, "layers": layers})
+
+    async def get_tile(self, request: web.Request) -> web.Response:
+        """Serve a map tile through the caching proxy."""
+        if self.tile_proxy is None:
+            raise web.HTTPNotFound()
+        try:
+            layer = request.match_info["layer"]
+            try:
+                z = int(request.match_info["z"])
+                x = int(request.match_info["x"])
+                # Allow an image extension on the last segment
+                y = int(request.match_info["y"].split(".")[0])
+            except ValueError:
+                return web.json_response({"error": "Invalid tile coordinates"}, status=400)
+
+            try:
+                tile = await self.tile_proxy.get_tile(layer, z, x, y)
+            except KeyError:
+                return web.json_response({"error": f"Unknown tile layer: {layer}"}, status=404)
+            except ValueError as e:
+                return web.json_response({"error": str(e)}, status=400)
+
+            if tile is None:
+                return web.json_response({"error": "Tile unavailable"}, status=502)
+
+            body, meta = tile
+            headers = {
+                "Cache-Control": f"public, max-age={CLIENT_MAX_AGE}",
+                "Content-Type": meta.get("content_type", "image/png"),
+            }
+            if meta.get("etag"):
+                headers["ETag"] = meta["etag"]
+                if request.headers.get("If-None-Match") == meta["etag"]:
+                    return web.Response(status=304, headers=headers)
+            return web.Response(body=body, headers=headers)
+
+        except Exception as e:
+            _LOGGER.error(f"Error in get_tile: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def stream_events(self, request: web.Request) -> web.StreamResponse:
+        """
+        Push new locations and zone changes as Server-Sent Events.
+
+        Query params:
+            device_id: Only stream these devices (repeat or comma-separate, optional)
+
+        Events:
+            location: A newly stored fix (same fields as /api/locations rows)
+            zone: A device moved between zones (device_id, time, from_zone, to_zone)
+            transition: A confirmed zone enter/exit (same fields as /api/transitions rows)
+            dropped: The client fell behind and was disconnected
+        """
+        device_ids = [
+            device_id
+            for value in request.query.getall("device_id", [])
+            for device_id in value.split(",") if device_id
+        ]
+        subscription = self.broadcaster.subscribe(device_ids or None)
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            # Keep ingress / reverse proxies from buffering the stream
+            "X-Accel-Buffering": "no",
+        })
+        try:
+            await response.prepare(request)
+            await response.write(b"retry: 5000\n\n")
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await response.write(b": keep-alive\n\n")
+                    continue
+                payload = json.dumps(event, default=str)
+                await response.write(f"event: {event['type']}\ndata: {payload}\n\n".encode())
+                if event["type"] == "dropped":
+                    break
+        except ConnectionResetError:
+            _LOGGER.debug("Stream client disconnected")
+        finally:
+            self.broadcaster.unsubscribe(subscription)
+        return response
+
+    def _publish_transition(self, device_id: str, event: Dict) -> None:
+        """Transition listener: push a committed enter/exit to stream subscribers."""
+        self.broadcaster.publish(dict(
+            event, type="transition", device_id=device_id, time=event["time"].isoformat()
+        ))
+
+    def publish_device_change(self, event: Dict) -> None:
+        """Device preferences listener: tell stream subscribers a device was (un)tracked."""
+        self.broadcaster.publish(dict(event, type="device", device_id=event["entity_id"]))
+
+    async def export_locations(self, request: web.Request) -> web.StreamResponse:
+        """
+        Stream location history as a GPX, GeoJSON or CSV download.
+
+        Query params:
+            format: gpx, geojson or csv (default: gpx)
+            device_id: Devices to export (repeat or comma-separate, default: all)
+            start: Start timestamp (ISO format, optional, default: 30 days before end)
+            end: End timestamp (ISO format, optional, default: now)
+            gzip: "true" to gzip the file
+        """
+        fmt = request.query.get("format", "gpx").lower()
+        if fmt not in EXPORT_FORMATS:
+            return web.json_response(
+                {"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400
+            )
+        try:
+            start_time, end_time = _parse_time_range(request, default=timedelta(days=30))
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        compress = request.query.get("gzip", "false").lower() in ("true", "1", "yes")
+
+        loop = asyncio.get_running_loop()
+        device_ids = [
+            device_id
+            for value in request.query.getall("device_id", [])
+            for device_id in value.split(",") if device_id
+        ]
+        if not device_ids:
+            device_ids = await loop.run_in_executor(None, self.influx_client.get_unique_devices)
+
+        tracks = (
+            (device_id, self.influx_client.iter_locations(device_id, start_time, end_time))
+            for device_id in device_ids
+        )
+        chunks = export_chunks(fmt, tracks, compress=compress)
+
+        content_type, extension = EXPORT_FORMATS[fmt]
+        filename = f"location_history_{start_time:%Y%m%d}_{end_time:%Y%m%d}.{extension}"
+        if compress:
+            content_type = "application/gzip"
+            filename += ".gz"
+        response = web.StreamResponse(headers={
+            "Content-Type": content_type,
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        })
+        await response.prepare(request)
+
+        # InfluxDB reads and formatting are blocking; pull one chunk at a time
+        # off the event loop so only one chunk is ever held in memory
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+                await response.write(chunk)
+        except ConnectionResetError:
+            _LOGGER.debug("Export client disconnected")
+        except Exception as e:
+            # Headers are already sent; all we can do is cut the download short
+            _LOGGER.error(f"Error in export_locations: {e}", exc_info=True)
+        await response.write_eof()
+        return response
+
+    def invalidate_caches(self) -> None:
+        """Drop cached results after points were written into past ranges."""
+        if self.visit_tracker is not None:
+            self.visit_tracker.invalidate()
+        self.heatmap_cache.clear()
+        self.places_cache.clear()
+        self.playback_cache.clear()
+
+    async def import_locations(self, request: web.Request) -> web.Response:
+        """
+        Import an uploaded GPX, GeoJSON or CSV file (optionally gzipped).
+
+        The body is either multipart/form-data with a "file" field or the raw
+        file. It is spooled to a temporary file and imported in the background
+        executor, so uploads of any size don't sit in memory.
+
+        Query params:
+            format: gpx, geojson or csv (default: from the uploaded file name)
+            device_id: Store points under this device (default: ids in the file)
+            device_name: Friendly device name
+        """
+        fmt = request.query.get("format")
+        if fmt is not None and fmt not in IMPORT_FORMATS:
+            return web.json_response(
+                {"error": f"format must be one of {', '.join(IMPORT_FORMATS)}"}, status=400
+            )
+        if not self._import_lock.acquire(blocking=False):
+            return web.json_response(
+                {"error": "An import is already running", "status": self.import_status}, status=409
+            )
+
+        try:
+            with tempfile.NamedTemporaryFile(prefix="import-") as spool:
+                if request.content_type.startswith("multipart/"):
+                    reader = await request.multipart()
+                    part = await reader.next()
+                    while part is not None and part.name != "file":
+                        part = await reader.next()
+                    if part is None:
+                        return web.json_response({"error": "file is required"}, status=400)
+                    fmt = fmt or detect_format(part.filename or "")
+                    while True:
+                        chunk = await part.read_chunk(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        spool.write(chunk)
+                else:
+                    async for chunk in request.content.iter_chunked(UPLOAD_CHUNK_SIZE):
+                        spool.write(chunk)
+                spool.flush()
+
+                if fmt is None:
+                    return web.json_response(
+                        {"error": f"format is required ({', '.join(IMPORT_FORMATS)})"}, status=400
+                    )
+
+                self.import_status = {"state": "running", "format": fmt, "imported": 0}
+
+                def progress(summary: Dict) -> None:
+                    self.import_status = dict(summary, state="running")
+
+                summary = await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    lambda: import_file(
+                        spool.name,
+                        fmt=fmt,
+                        influx_client=self.influx_client,
+                        zone_detector=self.zone_detector,
+                        device_id=request.query.get("device_id"),
+                        device_name=request.query.get("device_name"),
+                        progress=progress,
+                    )
+                )
+            self.import_status = dict(summary, state="done")
+            return web.json_response(summary)
+
+        except ValueError as e:
+            self.import_status = {"state": "failed", "error": str(e)}
+            return web.json_response({"error": str(e)}, status=400)
+        except Exception as e:
+            self.import_status = {"state": "failed", "error": str(e)}
+            _LOGGER.error(f"Error in import_locations: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+        finally:
+            # Even a failed import may have written some batches
+            self.invalidate_caches()
+            self._import_lock.release()
+
+    async def get_import_status(self, request: web.Request) -> web.Response:
+        """Progress of the running import, or the result of the last one."""
+        return web.json_response({"import": self.import_status})
+
+    async def start_backfill(self, request: web.Request) -> web.Response:
+        """
+        Backfill gaps in stored history from HA's recorder.
+
+        Query params:
+            days: How far back to look for gaps (default: 10)
+            device_id: Devices to backfill (repeat or comma-separate,
+                       default: all tracked devices)
+        """
+        try:
+            days = float(request.query.get("days", DEFAULT_BACKFILL_DAYS))
+        except ValueError:
+            return web.json_response({"error": "Invalid days value"}, status=400)
+        if not 0 < days <= 365:
+            return web.json_response({"error": "days must be between 0 and 365"}, status=400)
+
+        try:
+            tracked = get_device_prefs().get_tracked_with_intervals()
+            requested = {
+                device_id
+                for value in request.query.getall("device_id", [])
+                for device_id in value.split(",") if device_id
+            }
+            if requested:
+                intervals = {d["entity_id"]: d.get("interval_minutes", 5) for d in tracked}
+                devices = [
+                    {"entity_id": device_id, "interval_minutes": intervals.get(device_id, 5)}
+                    for device_id in sorted(requested)
+                ]
+            else:
+                devices = tracked
+
+            summary = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: self.backfiller.run(devices, days=days)
+            )
+            if summary is None:
+                return web.json_response(
+                    {"error": "A backfill is already running", "status": self.backfiller.status},
+                    status=409
+                )
+            self.invalidate_caches()
+            return web.json_response(summary)
+
+        except Exception as e:
+            self.invalidate_caches()
+            _LOGGER.error(f"Error in start_backfill: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
+    async def get_backfill_status(self, request: web.Request) -> web.Response:
+        """Progress of the running backfill, or the result of the last one."""
+        return web.json_response({"backfill": self.backfiller.status})
+
+    async def get_reclassify_status(self, request: web.Request) -> web.Response:
+        """Progress of retroactive zone reclassification."""
+        if self.reclassifier is None:
+            return web.json_response({"reclassify": None})
+        return web.json_response({"reclassify": self.reclassifier.stats()})
+
+    async def get_scheduler_status(self, request: web.Request) -> web.Response:
+        """Per-device polling schedule: last poll, last success, last fix, failures."""
+        if self.scheduler is None:
+            return web.json_response({"devices": None})
+        return web.json_response({"devices": self.scheduler.stats()})
+
+    async def get_cache_stats(self, request: web.Request) -> web.Response:
+        """Report in-memory cache sizes and memory usage."""
+        try:
+            return web.json_response({
+                "hot_window": self.influx_client.hot_window.stats(),
+                "heatmap": self.heatmap_cache.stats(),
+                "places": self.places_cache.stats(),
+                "playback": self.playback_cache.stats(),
+                "geocode": self.geocoder.stats(),
+                "tiles": self.tile_proxy.stats() if self.tile_proxy else None,
+                "stream": self.broadcaster.stats(),
+            })
+        except Exception as e:
+            _LOGGER.error(f"Error in get_cache_stats: {e}", exc_info=True)
+            return web.json_response(
+                {"error": str(e)}, status=500
+            )
+
     async def run(self):
         """Run the API server."""
         _LOGGER.info(f"Starting API server on port {self.port}")
@@ -47,11 +47,18 @@ async def main():
         port=config["influxdb_port"],
         database=config["influxdb_database"],
         username=config["influxdb_username"],
-        password=config["influxdb_password"]
+        password=config["influxdb_password"],
+        # Points are written by the polling process, so nothing here could
+        # keep a hot window current
+        hot_window_depth=0
     )
+    influx_client.seed_last_known()
 
     # Create and run API server
-    api = LocationHistoryAPI(ha_client, influx_client, port=config["api_port"])
+    # No writes reach this process, so visits always come from InfluxDB
+    api = LocationHistoryAPI(
+        ha_client, influx_client, port=config["api_port"], track_visits=False
+    )
     await api.run()
 
     # Keep running
@@ -0,0 +1,224 @@
+"""Backfill polling gaps from the Home Assistant recorder history."""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from find_my_history.ha_client import HomeAssistantClient
+from find_my_history.importer import classify_rows
+from find_my_history.influxdb_client import DEFAULT_BATCH_SIZE, InfluxDBLocationClient
+from find_my_history.timeutils import to_epoch
+from find_my_history.zone_detector import ZoneDetector
+
+_LOGGER = logging.getLogger(__name__)
+
+# HA's recorder keeps 10 days of history by default
+DEFAULT_BACKFILL_DAYS = 10
+
+# History requests in flight at once
+DEFAULT_CONCURRENCY = 4
+
+# Longest period fetched by one history request
+MAX_WINDOW = timedelta(days=1)
+
+# A gap is a stretch with no fixes longer than this many polling intervals
+GAP_INTERVALS = 2
+
+
+def _parse_state_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def history_points(device_id: str, states: List[Dict]) -> List[Dict]:
+    """
+    Convert recorder states into location rows with their original timestamps.
+
+    Args:
+        device_id: Entity ID the states belong to
+        states: States from HomeAssistantClient.get_history
+
+    Returns:
+        Rows accepted by InfluxDBLocationClient.write_locations (zones unset)
+    """
+    rows = []
+    for state in states:
+        attributes = state.get("attributes") or {}
+        latitude = attributes.get("latitude")
+        longitude = attributes.get("longitude")
+        epoch = _parse_state_time(state.get("last_updated") or state.get("last_changed"))
+        if latitude is None or longitude is None or epoch is None:
+            continue
+        rows.append({
+            "time": epoch,
+            "device_id": device_id,
+            "device_name": attributes.get("friendly_name") or device_id,
+            "latitude": float(latitude),
+            "longitude": float(longitude),
+            "accuracy": attributes.get("gps_accuracy"),
+            "altitude": attributes.get("altitude"),
+            "battery_level": attributes.get("battery_level"),
+            "battery_state": attributes.get("battery_state"),
+        })
+    return rows
+
+
+def split_window(
+    start_time: datetime, end_time: datetime, size: timedelta = MAX_WINDOW
+) -> List[Tuple[datetime, datetime]]:
+    """Split a period into consecutive windows of at most `size`."""
+    windows = []
+    while start_time < end_time:
+        window_end = min(start_time + size, end_time)
+        windows.append((start_time, window_end))
+        start_time = window_end
+    return windows
+
+
+class Backfiller:
+    """
+    Recover missed fixes from HA's recorder.
+
+    For each device the gaps in InfluxDB longer than GAP_INTERVALS polling
+    intervals are looked up, and only those windows are requested from
+    /api/history/period, with at most `concurrency` requests in flight.
+    Recovered points keep their recorded timestamps and are written in
+    batches. One backfill runs at a time.
+    """
+
+    def __init__(
+        self,
+        ha_client: HomeAssistantClient,
+        influx_client: InfluxDBLocationClient,
+        zone_detector: Optional[ZoneDetector] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ):
+        """
+        Initialize backfiller.
+
+        Args:
+            ha_client: Home Assistant API client
+            influx_client: InfluxDB client
+            zone_detector: Zones to classify recovered points against
+            concurrency: History requests in flight at once
+            batch_size: Points per write request
+        """
+        self.ha_client = ha_client
+        self.influx_client = influx_client
+        self.zone_detector = zone_detector
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._lock = Lock()
+        self.status: Optional[Dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(
+        self,
+        devices: List[Dict],
+        days: float = DEFAULT_BACKFILL_DAYS,
+        end_time: Optional[datetime] = None
+    ) -> Optional[Dict]:
+        """
+        Backfill gaps for devices over the last `days`.
+
+        Args:
+            devices: Dicts with entity_id and interval_minutes
+            days: How far back to look for gaps
+            end_time: End of the period (default: now)
+
+        Returns:
+            Summary with gaps, windows, fetched and written counts, or None if
+            a backfill is already running
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            return self._run(devices, days, end_time)
+        except Exception as e:
+            self.status = {"state": "failed", "error": str(e)}
+            raise
+        finally:
+            self._lock.release()
+
+    def _run(self, devices: List[Dict], days: float, end_time: Optional[datetime]) -> Dict:
+        started = time.monotonic()
+        end_time = end_time or datetime.now(timezone.utc)
+        start_time = end_time - timedelta(days=days)
+        summary = {
+            "state": "running",
+            "devices": len(devices),
+            "gaps": 0,
+            "windows": 0,
+            "failed_windows": 0,
+            "fetched": 0,
+            "written": 0,
+            "elapsed_seconds": 0.0,
+        }
+        self.status = summary
+
+        # (device_id, gap_start, gap_end, window_start, window_end)
+        windows = []
+        for device in devices:
+            device_id = device["entity_id"]
+            min_gap = GAP_INTERVALS * device.get("interval_minutes", 5) * 60
+            for gap_start, gap_end in self.influx_client.find_gaps(
+                device_id, start_time, end_time, min_gap
+            ):
+                summary["gaps"] += 1
+                for window in split_window(gap_start, gap_end):
+                    windows.append((device_id, to_epoch(gap_start), to_epoch(gap_end)) + window)
+        summary["windows"] = len(windows)
+
+        pending: List[Dict] = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {
+                executor.submit(self.ha_client.get_history, device_id, window_start, window_end):
+                    (device_id, gap_start, gap_end, to_epoch(window_start), to_epoch(window_end))
+                for device_id, gap_start, gap_end, window_start, window_end in windows
+            }
+            for future in as_completed(futures):
+                device_id, gap_start, gap_end, window_start, window_end = futures[future]
+                states = future.result()
+                if states is None:
+                    summary["failed_windows"] += 1
+                    continue
+                # History starts with the state current at window_start, which
+                # belongs to the previous window; gap edges are stored fixes
+                rows = [
+                    row for row in history_points(device_id, states)
+                    if window_start <= row["time"] < window_end
+                    and gap_start < row["time"] < gap_end
+                ]
+                summary["fetched"] += len(rows)
+                pending.extend(rows)
+                while len(pending) >= self.batch_size:
+                    summary["written"] += self._write(pending[:self.batch_size])
+                    del pending[:self.batch_size]
+        if pending:
+            summary["written"] += self._write(pending)
+
+        summary["state"] = "done"
+        summary["elapsed_seconds"] = round(time.monotonic() - started, 3)
+        _LOGGER.info(
+            f"Backfill: {summary['written']} points recovered from {summary['gaps']} gaps "
+            f"across {len(devices)} devices in {summary['elapsed_seconds']:.1f}s"
+        )
+        return summary
+
+    def _write(self, rows: List[Dict]) -> int:
+        classify_rows(self.zone_detector, rows)
+        return self.influx_client.write_locations(rows)
@@ -0,0 +1,131 @@
+"""In-process fan-out of live location events to streaming clients."""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, Iterable, Optional, Set
+
+from find_my_history.timeutils import to_epoch
+
+_LOGGER = logging.getLogger(__name__)
+
+# Events buffered per subscriber before it counts as too slow and is dropped
+DEFAULT_QUEUE_SIZE = 256
+
+# Final event put on a dropped subscriber's queue
+DROPPED_EVENT = {"type": "dropped", "reason": "Client too slow, reconnect to resume"}
+
+
+class Subscription:
+    """One streaming client: a bounded queue and an optional device filter."""
+
+    def __init__(self, device_ids: Optional[Set[str]], max_queue: int):
+        self.device_ids = device_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue + 1)
+        self.max_queue = max_queue
+        self.dropped = False
+
+    def wants(self, event: Dict) -> bool:
+        return self.device_ids is None or event.get("device_id") in self.device_ids
+
+
+class Broadcaster:
+    """
+    Fan-out of newly written fixes and zone changes to subscribers.
+
+    publish() may be called from any thread (the polling loop writes from
+    the main thread); delivery always happens on the API event loop. Each
+    subscriber has a bounded queue, and one that falls behind is dropped
+    rather than slowing down everyone else.
+    """
+
+    def __init__(self, max_queue: int = DEFAULT_QUEUE_SIZE):
+        """
+        Initialize broadcaster.
+
+        Args:
+            max_queue: Events buffered per subscriber
+        """
+        self.max_queue = max_queue
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[Subscription] = set()
+        self._zones_lock = Lock()
+        self._zones: Dict[str, str] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, device_ids: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        Register a subscriber; must be called on the event loop that serves it.
+
+        Args:
+            device_ids: Only deliver events for these devices (all if None)
+        """
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(set(device_ids) if device_ids else None, self.max_queue)
+        self._subscribers.add(subscription)
+        _LOGGER.debug(f"Stream subscriber added ({len(self._subscribers)} active)")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscriber."""
+        self._subscribers.discard(subscription)
+        _LOGGER.debug(f"Stream subscriber removed ({len(self._subscribers)} active)")
+
+    def publish(self, event: Dict) -> None:
+        """Queue an event for delivery; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # nobody has ever subscribed
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(event)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: Dict) -> None:
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if not subscription.wants(event):
+                continue
+            if subscription.queue.qsize() >= subscription.max_queue:
+                # Leave room for the final event so the client learns why
+                subscription.dropped = True
+                subscription.queue.put_nowait(DROPPED_EVENT)
+                self._subscribers.discard(subscription)
+                self.dropped += 1
+                _LOGGER.warning("Dropped a stream subscriber that fell behind")
+                continue
+            subscription.queue.put_nowait(event)
+
+    def on_write(self, device_id: str, timestamp: datetime, fix: Dict) -> None:
+        """Write listener: publish the fix, plus a zone event if the zone changed."""
+        time_str = datetime.fromtimestamp(to_epoch(timestamp), timezone.utc).isoformat()
+        zone_name = fix.get("zone_name") or "unknown"
+
+        with self._zones_lock:
+            previous = self._zones.get(device_id)
+            self._zones[device_id] = zone_name
+
+        self.publish(dict(fix, type="location", device_id=device_id, time=time_str))
+        if previous is not None and previous != zone_name:
+            self.publish({
+                "type": "zone",
+                "device_id": device_id,
+                "time": time_str,
+                "from_zone": previous,
+                "to_zone": zone_name,
+            })
+
+    def stats(self) -> Dict:
+        """Subscriber and delivery counters."""
+        return {
+            "subscribers": len(self._subscribers),
+            "queued": sum(subscription.queue.qsize() for subscription in list(self._subscribers)),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,94 @@
+"""Index of the latest stored fix for each device."""
+
+import logging
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, List, Optional
+
+from find_my_history.timeutils import to_epoch
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LastKnownIndex:
+    """
+    Latest stored position, zone and battery per device.
+
+    Updated on every successful write and seeded once at startup, so the
+    device list can be served without touching Home Assistant or InfluxDB.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._lock = Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._epochs: Dict[str, float] = {}
+
+    def update(self, device_id: str, timestamp: datetime, fix: Dict) -> bool:
+        """
+        Record a fix if it is newer than the one already indexed.
+
+        Args:
+            device_id: Entity ID of the device
+            timestamp: Time the fix was stored with
+            fix: Dict with latitude, longitude and optional device_name,
+                 accuracy, battery_level, battery_state, in_zone, zone_name
+
+        Returns:
+            True if the index entry changed
+        """
+        epoch = to_epoch(timestamp)
+        # Naive times are UTC (see to_epoch); always report them with an offset
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        else:
+            timestamp = timestamp.astimezone(timezone.utc)
+        with self._lock:
+            if epoch < self._epochs.get(device_id, float("-inf")):
+                return False
+            self._epochs[device_id] = epoch
+            self._entries[device_id] = {
+                "device_id": device_id,
+                "device_name": fix.get("device_name") or device_id,
+                "time": timestamp.isoformat(),
+                "latitude": fix.get("latitude"),
+                "longitude": fix.get("longitude"),
+                "accuracy": fix.get("accuracy"),
+                "battery_level": fix.get("battery_level"),
+                "battery_state": fix.get("battery_state"),
+                "in_zone": bool(fix.get("in_zone")),
+                "zone_name": fix.get("zone_name") or "unknown",
+            }
+            return True
+
+    def seed(self, entries: List[Dict]) -> int:
+        """
+        Seed the index from stored data without overriding newer entries.
+
+        Args:
+            entries: Dicts with device_id, time (datetime) and fix fields
+
+        Returns:
+            Number of devices seeded
+        """
+        seeded = 0
+        for entry in entries:
+            if self.update(entry["device_id"], entry["time"], entry):
+                seeded += 1
+        _LOGGER.info(f"Seeded last-known index with {seeded} devices")
+        return seeded
+
+    def get(self, device_id: str) -> Optional[Dict]:
+        """Get the latest indexed fix for a device."""
+        with self._lock:
+            entry = self._entries.get(device_id)
+            return dict(entry) if entry else None
+
+    def all(self) -> Dict[str, Dict]:
+        """Get a snapshot of all indexed devices."""
+        with self._lock:
+            return {device_id: dict(entry) for device_id, entry in self._entries.items()}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -1,58 +1,220 @@
 """Device preferences manager for persistent tracking configuration."""
 
-import json
 import logging
 import os
-from typing import Dict, List, Optional
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 from threading import Lock
 
+from find_my_history.persistence import atomic_write_json, read_json
+
 _LOGGER = logging.getLogger(__name__)
 
 # Default path for preferences file (persists in add-on /data volume)
 DEFAULT_PREFS_PATH = "/data/tracked_devices.json"
 
+# Seconds changes are held before they are written, so bursts cost one write
+DEFAULT_SAVE_DELAY = 1.0
+
+# Seconds between checks of the preferences file for external edits
+DEFAULT_WATCH_INTERVAL = 5.0
+
+
+def _diff(
+    old_tracked: List[str], old_intervals: Dict, new_tracked: List[str], new_intervals: Dict
+) -> List[Dict]:
+    """Change events turning one set of preferences into another."""
+    old_set = set(old_tracked)
+    new_set = set(new_tracked)
+    events = []
+    for entity_id in old_tracked:
+        if entity_id not in new_set:
+            events.append(_event("removed", entity_id, old_intervals.get(entity_id, 5)))
+    for entity_id in new_tracked:
+        interval = new_intervals.get(entity_id, 5)
+        if entity_id not in old_set:
+            events.append(_event("added", entity_id, interval))
+        elif old_intervals.get(entity_id, 5) != interval:
+            events.append(_event("interval", entity_id, interval))
+    return events
+
+
+def _event(kind: str, entity_id: str, interval_minutes: int) -> Dict:
+    return {"event": kind, "entity_id": entity_id, "interval_minutes": interval_minutes}
+
 
 class DevicePreferences:
-    """Manages device tracking preferences with persistent storage."""
+    """
+    Manages device tracking preferences with persistent storage.
+
+    Changes are applied in memory at once and written to disk after
+    save_delay seconds, so a burst of changes is coalesced into a single
+    write. Writes go through a temporary file that is renamed over the
+    preferences file, so a crash never leaves it truncated. Call flush()
+    before exiting to write any pending changes.
+
+    Every change is published to listeners as an event dict with event
+    ("added", "removed" or "interval"), entity_id and interval_minutes.
+    Edits made to the file by something else are picked up by
+    check_for_changes() (polled by start_watching()) and published the
+    same way.
+    """
 
-    def __init__(self, prefs_path: str = DEFAULT_PREFS_PATH):
+    def __init__(self, prefs_path: str = DEFAULT_PREFS_PATH, save_delay: float = DEFAULT_SAVE_DELAY):
         """
         Initialize device preferences manager.
 
         Args:
             prefs_path: Path to the preferences JSON file
+            save_delay: Seconds to wait before writing changes (0 writes at once)
         """
         self.prefs_path = prefs_path
+        self.save_delay = save_delay
         self._lock = Lock()
+        self._save_lock = Lock()
         self._cache: Dict = {}
+        self._tracked: Set[str] = set()
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._batch_depth = 0
+        self._listeners: List[Callable[[Dict], object]] = []
+        self._file_signature: Optional[Tuple[int, int]] = None
+        self._watch_stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
         self._load()
 
-    def _load(self) -> None:
-        """Load preferences from file."""
-        with self._lock:
-            if os.path.exists(self.prefs_path):
+    def add_listener(self, listener: Callable[[Dict], object]) -> None:
+        """Register a callback run with the event dict of every change."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Dict], object]) -> None:
+        """Unregister a change callback."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, events: List[Dict]) -> None:
+        for event in events:
+            for listener in list(self._listeners):
                 try:
-                    with open(self.prefs_path, 'r') as f:
-                        self._cache = json.load(f)
-                    _LOGGER.info(f"Loaded device preferences from {self.prefs_path}")
-                except (json.JSONDecodeError, IOError) as e:
-                    _LOGGER.warning(f"Could not load preferences: {e}")
-                    self._cache = {"tracked_devices": [], "device_intervals": {}}
-            else:
-                _LOGGER.info("No preferences file found, using defaults")
-                self._cache = {"tracked_devices": [], "device_intervals": {}}
+                    listener(event)
+                except Exception as e:
+                    _LOGGER.error(f"Device preferences listener failed: {e}", exc_info=True)
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of the preferences file, None if it is missing."""
+        try:
+            stat = os.stat(self.prefs_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> List[Dict]:
+        """
+        Load preferences from file.
 
-    def _save(self) -> None:
-        """Save preferences to file."""
+        Returns:
+            Change events between the previous and the loaded preferences
+        """
+        # Taken before reading, so an edit racing the read is seen next check
+        signature = self._stat()
+        data = read_json(self.prefs_path)
+        if isinstance(data, dict):
+            _LOGGER.info(f"Loaded device preferences from {self.prefs_path}")
+        else:
+            _LOGGER.info("No usable preferences file found, using defaults")
+            data = {}
+        data.setdefault("tracked_devices", [])
+        data.setdefault("device_intervals", {})
         with self._lock:
+            if self._dirty:
+                _LOGGER.warning("Preferences file changed on disk; discarding unsaved changes")
+            self._cancel_timer()
+            self._dirty = False
+            old = self._cache
+            self._cache = data
+            self._tracked = set(data["tracked_devices"])
+            self._file_signature = signature
+        if not old:
+            return []
+        return _diff(
+            old["tracked_devices"], old["device_intervals"],
+            data["tracked_devices"], data["device_intervals"],
+        )
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _changed(self) -> None:
+        """Mark preferences dirty and schedule a write (call with the lock held)."""
+        self._dirty = True
+        if self._batch_depth or self._timer is not None:
+            return
+        if self.save_delay <= 0:
+            return
+        self._timer = threading.Timer(self.save_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> bool:
+        """
+        Write pending changes to disk now.
+
+        Returns:
+            True if a write happened
+        """
+        # The save lock keeps concurrent flushes writing snapshots in order
+        with self._save_lock:
+            with self._lock:
+                self._cancel_timer()
+                if not self._dirty:
+                    return False
+                self._dirty = False
+                snapshot = {
+                    **self._cache,
+                    "tracked_devices": list(self._cache["tracked_devices"]),
+                    "device_intervals": dict(self._cache["device_intervals"]),
+                }
             try:
-                # Ensure directory exists
-                os.makedirs(os.path.dirname(self.prefs_path), exist_ok=True)
-                with open(self.prefs_path, 'w') as f:
-                    json.dump(self._cache, f, indent=2)
+                atomic_write_json(self.prefs_path, snapshot, indent=2)
+                with self._lock:
+                    # Our own write isn't an external edit
+                    self._file_signature = self._stat()
                 _LOGGER.debug(f"Saved device preferences to {self.prefs_path}")
-            except IOError as e:
+                return True
+            except OSError as e:
                 _LOGGER.error(f"Could not save preferences: {e}")
+                with self._lock:
+                    self._dirty = True
+                return False
+
+    def _save(self) -> None:
+        """Write at once when saves aren't delayed (the timer handles the rest)."""
+        if self.save_delay <= 0 and not self._batch_depth:
+            self.flush()
+
+    @contextmanager
+    def batch(self) -> Iterator["DevicePreferences"]:
+        """
+        Group changes so they are written once, when the outermost batch exits.
+
+        Example:
+            with prefs.batch():
+                for entity_id in devices:
+                    prefs.set_interval(entity_id, 5)
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                done = self._batch_depth == 0 and self._dirty
+            if done:
+                self.flush()
 
     def get_tracked_devices(self) -> List[str]:
         """
@@ -62,7 +224,7 @@ class DevicePreferences:
             List of entity_id strings that are being tracked
         """
         with self._lock:
-            return list(self._cache.get("tracked_devices", []))
+            return list(self._cache["tracked_devices"])
 
     def is_tracked(self, entity_id: str) -> bool:
         """
@@ -74,8 +236,7 @@ class DevicePreferences:
         Returns:
             True if device is tracked, False otherwise
         """
-        with self._lock:
-            return entity_id in self._cache.get("tracked_devices", [])
+        return entity_id in self._tracked
 
     def add_device(self, entity_id: str, interval_minutes: int = 5) -> bool:
         """
@@ -89,18 +250,18 @@ class DevicePreferences:
             True if device was added, False if already tracked
         """
         with self._lock:
-            tracked = self._cache.setdefault("tracked_devices", [])
-            intervals = self._cache.setdefault("device_intervals", {})
-            
-            if entity_id in tracked:
+            if entity_id in self._tracked:
                 _LOGGER.debug(f"Device {entity_id} already tracked")
                 return False
-            
-            tracked.append(entity_id)
-            intervals[entity_id] = interval_minutes
+
+            self._tracked.add(entity_id)
+            self._cache["tracked_devices"].append(entity_id)
+            self._cache["device_intervals"][entity_id] = interval_minutes
+            self._changed()
             _LOGGER.info(f"Added device {entity_id} to tracking (interval: {interval_minutes}m)")
-        
+
         self._save()
+        self._notify([_event("added", entity_id, interval_minutes)])
         return True
 
     def remove_device(self, entity_id: str) -> bool:
@@ -114,18 +275,18 @@ class DevicePreferences:
             True if device was removed, False if not found
         """
         with self._lock:
-            tracked = self._cache.get("tracked_devices", [])
-            intervals = self._cache.get("device_intervals", {})
-            
-            if entity_id not in tracked:
+            if entity_id not in self._tracked:
                 _LOGGER.debug(f"Device {entity_id} was not tracked")
                 return False
-            
-            tracked.remove(entity_id)
-            intervals.pop(entity_id, None)
+
+            self._tracked.discard(entity_id)
+            self._cache["tracked_devices"].remove(entity_id)
+            interval = self._cache["device_intervals"].pop(entity_id, 5)
+            self._changed()
             _LOGGER.info(f"Removed device {entity_id} from tracking")
-        
+
         self._save()
+        self._notify([_event("removed", entity_id, interval)])
         return True
 
     def toggle_device(self, entity_id: str, interval_minutes: int = 5) -> bool:
@@ -158,7 +319,7 @@ class DevicePreferences:
             Interval in minutes
         """
         with self._lock:
-            return self._cache.get("device_intervals", {}).get(entity_id, default)
+            return self._cache["device_intervals"].get(entity_id, default)
 
     def set_interval(self, entity_id: str, interval_minutes: int) -> None:
         """
@@ -169,9 +330,15 @@ class DevicePreferences:
             interval_minutes: New interval in minutes
         """
         with self._lock:
-            intervals = self._cache.setdefault("device_intervals", {})
+            intervals = self._cache["device_intervals"]
+            if intervals.get(entity_id) == interval_minutes:
+                return
             intervals[entity_id] = interval_minutes
+            self._changed()
+            tracked = entity_id in self._tracked
         self._save()
+        if tracked:
+            self._notify([_event("interval", entity_id, interval_minutes)])
 
     def get_tracked_with_intervals(self) -> List[Dict]:
         """
@@ -181,8 +348,8 @@ class DevicePreferences:
             List of dicts with entity_id and interval_minutes
         """
         with self._lock:
-            tracked = self._cache.get("tracked_devices", [])
-            intervals = self._cache.get("device_intervals", {})
+            tracked = self._cache["tracked_devices"]
+            intervals = self._cache["device_intervals"]
             return [
                 {
                     "entity_id": entity_id,
@@ -193,8 +360,55 @@ class DevicePreferences:
             ]
 
     def reload(self) -> None:
-        """Reload preferences from file."""
-        self._load()
+        """Reload preferences from file, discarding unsaved changes."""
+        self._notify(self._load())
+
+    def check_for_changes(self) -> bool:
+        """
+        Reload the preferences if the file was changed by someone else.
+
+        The file's mtime and size are compared with those seen at the last
+        load or save, so this is one stat() call when nothing changed.
+
+        Returns:
+            True if the file was reloaded
+        """
+        signature = self._stat()
+        with self._lock:
+            if signature == self._file_signature:
+                return False
+        if signature is None:
+            # Deleted: keep the current preferences, they are written back on the next save
+            with self._lock:
+                self._file_signature = None
+            return False
+        _LOGGER.info(f"Device preferences changed on disk, reloading {self.prefs_path}")
+        self.reload()
+        return True
+
+    def start_watching(self, interval: float = DEFAULT_WATCH_INTERVAL) -> None:
+        """Check the file for external edits every interval seconds in a background thread."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watch_stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="prefs-watch", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        """Stop the file watcher."""
+        self._watch_stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch(self, interval: float) -> None:
+        while not self._watch_stop.wait(interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                _LOGGER.error(f"Error checking device preferences: {e}", exc_info=True)
 
 
 # Global instance for shared access
@@ -0,0 +1,134 @@
+"""Streaming export of location history to GPX, GeoJSON and CSV."""
+
+import csv
+import io
+import json
+import logging
+import zlib
+from typing import Dict, Iterable, Iterator, Tuple
+from xml.sax.saxutils import escape
+
+_LOGGER = logging.getLogger(__name__)
+
+# format -> (content type, file extension)
+EXPORT_FORMATS = {
+    "gpx": ("application/gpx+xml", "gpx"),
+    "geojson": ("application/geo+json", "geojson"),
+    "csv": ("text/csv", "csv"),
+}
+
+CSV_COLUMNS = (
+    "time", "device_id", "device_name", "latitude", "longitude", "accuracy",
+    "altitude", "battery_level", "battery_state", "in_zone", "zone_name",
+)
+
+# Bytes collected before a chunk is handed to the response
+CHUNK_SIZE = 64 * 1024
+
+Tracks = Iterable[Tuple[str, Iterable[Dict]]]
+
+
+def _gpx_pieces(tracks: Tracks) -> Iterator[str]:
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="Find My Location History" '
+        'xmlns="http://www.topografix.com/GPX/1/1">\n'
+    )
+    for device_id, rows in tracks:
+        started = False
+        for row in rows:
+            if not started:
+                name = row.get("device_name") or device_id
+                yield f"  <trk>\n    <name>{escape(name)}</name>\n    <trkseg>\n"
+                started = True
+            point = f'      <trkpt lat="{row["latitude"]}" lon="{row["longitude"]}">'
+            if row.get("altitude") is not None:
+                point += f"<ele>{row['altitude']}</ele>"
+            point += f"<time>{escape(row['time'])}</time>"
+            if row.get("zone_name") and row["zone_name"] != "unknown":
+                point += f"<desc>{escape(row['zone_name'])}</desc>"
+            yield point + "</trkpt>\n"
+        if started:
+            yield "    </trkseg>\n  </trk>\n"
+    yield "</gpx>\n"
+
+
+def _geojson_pieces(tracks: Tracks) -> Iterator[str]:
+    yield '{"type": "FeatureCollection", "features": [\n'
+    first = True
+    for _, rows in tracks:
+        for row in rows:
+            properties = {
+                key: row.get(key) for key in CSV_COLUMNS
+                if key not in ("latitude", "longitude", "altitude") and row.get(key) is not None
+            }
+            coordinates = [row["longitude"], row["latitude"]]
+            if row.get("altitude") is not None:
+                coordinates.append(row["altitude"])
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": coordinates},
+                "properties": properties,
+            }
+            yield ("" if first else ",\n") + json.dumps(feature)
+            first = False
+    yield "\n]}\n"
+
+
+def _csv_pieces(tracks: Tracks) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for _, rows in tracks:
+        for row in rows:
+            writer.writerow(["" if row.get(key) is None else row[key] for key in CSV_COLUMNS])
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+
+_WRITERS = {"gpx": _gpx_pieces, "geojson": _geojson_pieces, "csv": _csv_pieces}
+
+
+def export_chunks(fmt: str, tracks: Tracks, compress: bool = False) -> Iterator[bytes]:
+    """
+    Render tracks in an export format as a stream of byte chunks.
+
+    Args:
+        fmt: One of EXPORT_FORMATS
+        tracks: (device_id, rows) pairs; rows are location dicts in time order
+                and are consumed lazily
+        compress: Gzip the output
+
+    Returns:
+        Iterator of chunks of roughly CHUNK_SIZE bytes
+
+    Raises:
+        ValueError: Unknown format
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    pending = []
+    size = 0
+    for piece in _WRITERS[fmt](tracks):
+        data = piece.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            chunk = b"".join(pending)
+            pending, size = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b"".join(pending)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
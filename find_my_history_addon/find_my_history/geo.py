@@ -0,0 +1,65 @@
+"""Geodesic helpers shared by the analytics modules."""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+# Earth radius in meters
+EARTH_RADIUS = 6371000.0
+
+# Meters per degree of latitude on the sphere haversine measures on
+METERS_PER_DEGREE = math.radians(EARTH_RADIUS)
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Calculate distance between two coordinates using Haversine formula.
+
+    Returns:
+        Distance in meters
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+
+    a = (
+        math.sin(delta_phi / 2) ** 2 +
+        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    )
+    return EARTH_RADIUS * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def degree_extents(latitude: float, radius: float) -> Tuple[float, float]:
+    """
+    Half-size in degrees of a box holding every point within radius of latitude.
+
+    Uses the same sphere as haversine, so points the distance check accepts
+    are never outside the box. The longitude span is taken at the latitude
+    farthest from the equator the circle reaches; near the poles it covers
+    every longitude (180).
+
+    Returns:
+        Tuple of (latitude half-size, longitude half-size)
+    """
+    d_lat = math.degrees(radius / EARTH_RADIUS)
+    cos_lat = math.cos(math.radians(min(abs(latitude) + d_lat, 90.0)))
+    d_lon = min(d_lat / cos_lat, 180.0) if cos_lat > 1e-6 else 180.0
+    return d_lat, d_lon
+
+
+def haversine_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized Haversine distance; arguments broadcast like NumPy arrays.
+
+    Returns:
+        Distances in meters
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    return EARTH_RADIUS * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
@@ -0,0 +1,284 @@
+"""Reverse-geocoding proxy with a persistent cache and a rate-limited worker."""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+# Upstream services (Nominatim reverse endpoint and Overpass interpreter)
+DEFAULT_GEOCODER_URL = "https://nominatim.openstreetmap.org/reverse"
+DEFAULT_OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+# Cache file (persists in add-on /data volume)
+DEFAULT_CACHE_PATH = "/data/geocode_cache.sqlite"
+
+# Coordinates are rounded to this many decimals for cache keys (~11m)
+COORDINATE_PRECISION = 4
+
+# Nominatim usage policy: at most one request per second
+MIN_REQUEST_INTERVAL = 1.0
+
+# Cached places are refreshed after this many seconds
+CACHE_TTL = 30 * 24 * 60 * 60
+
+# Radius in meters for the nearby point-of-interest lookup
+POI_RADIUS = 30
+
+USER_AGENT = "FindMyHistory/1.0"
+REQUEST_TIMEOUT = 10
+
+
+def format_place(nominatim: Dict, poi: Optional[str], latitude: float, longitude: float) -> Dict:
+    """
+    Build a display name from a Nominatim reverse result and a nearby POI.
+
+    Returns:
+        Dict with primary and secondary display lines
+    """
+    address = nominatim.get("address") or {}
+    road = address.get("road") or address.get("street")
+    house_number = address.get("house_number")
+    street = f"{road} {house_number}" if road and house_number else road
+    area = address.get("suburb") or address.get("city")
+    business = poi or nominatim.get("name") or address.get("amenity")
+
+    if business and business != road:
+        primary, secondary = business, street or area
+    elif street:
+        primary, secondary = street, area
+    else:
+        primary, secondary = area or "Unknown", f"{latitude:.4f}, {longitude:.4f}"
+
+    return {"primary": primary, "secondary": secondary}
+
+
+class Geocoder:
+    """
+    Shared reverse geocoder for all UI clients.
+
+    Lookups are answered from an on-disk SQLite cache keyed by rounded
+    coordinates. Misses go through a single worker that spaces upstream
+    requests by min_interval, and concurrent lookups of the same key share
+    one upstream request.
+    """
+
+    def __init__(
+        self,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        geocoder_url: str = DEFAULT_GEOCODER_URL,
+        overpass_url: Optional[str] = DEFAULT_OVERPASS_URL,
+        min_interval: float = MIN_REQUEST_INTERVAL,
+        precision: int = COORDINATE_PRECISION,
+        ttl: float = CACHE_TTL
+    ):
+        """
+        Initialize geocoder.
+
+        Args:
+            cache_path: SQLite cache file
+            geocoder_url: Nominatim-compatible reverse geocoding URL
+            overpass_url: Overpass interpreter URL for nearby POIs (None to skip)
+            min_interval: Minimum seconds between upstream requests
+            precision: Decimals coordinates are rounded to
+            ttl: Seconds a cached place stays valid
+        """
+        self.cache_path = cache_path
+        self.geocoder_url = geocoder_url
+        self.overpass_url = overpass_url
+        self.min_interval = min_interval
+        self.precision = precision
+        self.ttl = ttl
+
+        self._db_lock = Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._last_request = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.upstream_requests = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the cache database, falling back to memory if the file can't be used."""
+        if self._db is None:
+            try:
+                directory = os.path.dirname(self.cache_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(self.cache_path, check_same_thread=False)
+            except (OSError, sqlite3.Error) as e:
+                _LOGGER.warning(f"Could not open geocode cache {self.cache_path}, using memory: {e}")
+                self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                "key TEXT PRIMARY KEY, place TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def cache_key(self, latitude: float, longitude: float) -> Tuple[str, float, float]:
+        """Round coordinates and build the cache key."""
+        lat = round(latitude, self.precision)
+        lon = round(longitude, self.precision)
+        return f"{lat:.{self.precision}f},{lon:.{self.precision}f}", lat, lon
+
+    def get_cached(self, latitude: float, longitude: float) -> Optional[Dict]:
+        """Cached place for the coordinates, or None if missing or expired."""
+        key, _, _ = self.cache_key(latitude, longitude)
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT place, fetched_at FROM places WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def _store(self, key: str, place: Dict) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO places (key, place, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(place), time.time())
+            )
+            db.commit()
+
+    async def lookup(self, latitude: float, longitude: float) -> Optional[Dict]:
+        """
+        Reverse geocode coordinates.
+
+        Returns:
+            Place dict (primary, secondary, latitude, longitude, cached),
+            or None if the upstream lookup failed
+        """
+        key, lat, lon = self.cache_key(latitude, longitude)
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.get_cached, lat, lon)
+        if cached is not None:
+            self.hits += 1
+            return dict(cached, cached=True)
+        self.misses += 1
+
+        future = self._pending.get(key)
+        if future is None:
+            future = loop.create_future()
+            self._pending[key] = future
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            if self._worker is None or self._worker.done():
+                self._worker = loop.create_task(self._run())
+            self._queue.put_nowait((key, lat, lon))
+
+        place = await asyncio.shield(future)
+        return dict(place, cached=False) if place is not None else None
+
+    async def _run(self) -> None:
+        """Worker: resolve queued lookups one at a time, spaced by min_interval."""
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        headers = {"User-Agent": USER_AGENT}
+        loop = asyncio.get_running_loop()
+        async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
+            while True:
+                key, lat, lon = await self._queue.get()
+                place = None
+                try:
+                    # Another request may have filled the cache while this one waited
+                    place = await loop.run_in_executor(None, self.get_cached, lat, lon)
+                    if place is None:
+                        wait = self._last_request + self.min_interval - time.monotonic()
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                        self._last_request = time.monotonic()
+                        place = await self._fetch(session, lat, lon)
+                        if place is not None:
+                            await loop.run_in_executor(None, self._store, key, place)
+                except Exception as e:
+                    _LOGGER.error(f"Geocoding failed: {e}", exc_info=True)
+                finally:
+                    future = self._pending.pop(key, None)
+                    if future is not None and not future.done():
+                        future.set_result(place)
+
+    async def _fetch(self, session: aiohttp.ClientSession, lat: float, lon: float) -> Optional[Dict]:
+        """Query the upstream services for one coordinate."""
+        self.upstream_requests += 1
+        nominatim, poi = await asyncio.gather(
+            self._fetch_nominatim(session, lat, lon),
+            self._fetch_poi(session, lat, lon)
+        )
+        if nominatim is None and poi is None:
+            return None
+        place = format_place(nominatim or {}, poi, lat, lon)
+        place.update(latitude=lat, longitude=lon)
+        return place
+
+    async def _fetch_nominatim(
+        self, session: aiohttp.ClientSession, lat: float, lon: float
+    ) -> Optional[Dict]:
+        params = {
+            "lat": str(lat), "lon": str(lon),
+            "format": "json", "addressdetails": "1", "zoom": "18",
+        }
+        try:
+            async with session.get(self.geocoder_url, params=params) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            _LOGGER.warning(f"Reverse geocoding request failed: {e}")
+            return None
+
+    async def _fetch_poi(
+        self, session: aiohttp.ClientSession, lat: float, lon: float
+    ) -> Optional[str]:
+        if not self.overpass_url:
+            return None
+        query = (
+            f'[out:json][timeout:5];(node["name"](around:{POI_RADIUS},{lat},{lon});'
+            f'node["amenity"](around:{POI_RADIUS},{lat},{lon}););out body 1;'
+        )
+        try:
+            async with session.post(self.overpass_url, data=query) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            _LOGGER.debug(f"POI lookup failed: {e}")
+            return None
+        for element in data.get("elements", []):
+            name = (element.get("tags") or {}).get("name")
+            if name:
+                return name
+        return None
+
+    def stats(self) -> Dict:
+        """Cache and queue statistics."""
+        with self._db_lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM places").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "upstream_requests": self.upstream_requests,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    async def close(self) -> None:
+        """Stop the worker and close the cache."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -2,8 +2,12 @@
 
 import requests
 import logging
+import time
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
 
+from find_my_history.metrics import HA_REQUEST_SECONDS
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -25,18 +29,28 @@ class HomeAssistantClient:
             "Content-Type": "application/json"
         }
 
-    def _request(self, method: str, endpoint: str, **kwargs) -> Optional[Any]:
+    def _request(
+        self, method: str, endpoint: str, timeout: float = 10, **kwargs
+    ) -> Optional[Any]:
         """Make HTTP request to Home Assistant API."""
         url = f"{self.base_url}{endpoint}"
+        status = "error"
+        started = time.perf_counter()
         try:
             response = requests.request(
-                method, url, headers=self.headers, timeout=10, **kwargs
+                method, url, headers=self.headers, timeout=timeout, **kwargs
             )
+            status = str(response.status_code)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             _LOGGER.error(f"HA API request failed: {e}")
             return None
+        finally:
+            # Entity ids and timestamps are cut off to keep label values few
+            HA_REQUEST_SECONDS.labels("/".join(endpoint.split("/")[:3]), status).observe(
+                time.perf_counter() - started
+            )
 
     def get_device_tracker_state(self, entity_id: str) -> Optional[Dict]:
         """
@@ -125,3 +139,37 @@ class HomeAssistantClient:
             Entity state dict or None
         """
         return self._request("GET", f"/api/states/{entity_id}")
+
+    def get_history(
+        self, entity_id: str, start_time: datetime, end_time: datetime
+    ) -> Optional[List[Dict]]:
+        """
+        Get recorded states of an entity from the recorder history API.
+
+        Args:
+            entity_id: Entity ID
+            start_time: Period start
+            end_time: Period end
+
+        Returns:
+            States in time order (with attributes), or None if the request failed
+        """
+        def iso(value: datetime) -> str:
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value.astimezone(timezone.utc).isoformat()
+
+        result = self._request(
+            "GET",
+            f"/api/history/period/{iso(start_time)}",
+            timeout=60,
+            params={
+                "filter_entity_id": entity_id,
+                "end_time": iso(end_time),
+                "significant_changes_only": "0",
+            },
+        )
+        if result is None:
+            return None
+        # One list per requested entity
+        return result[0] if result and isinstance(result[0], list) else []
@@ -0,0 +1,166 @@
+"""Server-side heatmap binning weighted by dwell time."""
+
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default geohash precision (7 characters is roughly 150m x 150m)
+DEFAULT_PRECISION = 7
+MIN_PRECISION = 1
+MAX_PRECISION = 9
+
+# A fix is assumed to hold until the next one, but never longer than this
+DEFAULT_MAX_GAP_SECONDS = 30 * 60
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def _cell_bits(precision: int) -> tuple:
+    """Longitude and latitude bits for a geohash precision."""
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+
+def _geohash(lon_index: int, lat_index: int, precision: int) -> str:
+    """Encode grid indices as a geohash string."""
+    lon_bits, lat_bits = _cell_bits(precision)
+    value = 0
+    # Geohash interleaves bits starting with longitude
+    for i in range(5 * precision):
+        if i % 2 == 0:
+            lon_bits -= 1
+            bit = (lon_index >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (lat_index >> lat_bits) & 1
+        value = (value << 1) | bit
+    chars = []
+    for _ in range(precision):
+        chars.append(_GEOHASH_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def dwell_times(
+    times: np.ndarray,
+    device_ids: Optional[Sequence[str]] = None,
+    end_time: Optional[float] = None,
+    max_gap: float = DEFAULT_MAX_GAP_SECONDS
+) -> np.ndarray:
+    """
+    Seconds each fix represents: the time until the next fix, capped at max_gap.
+
+    Args:
+        times: Epoch seconds, sorted per device
+        device_ids: Device of each fix (fixes must be grouped by device)
+        end_time: Range end, used for each device's last fix
+        max_gap: Upper bound for a single fix's dwell
+
+    Returns:
+        Array of dwell seconds, same length as times
+    """
+    n = len(times)
+    dwell = np.zeros(n, dtype=float)
+    if n == 0:
+        return dwell
+
+    dwell[:-1] = np.diff(times)
+    last = np.zeros(n, dtype=bool)
+    last[-1] = True
+    if device_ids is not None and n > 1:
+        ids = np.asarray(device_ids, dtype=object)
+        last[:-1] = ids[1:] != ids[:-1]
+
+    # A device's last fix holds until the end of the range
+    dwell[last] = (end_time - times[last]) if end_time is not None else 0.0
+    return np.clip(dwell, 0.0, max_gap)
+
+
+def bin_heatmap(
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    weights: Sequence[float],
+    precision: int = DEFAULT_PRECISION
+) -> List[Dict]:
+    """
+    Bin points into geohash cells and sum their weights.
+
+    Args:
+        latitudes: Point latitudes
+        longitudes: Point longitudes
+        weights: Per-point weight (dwell seconds)
+        precision: Geohash precision 1-9
+
+    Returns:
+        Cells sorted by weight, each with geohash, weighted centroid,
+        dwell_seconds, points and a 0-1 normalized weight
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    w = np.asarray(weights, dtype=float)
+    if lat.size == 0:
+        return []
+
+    lon_bits, lat_bits = _cell_bits(precision)
+    lon_index = np.clip(((lon + 180.0) / 360.0 * (1 << lon_bits)).astype(np.int64), 0, (1 << lon_bits) - 1)
+    lat_index = np.clip(((lat + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+    keys = (lon_index << lat_bits) | lat_index
+
+    cells, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, minlength=cells.size)
+    dwell = np.bincount(inverse, weights=w, minlength=cells.size)
+
+    # Centroid weighted by dwell, falling back to the plain mean for
+    # cells whose fixes carry no dwell at all
+    point_weight = np.where(dwell[inverse] > 0, w, 1.0)
+    total = np.bincount(inverse, weights=point_weight, minlength=cells.size)
+    centroid_lat = np.bincount(inverse, weights=lat * point_weight, minlength=cells.size) / total
+    centroid_lon = np.bincount(inverse, weights=lon * point_weight, minlength=cells.size) / total
+
+    peak = dwell.max() if dwell.size else 0.0
+    order = np.argsort(-dwell, kind="stable")
+    lat_mask = (1 << lat_bits) - 1
+
+    return [
+        {
+            "geohash": _geohash(int(cells[i]) >> lat_bits, int(cells[i]) & lat_mask, precision),
+            "latitude": round(float(centroid_lat[i]), 6),
+            "longitude": round(float(centroid_lon[i]), 6),
+            "dwell_seconds": round(float(dwell[i]), 1),
+            "points": int(counts[i]),
+            "weight": round(float(dwell[i] / peak), 4) if peak > 0 else 0.0,
+        }
+        for i in order
+    ]
+
+
+def build_heatmap(
+    columns: Dict[str, List],
+    end_time: Optional[float] = None,
+    precision: int = DEFAULT_PRECISION,
+    max_gap: float = DEFAULT_MAX_GAP_SECONDS
+) -> Dict:
+    """
+    Build a dwell-weighted heatmap from query_columns output.
+
+    Args:
+        columns: Columns with time, device_id, latitude and longitude
+        end_time: Range end in epoch seconds
+        precision: Geohash precision 1-9
+        max_gap: Upper bound for a single fix's dwell
+
+    Returns:
+        Dict with precision, cells, total_points and total_dwell_seconds
+    """
+    times = np.asarray(columns["time"], dtype=float)
+    dwell = dwell_times(times, columns["device_id"], end_time, max_gap)
+    cells = bin_heatmap(columns["latitude"], columns["longitude"], dwell, precision)
+    return {
+        "precision": precision,
+        "cells": cells,
+        "total_points": int(times.size),
+        "total_dwell_seconds": round(float(dwell.sum()), 1),
+    }
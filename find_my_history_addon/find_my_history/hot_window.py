@@ -0,0 +1,311 @@
+"""In-memory window of recent location fixes per device."""
+
+import logging
+import math
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, List, Optional
+
+from find_my_history.timeutils import to_epoch
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default number of fixes kept per device (24h at a 1 minute poll interval)
+DEFAULT_HOT_WINDOW_DEPTH = 1440
+
+_NAN = float("nan")
+
+
+class _DeviceRing:
+    """Fixed-size ring buffer of fixes for a single device."""
+
+    def __init__(self, depth: int, created_at: float):
+        self.depth = depth
+        self.count = 0
+        self.head = 0  # index of the next slot to write
+        # Numeric columns live in flat arrays, NaN marks a missing value
+        self.times = array("d", [0.0]) * depth
+        self.latitudes = array("d", [0.0]) * depth
+        self.longitudes = array("d", [0.0]) * depth
+        self.accuracies = array("d", [0.0]) * depth
+        self.altitudes = array("d", [0.0]) * depth
+        self.battery_levels = array("d", [0.0]) * depth
+        self.in_zone = array("b", [0]) * depth
+        # String columns store interned values, so repeats share memory
+        self.device_names: List[Optional[str]] = [None] * depth
+        self.zone_names: List[Optional[str]] = [None] * depth
+        self.battery_states: List[Optional[str]] = [None] * depth
+        # Everything written at or after this time is held in the ring
+        self.covered_since = created_at
+
+    def _slot(self, offset: int) -> int:
+        """Physical slot of the offset-th oldest fix."""
+        return (self.head - self.count + offset) % self.depth
+
+    def _write_slot(self, slot: int, ts: float, fix: Dict) -> None:
+        self.times[slot] = ts
+        self.latitudes[slot] = fix["latitude"]
+        self.longitudes[slot] = fix["longitude"]
+        self.accuracies[slot] = _float_or_nan(fix.get("accuracy"))
+        self.altitudes[slot] = _float_or_nan(fix.get("altitude"))
+        self.battery_levels[slot] = _float_or_nan(fix.get("battery_level"))
+        self.in_zone[slot] = 1 if fix.get("in_zone") else 0
+        self.device_names[slot] = _intern(fix.get("device_name"))
+        self.zone_names[slot] = _intern(fix.get("zone_name") or "unknown")
+        self.battery_states[slot] = _intern(fix.get("battery_state"))
+
+    def _copy_slot(self, src: int, dst: int) -> None:
+        for column in (
+            self.times, self.latitudes, self.longitudes, self.accuracies,
+            self.altitudes, self.battery_levels, self.in_zone,
+            self.device_names, self.zone_names, self.battery_states,
+        ):
+            column[dst] = column[src]
+
+    def append(self, ts: float, fix: Dict) -> None:
+        """Add a fix, keeping the ring ordered by time."""
+        if ts < self.covered_since:
+            # Older than anything the ring can vouch for, keep coverage honest
+            return
+
+        if self.count == self.depth:
+            # Evicting the oldest fix: coverage now starts after it
+            evicted = self.times[self._slot(0)]
+            self.count -= 1
+            self.covered_since = math.nextafter(evicted, math.inf)
+            if ts < self.covered_since:
+                return
+
+        # Fixes normally arrive in order; walk back only for late arrivals
+        position = self.count
+        while position > 0 and self.times[self._slot(position - 1)] > ts:
+            position -= 1
+
+        for offset in range(self.count, position, -1):
+            self._copy_slot(self._slot(offset - 1), self._slot(offset))
+        self._write_slot(self._slot(position), ts, fix)
+        self.count += 1
+        self.head = (self.head + 1) % self.depth
+
+    def oldest(self) -> Optional[float]:
+        return self.times[self._slot(0)] if self.count else None
+
+    def select(self, start: float, end: float, limit: int) -> List[Dict]:
+        """Return fixes with start <= time <= end, oldest first."""
+        # Binary search for the first fix at or after start
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[self._slot(mid)] < start:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        rows = []
+        for offset in range(lo, self.count):
+            if len(rows) >= limit:
+                break
+            slot = self._slot(offset)
+            ts = self.times[slot]
+            if ts > end:
+                break
+            rows.append(self._row(slot, ts))
+        return rows
+
+    def _row(self, slot: int, ts: float) -> Dict:
+        row = {
+            "time": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+            "device_name": self.device_names[slot] or "",
+            "in_zone": bool(self.in_zone[slot]),
+            "zone_name": self.zone_names[slot] or "unknown",
+            "latitude": self.latitudes[slot],
+            "longitude": self.longitudes[slot],
+        }
+        for field, column in (
+            ("accuracy", self.accuracies),
+            ("altitude", self.altitudes),
+        ):
+            if not math.isnan(column[slot]):
+                row[field] = column[slot]
+        if not math.isnan(self.battery_levels[slot]):
+            row["battery_level"] = int(self.battery_levels[slot])
+        if self.battery_states[slot] is not None:
+            row["battery_state"] = self.battery_states[slot]
+        return row
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by this ring (column storage only)."""
+        numeric = sum(
+            column.buffer_info()[1] * column.itemsize
+            for column in (
+                self.times, self.latitudes, self.longitudes, self.accuracies,
+                self.altitudes, self.battery_levels, self.in_zone,
+            )
+        )
+        strings = sum(
+            sys.getsizeof(column)
+            for column in (self.device_names, self.zone_names, self.battery_states)
+        )
+        return numeric + strings
+
+
+def _float_or_nan(value) -> float:
+    if value is None:
+        return _NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class HotWindow:
+    """
+    Bounded per-device ring buffers of the most recently written fixes.
+
+    The window can answer a query only when every stored point in the
+    requested range is guaranteed to be in memory, i.e. the range starts at
+    or after the time the device's ring began covering (process start, or the
+    newest evicted fix once the ring has wrapped).
+    """
+
+    def __init__(self, depth: int = DEFAULT_HOT_WINDOW_DEPTH):
+        """
+        Initialize hot window.
+
+        Args:
+            depth: Maximum number of fixes kept per device (0 disables the window)
+        """
+        self.depth = max(0, int(depth))
+        self._lock = Lock()
+        self._rings: Dict[str, _DeviceRing] = {}
+        # Coverage start of invalidated devices that don't have a ring yet
+        self._floors: Dict[str, float] = {}
+        self._started_at = float(int(time.time()))
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.depth > 0
+
+    def add(self, device_id: str, timestamp: datetime, fix: Dict) -> None:
+        """
+        Record a written fix.
+
+        Args:
+            device_id: Entity ID of the device
+            timestamp: Time the fix was stored with
+            fix: Dict with latitude, longitude and optional accuracy, altitude,
+                 battery_level, battery_state, in_zone, zone_name, device_name
+        """
+        if not self.enabled:
+            return
+        # Points are stored with second precision
+        ts = float(int(to_epoch(timestamp)))
+        with self._lock:
+            ring = self._rings.get(device_id)
+            if ring is None:
+                ring = _DeviceRing(self.depth, self._floors.pop(device_id, self._started_at))
+                self._rings[device_id] = ring
+            ring.append(ts, fix)
+
+    def invalidate(self, device_id: Optional[str] = None) -> None:
+        """
+        Forget coverage for a device (or all devices).
+
+        Used when points are written behind the window's back, e.g. by bulk
+        imports, so the window stops answering for ranges it no longer
+        fully describes. Devices without a ring yet get a coverage floor,
+        since their writes may predate the first fix the window sees.
+        """
+        with self._lock:
+            targets = [device_id] if device_id else list(self._rings)
+            # Points are stored with second precision: the current second may
+            # already hold points that were written around the window
+            now = float(int(time.time()) + 1)
+            for target in targets:
+                ring = self._rings.get(target)
+                if ring is not None:
+                    ring.count = 0
+                    ring.covered_since = now
+                else:
+                    self._floors[target] = now
+            if device_id is None:
+                self._floors.clear()
+                self._started_at = now
+
+    def _covered_since(self, device_id: str) -> float:
+        """Epoch seconds from which the device is fully in memory (call with the lock held)."""
+        ring = self._rings.get(device_id)
+        if ring is not None:
+            return ring.covered_since
+        return self._floors.get(device_id, self._started_at)
+
+    def covers(self, device_id: str, start_time: datetime) -> bool:
+        """Check whether a range starting at start_time is fully in memory."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            covered_since = self._covered_since(device_id)
+        return to_epoch(start_time) >= covered_since
+
+    def query(
+        self,
+        device_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        limit: int = 1000
+    ) -> Optional[List[Dict]]:
+        """
+        Answer a range query from memory.
+
+        Returns:
+            List of location dicts shaped like query_locations results,
+            or None if the range is not fully covered by the window
+        """
+        if not self.enabled:
+            return None
+        start = to_epoch(start_time)
+        end = to_epoch(end_time)
+        with self._lock:
+            ring = self._rings.get(device_id)
+            covered_since = self._covered_since(device_id)
+            if start < covered_since:
+                self.misses += 1
+                return None
+            self.hits += 1
+            rows = ring.select(start, end, limit) if ring else []
+        for row in rows:
+            row["device_id"] = device_id
+        return rows
+
+    def stats(self) -> Dict:
+        """Report window size and approximate memory usage."""
+        with self._lock:
+            devices = {
+                device_id: {
+                    "points": ring.count,
+                    "oldest": (
+                        datetime.fromtimestamp(ring.oldest(), timezone.utc).isoformat()
+                        if ring.count else None
+                    ),
+                    "memory_bytes": ring.memory_bytes(),
+                }
+                for device_id, ring in self._rings.items()
+            }
+            return {
+                "depth": self.depth,
+                "devices": len(devices),
+                "points": sum(d["points"] for d in devices.values()),
+                "memory_bytes": sum(d["memory_bytes"] for d in devices.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "per_device": devices,
+            }
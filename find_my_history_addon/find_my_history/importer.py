@@ -0,0 +1,557 @@
+"""Bulk import of historical locations from GPX, GeoJSON and CSV files."""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, TextIO
+
+import numpy as np
+
+from find_my_history.influxdb_client import DEFAULT_BATCH_SIZE, InfluxDBLocationClient
+from find_my_history.zone_detector import ZoneDetector
+
+_LOGGER = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("gpx", "geojson", "csv")
+
+# Characters read per step by the streaming GeoJSON reader
+READ_SIZE = 64 * 1024
+
+# Largest single GeoJSON value (feature) accepted, in characters
+MAX_VALUE_SIZE = 256 * 1024 * 1024
+
+# GPX elements that carry a position
+_GPX_POINTS = {"trkpt", "rtept", "wpt"}
+
+_FEATURES_RE = re.compile(r'"features"\s*:\s*\[')
+
+# Characters that change nesting outside strings, and that end or escape inside them
+_STRUCTURE_RE = re.compile(r'[{}\[\]"]')
+_STRING_RE = re.compile(r'["\\]')
+
+# Accepted CSV headers for each field
+_CSV_ALIASES = {
+    "time": ("time", "timestamp", "datetime", "date"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lon", "lng", "long"),
+    "altitude": ("altitude", "ele", "elevation", "alt"),
+    "accuracy": ("accuracy", "gps_accuracy"),
+    "battery_level": ("battery_level", "battery"),
+    "battery_state": ("battery_state",),
+    "device_id": ("device_id", "entity_id"),
+    "device_name": ("device_name", "name"),
+}
+
+ProgressCallback = Callable[[Dict], None]
+
+
+def detect_format(filename: str) -> Optional[str]:
+    """Guess the import format from a file name (a .gz suffix is ignored)."""
+    name = filename.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    extension = os.path.splitext(name)[1].lstrip(".")
+    if extension == "json":
+        return "geojson"
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def parse_time(value) -> Optional[float]:
+    """
+    Parse an ISO 8601 timestamp or epoch seconds/milliseconds.
+
+    Returns:
+        Epoch seconds, or None if the value is missing or unparseable
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        epoch = float(value)
+    else:
+        text = str(value).strip()
+        try:
+            epoch = float(text)
+        except ValueError:
+            try:
+                parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+            except ValueError:
+                return None
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.timestamp()
+    # Epoch milliseconds are common in app exports
+    return epoch / 1000.0 if epoch > 1e11 else epoch
+
+
+def _float(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize(raw: Dict) -> Optional[Dict]:
+    """Validate a parsed point; None if it has no usable time or position."""
+    epoch = parse_time(raw.get("time"))
+    latitude = _float(raw.get("latitude"))
+    longitude = _float(raw.get("longitude"))
+    if epoch is None or latitude is None or longitude is None:
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    battery_level = _float(raw.get("battery_level"))
+    return {
+        "time": epoch,
+        "latitude": latitude,
+        "longitude": longitude,
+        "altitude": _float(raw.get("altitude")),
+        "accuracy": _float(raw.get("accuracy")),
+        "battery_level": int(battery_level) if battery_level is not None else None,
+        "battery_state": raw.get("battery_state") or None,
+        "device_id": raw.get("device_id") or None,
+        "device_name": raw.get("device_name") or None,
+    }
+
+
+def _local(tag: str) -> str:
+    """Strip the XML namespace from a tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_gpx(fp: BinaryIO) -> Iterator[Dict]:
+    """
+    Stream raw points from a GPX file.
+
+    Points are detached from the tree as soon as they are read, so memory
+    does not grow with the file.
+    """
+    stack = []
+    track_name = None
+    for event, elem in ET.iterparse(fp, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        tag = _local(elem.tag)
+        if tag == "name" and stack and _local(stack[-1].tag) == "trk":
+            track_name = (elem.text or "").strip() or None
+        elif tag == "trk":
+            track_name = None
+        if tag not in _GPX_POINTS:
+            continue
+        point = {
+            "latitude": elem.get("lat"),
+            "longitude": elem.get("lon"),
+            "device_name": track_name,
+        }
+        for child in elem:
+            name = _local(child.tag)
+            if name == "time":
+                point["time"] = (child.text or "").strip()
+            elif name == "ele":
+                point["altitude"] = child.text
+        yield point
+        elem.clear()
+        if stack:
+            # The point is its parent's last child; drop it so the tree stays small
+            del stack[-1][-1]
+
+
+class _ValueScanner:
+    """
+    Finds where a JSON object or array ends, one chunk at a time.
+
+    Only brackets and string delimiters are looked at (jumping between them
+    with a regex), so each character is scanned once no matter how many
+    chunks the value spans.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False  # a chunk ended on a backslash inside a string
+
+    def feed(self, text: str, pos: int = 0) -> Optional[int]:
+        """Scan text from pos; return the index just past the value, or None."""
+        if self.escaped:
+            pos += 1
+            self.escaped = False
+        while True:
+            if self.in_string:
+                match = _STRING_RE.search(text, pos)
+                if match is None:
+                    return None
+                if match.group() == "\\":
+                    if match.end() >= len(text):
+                        self.escaped = True
+                        return None
+                    pos = match.end() + 1
+                    continue
+                self.in_string = False
+                pos = match.end()
+                continue
+            match = _STRUCTURE_RE.search(text, pos)
+            if match is None:
+                return None
+            pos = match.end()
+            char = match.group()
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    return pos
+
+
+def _iter_json_values(fp: TextIO, buffer: str, in_array: bool) -> Iterator:
+    """
+    Decode consecutive JSON values from a stream, reading as needed.
+
+    Objects and arrays are collected chunk by chunk until the scanner finds
+    their end and then decoded once, so large values cost linear time.
+
+    Raises:
+        ValueError: If the input is truncated, invalid or a value exceeds MAX_VALUE_SIZE
+    """
+    decoder = json.JSONDecoder()
+    eof = False
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+        if not buffer:
+            if eof:
+                if in_array:
+                    raise ValueError("Truncated GeoJSON: features array is not closed")
+                return
+            buffer = fp.read(READ_SIZE)
+            eof = not buffer
+            continue
+        if in_array and buffer[0] == "]":
+            return
+
+        if buffer[0] in "{[":
+            scanner = _ValueScanner()
+            parts = [buffer]
+            size = len(buffer)
+            end = scanner.feed(buffer)
+            while end is None:
+                chunk = fp.read(READ_SIZE) if not eof else ""
+                if not chunk:
+                    raise ValueError("Truncated GeoJSON: value is not closed")
+                size += len(chunk)
+                if size > MAX_VALUE_SIZE:
+                    raise ValueError(f"GeoJSON value larger than {MAX_VALUE_SIZE} characters")
+                parts.append(chunk)
+                end = scanner.feed(chunk)
+            # end is an index into the last part
+            text = "".join(parts)
+            end += size - len(parts[-1])
+            try:
+                value, _ = decoder.raw_decode(text[:end])
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid GeoJSON: {e}")
+            yield value
+            buffer = text[end:]
+            continue
+
+        # Bare scalars are short; read until one decodes
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            if eof or len(buffer) > READ_SIZE:
+                raise ValueError(f"Invalid GeoJSON: {e}")
+            chunk = fp.read(READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield value
+        buffer = buffer[end:]
+
+
+def _feature_points(feature: Dict) -> Iterator[Dict]:
+    """Raw points of one Feature (Point, or MultiPoint/LineString with coordTimes)."""
+    if not isinstance(feature, dict):
+        return
+    if feature.get("type") == "FeatureCollection":
+        for child in feature.get("features") or []:
+            yield from _feature_points(child)
+        return
+    geometry = feature.get("geometry") or {}
+    properties = feature.get("properties") or {}
+    base = {
+        key: properties.get(key)
+        for key in ("accuracy", "battery_level", "battery_state", "device_id", "device_name")
+    }
+    coordinates = geometry.get("coordinates") or []
+    if geometry.get("type") == "Point":
+        coordinates, times = [coordinates], [properties.get("time", properties.get("timestamp"))]
+    elif geometry.get("type") in ("MultiPoint", "LineString"):
+        times = properties.get("coordTimes") or properties.get("times") or []
+    else:
+        return
+    for position, timestamp in zip(coordinates, times):
+        if len(position) < 2:
+            continue
+        yield dict(
+            base,
+            time=timestamp,
+            longitude=position[0],
+            latitude=position[1],
+            altitude=position[2] if len(position) > 2 else properties.get("altitude"),
+        )
+
+
+def iter_geojson(fp: TextIO) -> Iterator[Dict]:
+    """
+    Stream raw points from GeoJSON.
+
+    A FeatureCollection is decoded one feature at a time; files without a
+    features array are read as a sequence of features (GeoJSON Lines).
+    """
+    head = fp.read(READ_SIZE)
+    match = _FEATURES_RE.search(head)
+    if match:
+        values = _iter_json_values(fp, head[match.end():], in_array=True)
+    else:
+        values = _iter_json_values(fp, head, in_array=False)
+    for feature in values:
+        yield from _feature_points(feature)
+
+
+def iter_csv(fp: TextIO) -> Iterator[Dict]:
+    """Stream raw points from CSV with a header row (see _CSV_ALIASES)."""
+    reader = csv.reader(fp)
+    header = [column.strip().lower() for column in next(reader, [])]
+    columns = {}
+    for field, aliases in _CSV_ALIASES.items():
+        for alias in aliases:
+            if alias in header:
+                columns[field] = header.index(alias)
+                break
+    if "latitude" not in columns or "longitude" not in columns or "time" not in columns:
+        raise ValueError("CSV needs time, latitude and longitude columns")
+    for values in reader:
+        yield {
+            field: values[index] if index < len(values) else None
+            for field, index in columns.items()
+        }
+
+
+def classify_rows(zone_detector: Optional[ZoneDetector], rows: List[Dict]) -> None:
+    """Set in_zone and zone_name on location rows in place with one batch lookup."""
+    if zone_detector is None:
+        for row in rows:
+            row["in_zone"] = False
+            row["zone_name"] = None
+        return
+    latitudes = np.fromiter((row["latitude"] for row in rows), float, len(rows))
+    longitudes = np.fromiter((row["longitude"] for row in rows), float, len(rows))
+    in_zone, names = zone_detector.check_zones_batch(latitudes, longitudes)
+    for row, flag, zone_name in zip(rows, in_zone.tolist(), names.tolist()):
+        row["in_zone"] = flag
+        row["zone_name"] = zone_name
+
+
+def _raw_points(fp: BinaryIO, fmt: str) -> Iterator[Dict]:
+    if fmt == "gpx":
+        return iter_gpx(fp)
+    text = io.TextIOWrapper(fp, encoding="utf-8-sig", newline="")
+    if fmt == "geojson":
+        return iter_geojson(text)
+    if fmt == "csv":
+        return iter_csv(text)
+    raise ValueError(f"Unknown import format: {fmt}")
+
+
+def import_stream(
+    fp: BinaryIO,
+    fmt: str,
+    influx_client: InfluxDBLocationClient,
+    zone_detector: Optional[ZoneDetector] = None,
+    device_id: Optional[str] = None,
+    device_name: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[ProgressCallback] = None
+) -> Dict:
+    """
+    Parse a file stream and write its points in batches.
+
+    Args:
+        fp: Binary file object
+        fmt: One of IMPORT_FORMATS
+        influx_client: InfluxDB client to write to
+        zone_detector: Zones to classify points against (points are stored
+                       as unknown if omitted)
+        device_id: Device to store points under (overrides ids in the file)
+        device_name: Friendly name (default: name in the file, then device_id)
+        batch_size: Points per write request
+        progress: Called with the running summary after every batch
+
+    Returns:
+        Summary with read, imported and skipped counts, devices and timing
+
+    Raises:
+        ValueError: Unknown format or unreadable file
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+    started = time.monotonic()
+    summary = {
+        "format": fmt,
+        "read": 0,
+        "imported": 0,
+        "skipped": 0,
+        "in_zone": 0,
+        "batches": 0,
+        "devices": [],
+        "elapsed_seconds": 0.0,
+    }
+    devices = set()
+
+    def flush(batch: List[Dict]) -> None:
+        classify_rows(zone_detector, batch)
+        summary["in_zone"] += sum(row["in_zone"] for row in batch)
+        summary["imported"] += influx_client.write_locations(batch)
+        summary["batches"] += 1
+        summary["elapsed_seconds"] = round(time.monotonic() - started, 3)
+        summary["devices"] = sorted(devices)
+        if progress is not None:
+            progress(dict(summary))
+
+    batch: List[Dict] = []
+    for raw in _raw_points(fp, fmt):
+        summary["read"] += 1
+        row = _normalize(raw)
+        if row is not None and device_id:
+            row["device_id"] = device_id
+        if row is None or not row["device_id"]:
+            summary["skipped"] += 1
+            continue
+        row["device_name"] = device_name or row["device_name"] or row["device_id"]
+        devices.add(row["device_id"])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    summary["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    summary["devices"] = sorted(devices)
+    _LOGGER.info(
+        f"Imported {summary['imported']} of {summary['read']} points "
+        f"({summary['skipped']} skipped) for {len(devices)} devices "
+        f"in {summary['elapsed_seconds']:.1f}s"
+    )
+    return summary
+
+
+def import_file(path: str, fmt: Optional[str] = None, **kwargs) -> Dict:
+    """
+    Import a file from disk; gzipped files are decompressed on the fly.
+
+    Args:
+        path: File path
+        fmt: Import format (detected from the file name if omitted)
+        **kwargs: Passed to import_stream
+
+    Returns:
+        Import summary
+    """
+    fmt = fmt or detect_format(path)
+    if fmt is None:
+        raise ValueError(f"Cannot tell the format of {path}; pass one of {', '.join(IMPORT_FORMATS)}")
+    with open(path, "rb") as raw:
+        fp = gzip.GzipFile(fileobj=raw) if raw.read(2) == b"\x1f\x8b" else raw
+        raw.seek(0)
+        return import_stream(fp, fmt, **kwargs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m find_my_history.importer FILE..."""
+    parser = argparse.ArgumentParser(
+        prog="python -m find_my_history.importer",
+        description="Import GPX, GeoJSON or CSV location history into InfluxDB.",
+    )
+    parser.add_argument("files", nargs="+", help="Files to import (optionally gzipped)")
+    parser.add_argument("--device-id", help="Store points under this device (required if the file has no device_id)")
+    parser.add_argument("--device-name", help="Friendly device name")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="File format (default: from extension)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Points per write")
+    parser.add_argument("--no-zones", action="store_true", help="Skip zone classification")
+    parser.add_argument("--influxdb-host", default=os.environ.get("INFLUXDB_HOST", "a0d7b954-influxdb"))
+    parser.add_argument("--influxdb-port", type=int, default=int(os.environ.get("INFLUXDB_PORT", "8086")))
+    parser.add_argument("--influxdb-database", default=os.environ.get("INFLUXDB_DATABASE", "find_my_history"))
+    parser.add_argument("--influxdb-username", default=os.environ.get("INFLUXDB_USERNAME", "admin"))
+    parser.add_argument("--influxdb-password", default=os.environ.get("INFLUXDB_PASSWORD", ""))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    zone_detector = None
+    token = os.environ.get("SUPERVISOR_TOKEN", "") or os.environ.get("HA_TOKEN", "")
+    if not args.no_zones:
+        if token:
+            from find_my_history.ha_client import HomeAssistantClient
+            ha_client = HomeAssistantClient(os.environ.get("HA_URL", "http://supervisor/core"), token)
+            zone_detector = ZoneDetector(ha_client.get_zones())
+        else:
+            _LOGGER.warning("No HA token available; points will be stored without zones")
+
+    influx_client = InfluxDBLocationClient(
+        host=args.influxdb_host,
+        port=args.influxdb_port,
+        database=args.influxdb_database,
+        username=args.influxdb_username,
+        password=args.influxdb_password,
+        hot_window_depth=0,
+    )
+
+    def report(summary: Dict) -> None:
+        rate = summary["imported"] / summary["elapsed_seconds"] if summary["elapsed_seconds"] else 0
+        print(
+            f"\r{summary['imported']} points imported, {summary['skipped']} skipped "
+            f"({rate:.0f} points/s)",
+            end="", file=sys.stderr, flush=True
+        )
+
+    failed = False
+    try:
+        for path in args.files:
+            try:
+                summary = import_file(
+                    path,
+                    fmt=args.format,
+                    influx_client=influx_client,
+                    zone_detector=zone_detector,
+                    device_id=args.device_id,
+                    device_name=args.device_name,
+                    batch_size=args.batch_size,
+                    progress=report,
+                )
+                print(file=sys.stderr)
+                print(f"{path}: {json.dumps(summary)}")
+            except Exception as e:
+                print(file=sys.stderr)
+                _LOGGER.error(f"Error importing {path}: {e}")
+                failed = True
+    finally:
+        influx_client.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
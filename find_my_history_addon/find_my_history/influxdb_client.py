@@ -1,15 +1,73 @@
 """InfluxDB client for storing location data."""
 
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, Optional, List, Tuple
 from influxdb_client import InfluxDBClient, Point, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
 
-from find_my_history.log_utils import format_coordinates
+from find_my_history.aggregates import flux_duration
+from find_my_history.device_index import LastKnownIndex
+from find_my_history.hot_window import DEFAULT_HOT_WINDOW_DEPTH, HotWindow
+from find_my_history.log_utils import LazyCoordinates
+from find_my_history.metrics import POINTS_WRITTEN, InstrumentedQueryApi, InstrumentedWriteApi
+from find_my_history.motion import annotate_motion
+from find_my_history.timeutils import to_epoch
 
 _LOGGER = logging.getLogger(__name__)
 
+# Points per write request for bulk writers
+DEFAULT_BATCH_SIZE = 5000
+
+_TAG_ESCAPES = str.maketrans({",": "\\,", "=": "\\=", " ": "\\ ", "\n": "\\ "})
+
+
+def _escape_tag(value: str) -> str:
+    """Escape a tag key or value for line protocol."""
+    return value.translate(_TAG_ESCAPES)
+
+
+def _escape_string_field(value: str) -> str:
+    """Quote a string field value for line protocol."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def location_line(row: Dict) -> str:
+    """
+    Format a fix as a device_location line-protocol record.
+
+    Builds the same tags and fields as write_location without going through
+    Point objects, which dominate the cost of bulk writes.
+
+    Args:
+        row: Dict with device_id, time (datetime or epoch seconds), latitude,
+             longitude and optional device_name, accuracy, altitude,
+             battery_level, battery_state, in_zone, zone_name
+
+    Returns:
+        Line-protocol record with second precision
+    """
+    timestamp = row["time"]
+    epoch = int(timestamp if isinstance(timestamp, (int, float)) else to_epoch(timestamp))
+    device_id = row["device_id"]
+    tags = (
+        f"device_location,device_id={_escape_tag(device_id)}"
+        f",device_name={_escape_tag(row.get('device_name') or device_id)}"
+        f",in_zone={'true' if row.get('in_zone') else 'false'}"
+        f",zone_name={_escape_tag(row.get('zone_name') or 'unknown')}"
+    )
+    fields = f"latitude={float(row['latitude'])!r},longitude={float(row['longitude'])!r}"
+    if row.get("accuracy") is not None:
+        fields += f",accuracy={float(row['accuracy'])!r}"
+    if row.get("altitude") is not None:
+        fields += f",altitude={float(row['altitude'])!r}"
+    if row.get("battery_level") is not None:
+        fields += f",battery_level={int(row['battery_level'])}i"
+    if row.get("battery_state") is not None:
+        fields += f",battery_state={_escape_string_field(str(row['battery_state']))}"
+    return f"{tags} {fields} {epoch}"
+
 
 class InfluxDBLocationClient:
     """Client for writing and reading location data from InfluxDB."""
@@ -20,7 +78,8 @@ class InfluxDBLocationClient:
         port: int,
         database: str,
         username: str,
-        password: str
+        password: str,
+        hot_window_depth: int = DEFAULT_HOT_WINDOW_DEPTH
     ):
         """
         Initialize InfluxDB client.
@@ -31,11 +90,15 @@ class InfluxDBLocationClient:
             database: Database name
             username: InfluxDB username
             password: InfluxDB password
+            hot_window_depth: Recent fixes kept in memory per device (0 disables)
         """
         self.host = host
         self.port = port
         self.database = database
         self.url = f"http://{host}:{port}"
+        self.hot_window = HotWindow(hot_window_depth)
+        self.last_known = LastKnownIndex()
+        self._write_listeners: List[Callable[[str, datetime, Dict], None]] = []
         
         # Try InfluxDB 2.x style first (with org), fallback to 1.x
         try:
@@ -46,8 +109,8 @@ class InfluxDBLocationClient:
                 token=f"{username}:{password}" if username and password else "",
                 org="-",
             )
-            self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
-            self.query_api = self.client.query_api()
+            self.write_api = InstrumentedWriteApi(self.client.write_api(write_options=SYNCHRONOUS))
+            self.query_api = InstrumentedQueryApi(self.client.query_api())
             # In InfluxDB 2.x, bucket = database name
             self.bucket = database
             self.version = 2
@@ -60,14 +123,32 @@ class InfluxDBLocationClient:
                     username=username,
                     password=password,
                 )
-                self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
-                self.query_api = self.client.query_api()
+                self.write_api = InstrumentedWriteApi(self.client.write_api(write_options=SYNCHRONOUS))
+                self.query_api = InstrumentedQueryApi(self.client.query_api())
                 self.bucket = database
                 self.version = 1
             except Exception as e2:
                 _LOGGER.error(f"Failed to initialize InfluxDB client: {e2}")
                 raise
 
+    def add_write_listener(self, listener: Callable[[str, datetime, Dict], None]) -> None:
+        """
+        Register a callback run after every successful write_location.
+
+        Args:
+            listener: Called with (device_id, timestamp, fix) where fix holds
+                      the written fields and tags
+        """
+        self._write_listeners.append(listener)
+
+    def _notify_write(self, device_id: str, timestamp: datetime, fix: Dict) -> None:
+        """Run write listeners; a failing listener never fails the write."""
+        for listener in self._write_listeners:
+            try:
+                listener(device_id, timestamp, fix)
+            except Exception as e:
+                _LOGGER.error(f"Write listener failed for {device_id}: {e}", exc_info=True)
+
     def write_location(
         self,
         device_id: str,
@@ -126,10 +207,22 @@ class InfluxDBLocationClient:
                 point = point.field("battery_state", battery_state)
 
             self.write_api.write(bucket=self.bucket, record=point)
-            coords = format_coordinates(latitude, longitude, precision=5)
-            _LOGGER.debug(
-                f"Wrote location for {device_id} at {coords}"
-            )
+            POINTS_WRITTEN.labels("poll").inc()
+            fix = {
+                "device_name": device_name,
+                "latitude": latitude,
+                "longitude": longitude,
+                "accuracy": accuracy,
+                "altitude": altitude,
+                "battery_level": battery_level,
+                "battery_state": battery_state,
+                "in_zone": in_zone,
+                "zone_name": zone_name,
+            }
+            self.hot_window.add(device_id, timestamp, fix)
+            self.last_known.update(device_id, timestamp, fix)
+            self._notify_write(device_id, timestamp, fix)
+            _LOGGER.debug("Wrote location for %s at %s", device_id, LazyCoordinates(latitude, longitude))
             return True
 
         except Exception as e:
@@ -141,20 +234,32 @@ class InfluxDBLocationClient:
         device_id: Optional[str] = None,
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
-        limit: int = 1000
+        limit: int = 1000,
+        annotate: bool = False,
+        every: Optional[int] = None
     ) -> List[Dict]:
         """
         Query location history from InfluxDB.
 
+        Single-device ranges that lie entirely inside the in-memory hot
+        window are answered without a database round-trip.
+
         Args:
             device_id: Filter by device ID (optional)
             start_time: Start time for query (optional)
             end_time: End time for query (optional)
             limit: Maximum number of results
+            annotate: Add distance_from_prev, speed_kmh, heading and motion to each row
+            every: Bucket size in seconds; returns one aggregated row per bucket
+                   (see query_aggregated) instead of raw points
 
         Returns:
             List of location dictionaries
         """
+        if every:
+            locations = self.query_aggregated(device_id, start_time, end_time, every)
+            return annotate_motion(locations) if annotate else locations
+
         try:
             # Build Flux query for InfluxDB 2.x
             if not start_time:
@@ -162,6 +267,12 @@ class InfluxDBLocationClient:
             if not end_time:
                 end_time = datetime.utcnow()
 
+            if device_id:
+                cached = self.hot_window.query(device_id, start_time, end_time, limit)
+                if cached is not None:
+                    _LOGGER.debug("Served %d locations for %s from hot window", len(cached), device_id)
+                    return annotate_motion(cached) if annotate else cached
+
             start_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
             end_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
 
@@ -212,12 +323,646 @@ class InfluxDBLocationClient:
             ]
             locations.sort(key=lambda x: x["time"])
 
+            if annotate:
+                annotate_motion(locations)
             return locations
 
         except Exception as e:
             _LOGGER.error(f"Failed to query locations from InfluxDB: {e}", exc_info=True)
             return []
 
+    def query_aggregated(
+        self,
+        device_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        every: int = 300
+    ) -> List[Dict]:
+        """
+        Query locations bucketed with aggregateWindow.
+
+        Each bucket reports the last position in it, the zone most fixes
+        were in, min/max battery and the number of fixes.
+
+        Args:
+            device_id: Filter by device ID (optional)
+            start_time: Start time for query (defaults to 30 days ago)
+            end_time: End time for query (defaults to now)
+            every: Bucket size in seconds
+
+        Returns:
+            Location dicts (time is the bucket start) with latitude, longitude,
+            zone_name, in_zone, battery_min, battery_max, count and resolution
+        """
+        if not start_time:
+            start_time = datetime.utcnow() - timedelta(days=30)
+        if not end_time:
+            end_time = datetime.utcnow()
+
+        try:
+            start_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            end_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            window = flux_duration(int(every))
+            device_filter = (
+                f'\n  |> filter(fn: (r) => r.device_id == "{device_id}")' if device_id else ""
+            )
+
+            query = f'''data = from(bucket: "{self.bucket}")
+  |> range(start: {start_str}, stop: {end_str})
+  |> filter(fn: (r) => r._measurement == "device_location"){device_filter}
+
+data
+  |> filter(fn: (r) => r._field == "latitude" or r._field == "longitude")
+  |> group(columns: ["device_id", "_field"])
+  |> sort(columns: ["_time"])
+  |> aggregateWindow(every: {window}, fn: last, timeSrc: "_start", createEmpty: false)
+  |> yield(name: "position")
+
+data
+  |> filter(fn: (r) => r._field == "latitude")
+  |> group(columns: ["device_id", "zone_name"])
+  |> aggregateWindow(every: {window}, fn: count, timeSrc: "_start", createEmpty: false)
+  |> yield(name: "zones")
+
+battery = data
+  |> filter(fn: (r) => r._field == "battery_level")
+  |> group(columns: ["device_id"])
+
+battery
+  |> aggregateWindow(every: {window}, fn: min, timeSrc: "_start", createEmpty: false)
+  |> yield(name: "battery_min")
+
+battery
+  |> aggregateWindow(every: {window}, fn: max, timeSrc: "_start", createEmpty: false)
+  |> yield(name: "battery_max")'''
+
+            buckets: Dict[Tuple[str, str], Dict] = {}
+            zone_counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+            for table in self.query_api.query(query):
+                for record in table.records:
+                    values = record.values
+                    key = (values.get("device_id", ""), record.get_time().isoformat())
+                    bucket = buckets.setdefault(key, {
+                        "time": key[1],
+                        "device_id": key[0],
+                        "count": 0,
+                        "resolution": int(every),
+                    })
+                    result = values.get("result")
+                    value = record.get_value()
+                    if result == "position":
+                        bucket[record.get_field()] = float(value)
+                    elif result == "zones":
+                        zones = zone_counts.setdefault(key, {})
+                        zone = values.get("zone_name", "unknown")
+                        zones[zone] = zones.get(zone, 0) + int(value)
+                        bucket["count"] += int(value)
+                    elif result in ("battery_min", "battery_max") and value is not None:
+                        bucket[result] = int(value)
+
+            locations = []
+            for key, bucket in buckets.items():
+                if "latitude" not in bucket or "longitude" not in bucket:
+                    continue
+                zones = zone_counts.get(key, {})
+                zone_name = max(zones, key=zones.get) if zones else "unknown"
+                bucket["zone_name"] = zone_name
+                bucket["in_zone"] = zone_name != "unknown"
+                locations.append(bucket)
+            locations.sort(key=lambda x: (x["time"], x["device_id"]))
+            return locations
+
+        except Exception as e:
+            _LOGGER.error(f"Failed to query aggregated locations from InfluxDB: {e}", exc_info=True)
+            return []
+
+    def query_columns(
+        self,
+        device_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        fields: Tuple[str, ...] = ("latitude", "longitude")
+    ) -> Dict[str, List]:
+        """
+        Query raw fixes as columns for vectorized processing.
+
+        Unlike query_locations this is not capped by a limit and returns
+        one list per column instead of one dict per point.
+
+        Args:
+            device_id: Filter by device ID (optional)
+            start_time: Start time for query (defaults to 30 days ago)
+            end_time: End time for query (defaults to now)
+            fields: Numeric fields to return
+
+        Returns:
+            Dict with "time" (epoch seconds), "device_id", "zone_name" and
+            one list per requested field, sorted by device and time
+        """
+        if not start_time:
+            start_time = datetime.utcnow() - timedelta(days=30)
+        if not end_time:
+            end_time = datetime.utcnow()
+
+        columns: Dict[str, List] = {"time": [], "device_id": [], "zone_name": []}
+        for field in fields:
+            columns[field] = []
+
+        if device_id:
+            cached = self.hot_window.query(device_id, start_time, end_time, limit=sys.maxsize)
+            if cached is not None:
+                for row in cached:
+                    columns["time"].append(to_epoch(datetime.fromisoformat(row["time"])))
+                    columns["device_id"].append(device_id)
+                    columns["zone_name"].append(row.get("zone_name", "unknown"))
+                    for field in fields:
+                        columns[field].append(row.get(field))
+                return columns
+
+        try:
+            start_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            end_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            field_filter = " or ".join(f'r._field == "{field}"' for field in fields)
+
+            query = f'''from(bucket: "{self.bucket}")
+  |> range(start: {start_str}, stop: {end_str})
+  |> filter(fn: (r) => r._measurement == "device_location")'''
+            if device_id:
+                query += f'\n  |> filter(fn: (r) => r.device_id == "{device_id}")'
+            query += f'''
+  |> filter(fn: (r) => {field_filter})
+  |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")'''
+
+            rows = []
+            for table in self.query_api.query(query):
+                for record in table.records:
+                    values = record.values
+                    rows.append((
+                        values.get("device_id", ""),
+                        record.get_time().timestamp(),
+                        values.get("zone_name", "unknown"),
+                        tuple(values.get(field) for field in fields),
+                    ))
+            rows.sort(key=lambda row: (row[0], row[1]))
+
+            for row_device, epoch, zone_name, values in rows:
+                columns["time"].append(epoch)
+                columns["device_id"].append(row_device)
+                columns["zone_name"].append(zone_name)
+                for field, value in zip(fields, values):
+                    columns[field].append(value)
+            return columns
+
+        except Exception as e:
+            _LOGGER.error(f"Failed to query location columns from InfluxDB: {e}", exc_info=True)
+            return columns
+
+    def iter_locations(
+        self,
+        device_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        page: timedelta = timedelta(days=1)
+    ) -> Iterator[Dict]:
+        """
+        Stream a device's fixes in time order, one page of time at a time.
+
+        Each page is a separate pivoted query read with query_stream, so
+        memory stays constant however long the range is.
+
+        Args:
+            device_id: Device ID
+            start_time: Range start
+            end_time: Range end
+            page: Time span fetched per query
+
+        Yields:
+            Location dicts shaped like query_locations rows
+        """
+        page_start = start_time
+        while page_start < end_time:
+            page_end = min(page_start + page, end_time)
+            query = f'''from(bucket: "{self.bucket}")
+  |> range(start: {page_start.strftime("%Y-%m-%dT%H:%M:%SZ")}, stop: {page_end.strftime("%Y-%m-%dT%H:%M:%SZ")})
+  |> filter(fn: (r) => r._measurement == "device_location")
+  |> filter(fn: (r) => r.device_id == "{device_id}")
+  |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+  |> group(columns: ["device_id"])
+  |> sort(columns: ["_time"])'''
+
+            for record in self.query_api.query_stream(query):
+                values = record.values
+                if values.get("latitude") is None or values.get("longitude") is None:
+                    continue
+                battery_level = values.get("battery_level")
+                yield {
+                    "time": record.get_time().isoformat(),
+                    "device_id": device_id,
+                    "device_name": values.get("device_name", ""),
+                    "latitude": float(values["latitude"]),
+                    "longitude": float(values["longitude"]),
+                    "accuracy": values.get("accuracy"),
+                    "altitude": values.get("altitude"),
+                    "battery_level": int(battery_level) if battery_level is not None else None,
+                    "battery_state": values.get("battery_state"),
+                    "in_zone": str(values.get("in_zone", "false")).lower() == "true",
+                    "zone_name": values.get("zone_name", "unknown"),
+                }
+            page_start = page_end
+
+    def write_locations(self, rows: Iterable[Dict]) -> int:
+        """
+        Write a batch of historical fixes in one line-protocol request.
+
+        Unlike write_location this does not run write listeners, since the
+        points are not live, but it keeps the hot window and last-known
+        index consistent with what was written behind their backs.
+
+        Args:
+            rows: Dicts accepted by location_line
+
+        Returns:
+            Number of points written
+
+        Raises:
+            Exception: If InfluxDB rejects the write
+        """
+        lines = []
+        newest: Dict[str, Tuple[float, Dict]] = {}
+        for row in rows:
+            lines.append(location_line(row))
+            timestamp = row["time"]
+            epoch = timestamp if isinstance(timestamp, (int, float)) else to_epoch(timestamp)
+            device_id = row["device_id"]
+            if epoch > newest.get(device_id, (float("-inf"), None))[0]:
+                newest[device_id] = (epoch, row)
+        if not lines:
+            return 0
+
+        self.write_api.write(bucket=self.bucket, record=lines, write_precision=WritePrecision.S)
+        POINTS_WRITTEN.labels("bulk").inc(len(lines))
+
+        for device_id, (epoch, row) in newest.items():
+            self.hot_window.invalidate(device_id)
+            self.last_known.update(
+                device_id, datetime.fromtimestamp(int(epoch), timezone.utc), row
+            )
+        _LOGGER.debug(f"Wrote {len(lines)} points for {len(newest)} devices")
+        return len(lines)
+
+    def find_gaps(
+        self,
+        device_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        min_gap: float
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Find periods without stored fixes for a device.
+
+        Gaps between consecutive fixes are found server-side with elapsed(),
+        so only the gaps cross the wire, not the points.
+
+        Args:
+            device_id: Device ID
+            start_time: Range start
+            end_time: Range end
+            min_gap: Shortest period in seconds that counts as a gap
+
+        Returns:
+            (gap_start, gap_end) pairs in time order, including the stretch
+            before the first and after the last fix; the whole range if the
+            device has no fixes in it
+        """
+        try:
+            start_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            end_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            query = f'''data = from(bucket: "{self.bucket}")
+  |> range(start: {start_str}, stop: {end_str})
+  |> filter(fn: (r) => r._measurement == "device_location")
+  |> filter(fn: (r) => r.device_id == "{device_id}")
+  |> filter(fn: (r) => r._field == "latitude")
+  |> group(columns: ["device_id"])
+  |> sort(columns: ["_time"])
+
+data
+  |> elapsed(unit: 1s)
+  |> filter(fn: (r) => r.elapsed > {int(min_gap)})
+  |> keep(columns: ["_time", "elapsed"])
+  |> yield(name: "gaps")
+
+data |> first() |> keep(columns: ["_time"]) |> yield(name: "first")
+
+data |> last() |> keep(columns: ["_time"]) |> yield(name: "last")'''
+
+            start_epoch = to_epoch(start_time)
+            end_epoch = to_epoch(end_time)
+            first = last = None
+            gaps = []
+            for table in self.query_api.query(query):
+                for record in table.records:
+                    epoch = to_epoch(record.get_time())
+                    result = record.values.get("result")
+                    if result == "gaps":
+                        gaps.append((epoch - float(record.values["elapsed"]), epoch))
+                    elif result == "first":
+                        first = epoch
+                    elif result == "last":
+                        last = epoch
+
+            if first is None:
+                gaps = [(start_epoch, end_epoch)]
+            else:
+                if first - start_epoch > min_gap:
+                    gaps.append((start_epoch, first))
+                if end_epoch - last > min_gap:
+                    gaps.append((last, end_epoch))
+            gaps.sort()
+            return [
+                (datetime.fromtimestamp(a, timezone.utc), datetime.fromtimestamp(b, timezone.utc))
+                for a, b in gaps
+            ]
+
+        except Exception as e:
+            _LOGGER.error(f"Failed to find gaps for {device_id}: {e}", exc_info=True)
+            return []
+
+    def iter_zone_candidates(
+        self,
+        device_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        boxes: List[Tuple[float, float, float, float]]
+    ) -> Iterator[Tuple[float, float, float, str]]:
+        """
+        Stream a device's fixes that fall inside any of the given boxes.
+
+        The box filter runs in InfluxDB, so only candidate points cross the
+        wire however long the history is.
+
+        Args:
+            device_id: Device ID
+            start_time: Range start
+            end_time: Range end
+            boxes: (min_lat, max_lat, min_lon, max_lon) boxes
+
+        Yields:
+            (epoch seconds, latitude, longitude, stored zone_name) in time order
+        """
+        if not boxes:
+            return
+        predicate = " or ".join(
+            f"(r.latitude >= {min_lat!r} and r.latitude <= {max_lat!r} and "
+            f"r.longitude >= {min_lon!r} and r.longitude <= {max_lon!r})"
+            for min_lat, max_lat, min_lon, max_lon in boxes
+        )
+        query = f'''from(bucket: "{self.bucket}")
+  |> range(start: {start_time.strftime("%Y-%m-%dT%H:%M:%SZ")}, stop: {end_time.strftime("%Y-%m-%dT%H:%M:%SZ")})
+  |> filter(fn: (r) => r._measurement == "device_location")
+  |> filter(fn: (r) => r.device_id == "{device_id}")
+  |> filter(fn: (r) => r._field == "latitude" or r._field == "longitude")
+  |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+  |> filter(fn: (r) => {predicate})
+  |> group(columns: ["device_id"])
+  |> sort(columns: ["_time"])
+  |> keep(columns: ["_time", "latitude", "longitude", "zone_name"])'''
+
+        for record in self.query_api.query_stream(query):
+            values = record.values
+            yield (
+                to_epoch(record.get_time()),
+                float(values["latitude"]),
+                float(values["longitude"]),
+                values.get("zone_name") or "unknown",
+            )
+
+    def delete_locations(self, device_id: str, start_time: datetime, end_time: datetime) -> None:
+        """
+        Delete a device's fixes in [start_time, end_time].
+
+        Raises:
+            Exception: If InfluxDB rejects the delete
+        """
+        self.client.delete_api().delete(
+            start_time,
+            end_time,
+            f'_measurement="device_location" AND device_id="{device_id}"',
+            bucket=self.bucket,
+            org="-",
+        )
+
+    def write_trip(self, device_id: str, trip: Dict) -> bool:
+        """
+        Write a finished trip to the device_trip measurement.
+
+        Args:
+            device_id: Entity ID of the device
+            trip: Trip dict from TripSegmenter (start_time/end_time datetimes,
+                  duration, distance, speeds and endpoints)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            point = (
+                Point("device_trip")
+                .tag("device_id", device_id)
+                .tag("start_zone", trip.get("start_zone") or "unknown")
+                .tag("end_zone", trip.get("end_zone") or "unknown")
+                .field("end_time", int(to_epoch(trip["end_time"])))
+                .field("duration_seconds", float(trip["duration_seconds"]))
+                .field("distance_m", float(trip["distance_m"]))
+                .field("avg_speed_kmh", float(trip["avg_speed_kmh"]))
+                .field("max_speed_kmh", float(trip["max_speed_kmh"]))
+                .field("points", int(trip["points"]))
+                .field("start_latitude", float(trip["start_latitude"]))
+                .field("start_longitude", float(trip["start_longitude"]))
+                .field("end_latitude", float(trip["end_latitude"]))
+                .field("end_longitude", float(trip["end_longitude"]))
+                .time(trip["start_time"], WritePrecision.S)
+            )
+            self.write_api.write(bucket=self.bucket, record=point)
+            return True
+
+        except Exception as e:
+            _LOGGER.error(f"Failed to write trip to InfluxDB: {e}")
+            return False
+
+    def query_trips(
+        self,
+        device_id: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        limit: int = 1000
+    ) -> List[Dict]:
+        """
+        Query finished trips that started within a time range.
+
+        Args:
+            device_id: Filter by device ID (optional)
+            start_time: Start time for query (defaults to 30 days ago)
+            end_time: End time for query (defaults to now)
+            limit: Maximum number of trips
+
+        Returns:
+            List of trip dictionaries sorted by start time
+        """
+        try:
+            if not start_time:
+                start_time = datetime.utcnow() - timedelta(days=30)
+            if not end_time:
+                end_time = datetime.utcnow()
+
+            start_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            end_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+            query = f'''from(bucket: "{self.bucket}")
+  |> range(start: {start_str}, stop: {end_str})
+  |> filter(fn: (r) => r._measurement == "device_trip")'''
+            if device_id:
+                query += f'\n  |> filter(fn: (r) => r.device_id == "{device_id}")'
+            query += '''
+  |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")'''
+
+            trips = []
+            for table in self.query_api.query(query):
+                for record in table.records:
+                    values = record.values
+                    end_epoch = values.get("end_time")
+                    trips.append({
+                        "device_id": values.get("device_id", ""),
+                        "start_time": record.get_time().isoformat(),
+                        "end_time": (
+                            datetime.fromtimestamp(end_epoch, timezone.utc).isoformat()
+                            if end_epoch is not None else None
+                        ),
+                        "duration_seconds": values.get("duration_seconds"),
+                        "distance_m": values.get("distance_m"),
+                        "avg_speed_kmh": values.get("avg_speed_kmh"),
+                        "max_speed_kmh": values.get("max_speed_kmh"),
+                        "points": values.get("points"),
+                        "start": {
+                            "latitude": values.get("start_latitude"),
+                            "longitude": values.get("start_longitude"),
+                            "zone_name": values.get("start_zone", "unknown"),
+                        },
+                        "end": {
+                            "latitude": values.get("end_latitude"),
+                            "longitude": values.get("end_longitude"),
+                            "zone_name": values.get("end_zone", "unknown"),
+                        },
+                    })
+
+            trips.sort(key=lambda trip: trip["start_time"])
+            return trips[:limit]
+
+        except Exception as e:
+            _LOGGER.error(f"Failed to query trips from InfluxDB: {e}", exc_info=True)
+            return []
+
+    def write_transition(self, device_id: str, event: Dict) -> bool:
+        """
+        Write a zone enter/exit event to the zone_transition measurement.
+
+        device_id, zone_name and event are tags, so "when did the device
+        last leave home" is an indexed lookup rather than a scan of fixes.
+
+        Args:
+            device_id: Entity ID of the device
+            event: Event dict from ZoneTransitionTracker (event, zone_name,
+                   time datetime, latitude, longitude, dwell_seconds)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            point = (
+                Point("zone_transition")
+                .tag("device_id", device_id)
+                .tag("zone_name", event["zone_name"])
+                .tag("event", event["event"])
+                .field("latitude", float(event["latitude"]))
+                .field("longitude", float(event["longitude"]))
+                .time(event["time"], WritePrecision.S)
+            )
+            if event.get("dwell_seconds") is not None:
+                point = point.field("dwell_seconds", float(event["dwell_seconds"]))
+            self.write_api.write(bucket=self.bucket, record=point)
+            return True
+
+        except Exception as e:
+            _LOGGER.error(f"Failed to write zone transition to InfluxDB: {e}")
+            return False
+
+    def query_transitions(
+        self,
+        device_id: Optional[str] = None,
+        zone_name: Optional[str] = None,
+        event: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        limit: int = 1000
+    ) -> List[Dict]:
+        """
+        Query zone enter/exit events, newest first.
+
+        Args:
+            device_id: Filter by device ID (optional)
+            zone_name: Filter by zone (optional)
+            event: "enter" or "exit" (optional)
+            start_time: Start time for query (defaults to 30 days ago)
+            end_time: End time for query (defaults to now)
+            limit: Maximum number of events
+
+        Returns:
+            List of event dictionaries, most recent first
+        """
+        try:
+            if not start_time:
+                start_time = datetime.utcnow() - timedelta(days=30)
+            if not end_time:
+                end_time = datetime.utcnow()
+
+            start_str = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            end_str = end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+            query = f'''from(bucket: "{self.bucket}")
+  |> range(start: {start_str}, stop: {end_str})
+  |> filter(fn: (r) => r._measurement == "zone_transition")'''
+            if device_id:
+                query += f'\n  |> filter(fn: (r) => r.device_id == "{device_id}")'
+            if zone_name:
+                query += f'\n  |> filter(fn: (r) => r.zone_name == "{zone_name}")'
+            if event:
+                query += f'\n  |> filter(fn: (r) => r.event == "{event}")'
+            query += f'''
+  |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+  |> group()
+  |> sort(columns: ["_time"], desc: true)
+  |> limit(n: {int(limit)})'''
+
+            transitions = []
+            for table in self.query_api.query(query):
+                for record in table.records:
+                    values = record.values
+                    transitions.append({
+                        "device_id": values.get("device_id", ""),
+                        "zone_name": values.get("zone_name", "unknown"),
+                        "event": values.get("event"),
+                        "time": record.get_time().isoformat(),
+                        "latitude": values.get("latitude"),
+                        "longitude": values.get("longitude"),
+                        "dwell_seconds": values.get("dwell_seconds"),
+                    })
+
+            transitions.sort(key=lambda transition: transition["time"], reverse=True)
+            return transitions[:limit]
+
+        except Exception as e:
+            _LOGGER.error(f"Failed to query zone transitions from InfluxDB: {e}", exc_info=True)
+            return []
+
     def get_unique_devices(self) -> List[str]:
         """
         Get list of unique device IDs from InfluxDB.
@@ -245,6 +990,72 @@ schema.tagValues(bucket: "{self.bucket}", tag: "device_id")'''
             _LOGGER.warning(f"Failed to get unique devices from InfluxDB: {e}")
             return []
 
+    def get_last_locations(self) -> List[Dict]:
+        """
+        Get the latest stored fix for every device with a single last() query.
+
+        Returns:
+            List of dicts with device_id, device_name, time (datetime),
+            latitude, longitude, accuracy, battery_level, battery_state,
+            in_zone and zone_name
+        """
+        try:
+            # last() runs per series (device, zone tags, field); the newest
+            # series per device is picked below
+            query = f'''from(bucket: "{self.bucket}")
+  |> range(start: 0)
+  |> filter(fn: (r) => r._measurement == "device_location")
+  |> filter(fn: (r) => r._field == "latitude" or r._field == "longitude" or r._field == "accuracy" or r._field == "battery_level" or r._field == "battery_state")
+  |> last()'''
+
+            tables = self.query_api.query(query)
+
+            # device_id -> field -> (time, value, record values)
+            latest: Dict[str, Dict] = {}
+            for table in tables:
+                for record in table.records:
+                    device_id = record.values.get("device_id")
+                    if not device_id:
+                        continue
+                    fields = latest.setdefault(device_id, {})
+                    field = record.get_field()
+                    current = fields.get(field)
+                    if current is None or record.get_time() > current[0]:
+                        fields[field] = (record.get_time(), record.get_value(), record.values)
+
+            locations = []
+            for device_id, fields in latest.items():
+                if "latitude" not in fields or "longitude" not in fields:
+                    continue
+                time, latitude, tags = fields["latitude"]
+                battery_level = fields.get("battery_level", (None, None, None))[1]
+                locations.append({
+                    "device_id": device_id,
+                    "device_name": tags.get("device_name", device_id),
+                    "time": time,
+                    "latitude": float(latitude),
+                    "longitude": float(fields["longitude"][1]),
+                    "accuracy": fields.get("accuracy", (None, None, None))[1],
+                    "battery_level": int(battery_level) if battery_level is not None else None,
+                    "battery_state": fields.get("battery_state", (None, None, None))[1],
+                    "in_zone": tags.get("in_zone", "false").lower() == "true",
+                    "zone_name": tags.get("zone_name", "unknown"),
+                })
+            return locations
+
+        except Exception as e:
+            _LOGGER.warning(f"Failed to get last locations from InfluxDB: {e}")
+            return []
+
+    def seed_last_known(self) -> int:
+        """
+        Seed the last-known index from stored data.
+
+        Returns:
+            Number of devices seeded
+        """
+        return self.last_known.seed(self.get_last_locations())
+
     def close(self):
         """Close InfluxDB client connections."""
         if self.client:
@@ -1,8 +1,12 @@
 """Utility functions for safe logging of sensitive information."""
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import re
+import string
 from typing import Any, Dict, Optional
 
 _LOGGER = logging.getLogger(__name__)
@@ -82,6 +86,25 @@ def sanitize_entity_id(entity_id: Optional[str]) -> str:
     return entity_id
 
 
+class LazyCoordinates:
+    """
+    Coordinates formatted only when a log record is actually emitted.
+
+    Pass as a %-style logging argument on hot paths, e.g.
+    ``_LOGGER.debug("at %s", LazyCoordinates(lat, lon))``.
+    """
+
+    __slots__ = ("latitude", "longitude", "precision")
+
+    def __init__(self, latitude: Optional[float], longitude: Optional[float], precision: int = 5):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.precision = precision
+
+    def __str__(self) -> str:
+        return format_coordinates(self.latitude, self.longitude, self.precision)
+
+
 class SecureLogFormatter(logging.Formatter):
     """
     Log formatter that can mask sensitive information in log messages.
@@ -92,11 +115,19 @@ class SecureLogFormatter(logging.Formatter):
     - Passwords
     """
     
-    # Pattern to match coordinate pairs like (12.34567, -98.76543)
-    COORD_PATTERN = re.compile(r'\((-?\d+\.\d{4,}),\s*(-?\d+\.\d{4,})\)')
-    
-    # Pattern to match tokens (long alphanumeric strings)
-    TOKEN_PATTERN = re.compile(r'\b([a-zA-Z0-9]{20,})\b')
+    # Coordinate pairs like (12.34567, -98.76543)
+    COORD_PATTERN = re.compile(r'\((?P<lat>-?\d+\.\d{4,}),\s*(?P<lon>-?\d+\.\d{4,})\)')
+
+    # Coordinates or tokens (long alphanumeric strings) in one scan
+    MASK_PATTERN = re.compile(COORD_PATTERN.pattern + r'|\b(?P<token>[a-zA-Z0-9]{20,})\b')
+
+    # Maps ASCII letters and digits to "a"; a run of 20 marks a possible token.
+    # Translating is far cheaper than the token regex, which has no literal
+    # prefix to search for, so most messages only need COORD_PATTERN
+    _TOKEN_GATE = bytes.maketrans(
+        (string.ascii_letters + string.digits).encode(), b"a" * 62
+    )
+    _TOKEN_RUN = b"a" * 20
     
     def __init__(self, fmt=None, datefmt=None, mask_sensitive=True):
         """
@@ -109,56 +140,70 @@ class SecureLogFormatter(logging.Formatter):
         """
         super().__init__(fmt, datefmt)
         self.mask_sensitive = mask_sensitive
-    
-    def format(self, record: logging.LogRecord) -> str:
-        """Format log record, masking sensitive data if enabled."""
-        # Get the formatted message
-        message = super().format(record)
-        
-        if not self.mask_sensitive:
-            return message
-        
-        # Mask coordinates: replace with masked version
-        # Keep first 2 decimal places for approximate location (~1km precision)
-        def mask_coords(match):
-            lat = float(match.group(1))
-            lon = float(match.group(2))
-            # Show approximate location but mask precise coordinates
-            return f"({lat:.2f}**, {lon:.2f}**)"
-        
-        message = self.COORD_PATTERN.sub(mask_coords, message)
-        
-        # Mask tokens (keep first 4 chars)
-        def mask_token(match):
-            token = match.group(1)
-            if len(token) > 4:
-                return f"{token[:4]}***"
-            return "***"
-        
-        # Only mask tokens that look like auth tokens (not entity IDs or device names)
-        # Entity IDs typically have dots, device names have spaces - tokens don't
-        def mask_token_safe(match):
-            token = match.group(1)
-            # Don't mask if it contains dots or spaces (likely not a token)
-            if '.' in token or ' ' in token:
-                return token
-            if len(token) > 4:
-                return f"{token[:4]}***"
-            return "***"
-        
-        message = self.TOKEN_PATTERN.sub(mask_token_safe, message)
-        
-        return message
+
+    @staticmethod
+    def _mask(match: "re.Match") -> str:
+        if match.lastgroup == "token":
+            # Keep first 4 chars; the pattern excludes dots and spaces, so
+            # entity IDs and device names are never masked
+            return f"{match.group('token')[:4]}***"
+        # Show approximate location (~1km precision) but mask precise coordinates
+        return f"({float(match.group('lat')):.2f}**, {float(match.group('lon')):.2f}**)"
+
+    def mask(self, text: str) -> str:
+        """Mask coordinates and tokens in text with a single regex scan."""
+        if self._TOKEN_RUN in text.encode("utf-8", "replace").translate(self._TOKEN_GATE):
+            return self.MASK_PATTERN.sub(self._mask, text)
+        return self.COORD_PATTERN.sub(self._mask, text)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        """Format the line, masking only the message, not the timestamp/level/name prefix."""
+        if self.mask_sensitive:
+            record.message = self.mask(record.message)
+        return super().formatMessage(record)
+
+    def formatException(self, ei) -> str:
+        """Format a traceback, masking it like the message."""
+        text = super().formatException(ei)
+        return self.mask(text) if self.mask_sensitive else text
+
+    def formatStack(self, stack_info: str) -> str:
+        """Format stack info, masking it like the message."""
+        text = super().formatStack(stack_info)
+        return self.mask(text) if self.mask_sensitive else text
+
+
+# Listener draining the logging queue; replaced on every setup call
+_queue_listener: Optional[logging.handlers.QueueListener] = None
 
 
-def setup_secure_logging(level=logging.INFO, mask_sensitive=None):
+def _stop_queue_listener() -> None:
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def log_queue_depth() -> int:
+    """Records waiting for the background log writer."""
+    listener = _queue_listener
+    return listener.queue.qsize() if listener is not None else 0
+
+
+def setup_secure_logging(level=logging.INFO, mask_sensitive=None, use_queue=True):
     """
     Set up secure logging configuration.
+
+    With use_queue the root logger only enqueues records; a background
+    listener thread formats, masks and writes them, so the polling thread
+    never waits on regexes or console I/O.
     
     Args:
         level: Logging level
         mask_sensitive: Whether to mask sensitive data (defaults to MASK_SENSITIVE_DATA env var)
+        use_queue: Hand records to a background writer thread
     """
+    global _queue_listener
     if mask_sensitive is None:
         mask_sensitive = MASK_SENSITIVE_DATA
     
@@ -175,10 +220,21 @@ def setup_secure_logging(level=logging.INFO, mask_sensitive=None):
     # Remove existing handlers
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    _stop_queue_listener()
     
-    # Add console handler with secure formatter
+    # Console handler with secure formatter
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
+    if not use_queue:
+        root_logger.addHandler(console_handler)
+        return root_logger
+
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _queue_listener = logging.handlers.QueueListener(log_queue, console_handler)
+    _queue_listener.start()
     return root_logger
+
+
+# Flush queued records on interpreter exit
+atexit.register(_stop_queue_listener)
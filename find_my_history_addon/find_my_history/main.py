@@ -13,9 +13,19 @@ from typing import Dict, List, Optional
 from find_my_history.ha_client import HomeAssistantClient
 from find_my_history.zone_detector import ZoneDetector
 from find_my_history.influxdb_client import InfluxDBLocationClient
+from find_my_history.transitions import ZoneTransitionTracker
+from find_my_history.trips import TripSegmenter
 from find_my_history.api import LocationHistoryAPI
+from find_my_history.backfill import DEFAULT_BACKFILL_DAYS
+from find_my_history.polygons import load_polygon_zones
+from find_my_history.reclassify import Reclassifier
+from find_my_history.scheduler import PollScheduler
+from find_my_history.timeutils import to_epoch
+from find_my_history.geocoder import DEFAULT_GEOCODER_URL, DEFAULT_OVERPASS_URL, Geocoder
+from find_my_history.tiles import DEFAULT_TILE_CACHE_MB, TileProxy, merge_tile_layers
 from find_my_history.device_prefs import get_device_prefs
-from find_my_history.log_utils import format_coordinates, setup_secure_logging
+from find_my_history.log_utils import LazyCoordinates, setup_secure_logging
+from find_my_history.metrics import POLL_CYCLE_SECONDS, POLL_RESULTS
 
 # Configure secure logging
 setup_secure_logging(level=logging.INFO)
@@ -52,6 +62,13 @@ def load_config() -> Dict:
         if d.get("enabled", True) and d.get("entity_id") and "example" not in d.get("entity_id", "")
     ]
 
+    tile_layers_str = os.environ.get("TILE_LAYERS", "[]")
+    try:
+        tile_layers = json.loads(tile_layers_str) if tile_layers_str else []
+    except json.JSONDecodeError:
+        _LOGGER.warning(f"Could not parse TILE_LAYERS: {tile_layers_str}")
+        tile_layers = []
+
     # Parse boolean
     focus_unknown_str = os.environ.get("FOCUS_UNKNOWN_LOCATIONS", "true")
     focus_unknown = focus_unknown_str.lower() in ("true", "1", "yes")
@@ -71,6 +88,14 @@ def load_config() -> Dict:
         "influxdb_password": os.environ.get("INFLUXDB_PASSWORD", ""),
         "focus_unknown_locations": focus_unknown,
         "api_port": int(os.environ.get("API_PORT", "8090")),
+        "hot_window_depth": int(os.environ.get("HOT_WINDOW_DEPTH", "1440")),
+        "geocoder_url": os.environ.get("GEOCODER_URL") or DEFAULT_GEOCODER_URL,
+        "overpass_url": os.environ.get("OVERPASS_URL") or DEFAULT_OVERPASS_URL,
+        "tile_proxy": os.environ.get("TILE_PROXY", "true").lower() in ("true", "1", "yes"),
+        "tile_cache_mb": int(os.environ.get("TILE_CACHE_MB", str(DEFAULT_TILE_CACHE_MB))),
+        "tile_layers": tile_layers,
+        "backfill_days": int(os.environ.get("BACKFILL_DAYS", str(DEFAULT_BACKFILL_DAYS))),
+        "polygon_zones_file": os.environ.get("POLYGON_ZONES_FILE", ""),
     }
 
     # Validate required config
@@ -143,7 +168,8 @@ def poll_devices(
     zone_detector: ZoneDetector,
     influx_client: InfluxDBLocationClient,
     device_ids: List[str],
-    focus_unknown: bool
+    focus_unknown: bool,
+    scheduler: Optional[PollScheduler] = None
 ):
     """
     Poll all configured devices and store their locations.
@@ -154,21 +180,25 @@ def poll_devices(
         influx_client: InfluxDB client
         device_ids: List of device_tracker entity IDs to poll
         focus_unknown: Whether to focus on unknown locations
+        scheduler: Records the outcome of each device's poll (optional)
     """
-    _LOGGER.info(f"Polling {len(device_ids)} devices...")
+    _LOGGER.info("Polling %d devices...", len(device_ids))
 
     for device_id in device_ids:
+        polled, fix_time, result = False, None, "error"
         try:
             # Get device state from HA
             entity_state = ha_client.get_device_tracker_state(device_id)
             if not entity_state:
                 _LOGGER.warning(f"Could not get state for {device_id}")
+                result = "no_state"
                 continue
 
             # Extract location data
             location_data = extract_location_data(entity_state)
             if not location_data:
                 _LOGGER.debug(f"No location data for {device_id}")
+                polled, result = True, "no_location"
                 continue
 
             # Check if in zone
@@ -196,21 +226,42 @@ def poll_devices(
             )
 
             if success:
-                status = f"in zone '{zone_name}'" if in_zone else "unknown location"
-                coords = format_coordinates(
-                    location_data['latitude'],
-                    location_data['longitude'],
-                    precision=4
-                )
+                # One line per device per poll; coordinates are only formatted if emitted
                 _LOGGER.info(
-                    f"Stored location for {device_id} ({device_name}): "
-                    f"{coords} - {status}"
+                    "Stored location for %s (%s): %s - %s",
+                    device_id, device_name,
+                    LazyCoordinates(location_data["latitude"], location_data["longitude"], precision=4),
+                    f"in zone '{zone_name}'" if in_zone else "unknown location"
                 )
+                polled, fix_time = True, to_epoch(location_data["timestamp"])
+                result = "stored"
             else:
                 _LOGGER.error(f"Failed to store location for {device_id}")
+                result = "write_failed"
 
         except Exception as e:
             _LOGGER.error(f"Error processing device {device_id}: {e}", exc_info=True)
+        finally:
+            POLL_RESULTS.labels(result).inc()
+            if scheduler is not None:
+                scheduler.record(device_id, polled, fix_time)
+
+
+def load_zones(ha_client: HomeAssistantClient, polygon_zones_file: str) -> List[Dict]:
+    """
+    HA zones plus the polygon zones from the configured GeoJSON file.
+
+    Args:
+        ha_client: Home Assistant API client
+        polygon_zones_file: GeoJSON file path (empty to skip)
+
+    Returns:
+        Zone list for ZoneDetector
+    """
+    zones = ha_client.get_zones()
+    if polygon_zones_file:
+        zones = zones + load_polygon_zones(polygon_zones_file)
+    return zones
 
 
 def run_api_server(api: LocationHistoryAPI):
@@ -226,6 +277,15 @@ def run_api_server(api: LocationHistoryAPI):
         loop.close()
 
 
+def run_backfill(api: LocationHistoryAPI, devices: List[Dict], days: int):
+    """Recover fixes missed while the add-on was down (runs in a background thread)."""
+    try:
+        if api.backfiller.run(devices, days=days) is not None:
+            api.invalidate_caches()
+    except Exception as e:
+        _LOGGER.error(f"Error in startup backfill: {e}", exc_info=True)
+
+
 def main():
     """Main entry point."""
     _LOGGER.info("Starting Find My Location History add-on...")
@@ -240,26 +300,26 @@ def main():
     # Config is the source of truth for intervals, UI manages which devices are tracked
     config_devices = config.get("tracked_devices", [])
     if config_devices:
-        existing_tracked = prefs.get_tracked_devices()
-        
-        for dev in config_devices:
-            entity_id = dev.get("entity_id")
-            interval = dev.get("interval_minutes", 5)
-            enabled = dev.get("enabled", True)
-            
-            if not entity_id or "example" in entity_id:
-                continue
-                
-            if enabled:
-                if entity_id not in existing_tracked:
-                    # Add new device from config
-                    prefs.add_device(entity_id, interval)
-                    _LOGGER.info(f"Added device from config: {entity_id} (interval: {interval}m)")
-                else:
-                    # Update interval from config
-                    prefs.set_interval(entity_id, interval)
-                    _LOGGER.debug(f"Updated interval from config: {entity_id} -> {interval}m")
-    
+        # One write for the whole sync instead of one per device
+        with prefs.batch():
+            for dev in config_devices:
+                entity_id = dev.get("entity_id")
+                interval = dev.get("interval_minutes", 5)
+                enabled = dev.get("enabled", True)
+
+                if not entity_id or "example" in entity_id:
+                    continue
+
+                if enabled:
+                    if not prefs.is_tracked(entity_id):
+                        # Add new device from config
+                        prefs.add_device(entity_id, interval)
+                        _LOGGER.info(f"Added device from config: {entity_id} (interval: {interval}m)")
+                    else:
+                        # Update interval from config
+                        prefs.set_interval(entity_id, interval)
+                        _LOGGER.debug(f"Updated interval from config: {entity_id} -> {interval}m")
+
     # Log current tracked devices
     tracked = prefs.get_tracked_with_intervals()
     _LOGGER.info(f"Device preferences loaded: {len(tracked)} devices tracked")
@@ -273,24 +333,79 @@ def main():
         port=config["influxdb_port"],
         database=config["influxdb_database"],
         username=config["influxdb_username"],
-        password=config["influxdb_password"]
+        password=config["influxdb_password"],
+        hot_window_depth=config["hot_window_depth"]
     )
+    influx_client.seed_last_known()
+
+    # Trips are segmented as fixes are stored and persisted when the device settles
+    trip_segmenter = TripSegmenter(on_trip=influx_client.write_trip)
+    influx_client.add_write_listener(trip_segmenter.on_write)
 
     # Get initial zones
-    zones = ha_client.get_zones()
+    zones = load_zones(ha_client, config["polygon_zones_file"])
     zone_detector = ZoneDetector(zones)
     _LOGGER.info(f"Loaded {len(zones)} zones")
 
+    # Zone enter/exit events, debounced at zone edges, stored as they happen
+    transition_tracker = ZoneTransitionTracker(zone_detector)
+    transition_tracker.add_listener(influx_client.write_transition)
+    influx_client.add_write_listener(transition_tracker.on_write)
+
     # Start API server in background thread
     api_port = config["api_port"]
-    api = LocationHistoryAPI(ha_client, influx_client, port=api_port)
+    geocoder = Geocoder(geocoder_url=config["geocoder_url"], overpass_url=config["overpass_url"])
+    tile_proxy = None
+    if config["tile_proxy"]:
+        tile_proxy = TileProxy(
+            layers=merge_tile_layers(config["tile_layers"]),
+            max_bytes=config["tile_cache_mb"] * 1024 * 1024
+        )
+    # Rewrites stored zone tags in the background when zones change
+    reclassifier = Reclassifier(influx_client, zone_detector)
+    # Per-device schedule restored from /data, so a restart doesn't poll
+    # every device at once
+    scheduler = PollScheduler()
+    scheduler.restore(tracked)
+
+    api = LocationHistoryAPI(
+        ha_client, influx_client, port=api_port, geocoder=geocoder, tile_proxy=tile_proxy,
+        reclassifier=reclassifier, transition_tracker=transition_tracker, scheduler=scheduler
+    )
+    if config["polygon_zones_file"]:
+        # The API builds its detector from HA zones only
+        api.zone_detector.update_zones(zones)
     api_thread = threading.Thread(target=run_api_server, args=(api,), daemon=True)
     api_thread.start()
     _LOGGER.info(f"API server started on port {api_port}")
 
-    # Track last poll time for each device
-    last_poll_times: Dict[str, float] = {}
-    zone_refresh_counter = 0
+    # Picks up zones edited while the add-on was stopped and resumes an
+    # interrupted reclassification
+    reclassifier.update(zones)
+
+    if config["backfill_days"] > 0 and tracked:
+        threading.Thread(
+            target=run_backfill, args=(api, tracked, config["backfill_days"]), daemon=True
+        ).start()
+
+    last_zone_refresh = time.time()
+
+    # Set by preference changes so the loop doesn't wait out its sleep
+    wake = threading.Event()
+
+    def on_prefs_change(event: Dict) -> None:
+        if event["event"] == "added":
+            # A newly tracked device is polled right away
+            scheduler.mark_due(event["entity_id"])
+        elif event["event"] == "removed":
+            scheduler.forget(event["entity_id"])
+        if event["event"] in ("added", "interval"):
+            wake.set()
+
+    prefs.add_listener(on_prefs_change)
+    prefs.add_listener(api.publish_device_change)
+    # Edits to the preferences file made outside the add-on
+    prefs.start_watching()
     
     # Base check interval (1 minute) - check if any device needs updating
     base_interval = 60
@@ -298,44 +413,51 @@ def main():
 
     try:
         while True:
+            wake.clear()
             current_time = time.time()
             
-            # Refresh zones periodically (every 10 base cycles = 10 minutes)
-            zone_refresh_counter += 1
-            if zone_refresh_counter >= 10:
-                zones = ha_client.get_zones()
-                zone_detector.update_zones(zones)
-                zone_refresh_counter = 0
-
-            # Get current tracked devices (re-read from prefs for hot reload)
+            # Refresh zones periodically (every 10 minutes)
+            if current_time - last_zone_refresh >= 10 * base_interval:
+                zones = load_zones(ha_client, config["polygon_zones_file"])
+                api.zone_detector.update_zones(zones)
+                if zone_detector.update_zones(zones):
+                    reclassifier.update(zones)
+                last_zone_refresh = current_time
+
+                window = influx_client.hot_window.stats()
+                _LOGGER.info(
+                    f"Hot window: {window['points']} points for {window['devices']} devices, "
+                    f"~{window['memory_bytes'] // 1024} KiB "
+                    f"(hits: {window['hits']}, misses: {window['misses']})"
+                )
+
+            # Get current tracked devices (changes also wake the loop early)
             tracked_devices = prefs.get_tracked_with_intervals()
             
             # Check each device if it needs to be polled
-            devices_to_poll = []
-            for dev in tracked_devices:
-                entity_id = dev["entity_id"]
-                interval_seconds = dev.get("interval_minutes", 5) * 60
-                last_poll = last_poll_times.get(entity_id, 0)
-                
-                if current_time - last_poll >= interval_seconds:
-                    devices_to_poll.append(entity_id)
-                    last_poll_times[entity_id] = current_time
+            devices_to_poll = scheduler.due(tracked_devices, current_time)
 
             # Poll devices that need updating
             if devices_to_poll:
+                cycle_started = time.perf_counter()
                 poll_devices(
                     ha_client,
                     zone_detector,
                     influx_client,
                     devices_to_poll,
-                    config["focus_unknown_locations"]
+                    config["focus_unknown_locations"],
+                    scheduler
                 )
+                POLL_CYCLE_SECONDS.observe(time.perf_counter() - cycle_started)
+                scheduler.save()
             
             if not tracked_devices:
                 _LOGGER.debug("No devices tracked. Use the web UI to add devices.")
 
-            # Sleep for base interval
-            time.sleep(base_interval)
+            # Sleep until the next device is due (at most the base interval),
+            # or until a device is added or its interval changes
+            until_due = scheduler.seconds_until_due(tracked_devices)
+            wake.wait(base_interval if until_due is None else min(until_due, base_interval))
 
     except KeyboardInterrupt:
         _LOGGER.info("Received interrupt signal, shutting down...")
@@ -343,6 +465,10 @@ def main():
         _LOGGER.error(f"Fatal error in main loop: {e}", exc_info=True)
         sys.exit(1)
     finally:
+        reclassifier.stop(timeout=5)
+        prefs.stop_watching()
+        prefs.flush()
+        scheduler.save()
         influx_client.close()
         _LOGGER.info("Add-on stopped")
 
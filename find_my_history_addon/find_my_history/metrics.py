@@ -0,0 +1,334 @@
+"""Prometheus-style counters and histograms served at /metrics."""
+
+import bisect
+import math
+import time
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow exports
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (labels, value) pairs of one metric family, produced at scrape time
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_family(name: str, kind: str, help_text: str, samples: Samples) -> str:
+    """
+    Render one metric family in the text exposition format.
+
+    Args:
+        name: Metric name
+        kind: counter, gauge, histogram or untyped
+        help_text: HELP line
+        samples: (labels, value) pairs; histogram samples carry their own suffixes
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {_value(value)}" for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+class _Metric:
+    """Base for metrics with optional label dimensions."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        Child metric for one combination of label values.
+
+        Children are created once and cached, so hot paths can keep a
+        reference or look them up with a single dict access.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in children]
+
+    def render(self) -> str:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self._default.inc(amount)
+
+    def render(self) -> str:
+        return format_family(
+            self.name, self.kind, self.help,
+            [(labels, child.value) for labels, child in self._items()]
+        )
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        """Record a value in the unlabelled histogram."""
+        self._default.observe(value)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(dict(labels, le=_value(bound)))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(labels)} {_value(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class Registry:
+    """Metrics rendered together by /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add a metric; registering the same name twice returns the first one."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Create and register a histogram."""
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self, extra: Iterable[str] = ()) -> str:
+        """
+        Text exposition of every registered metric.
+
+        Args:
+            extra: Already formatted families (e.g. gauges read at scrape time)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join([metric.render() for metric in metrics] + list(extra))
+
+
+# Registry shared by the whole add-on
+REGISTRY = Registry()
+
+HA_REQUEST_SECONDS = REGISTRY.histogram(
+    "find_my_history_ha_request_duration_seconds",
+    "Home Assistant API request latency",
+    ("endpoint", "status"),
+)
+INFLUX_WRITE_SECONDS = REGISTRY.histogram(
+    "find_my_history_influx_write_duration_seconds",
+    "InfluxDB write request latency",
+)
+INFLUX_QUERY_SECONDS = REGISTRY.histogram(
+    "find_my_history_influx_query_duration_seconds",
+    "InfluxDB query latency (streamed queries until fully read)",
+    ("method",),
+)
+INFLUX_ERRORS = REGISTRY.counter(
+    "find_my_history_influx_errors_total",
+    "Failed InfluxDB requests",
+    ("operation",),
+)
+POINTS_WRITTEN = REGISTRY.counter(
+    "find_my_history_points_written_total",
+    "Location points written to InfluxDB",
+    ("source",),
+)
+POLL_CYCLE_SECONDS = REGISTRY.histogram(
+    "find_my_history_poll_cycle_duration_seconds",
+    "Time to poll all due devices in one cycle",
+)
+POLL_RESULTS = REGISTRY.counter(
+    "find_my_history_device_polls_total",
+    "Device polls by outcome (stored, or why no point was stored)",
+    ("result",),
+)
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    "find_my_history_api_request_duration_seconds",
+    "HTTP API handler latency",
+    ("method", "route", "status"),
+)
+
+
+def timed_iter(iterable: Iterable, histogram_child, errors=None) -> Iterator:
+    """Yield from iterable, observing the time until it is exhausted or closed."""
+    started = time.perf_counter()
+    try:
+        yield from iterable
+    except Exception:
+        if errors is not None:
+            errors.inc()
+        raise
+    finally:
+        histogram_child.observe(time.perf_counter() - started)
+
+
+class InstrumentedWriteApi:
+    """InfluxDB write API wrapper timing every write call."""
+
+    def __init__(self, write_api):
+        self._api = write_api
+        self._errors = INFLUX_ERRORS.labels("write")
+
+    def write(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._api.write(*args, **kwargs)
+        except Exception:
+            self._errors.inc()
+            raise
+        finally:
+            INFLUX_WRITE_SECONDS.observe(time.perf_counter() - started)
+
+    def __getattr__(self, name: str):
+        return getattr(self._api, name)
+
+
+class InstrumentedQueryApi:
+    """InfluxDB query API wrapper timing query and query_stream."""
+
+    def __init__(self, query_api):
+        self._api = query_api
+        self._query = INFLUX_QUERY_SECONDS.labels("query")
+        self._stream = INFLUX_QUERY_SECONDS.labels("query_stream")
+        self._errors = INFLUX_ERRORS.labels("query")
+
+    def query(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._api.query(*args, **kwargs)
+        except Exception:
+            self._errors.inc()
+            raise
+        finally:
+            self._query.observe(time.perf_counter() - started)
+
+    def query_stream(self, *args, **kwargs):
+        try:
+            records = self._api.query_stream(*args, **kwargs)
+        except Exception:
+            self._errors.inc()
+            raise
+        return timed_iter(records, self._stream, self._errors)
+
+    def __getattr__(self, name: str):
+        return getattr(self._api, name)
+
+
+def gauge(name: str, help_text: str, samples: Samples) -> str:
+    """Format a gauge family read at scrape time."""
+    return format_family(name, "gauge", help_text, samples)
+
+
+def counter(name: str, help_text: str, samples: Samples) -> str:
+    """Format a counter family whose values are kept elsewhere (e.g. cache hit counts)."""
+    return format_family(name, "counter", help_text, samples)
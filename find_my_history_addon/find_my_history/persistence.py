@@ -0,0 +1,59 @@
+"""Crash-safe JSON state files in the add-on /data volume."""
+
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = None) -> None:
+    """
+    Write JSON so readers see either the old or the new file, never a torn one.
+
+    The data goes to a temporary file in the same directory, is flushed to
+    disk and then renamed over the target.
+
+    Args:
+        path: Target file
+        data: JSON-serializable data
+        indent: Indentation passed to json.dump
+
+    Raises:
+        OSError: If the file can't be written
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    """
+    Read a JSON file, returning default if it is missing or unreadable.
+
+    Args:
+        path: File to read
+        default: Value returned when the file can't be used
+    """
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        _LOGGER.warning(f"Could not read {path}: {e}")
+        return default
@@ -0,0 +1,214 @@
+"""Place clustering for "Most Visited" analytics."""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from find_my_history.geo import EARTH_RADIUS, haversine_np
+from find_my_history.heatmap import DEFAULT_MAX_GAP_SECONDS, dwell_times
+
+_LOGGER = logging.getLogger(__name__)
+
+# Points closer than this (meters) are neighbours
+DEFAULT_EPS = 100.0
+
+# Minimum dwell (seconds) within eps of a grid cell for it to seed a place
+DEFAULT_MIN_DWELL = 10 * 60
+
+# Fixes moving faster than this (m/s, ~7 km/h) are in transit, not at a place
+STATIONARY_SPEED = 2.0
+
+# Separate stays at the same place need this much time elsewhere in between
+VISIT_GAP = 15 * 60
+
+_NEIGHBOUR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _grid_clusters(
+    x: np.ndarray, y: np.ndarray, weights: np.ndarray, eps: float, min_weight: float
+) -> np.ndarray:
+    """
+    DBSCAN-style clustering on a grid of eps-sized cells.
+
+    Points are snapped to cells; a cell is core when the weight in its 3x3
+    neighbourhood reaches min_weight, and adjacent core cells are merged.
+    Non-core cells join a neighbouring core cell's cluster if there is one,
+    mirroring DBSCAN border points. All per-point work is vectorized; the
+    union-find runs over occupied cells only.
+
+    Returns:
+        Cluster label per point (-1 for noise)
+    """
+    cx = np.floor(x / eps).astype(np.int64)
+    cy = np.floor(y / eps).astype(np.int64)
+    # Shift to non-negative and pack both indices into one key
+    cx -= cx.min()
+    cy -= cy.min()
+    stride = int(cy.max()) + 3
+    keys = (cx + 1) * stride + (cy + 1)
+
+    cells, inverse = np.unique(keys, return_inverse=True)
+    cell_weight = np.bincount(inverse, weights=weights, minlength=cells.size)
+
+    # Neighbourhood weight: look up each of the 9 shifted keys in the sorted cell list
+    neighbour_idx = np.full((cells.size, 9), -1, dtype=np.int64)
+    for k, (dx, dy) in enumerate(_NEIGHBOUR_OFFSETS):
+        shifted = cells + dx * stride + dy
+        pos = np.searchsorted(cells, shifted)
+        pos_clipped = np.minimum(pos, cells.size - 1)
+        found = cells[pos_clipped] == shifted
+        neighbour_idx[found, k] = pos_clipped[found]
+    padded_weight = np.append(cell_weight, 0.0)
+    neighbourhood = padded_weight[neighbour_idx].sum(axis=1)
+    core = neighbourhood >= min_weight
+
+    # Union adjacent core cells
+    parent = np.arange(cells.size)
+    core_idx = np.nonzero(core)[0]
+    for i in core_idx:
+        for j in neighbour_idx[i]:
+            if j > i and core[j]:
+                ri, rj = _find(parent, i), _find(parent, j)
+                if ri != rj:
+                    parent[rj] = ri
+
+    cell_label = np.full(cells.size + 1, -1, dtype=np.int64)
+    for i in core_idx:
+        cell_label[i] = _find(parent, i)
+
+    # Border cells take the label of their heaviest core neighbour
+    padded_core = np.append(core, False)
+    core_weight = np.where(padded_core[neighbour_idx], padded_weight[neighbour_idx], -1.0)
+    best = neighbour_idx[np.arange(cells.size), core_weight.argmax(axis=1)]
+    border = ~core & (core_weight.max(axis=1) >= 0)
+    cell_label[np.nonzero(border)[0]] = cell_label[best[border]]
+
+    return cell_label[:-1][inverse]
+
+
+def cluster_places(
+    columns: Dict[str, List],
+    end_time: Optional[float] = None,
+    eps: float = DEFAULT_EPS,
+    min_dwell: float = DEFAULT_MIN_DWELL,
+    max_gap: float = DEFAULT_MAX_GAP_SECONDS,
+    limit: int = 20
+) -> List[Dict]:
+    """
+    Cluster stationary fixes into places ranked by visits and dwell time.
+
+    Args:
+        columns: query_columns output (time, device_id, zone_name, latitude, longitude)
+        end_time: Range end in epoch seconds
+        eps: Neighbourhood radius in meters
+        min_dwell: Dwell seconds needed around a cell to form a place
+        max_gap: Upper bound for a single fix's dwell
+        limit: Maximum number of places returned
+
+    Returns:
+        Places with centroid, radius, zone_name, visits, dwell_seconds,
+        first_seen and last_seen (ISO 8601 UTC), best first
+    """
+    times = np.asarray(columns["time"], dtype=float)
+    if times.size == 0:
+        return []
+    lat = np.asarray(columns["latitude"], dtype=float)
+    lon = np.asarray(columns["longitude"], dtype=float)
+    devices = np.asarray(columns["device_id"], dtype=object)
+    zones = np.asarray(columns["zone_name"], dtype=object)
+
+    dwell = dwell_times(times, devices, end_time, max_gap)
+
+    # Drop fixes in transit: speed to the next fix above walking pace
+    same_device = np.ones(times.size, dtype=bool)
+    same_device[:-1] = devices[1:] == devices[:-1]
+    same_device[-1] = False
+    step = np.zeros(times.size)
+    step[:-1] = haversine_np(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    elapsed = np.zeros(times.size)
+    elapsed[:-1] = np.diff(times)
+    moving = same_device & (elapsed > 0) & (step > np.maximum(elapsed, 1.0) * STATIONARY_SPEED) & (step > eps)
+    keep = ~moving
+    if not keep.any():
+        return []
+
+    # Local equirectangular projection in meters (accurate at city scale)
+    lat0 = np.radians(np.median(lat[keep]))
+    x = np.radians(lon) * np.cos(lat0) * EARTH_RADIUS
+    y = np.radians(lat) * EARTH_RADIUS
+
+    labels = np.full(times.size, -1, dtype=np.int64)
+    labels[keep] = _grid_clusters(x[keep], y[keep], dwell[keep], eps, min_dwell)
+    clustered = labels >= 0
+    if not clustered.any():
+        return []
+
+    ids, label_index = np.unique(labels[clustered], return_inverse=True)
+    n = ids.size
+    w = dwell[clustered]
+    total = np.bincount(label_index, weights=w, minlength=n)
+    safe_total = np.where(total > 0, total, 1.0)
+    fallback = total <= 0
+    counts = np.bincount(label_index, minlength=n)
+    c_lat = np.where(fallback, np.bincount(label_index, weights=lat[clustered], minlength=n) / counts,
+                     np.bincount(label_index, weights=lat[clustered] * w, minlength=n) / safe_total)
+    c_lon = np.where(fallback, np.bincount(label_index, weights=lon[clustered], minlength=n) / counts,
+                     np.bincount(label_index, weights=lon[clustered] * w, minlength=n) / safe_total)
+
+    # Radius: distance from centroid to the farthest member
+    member_dist = haversine_np(lat[clustered], lon[clustered], c_lat[label_index], c_lon[label_index])
+    radius = np.zeros(n)
+    np.maximum.at(radius, label_index, member_dist)
+
+    # Visits: runs of fixes at the place, split by device changes or time away
+    c_times = times[clustered]
+    c_devices = devices[clustered]
+    order = np.lexsort((c_times, label_index))
+    sorted_label = label_index[order]
+    sorted_time = c_times[order]
+    sorted_device = c_devices[order]
+    new_visit = np.ones(order.size, dtype=bool)
+    new_visit[1:] = (
+        (sorted_label[1:] != sorted_label[:-1])
+        | (sorted_device[1:] != sorted_device[:-1])
+        | (np.diff(sorted_time) > VISIT_GAP + max_gap)
+    )
+    visits = np.bincount(sorted_label[new_visit], minlength=n)
+
+    first_seen = np.full(n, np.inf)
+    last_seen = np.full(n, -np.inf)
+    np.minimum.at(first_seen, label_index, c_times)
+    np.maximum.at(last_seen, label_index, c_times)
+
+    # Most common zone tag per place
+    c_zones = zones[clustered]
+    zone_names, zone_index = np.unique(c_zones.astype(str), return_inverse=True)
+    zone_counts = np.zeros((n, zone_names.size))
+    np.add.at(zone_counts, (label_index, zone_index), w + 1e-9)
+    place_zone = zone_names[zone_counts.argmax(axis=1)]
+
+    ranking = np.lexsort((-total, -visits))[:limit]
+    return [
+        {
+            "latitude": round(float(c_lat[i]), 6),
+            "longitude": round(float(c_lon[i]), 6),
+            "radius_m": round(float(radius[i]), 1),
+            "zone_name": str(place_zone[i]),
+            "in_zone": str(place_zone[i]) != "unknown",
+            "visits": int(visits[i]),
+            "dwell_seconds": round(float(total[i]), 1),
+            "points": int(counts[i]),
+            "first_seen": datetime.fromtimestamp(float(first_seen[i]), timezone.utc).isoformat(),
+            "last_seen": datetime.fromtimestamp(float(last_seen[i]), timezone.utc).isoformat(),
+        }
+        for i in ranking
+    ]
@@ -0,0 +1,140 @@
+"""Resample a device track into evenly spaced playback frames."""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from find_my_history.timeutils import to_epoch
+from find_my_history.visits import MAX_DEPARTURE_GAP, MIN_VISIT_DURATION, detect_visits
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_FRAMES = 1000
+MAX_FRAMES = 5000
+
+
+def frame_times(
+    start: float, end: float, frames: Optional[int] = None, step: Optional[float] = None
+) -> np.ndarray:
+    """
+    Evenly spaced frame timestamps over [start, end].
+
+    Args:
+        start: Range start in epoch seconds
+        end: Range end in epoch seconds
+        frames: Number of frames (used when step is not given)
+        step: Seconds between frames
+
+    Returns:
+        Frame times in epoch seconds
+
+    Raises:
+        ValueError: More than MAX_FRAMES would be produced or arguments are invalid
+    """
+    if end < start:
+        raise ValueError("end must not be before start")
+    if step is not None:
+        if step <= 0:
+            raise ValueError("step must be positive")
+        count = int((end - start) // step) + 1
+        if count > MAX_FRAMES:
+            raise ValueError(f"step too small: {count} frames exceeds {MAX_FRAMES}")
+        return start + np.arange(count) * step
+    frames = DEFAULT_FRAMES if frames is None else frames
+    if not 2 <= frames <= MAX_FRAMES:
+        raise ValueError(f"frames must be between 2 and {MAX_FRAMES}")
+    return np.linspace(start, end, frames)
+
+
+def resample_track(
+    times: Sequence[float],
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    zone_names: Sequence[str],
+    frame_t: np.ndarray,
+    max_gap: float = MAX_DEPARTURE_GAP,
+    min_visit: float = MIN_VISIT_DURATION
+) -> Dict[str, List]:
+    """
+    Resample one device's time-ordered track at frame_t.
+
+    Between fixes the position is interpolated linearly. Inside a visit it
+    is held at the visit's centroid so jitter doesn't animate, and across
+    gaps longer than max_gap it is held at the last fix rather than drawn
+    as a straight line through unknown territory. Frames before the first
+    or after the last fix hold the nearest fix.
+
+    Returns:
+        Columnar frames: time, latitude, longitude, zone_name, held
+    """
+    t = np.asarray(times, dtype=float)
+    if t.size == 0:
+        return {"time": [], "latitude": [], "longitude": [], "zone_name": [], "held": []}
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+
+    out_lat = np.interp(frame_t, t, lat)
+    out_lon = np.interp(frame_t, t, lon)
+
+    # Preceding fix of each frame (clamped to the first fix)
+    prev = np.clip(np.searchsorted(t, frame_t, side="right") - 1, 0, t.size - 1)
+    following = np.minimum(prev + 1, t.size - 1)
+    gap = (t[following] - t[prev]) > max_gap
+    outside = (frame_t < t[0]) | (frame_t > t[-1])
+    hold = gap & ~outside
+    out_lat[hold] = lat[prev[hold]]
+    out_lon[hold] = lon[prev[hold]]
+    held = hold | outside
+
+    # Stay-points: frames inside a visit sit on its centroid
+    visits = detect_visits(t, lat, lon, zone_names, min_duration=min_visit)
+    if visits:
+        starts = np.array([to_epoch(datetime.fromisoformat(v["start"])) for v in visits])
+        ends = np.array([to_epoch(datetime.fromisoformat(v["end"])) for v in visits])
+        v_lat = np.array([v["latitude"] for v in visits])
+        v_lon = np.array([v["longitude"] for v in visits])
+        idx = np.searchsorted(starts, frame_t, side="right") - 1
+        valid = idx >= 0
+        inside = np.zeros(frame_t.size, dtype=bool)
+        inside[valid] = frame_t[valid] <= ends[idx[valid]]
+        out_lat[inside] = v_lat[idx[inside]]
+        out_lon[inside] = v_lon[idx[inside]]
+        held |= inside
+
+    zones = np.asarray(zone_names, dtype=object)[prev]
+
+    return {
+        "time": frame_t.tolist(),
+        "latitude": np.round(out_lat, 6).tolist(),
+        "longitude": np.round(out_lon, 6).tolist(),
+        "zone_name": zones.tolist(),
+        "held": held.tolist(),
+    }
+
+
+def build_playback(
+    columns: Dict[str, List],
+    start: float,
+    end: float,
+    frames: Optional[int] = None,
+    step: Optional[float] = None
+) -> Dict:
+    """
+    Build playback frames from query_columns output for one device.
+
+    Returns:
+        Dict with frame_count, step_seconds, source_points and columnar frames
+    """
+    frame_t = frame_times(start, end, frames, step)
+    resampled = resample_track(
+        columns["time"], columns["latitude"], columns["longitude"],
+        columns["zone_name"], frame_t
+    )
+    return {
+        "frame_count": int(frame_t.size),
+        "step_seconds": float(frame_t[1] - frame_t[0]) if frame_t.size > 1 else 0.0,
+        "source_points": len(columns["time"]),
+        "frames": resampled,
+    }
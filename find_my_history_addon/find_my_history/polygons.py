@@ -0,0 +1,254 @@
+"""Polygon zones loaded from a GeoJSON file."""
+
+import hashlib
+import json
+import logging
+import math
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from find_my_history.geo import METERS_PER_DEGREE
+
+_LOGGER = logging.getLogger(__name__)
+
+# Average edges per latitude slab of a prepared polygon
+EDGES_PER_SLAB = 8
+
+# Upper bound on slabs per polygon
+MAX_SLABS = 256
+
+# Point-edge pairs compared at once by contains_many
+MAX_PAIRS = 1_000_000
+
+
+class PreparedPolygon:
+    """
+    Polygon (with optional holes) prepared for fast point-in-polygon tests.
+
+    Edges are bucketed into horizontal slabs when the polygon is built, so a
+    ray-casting test only looks at the edges crossing the point's latitude
+    instead of every edge. Coordinates are treated as planar lon/lat, which
+    is accurate for zone-sized shapes; polygons crossing the antimeridian
+    are not supported.
+    """
+
+    def __init__(self, rings: Sequence[Sequence[Sequence[float]]]):
+        """
+        Prepare a polygon.
+
+        Args:
+            rings: GeoJSON Polygon coordinates: an outer ring followed by
+                   holes, each a list of [longitude, latitude] positions
+
+        Raises:
+            ValueError: If the outer ring has fewer than three positions
+        """
+        x0, y0, x1, y1 = [], [], [], []
+        ring_areas = []
+        self.vertices = 0
+        outer = None
+        for ring in rings:
+            points = [(float(p[0]), float(p[1])) for p in ring]
+            if len(points) > 1 and points[0] == points[-1]:
+                points.pop()
+            if len(points) < 3:
+                if outer is None:
+                    raise ValueError("Polygon outer ring needs at least three positions")
+                continue
+            if outer is None:
+                outer = len(points)
+            self.vertices += len(points)
+            ref_x, ref_y = points[0]
+            twice_area = 0.0
+            for (ax, ay), (bx, by) in zip(points, points[1:] + points[:1]):
+                x0.append(ax)
+                y0.append(ay)
+                x1.append(bx)
+                y1.append(by)
+                twice_area += (ax - ref_x) * (by - ref_y) - (bx - ref_x) * (ay - ref_y)
+            ring_areas.append(abs(twice_area) / 2)
+        if outer is None:
+            raise ValueError("Polygon outer ring needs at least three positions")
+
+        self.x0 = np.asarray(x0)
+        self.y0 = np.asarray(y0)
+        self.x1 = np.asarray(x1)
+        self.y1 = np.asarray(y1)
+
+        self.min_lon, self.max_lon = float(self.x0[:outer].min()), float(self.x0[:outer].max())
+        self.min_lat, self.max_lat = float(self.y0[:outer].min()), float(self.y0[:outer].max())
+        self.center_lat = (self.min_lat + self.max_lat) / 2
+        self.center_lon = (self.min_lon + self.max_lon) / 2
+
+        # Outer ring minus holes, in square meters
+        scale_x = METERS_PER_DEGREE * math.cos(math.radians(self.center_lat))
+        self.area = max(ring_areas[0] - sum(ring_areas[1:]), 0.0) * scale_x * METERS_PER_DEGREE
+
+        # Horizontal slabs of edge indexes
+        self.slabs = min(MAX_SLABS, max(1, len(x0) // EDGES_PER_SLAB))
+        self.slab_height = (self.max_lat - self.min_lat) / self.slabs or 1.0
+        low = self._slab(np.minimum(self.y0, self.y1))
+        high = self._slab(np.maximum(self.y0, self.y1))
+        self.slab_edges: List[np.ndarray] = []
+        for slab in range(self.slabs):
+            self.slab_edges.append(np.flatnonzero((low <= slab) & (high >= slab)))
+
+        digest = hashlib.sha1(
+            json.dumps([[list(p) for p in ring] for ring in rings]).encode()
+        ).hexdigest()
+        self.digest = digest[:16]
+
+    def _slab(self, latitudes):
+        slab = np.floor((np.asarray(latitudes) - self.min_lat) / self.slab_height).astype(int)
+        return np.clip(slab, 0, self.slabs - 1)
+
+    @property
+    def equivalent_radius(self) -> float:
+        """Radius in meters of a circle with the polygon's area."""
+        return math.sqrt(self.area / math.pi)
+
+    @property
+    def half_extent(self) -> tuple:
+        """(latitude, longitude) half-sizes of the bounding box in degrees."""
+        return (self.max_lat - self.min_lat) / 2, (self.max_lon - self.min_lon) / 2
+
+    @property
+    def bounding_radius(self) -> float:
+        """Meters from the bounding box center to its farthest corner."""
+        half_lat, half_lon = self.half_extent
+        # Degrees of longitude are longest at the latitude nearest the equator
+        nearest_equator = (
+            0.0 if self.min_lat <= 0.0 <= self.max_lat
+            else min(abs(self.min_lat), abs(self.max_lat))
+        )
+        widest = math.cos(math.radians(nearest_equator))
+        return math.hypot(half_lat * METERS_PER_DEGREE, half_lon * METERS_PER_DEGREE * widest)
+
+    def in_bounds(self, latitude: float, longitude: float) -> bool:
+        """Bounding-box test."""
+        return (self.min_lat <= latitude <= self.max_lat
+                and self.min_lon <= longitude <= self.max_lon)
+
+    def contains(self, latitude: float, longitude: float) -> bool:
+        """Point-in-polygon test (even-odd rule, so holes are excluded)."""
+        if not self.in_bounds(latitude, longitude):
+            return False
+        edges = self.slab_edges[int(self._slab(latitude))]
+        y0 = self.y0[edges]
+        y1 = self.y1[edges]
+        crosses = (y0 > latitude) != (y1 > latitude)
+        if not crosses.any():
+            return False
+        edges = edges[crosses]
+        y0 = self.y0[edges]
+        x0 = self.x0[edges]
+        x_at = x0 + (latitude - y0) * (self.x1[edges] - x0) / (self.y1[edges] - y0)
+        return bool(np.count_nonzero(x_at > longitude) % 2)
+
+    def contains_many(self, latitudes, longitudes) -> np.ndarray:
+        """Vectorized contains over coordinate arrays."""
+        lat = np.asarray(latitudes, dtype=float)
+        lon = np.asarray(longitudes, dtype=float)
+        result = np.zeros(lat.size, dtype=bool)
+        candidates = np.flatnonzero(
+            (lat >= self.min_lat) & (lat <= self.max_lat)
+            & (lon >= self.min_lon) & (lon <= self.max_lon)
+        )
+        if not candidates.size:
+            return result
+        slabs = self._slab(lat[candidates])
+        for slab in np.unique(slabs):
+            edges = self.slab_edges[slab]
+            if not edges.size:
+                continue
+            points = candidates[slabs == slab]
+            step = max(1, MAX_PAIRS // edges.size)
+            y0 = self.y0[edges][None, :]
+            y1 = self.y1[edges][None, :]
+            x0 = self.x0[edges][None, :]
+            x1 = self.x1[edges][None, :]
+            for start in range(0, points.size, step):
+                chunk = points[start:start + step]
+                p_lat = lat[chunk][:, None]
+                p_lon = lon[chunk][:, None]
+                crosses = (y0 > p_lat) != (y1 > p_lat)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    x_at = x0 + (p_lat - y0) * (x1 - x0) / (y1 - y0)
+                hits = np.count_nonzero(crosses & (x_at > p_lon), axis=1)
+                result[chunk] = hits % 2 == 1
+        return result
+
+    def distance_outside(self, latitude: float, longitude: float) -> float:
+        """Meters to the nearest edge, negative when the point is inside."""
+        scale_x = METERS_PER_DEGREE * math.cos(math.radians(latitude))
+        ax = (self.x0 - longitude) * scale_x
+        ay = (self.y0 - latitude) * METERS_PER_DEGREE
+        bx = (self.x1 - longitude) * scale_x
+        by = (self.y1 - latitude) * METERS_PER_DEGREE
+        dx = bx - ax
+        dy = by - ay
+        length = dx * dx + dy * dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(length > 0, -(ax * dx + ay * dy) / length, 0.0), 0.0, 1.0)
+        distance = float(np.min(np.hypot(ax + t * dx, ay + t * dy)))
+        return -distance if self.contains(latitude, longitude) else distance
+
+
+def _feature_polygons(geometry: Dict) -> List:
+    if not isinstance(geometry, dict):
+        return []
+    if geometry.get("type") == "Polygon":
+        return [geometry.get("coordinates") or []]
+    if geometry.get("type") == "MultiPolygon":
+        return list(geometry.get("coordinates") or [])
+    return []
+
+
+def load_polygon_zones(path: str) -> List[Dict]:
+    """
+    Read polygon zones from a GeoJSON file.
+
+    Each Polygon or MultiPolygon feature becomes a zone named after its
+    "name" property; a MultiPolygon yields one zone per part under the
+    same name.
+
+    Args:
+        path: GeoJSON file (FeatureCollection, Feature or bare geometry)
+
+    Returns:
+        Zone dicts with name and polygon (GeoJSON Polygon coordinates);
+        empty if the file is missing or invalid
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        _LOGGER.warning(f"Polygon zones file not found: {path}")
+        return []
+    except (OSError, ValueError) as e:
+        _LOGGER.warning(f"Could not read polygon zones from {path}: {e}")
+        return []
+    if not isinstance(data, dict):
+        _LOGGER.warning(f"Polygon zones file {path} is not a GeoJSON object, skipping")
+        return []
+
+    if data.get("type") == "FeatureCollection":
+        features = data.get("features") or []
+    elif data.get("type") == "Feature":
+        features = [data]
+    else:
+        features = [{"type": "Feature", "geometry": data, "properties": {}}]
+
+    zones = []
+    for i, feature in enumerate(features):
+        if not isinstance(feature, dict):
+            _LOGGER.warning(f"Polygon zone feature {i + 1} is not an object, skipping")
+            continue
+        properties = feature.get("properties") or {}
+        name = properties.get("name") or f"polygon_{i + 1}"
+        polygons = _feature_polygons(feature.get("geometry"))
+        if not polygons:
+            _LOGGER.warning(f"Polygon zone '{name}' has no Polygon geometry, skipping")
+        zones.extend({"name": name, "polygon": rings} for rings in polygons if rings)
+    return zones
@@ -0,0 +1,357 @@
+"""Retroactive zone reclassification of stored history."""
+
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from find_my_history.geo import degree_extents
+from find_my_history.influxdb_client import InfluxDBLocationClient
+from find_my_history.persistence import atomic_write_json, read_json
+from find_my_history.timeutils import to_epoch
+from find_my_history.zone_detector import ZoneDetector, ZoneIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+# Checkpoint file (persists in add-on /data volume)
+DEFAULT_STATE_PATH = "/data/reclassify_state.json"
+
+# History is rewritten one device-day at a time
+CHUNK_SECONDS = 86400
+
+# Seconds slept after each chunk so live queries keep priority
+DEFAULT_THROTTLE = 1.0
+
+# Seconds to wait before retrying after InfluxDB errors
+RETRY_DELAY = 60.0
+
+# Candidate points classified per check_zones_batch call during the scan
+SCAN_BATCH = 10000
+
+Box = Tuple[float, float, float, float]
+
+
+def circle_box(latitude: float, longitude: float, radius: float) -> Box:
+    """(min_lat, max_lat, min_lon, max_lon) box around a zone circle."""
+    d_lat, d_lon = degree_extents(latitude, radius)
+    if abs(longitude) + d_lon >= 180.0:
+        d_lon = 180.0
+    return (
+        latitude - d_lat, latitude + d_lat,
+        max(longitude - d_lon, -180.0), min(longitude + d_lon, 180.0),
+    )
+
+
+def changed_boxes(old: List[List], new: List[List]) -> List[Box]:
+    """
+    Boxes around every zone circle that differs between two zone sets.
+
+    A moved or resized zone contributes both its old and new circle, since
+    points can leave the old one as well as enter the new one. Polygon
+    zones are given by their bounding circle (see ZoneIndex.circles).
+    """
+    old_set = {tuple(circle) for circle in old}
+    new_set = {tuple(circle) for circle in new}
+    return [
+        circle_box(circle[1], circle[2], circle[3])
+        for circle in sorted(old_set ^ new_set)
+    ]
+
+
+class Reclassifier:
+    """
+    Rewrites stored zone tags after zones change.
+
+    in_zone and zone_name are tags fixed at write time, so when a zone is
+    added, moved or resized, past fixes near it are re-read, classified
+    against the current zones and rewritten. Only points inside the boxes
+    of changed zones are scanned (filtered in InfluxDB); only device-days
+    where a point's zone actually changes are deleted and rewritten.
+
+    Progress is checkpointed to a JSON file after every step, and a chunk's
+    new rows are saved before its old points are deleted, so the job
+    resumes after a restart without losing data. Zone changes that arrive
+    while a job runs are queued for the next pass.
+    """
+
+    def __init__(
+        self,
+        influx_client: InfluxDBLocationClient,
+        zone_detector: ZoneDetector,
+        state_path: str = DEFAULT_STATE_PATH,
+        throttle: float = DEFAULT_THROTTLE
+    ):
+        """
+        Initialize reclassifier.
+
+        Args:
+            influx_client: InfluxDB client
+            zone_detector: Detector holding the current zones
+            state_path: Checkpoint file
+            throttle: Seconds slept after each chunk
+        """
+        self.influx_client = influx_client
+        self.zone_detector = zone_detector
+        self.state_path = state_path
+        self.throttle = throttle
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._listeners: List[Callable[[], None]] = []
+        self._state: Dict = read_json(state_path, {}) or {}
+        self.error: Optional[str] = None
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Register a callback run after each rewritten chunk (e.g. cache invalidation)."""
+        self._listeners.append(listener)
+
+    def _save(self) -> None:
+        atomic_write_json(self.state_path, self._state)
+
+    def update(self, zones: List[Dict]) -> bool:
+        """
+        Compare zones with the ones history was classified against.
+
+        The first call only records the zones. Later calls queue the
+        regions of changed zones and start the background job.
+
+        Args:
+            zones: Current zone list (already applied to the detector)
+
+        Returns:
+            True if a reclassification was queued
+        """
+        circles = [list(circle) for circle in ZoneIndex(zones).circles()]
+        with self._lock:
+            previous = self._state.get("zones")
+            self._state["zones"] = circles
+            boxes = changed_boxes(previous, circles) if previous is not None else []
+            if boxes:
+                self._state.setdefault("queued", []).extend(list(box) for box in boxes)
+                _LOGGER.info(f"Zones changed; queued reclassification of {len(boxes)} regions")
+            self._save()
+        self.start()
+        return bool(boxes)
+
+    def start(self) -> None:
+        """Start the background job if there is work and it isn't running."""
+        with self._lock:
+            if not self._state.get("job") and not self._state.get("queued"):
+                return
+            if self._running:
+                return
+            self._running = True
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._worker, name="reclassify", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Ask the job to stop after the current step (progress is kept)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _worker(self) -> None:
+        try:
+            while not self._stop.is_set():
+                try:
+                    if not self.step():
+                        return
+                    self.error = None
+                except Exception as e:
+                    self.error = str(e)
+                    _LOGGER.error(f"Error in zone reclassification: {e}", exc_info=True)
+                    self._stop.wait(RETRY_DELAY)
+        finally:
+            with self._lock:
+                self._running = False
+
+    def run_until_idle(self) -> None:
+        """Run the job to completion on the calling thread."""
+        while self.step():
+            pass
+
+    def step(self) -> bool:
+        """
+        Do one unit of work and checkpoint it.
+
+        Returns:
+            False once there is nothing left to do
+        """
+        job = self._state.get("job")
+        if job is None:
+            with self._lock:
+                queued = self._state.get("queued")
+                if not queued:
+                    # Cleared under the lock so a concurrent update() restarts the worker
+                    self._running = False
+                    return False
+                self._state["job"] = job = {
+                    "boxes": queued,
+                    "end": time.time(),
+                    "devices": None,
+                    "days": None,
+                    "pending": None,
+                    "scanned": 0,
+                    "changed": 0,
+                    "rewritten": 0,
+                }
+                self._state["queued"] = []
+                self._save()
+            return True
+
+        # I/O happens outside the lock; results are applied and saved under it
+        # so update() on another thread never sees a half-changed job
+        if job["pending"] is not None:
+            rewritten = self._rewrite(job["pending"])
+            with self._lock:
+                job["rewritten"] += rewritten
+                job["pending"] = None
+                self._save()
+            self._notify()
+            self._stop.wait(self.throttle)
+        elif job["devices"] is None:
+            devices = self.influx_client.get_unique_devices()
+            with self._lock:
+                job["devices"] = devices
+                self._save()
+        elif not job["devices"]:
+            _LOGGER.info(
+                f"Zone reclassification done: {job['changed']} points changed zone, "
+                f"{job['rewritten']} points rewritten"
+            )
+            with self._lock:
+                self._state["job"] = None
+                self._save()
+        elif job["days"] is None:
+            days, scanned = self._scan(job, job["devices"][0])
+            with self._lock:
+                job["days"] = days
+                job["scanned"] += scanned
+                self._save()
+            self._stop.wait(self.throttle)
+        elif job["days"]:
+            day = job["days"][0]
+            pending, changed = self._reclassify_day(job, job["devices"][0], day)
+            with self._lock:
+                job["days"].pop(0)
+                job["changed"] += changed
+                # Saved before anything is deleted so a crash can't lose the day
+                job["pending"] = pending
+                self._save()
+        else:
+            with self._lock:
+                job["devices"].pop(0)
+                job["days"] = None
+                self._save()
+        return True
+
+    def _scan(self, job: Dict, device_id: str) -> Tuple[List[float], int]:
+        """
+        Find the days in which some stored point's zone changes.
+
+        Returns:
+            (sorted day start epochs, candidate points scanned)
+        """
+        days = set()
+        scanned = 0
+        batch: List[Tuple[float, float, float, str]] = []
+
+        def classify() -> None:
+            lat = np.fromiter((p[1] for p in batch), float, len(batch))
+            lon = np.fromiter((p[2] for p in batch), float, len(batch))
+            _, names = self.zone_detector.check_zones_batch(lat, lon)
+            for point, name in zip(batch, names.tolist()):
+                if (name or "unknown") != point[3]:
+                    days.add(math.floor(point[0] / CHUNK_SECONDS) * CHUNK_SECONDS)
+            batch.clear()
+
+        candidates = self.influx_client.iter_zone_candidates(
+            device_id,
+            datetime.fromtimestamp(0, timezone.utc),
+            datetime.fromtimestamp(job["end"], timezone.utc),
+            [tuple(box) for box in job["boxes"]],
+        )
+        for point in candidates:
+            batch.append(point)
+            scanned += 1
+            if len(batch) >= SCAN_BATCH:
+                classify()
+        if batch:
+            classify()
+        _LOGGER.debug(f"Reclassification: {len(days)} days to rewrite for {device_id}")
+        return sorted(days), scanned
+
+    def _reclassify_day(
+        self, job: Dict, device_id: str, day: float
+    ) -> Tuple[Optional[Dict], int]:
+        """
+        Classify one device-day against the current zones.
+
+        Returns:
+            (pending rewrite or None if nothing changed, points that changed zone)
+        """
+        end = min(day + CHUNK_SECONDS, job["end"])
+        rows = list(self.influx_client.iter_locations(
+            device_id,
+            datetime.fromtimestamp(day, timezone.utc),
+            datetime.fromtimestamp(end, timezone.utc),
+        ))
+        if not rows:
+            return None, 0
+        lat = np.fromiter((row["latitude"] for row in rows), float, len(rows))
+        lon = np.fromiter((row["longitude"] for row in rows), float, len(rows))
+        in_zone, names = self.zone_detector.check_zones_batch(lat, lon)
+        changed = 0
+        for row, flag, name in zip(rows, in_zone.tolist(), names.tolist()):
+            changed += (name or "unknown") != row.get("zone_name")
+            row["time"] = to_epoch(datetime.fromisoformat(row["time"]))
+            row["in_zone"] = flag
+            row["zone_name"] = name
+        if not changed:
+            return None, 0
+        return {"device_id": device_id, "start": day, "end": end, "rows": rows}, changed
+
+    def _rewrite(self, pending: Dict) -> int:
+        """Replace a checkpointed device-day with its reclassified rows."""
+        self.influx_client.delete_locations(
+            pending["device_id"],
+            datetime.fromtimestamp(pending["start"], timezone.utc),
+            # Delete bounds are inclusive; points are stored at second precision
+            datetime.fromtimestamp(pending["end"] - 1, timezone.utc),
+        )
+        return self.influx_client.write_locations(pending["rows"])
+
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as e:
+                _LOGGER.error(f"Reclassify listener failed: {e}", exc_info=True)
+
+    def stats(self) -> Dict:
+        """Job progress for the API."""
+        with self._lock:
+            job = self._state.get("job")
+            queued = len(self._state.get("queued") or [])
+            summary = None
+            if job is not None:
+                summary = {
+                    "devices_left": len(job["devices"]) if job["devices"] is not None else None,
+                    "days_left": len(job["days"]) if job["days"] is not None else None,
+                    "scanned": job["scanned"],
+                    "changed": job["changed"],
+                    "rewritten": job["rewritten"],
+                }
+            running = self._running
+        return {
+            "state": "running" if running else ("pending" if job or queued else "idle"),
+            "job": summary,
+            "queued_regions": queued,
+            "error": self.error,
+        }
@@ -0,0 +1,94 @@
+"""LRU cache for results computed over closed time ranges."""
+
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable
+
+from find_my_history.timeutils import to_epoch
+
+_LOGGER = logging.getLogger(__name__)
+
+# A range is considered closed once its end is this far in the past,
+# leaving room for late writes (e.g. manual updates, slow polls)
+CLOSED_RANGE_GRACE = timedelta(minutes=5)
+
+
+class ClosedRangeCache:
+    """
+    Bounded LRU cache for results over time ranges that can no longer change.
+
+    Results for ranges ending in the recent past or the future are computed
+    every time and never stored.
+    """
+
+    def __init__(self, name: str, max_entries: int = 128):
+        """
+        Initialize cache.
+
+        Args:
+            name: Cache name used in logs and stats
+            max_entries: Maximum number of cached results
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def is_closed(end_time: datetime) -> bool:
+        """Check whether a range ending at end_time is closed."""
+        return to_epoch(end_time) <= to_epoch(datetime.utcnow() - CLOSED_RANGE_GRACE)
+
+    def get_or_compute(
+        self, key: Hashable, end_time: datetime, compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Return a cached result or compute it.
+
+        Args:
+            key: Cache key, must include every parameter the result depends on
+            end_time: End of the time range the result covers
+            compute: Callable producing the result
+
+        Returns:
+            Cached or freshly computed result
+        """
+        closed = self.is_closed(end_time)
+        if closed:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+
+        with self._lock:
+            self.misses += 1
+        result = compute()
+
+        if closed:
+            with self._lock:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+        _LOGGER.debug(f"Cleared {self.name} cache")
+
+    def stats(self) -> Dict:
+        """Report cache size and hit counts."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,241 @@
+"""Per-device polling schedule that survives restarts."""
+
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, List, Optional
+
+from find_my_history.persistence import atomic_write_json, read_json
+
+_LOGGER = logging.getLogger(__name__)
+
+# Scheduler state file (persists in add-on /data volume)
+DEFAULT_STATE_PATH = "/data/scheduler_state.json"
+
+# Overdue and never-polled devices are spread over up to this many seconds
+# after startup (or their interval, if shorter) instead of all polling at once
+STARTUP_SPREAD = 30.0
+
+
+def _iso(epoch: Optional[float]) -> Optional[str]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+class PollScheduler:
+    """
+    Decides which devices are due for a poll and remembers how polls went.
+
+    For every device it keeps the last poll, the last successful poll, the
+    time of the last stored fix and the number of consecutive failures.
+    The state is saved to a small JSON file so a restart resumes each
+    device on its own schedule: devices that aren't due yet wait for their
+    next slot, and ones that became due while the add-on was down are
+    polled at random offsets within the startup spread rather than all in
+    the first cycle.
+    """
+
+    def __init__(
+        self,
+        state_path: str = DEFAULT_STATE_PATH,
+        startup_spread: float = STARTUP_SPREAD,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        Initialize scheduler.
+
+        Args:
+            state_path: State file
+            startup_spread: Seconds over which overdue devices are spread at startup
+            rng: Random source for the startup jitter
+        """
+        self.state_path = state_path
+        self.startup_spread = startup_spread
+        self._rng = rng or random.Random()
+        self._lock = Lock()
+        self._dirty = False
+        state = read_json(state_path, {}) or {}
+        self._devices: Dict[str, Dict] = state.get("devices") or {}
+        # Due times overriding last_poll + interval (startup jitter, new devices)
+        self._due_at: Dict[str, float] = {}
+
+    def restore(self, devices: List[Dict], now: Optional[float] = None) -> None:
+        """
+        Plan the first poll of each tracked device after a restart.
+
+        State of devices that are no longer tracked is dropped.
+
+        Args:
+            devices: Tracked devices with entity_id and interval_minutes
+            now: Current epoch seconds (default: time.time())
+        """
+        now = time.time() if now is None else now
+        tracked = {dev["entity_id"] for dev in devices}
+        with self._lock:
+            for entity_id in list(self._devices):
+                if entity_id not in tracked:
+                    del self._devices[entity_id]
+                    self._dirty = True
+            for dev in devices:
+                entity_id = dev["entity_id"]
+                interval = dev.get("interval_minutes", 5) * 60
+                state = self._devices.get(entity_id)
+                if state is not None and state["last_poll"] + interval > now:
+                    continue  # not due yet, keeps its schedule
+                if state is not None:
+                    missed = int((now - state["last_poll"]) // interval)
+                    _LOGGER.info(
+                        f"{entity_id} was last polled {(now - state['last_poll']) / 60:.0f} "
+                        f"minutes ago ({missed} polls missed)"
+                    )
+                self._due_at[entity_id] = now + self._rng.uniform(
+                    0, min(interval, self.startup_spread)
+                )
+
+    def mark_due(self, entity_id: str, now: Optional[float] = None) -> None:
+        """Poll a device in the next cycle (e.g. when it was just added)."""
+        with self._lock:
+            self._due_at[entity_id] = time.time() if now is None else now
+
+    def forget(self, entity_id: str) -> None:
+        """Drop the state of a device that is no longer tracked."""
+        with self._lock:
+            self._due_at.pop(entity_id, None)
+            if self._devices.pop(entity_id, None) is not None:
+                self._dirty = True
+
+    def _next_due(self, entity_id: str, interval: float) -> float:
+        """Epoch seconds the device is next due (call with the lock held)."""
+        if entity_id in self._due_at:
+            return self._due_at[entity_id]
+        state = self._devices.get(entity_id)
+        return state["last_poll"] + interval if state is not None else 0.0
+
+    def due(self, devices: List[Dict], now: Optional[float] = None) -> List[str]:
+        """
+        Devices due for a poll; they are recorded as polled at now.
+
+        Args:
+            devices: Tracked devices with entity_id and interval_minutes
+            now: Current epoch seconds (default: time.time())
+
+        Returns:
+            Entity IDs to poll
+        """
+        now = time.time() if now is None else now
+        result = []
+        with self._lock:
+            for dev in devices:
+                entity_id = dev["entity_id"]
+                interval = dev.get("interval_minutes", 5) * 60
+                if self._next_due(entity_id, interval) > now:
+                    continue
+                self._due_at.pop(entity_id, None)
+                state = self._devices.setdefault(entity_id, {
+                    "last_poll": now,
+                    "last_success": None,
+                    "last_fix": None,
+                    "failures": 0,
+                })
+                state["last_poll"] = now
+                state["interval"] = interval
+                self._dirty = True
+                result.append(entity_id)
+        return result
+
+    def seconds_until_due(self, devices: List[Dict], now: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds until the next device is due (0 if one already is).
+
+        Returns:
+            None when there are no devices
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            due = [
+                self._next_due(dev["entity_id"], dev.get("interval_minutes", 5) * 60)
+                for dev in devices
+            ]
+        if not due:
+            return None
+        return max(min(due) - now, 0.0)
+
+    def record(
+        self,
+        entity_id: str,
+        success: bool,
+        fix_time: Optional[float] = None,
+        now: Optional[float] = None
+    ) -> None:
+        """
+        Record the outcome of polling a device.
+
+        Args:
+            entity_id: Device entity ID
+            success: Whether the poll worked
+            fix_time: Epoch seconds of the stored fix, if one was stored
+            now: Current epoch seconds (default: time.time())
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._devices.get(entity_id)
+            if state is None:
+                return  # untracked while it was being polled
+            if success:
+                state["last_success"] = now
+                state["failures"] = 0
+                if fix_time is not None:
+                    state["last_fix"] = fix_time
+            else:
+                state["failures"] += 1
+            self._dirty = True
+
+    def save(self) -> bool:
+        """
+        Write the state file if anything changed since the last save.
+
+        Returns:
+            True if the file was written
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._dirty = False
+            data = {
+                "devices": {
+                    entity_id: {
+                        key: round(value) if isinstance(value, float) else value
+                        for key, value in state.items()
+                    }
+                    for entity_id, state in self._devices.items()
+                }
+            }
+        try:
+            atomic_write_json(self.state_path, data)
+            return True
+        except OSError as e:
+            _LOGGER.error(f"Could not save scheduler state: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-device schedule for the API."""
+        with self._lock:
+            result = {}
+            for entity_id, state in self._devices.items():
+                interval = state.get("interval")
+                next_poll = self._due_at.get(entity_id)
+                if next_poll is None and interval is not None:
+                    next_poll = state["last_poll"] + interval
+                result[entity_id] = {
+                    "last_poll": _iso(state["last_poll"]),
+                    "last_success": _iso(state["last_success"]),
+                    "last_fix": _iso(state["last_fix"]),
+                    "consecutive_failures": state["failures"],
+                    "next_poll": _iso(next_poll),
+                }
+            return result
@@ -0,0 +1,361 @@
+"""Caching map tile proxy for the web UI."""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+# Base layers offered to the UI; url is an upstream template with {z}/{x}/{y}
+# and optionally {s} for a load-balanced subdomain
+DEFAULT_TILE_LAYERS: Dict[str, Dict] = {
+    "street": {
+        "url": "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
+        "attribution": "© OpenStreetMap",
+        "max_zoom": 19,
+    },
+    "satellite": {
+        "url": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+        "attribution": "© Esri",
+        "max_zoom": 18,
+    },
+}
+
+# Cache directory (persists in add-on /data volume)
+DEFAULT_TILE_CACHE_DIR = "/data/tile_cache"
+
+# Disk budget for cached tiles
+DEFAULT_TILE_CACHE_MB = 256
+
+# Tiles are revalidated upstream after this many seconds unless the
+# upstream Cache-Control says otherwise
+DEFAULT_TILE_MAX_AGE = 7 * 24 * 60 * 60
+
+# Browser cache lifetime for proxied tiles
+CLIENT_MAX_AGE = 24 * 60 * 60
+
+USER_AGENT = "FindMyHistory/1.0"
+REQUEST_TIMEOUT = 15
+SUBDOMAINS = "abc"
+
+
+def merge_tile_layers(overrides: Optional[List[Dict]]) -> Dict[str, Dict]:
+    """
+    Apply configured layer entries on top of the defaults.
+
+    Args:
+        overrides: Entries with name and url (attribution, max_zoom optional)
+
+    Returns:
+        Layers keyed by name
+    """
+    layers = {name: dict(layer) for name, layer in DEFAULT_TILE_LAYERS.items()}
+    for entry in overrides or []:
+        name = entry.get("name")
+        url = entry.get("url")
+        if not name or not url:
+            _LOGGER.warning(f"Ignoring tile layer without name or url: {entry}")
+            continue
+        layer = layers.setdefault(name, {"attribution": "", "max_zoom": 19})
+        layer["url"] = url
+        for key in ("attribution", "max_zoom"):
+            if entry.get(key) is not None:
+                layer[key] = entry[key]
+    return layers
+
+
+def _max_age(cache_control: Optional[str], default: float) -> float:
+    """Freshness lifetime from a Cache-Control header."""
+    if not cache_control:
+        return default
+    for directive in cache_control.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name.lower() == "no-cache":
+            return 0.0
+        if name.lower() == "max-age":
+            try:
+                return float(value)
+            except ValueError:
+                return default
+    return default
+
+
+class TileProxy:
+    """
+    Tile proxy with a size-bounded disk LRU.
+
+    Each tile is stored as a body file plus a small JSON sidecar holding its
+    validators (ETag, Last-Modified) and expiry. Fresh tiles are served from
+    disk; stale ones are revalidated with a conditional request and served
+    from disk on 304 or when the upstream is unreachable. Concurrent requests
+    for the same tile share one upstream fetch.
+    """
+
+    def __init__(
+        self,
+        layers: Optional[Dict[str, Dict]] = None,
+        cache_dir: str = DEFAULT_TILE_CACHE_DIR,
+        max_bytes: int = DEFAULT_TILE_CACHE_MB * 1024 * 1024,
+        max_age: float = DEFAULT_TILE_MAX_AGE
+    ):
+        """
+        Initialize tile proxy.
+
+        Args:
+            layers: Layers keyed by name (default: DEFAULT_TILE_LAYERS)
+            cache_dir: Directory for cached tiles
+            max_bytes: Disk budget; least recently used tiles are evicted beyond it
+            max_age: Default freshness lifetime in seconds
+        """
+        self.layers = layers if layers is not None else merge_tile_layers(None)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._lock = Lock()
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.upstream_errors = 0
+        # Built from the files on disk by the first request, off the event loop
+        self._index_ready: Optional[asyncio.Future] = None
+
+    async def _ensure_index(self) -> None:
+        """Scan the cache directory once, in the default executor."""
+        if self._index_ready is None:
+            self._index_ready = asyncio.get_running_loop().run_in_executor(None, self._load_index)
+        await asyncio.shield(self._index_ready)
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU from files on disk, oldest access first (blocking)."""
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".meta"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    key = os.path.relpath(path, self.cache_dir)
+                    entries.append((stat.st_mtime, key, stat.st_size))
+        entries.sort()
+        with self._lock:
+            for _, key, size in entries:
+                self._lru[key] = size
+                self._bytes += size
+        if entries:
+            _LOGGER.info(f"Tile cache: {len(entries)} tiles, {self._bytes / 1048576:.1f} MB")
+        self._evict()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        path = os.path.join(self.cache_dir, key)
+        return path, path + ".meta"
+
+    def _read(self, key: str) -> Optional[Tuple[bytes, Dict]]:
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return body, meta
+
+    def _write(self, key: str, body: bytes, meta: Dict) -> None:
+        body_path, meta_path = self._paths(key)
+        try:
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            with open(body_path, "wb") as f:
+                f.write(body)
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        except OSError as e:
+            _LOGGER.warning(f"Could not cache tile {key}: {e}")
+            return
+        with self._lock:
+            self._bytes -= self._lru.pop(key, 0)
+            self._lru[key] = len(body)
+            self._bytes += len(body)
+        self._evict()
+
+    def _write_meta(self, key: str, meta: Dict) -> None:
+        _, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        except OSError as e:
+            _LOGGER.warning(f"Could not update tile metadata {key}: {e}")
+
+    def _revalidated(self, key: str, meta: Dict) -> None:
+        self._write_meta(key, meta)
+        self._touch(key)
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+        try:
+            os.utime(self._paths(key)[0])
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Drop least recently used tiles until the cache fits its budget."""
+        while True:
+            with self._lock:
+                if self._bytes <= self.max_bytes or not self._lru:
+                    return
+                key, size = self._lru.popitem(last=False)
+                self._bytes -= size
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def upstream_url(self, layer: str, z: int, x: int, y: int) -> str:
+        """Fill the layer's upstream template."""
+        template = self.layers[layer]["url"]
+        return template.format(s=SUBDOMAINS[(x + y) % len(SUBDOMAINS)], z=z, x=x, y=y)
+
+    def _expires(self, headers) -> float:
+        return time.time() + _max_age(headers.get("Cache-Control"), self.max_age)
+
+    async def get_tile(self, layer: str, z: int, x: int, y: int) -> Optional[Tuple[bytes, Dict]]:
+        """
+        Fetch a tile through the cache.
+
+        Args:
+            layer: Layer name
+            z: Zoom level
+            x: Tile column
+            y: Tile row
+
+        Returns:
+            (body, meta) with content_type and etag in meta, or None if the
+            tile is unavailable
+
+        Raises:
+            KeyError: Unknown layer
+            ValueError: Tile coordinates out of range
+        """
+        if layer not in self.layers:
+            raise KeyError(layer)
+        max_zoom = int(self.layers[layer].get("max_zoom", 19))
+        if not 0 <= z <= max_zoom or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError("Tile coordinates out of range")
+
+        await self._ensure_index()
+        loop = asyncio.get_running_loop()
+        key = os.path.join(layer, str(z), str(x), str(y))
+        # Disk I/O runs in the executor; /data may be slow storage
+        cached = await loop.run_in_executor(None, self._read, key)
+        if cached is not None and cached[1].get("expires", 0) > time.time():
+            self.hits += 1
+            await loop.run_in_executor(None, self._touch, key)
+            return cached
+        self.misses += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = loop.create_task(
+                self._fetch(key, self.upstream_url(layer, z, x, y), cached)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one client going away doesn't cancel the shared fetch
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self, key: str, url: str, cached: Optional[Tuple[bytes, Dict]]
+    ) -> Optional[Tuple[bytes, Dict]]:
+        """Fetch or revalidate one tile upstream."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                headers={"User-Agent": USER_AGENT}
+            )
+
+        headers = {}
+        if cached is not None:
+            meta = cached[1]
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            async with self._session.get(url, headers=headers) as response:
+                if response.status == 304 and cached is not None:
+                    self.revalidated += 1
+                    meta = dict(cached[1], expires=self._expires(response.headers))
+                    await loop.run_in_executor(None, self._revalidated, key, meta)
+                    return cached[0], meta
+                if response.status != 200:
+                    self.upstream_errors += 1
+                    _LOGGER.debug(f"Tile upstream returned {response.status} for {key}")
+                    return cached
+                body = await response.read()
+                meta = {
+                    "content_type": response.headers.get("Content-Type", "image/png"),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "expires": self._expires(response.headers),
+                }
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            self.upstream_errors += 1
+            _LOGGER.debug(f"Tile upstream unreachable for {key}: {e}")
+            # A stale tile beats a grey square
+            return cached
+
+        await loop.run_in_executor(None, self._write, key, body, meta)
+        return body, meta
+
+    def layer_templates(self, base: str = "./tiles") -> List[Dict]:
+        """Leaflet layer definitions pointing at the proxy."""
+        return [
+            {
+                "name": name,
+                "url": f"{base}/{name}/{{z}}/{{x}}/{{y}}",
+                "attribution": layer.get("attribution", ""),
+                "max_zoom": layer.get("max_zoom", 19),
+            }
+            for name, layer in self.layers.items()
+        ]
+
+    def stats(self) -> Dict:
+        """Cache statistics."""
+        with self._lock:
+            entries, size = len(self._lru), self._bytes
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "upstream_errors": self.upstream_errors,
+        }
+
+    async def close(self) -> None:
+        """Close the upstream session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
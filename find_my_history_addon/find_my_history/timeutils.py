@@ -0,0 +1,14 @@
+"""Timestamp helpers shared by the storage and analytics modules."""
+
+from datetime import datetime, timezone
+
+
+def to_epoch(value: datetime) -> float:
+    """
+    Convert a datetime to epoch seconds.
+
+    Naive datetimes are treated as UTC, matching how points are written.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
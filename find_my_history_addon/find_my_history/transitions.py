@@ -0,0 +1,161 @@
+"""Zone enter/exit events with hysteresis at ingest."""
+
+import logging
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from find_my_history.timeutils import to_epoch
+from find_my_history.zone_detector import ZoneDetector
+
+_LOGGER = logging.getLogger(__name__)
+
+# A device must be this far (meters) outside its zone's radius before it
+# can leave, so fixes jittering around the edge don't flap
+EXIT_MARGIN = 50.0
+
+# Upper bound on the margin widened by a fix's reported GPS accuracy
+MAX_EXIT_MARGIN = 250.0
+
+# A new zone state must hold for this long (seconds) before it is committed
+CONFIRM_DURATION = 2 * 60
+
+# A gap this long between fixes discards an unconfirmed state change
+MAX_CONFIRM_GAP = 60 * 60
+
+
+class _DeviceZone:
+    """Zone state for a single device."""
+
+    def __init__(self, zone_name: str, epoch: float):
+        self.zone_name = zone_name
+        self.since: Optional[float] = None  # entry time, unknown for the first fix
+        self.last = epoch
+        self.candidate: Optional[Dict] = None
+
+
+class ZoneTransitionTracker:
+    """
+    Per-device zone state machine fed by every stored fix.
+
+    A device only leaves its zone once a fix is more than the exit margin
+    outside the radius (distance hysteresis), and a new zone state is only
+    committed after it has held for confirm_duration across fixes (time
+    hysteresis). Committed changes produce exit and enter events stamped
+    with the first fix of the new state and are handed to the listeners
+    (normally InfluxDBLocationClient.write_transition and the live stream).
+    """
+
+    def __init__(
+        self,
+        zone_detector: ZoneDetector,
+        exit_margin: float = EXIT_MARGIN,
+        confirm_duration: float = CONFIRM_DURATION,
+        max_gap: float = MAX_CONFIRM_GAP
+    ):
+        """
+        Initialize transition tracker.
+
+        Args:
+            zone_detector: Detector holding the current zones
+            exit_margin: Meters beyond a zone's radius needed to leave it
+            confirm_duration: Seconds a new zone state must hold
+            max_gap: Maximum seconds between fixes while confirming
+        """
+        self.zone_detector = zone_detector
+        self.exit_margin = exit_margin
+        self.confirm_duration = confirm_duration
+        self.max_gap = max_gap
+        self._lock = Lock()
+        self._devices: Dict[str, _DeviceZone] = {}
+        self._listeners: List[Callable[[str, Dict], object]] = []
+
+    def add_listener(self, listener: Callable[[str, Dict], object]) -> None:
+        """Register a callback run with (device_id, event) for every transition."""
+        self._listeners.append(listener)
+
+    def on_write(self, device_id: str, timestamp: datetime, fix: Dict) -> None:
+        """Write listener: advance the device's zone state with a stored fix."""
+        epoch = float(int(to_epoch(timestamp)))
+        latitude = fix["latitude"]
+        longitude = fix["longitude"]
+        observed = fix.get("zone_name") or "unknown"
+
+        with self._lock:
+            state = self._devices.get(device_id)
+            if state is None:
+                # Entry time unknown: the device was already here
+                self._devices[device_id] = _DeviceZone(observed, epoch)
+                return
+            if epoch <= state.last:
+                return  # late fix, zone state only moves forward
+            if state.candidate is not None and epoch - state.last > self.max_gap:
+                state.candidate = None
+            state.last = epoch
+
+            if observed != state.zone_name and state.zone_name != "unknown":
+                margin = min(max(self.exit_margin, fix.get("accuracy") or 0), MAX_EXIT_MARGIN)
+                outside = self.zone_detector.distance_outside_zone(
+                    state.zone_name, latitude, longitude
+                )
+                # Just past the edge counts as still inside; a point inside
+                # the current zone may still enter a smaller zone within it
+                if outside is not None and 0 < outside <= margin:
+                    observed = state.zone_name
+
+            if observed == state.zone_name:
+                state.candidate = None
+                return
+            if state.candidate is None or state.candidate["zone_name"] != observed:
+                state.candidate = {
+                    "zone_name": observed,
+                    "time": epoch,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                }
+            if epoch - state.candidate["time"] < self.confirm_duration:
+                return
+            events = self._commit(state)
+
+        for event in events:
+            _LOGGER.info(
+                f"{device_id} {'entered' if event['event'] == 'enter' else 'left'} "
+                f"zone '{event['zone_name']}'"
+            )
+            for listener in self._listeners:
+                try:
+                    listener(device_id, event)
+                except Exception as e:
+                    _LOGGER.error(f"Transition listener failed for {device_id}: {e}", exc_info=True)
+
+    @staticmethod
+    def _commit(state: _DeviceZone) -> List[Dict]:
+        """Commit the candidate state and build its exit/enter events."""
+        candidate = state.candidate
+        at = datetime.fromtimestamp(candidate["time"], timezone.utc)
+        events = []
+        if state.zone_name != "unknown":
+            events.append({
+                "event": "exit",
+                "zone_name": state.zone_name,
+                "time": at,
+                "latitude": candidate["latitude"],
+                "longitude": candidate["longitude"],
+                "dwell_seconds": (
+                    candidate["time"] - state.since if state.since is not None else None
+                ),
+            })
+        if candidate["zone_name"] != "unknown":
+            events.append({
+                "event": "enter",
+                "zone_name": candidate["zone_name"],
+                "time": at,
+                "latitude": candidate["latitude"],
+                "longitude": candidate["longitude"],
+                "dwell_seconds": None,
+            })
+        state.zone_name = candidate["zone_name"]
+        state.since = candidate["time"]
+        state.candidate = None
+        return events
+
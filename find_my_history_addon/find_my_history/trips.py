@@ -0,0 +1,161 @@
+"""Incremental trip segmentation at ingest."""
+
+import logging
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+from find_my_history.geo import haversine
+from find_my_history.timeutils import to_epoch
+from find_my_history.visits import VISIT_RADIUS, StayPointDetector
+
+_LOGGER = logging.getLogger(__name__)
+
+# A device is settled once it stays within VISIT_RADIUS for this long
+SETTLE_DURATION = 10 * 60
+
+# Trips shorter than this are treated as jitter and dropped
+MIN_TRIP_DISTANCE = 1000.0
+
+# A gap this long between fixes abandons the trip in progress
+MAX_TRIP_GAP = 2 * 60 * 60
+
+
+class _DeviceTrips:
+    """Trip state for a single device."""
+
+    def __init__(self, radius: float):
+        self.detector = StayPointDetector(radius)
+        self.settled = False
+        self.last: Optional[tuple] = None  # (epoch, latitude, longitude)
+        self.trip: Optional[Dict] = None
+
+
+class TripSegmenter:
+    """
+    Per-device trip state machine fed by every stored fix.
+
+    A trip starts when the device leaves a place it had settled at and
+    closes once it settles again; finished trips are handed to on_trip
+    (normally InfluxDBLocationClient.write_trip).
+    """
+
+    def __init__(
+        self,
+        on_trip: Callable[[str, Dict], object],
+        radius: float = VISIT_RADIUS,
+        settle_duration: float = SETTLE_DURATION,
+        min_distance: float = MIN_TRIP_DISTANCE,
+        max_gap: float = MAX_TRIP_GAP
+    ):
+        """
+        Initialize trip segmenter.
+
+        Args:
+            on_trip: Called with (device_id, trip) for every finished trip
+            radius: Radius in meters a settled device stays within
+            settle_duration: Seconds within radius before a device counts as settled
+            min_distance: Minimum trip distance in meters
+            max_gap: Maximum seconds between fixes during a trip
+        """
+        self.on_trip = on_trip
+        self.radius = radius
+        self.settle_duration = settle_duration
+        self.min_distance = min_distance
+        self.max_gap = max_gap
+        self._lock = Lock()
+        self._devices: Dict[str, _DeviceTrips] = {}
+
+    def on_write(self, device_id: str, timestamp: datetime, fix: Dict) -> None:
+        """Write listener: advance the device's trip state with a stored fix."""
+        epoch = float(int(to_epoch(timestamp)))
+        latitude = fix["latitude"]
+        longitude = fix["longitude"]
+        zone_name = fix.get("zone_name") or "unknown"
+
+        with self._lock:
+            state = self._devices.get(device_id)
+            if state is None:
+                state = _DeviceTrips(self.radius)
+                self._devices[device_id] = state
+
+            if state.last is not None and epoch < state.last[0]:
+                return  # late fix, trip state only moves forward
+
+            if state.last is not None and epoch - state.last[0] > self.max_gap:
+                if state.trip is not None:
+                    _LOGGER.debug(f"Abandoned trip for {device_id} after a data gap")
+                # Can't tell what happened during the gap, start over
+                state.trip = None
+                state.settled = False
+                state.detector = StayPointDetector(self.radius)
+
+            step = 0.0
+            if state.last is not None:
+                step = haversine(state.last[1], state.last[2], latitude, longitude)
+                if state.trip is not None:
+                    elapsed = epoch - state.last[0]
+                    state.trip["distance"] += step
+                    if elapsed > 0:
+                        state.trip["max_speed"] = max(state.trip["max_speed"], step / elapsed)
+                    state.trip["points"] += 1
+
+            closed = state.detector.add(epoch, latitude, longitude, zone_name)
+            if closed is not None:
+                if state.settled and state.trip is None:
+                    # Left a settled place: the trip starts at its last fix
+                    start = state.last
+                    state.trip = {
+                        "start_time": start[0],
+                        "start_latitude": closed["latitude"],
+                        "start_longitude": closed["longitude"],
+                        "start_zone": closed["zone_name"],
+                        "distance": step,
+                        "max_speed": step / (epoch - start[0]) if epoch > start[0] else 0.0,
+                        "points": 2,
+                    }
+                state.settled = False
+                if state.trip is not None:
+                    state.trip["distance_at_segment_start"] = state.trip["distance"]
+                    state.trip["points_at_segment_start"] = state.trip["points"]
+
+            state.last = (epoch, latitude, longitude)
+
+            finished = None
+            current = state.detector.open_visit()
+            if not state.settled and current["duration_seconds"] >= self.settle_duration:
+                state.settled = True
+                if state.trip is not None:
+                    trip = self._finish(state.trip, current)
+                    state.trip = None
+                    if trip["distance_m"] >= self.min_distance:
+                        finished = trip
+
+        if finished is not None:
+            _LOGGER.info(
+                f"Trip finished for {device_id}: {finished['start_zone']} -> "
+                f"{finished['end_zone']}, {finished['distance_m'] / 1000:.1f} km"
+            )
+            self.on_trip(device_id, finished)
+
+    @staticmethod
+    def _finish(trip: Dict, arrival: Dict) -> Dict:
+        """Build the finished trip; it ends where the settling segment began."""
+        end_time = to_epoch(datetime.fromisoformat(arrival["start"]))
+        duration = max(0.0, end_time - trip["start_time"])
+        distance = trip.get("distance_at_segment_start", trip["distance"])
+        return {
+            "start_time": datetime.fromtimestamp(trip["start_time"], timezone.utc),
+            "end_time": datetime.fromtimestamp(end_time, timezone.utc),
+            "duration_seconds": duration,
+            "distance_m": round(distance, 1),
+            "avg_speed_kmh": round(distance / duration * 3.6, 1) if duration > 0 else 0.0,
+            "max_speed_kmh": round(trip["max_speed"] * 3.6, 1),
+            "points": trip.get("points_at_segment_start", trip["points"]),
+            "start_latitude": trip["start_latitude"],
+            "start_longitude": trip["start_longitude"],
+            "start_zone": trip["start_zone"],
+            "end_latitude": arrival["latitude"],
+            "end_longitude": arrival["longitude"],
+            "end_zone": arrival["zone_name"],
+        }
@@ -0,0 +1,281 @@
+"""Stay-point detection: turn a device track into a list of visits."""
+
+import logging
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Deque, Dict, List, Optional, Sequence
+
+from find_my_history.geo import haversine
+from find_my_history.timeutils import to_epoch
+
+_LOGGER = logging.getLogger(__name__)
+
+# Fixes within this distance of a visit's centroid belong to the visit
+VISIT_RADIUS = 100.0
+
+# Minimum time spent at a place to count as a visit
+MIN_VISIT_DURATION = 5 * 60
+
+# A visit lasts until the next fix elsewhere, if that fix came within this gap
+MAX_DEPARTURE_GAP = 30 * 60
+
+# Segments kept in memory per device by VisitTracker
+DEFAULT_MAX_SEGMENTS = 2000
+
+
+def _isoformat(epoch: Optional[float]) -> Optional[str]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+class _Segment:
+    """Run of consecutive fixes within VISIT_RADIUS of their centroid."""
+
+    __slots__ = ("start", "end", "lat_sum", "lon_sum", "count", "zones")
+
+    def __init__(self, epoch: float, latitude: float, longitude: float, zone_name: str):
+        self.start = epoch
+        self.end = epoch
+        self.lat_sum = latitude
+        self.lon_sum = longitude
+        self.count = 1
+        self.zones = Counter({zone_name: 1})
+
+    @property
+    def latitude(self) -> float:
+        return self.lat_sum / self.count
+
+    @property
+    def longitude(self) -> float:
+        return self.lon_sum / self.count
+
+    def add(self, epoch: float, latitude: float, longitude: float, zone_name: str) -> None:
+        self.end = epoch
+        self.lat_sum += latitude
+        self.lon_sum += longitude
+        self.count += 1
+        self.zones[zone_name] += 1
+
+    def to_visit(self, departed: Optional[float], is_open: bool) -> Dict:
+        zone_name = self.zones.most_common(1)[0][0]
+        return {
+            "latitude": round(self.latitude, 6),
+            "longitude": round(self.longitude, 6),
+            "start": _isoformat(self.start),
+            "end": _isoformat(self.end),
+            "departed": _isoformat(departed),
+            "duration_seconds": self.end - self.start,
+            "points": self.count,
+            "zone_name": zone_name,
+            "in_zone": zone_name != "unknown",
+            "open": is_open,
+        }
+
+
+class StayPointDetector:
+    """
+    Incremental stay-point detector for a single device.
+
+    Fixes are fed in time order; each fix either extends the current segment
+    (within radius of its centroid) or closes it and starts a new one, so a
+    whole track is processed in one linear pass.
+    """
+
+    def __init__(self, radius: float = VISIT_RADIUS, max_gap: float = MAX_DEPARTURE_GAP):
+        """
+        Initialize detector.
+
+        Args:
+            radius: Maximum distance in meters from a segment's centroid
+            max_gap: Maximum seconds to the next fix for it to mark the departure
+        """
+        self.radius = radius
+        self.max_gap = max_gap
+        self._current: Optional[_Segment] = None
+
+    @property
+    def last_time(self) -> Optional[float]:
+        """Epoch seconds of the last fix fed to the detector."""
+        return self._current.end if self._current else None
+
+    def add(
+        self, epoch: float, latitude: float, longitude: float, zone_name: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Feed one fix.
+
+        Returns:
+            The segment closed by this fix as a visit dict, or None
+        """
+        zone_name = zone_name or "unknown"
+        current = self._current
+        if current is None:
+            self._current = _Segment(epoch, latitude, longitude, zone_name)
+            return None
+
+        if haversine(current.latitude, current.longitude, latitude, longitude) <= self.radius:
+            current.add(epoch, latitude, longitude, zone_name)
+            return None
+
+        departed = epoch if epoch - current.end <= self.max_gap else None
+        self._current = _Segment(epoch, latitude, longitude, zone_name)
+        return current.to_visit(departed, is_open=False)
+
+    def open_visit(self) -> Optional[Dict]:
+        """The segment still in progress, if any."""
+        if self._current is None:
+            return None
+        return self._current.to_visit(None, is_open=True)
+
+
+def detect_visits(
+    times: Sequence[float],
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    zone_names: Optional[Sequence[str]] = None,
+    radius: float = VISIT_RADIUS,
+    min_duration: float = MIN_VISIT_DURATION
+) -> List[Dict]:
+    """
+    Detect visits in a single device's time-ordered track.
+
+    Args:
+        times: Epoch seconds of each fix
+        latitudes: Latitude of each fix
+        longitudes: Longitude of each fix
+        zone_names: Zone tag of each fix (optional)
+        radius: Visit radius in meters
+        min_duration: Minimum visit duration in seconds (0 returns every segment)
+
+    Returns:
+        Visits in time order; the last one is marked open
+    """
+    detector = StayPointDetector(radius)
+    visits = []
+    for i in range(len(times)):
+        visit = detector.add(
+            times[i], latitudes[i], longitudes[i],
+            zone_names[i] if zone_names is not None else None
+        )
+        if visit is not None and visit["duration_seconds"] >= min_duration:
+            visits.append(visit)
+
+    last = detector.open_visit()
+    if last is not None and last["duration_seconds"] >= min_duration:
+        visits.append(last)
+    return visits
+
+
+def filter_visits(
+    visits: List[Dict], start_time: datetime, end_time: datetime, min_duration: float
+) -> List[Dict]:
+    """Keep visits overlapping [start_time, end_time] lasting at least min_duration."""
+    start = start_time if start_time.tzinfo else start_time.replace(tzinfo=timezone.utc)
+    end = end_time if end_time.tzinfo else end_time.replace(tzinfo=timezone.utc)
+    return [
+        visit for visit in visits
+        if visit["duration_seconds"] >= min_duration
+        and datetime.fromisoformat(visit["end"]) >= start
+        and datetime.fromisoformat(visit["start"]) <= end
+    ]
+
+
+class VisitTracker:
+    """
+    Per-device stay-point detectors fed by every stored fix.
+
+    Keeps recent segments in memory so visits for ranges since the process
+    started can be served without re-reading raw points.
+    """
+
+    def __init__(self, radius: float = VISIT_RADIUS, max_segments: int = DEFAULT_MAX_SEGMENTS):
+        """
+        Initialize tracker.
+
+        Args:
+            radius: Visit radius in meters
+            max_segments: Closed segments kept per device
+        """
+        self.radius = radius
+        self.max_segments = max_segments
+        self._lock = Lock()
+        self._detectors: Dict[str, StayPointDetector] = {}
+        self._segments: Dict[str, Deque[Dict]] = {}
+        self._covered_since: Dict[str, float] = {}
+        self._started_at = float(int(time.time()))
+
+    def on_write(self, device_id: str, timestamp: datetime, fix: Dict) -> None:
+        """Write listener: feed a stored fix to the device's detector."""
+        epoch = float(int(to_epoch(timestamp)))
+        with self._lock:
+            detector = self._detectors.get(device_id)
+            if detector is None:
+                detector = StayPointDetector(self.radius)
+                self._detectors[device_id] = detector
+                self._segments[device_id] = deque()
+                self._covered_since.setdefault(device_id, self._started_at)
+
+            if detector.last_time is not None and epoch < detector.last_time:
+                # Late fix the detector can't place; stop vouching for the past
+                self._covered_since[device_id] = max(
+                    self._covered_since[device_id], detector.last_time
+                )
+                return
+
+            closed = detector.add(epoch, fix["latitude"], fix["longitude"], fix.get("zone_name"))
+            if closed is not None:
+                segments = self._segments[device_id]
+                segments.append(closed)
+                if len(segments) > self.max_segments:
+                    evicted = segments.popleft()
+                    self._covered_since[device_id] = max(
+                        self._covered_since[device_id],
+                        to_epoch(datetime.fromisoformat(evicted["end"]))
+                    )
+
+    def invalidate(self, device_id: Optional[str] = None) -> None:
+        """
+        Forget tracked visits for a device (or all devices).
+
+        Used when points are written into past ranges behind the tracker's
+        back (imports, backfills, reclassification), so it stops answering
+        for ranges its segments no longer describe.
+        """
+        with self._lock:
+            # Points are stored with second precision, so the current second
+            # may already hold points the tracker never saw
+            now = float(int(time.time()) + 1)
+            if device_id is None:
+                # Also covers devices the tracker hasn't seen a fix for yet
+                self._detectors.clear()
+                self._segments.clear()
+                self._covered_since.clear()
+                self._started_at = now
+                return
+            self._detectors.pop(device_id, None)
+            self._segments.pop(device_id, None)
+            self._covered_since[device_id] = now
+
+    def visits(
+        self,
+        device_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        min_duration: float = MIN_VISIT_DURATION
+    ) -> Optional[List[Dict]]:
+        """
+        Visits from memory, or None if the range starts before tracking covered it.
+        """
+        with self._lock:
+            covered_since = self._covered_since.get(device_id, self._started_at)
+            if to_epoch(start_time) < covered_since:
+                return None
+            segments = list(self._segments.get(device_id, ()))
+            detector = self._detectors.get(device_id)
+            current = detector.open_visit() if detector else None
+        if current is not None:
+            segments.append(current)
+        return filter_visits(segments, start_time, end_time, min_duration)
@@ -2,12 +2,159 @@
 
 import logging
 import math
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from find_my_history.log_utils import format_coordinates
+import numpy as np
+
+from find_my_history.geo import degree_extents, haversine, haversine_np
+from find_my_history.log_utils import LazyCoordinates, format_coordinates
+from find_my_history.polygons import PreparedPolygon
 
 _LOGGER = logging.getLogger(__name__)
 
+# Grid cell size of the zone index in degrees (~1.1 km of latitude)
+CELL_DEGREES = 0.01
+
+# Zones covering more grid cells than this are checked for every point
+# rather than indexed, so one huge zone can't blow up the index
+MAX_INDEXED_CELLS = 400
+
+DEFAULT_RADIUS = 100.0
+
+# Point-zone pairs prefiltered at once by check_zones_batch; bounds the
+# temporary arrays to a few tens of MB however many points are passed
+BATCH_PAIRS = 2_000_000
+
+# Most points per check_zones_batch chunk; chunks of latitude-sorted points
+# span a narrow band, so only the zones in that band are compared
+BATCH_POINTS = 4096
+
+
+def parse_radius(value) -> float:
+    """Zone radius in meters from a number or a string such as "100m"."""
+    if isinstance(value, str):
+        try:
+            return float(value.replace("m", "").strip())
+        except ValueError:
+            return DEFAULT_RADIUS
+    return float(value) if value else DEFAULT_RADIUS
+
+
+def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+    return math.floor(latitude / CELL_DEGREES), math.floor(longitude / CELL_DEGREES)
+
+
+class ZoneIndex:
+    """
+    Zones compiled for lookup: parsed radii plus a grid of candidate zones.
+
+    Each zone is registered in every grid cell its bounding box touches, so
+    a point only needs distance checks against the zones of its own cell.
+    Polygon zones (dicts with a "polygon" instead of a radius) are indexed
+    by their bounding box the same way and tested with a prepared
+    point-in-polygon check; for picking the smallest zone they rank by the
+    radius of a circle with the same area.
+    """
+
+    def __init__(self, zones: List[Dict]):
+        """
+        Compile zones.
+
+        Args:
+            zones: Zone dicts with name, latitude, longitude and radius, or
+                   name and polygon (GeoJSON Polygon coordinates)
+        """
+        self.names: List[str] = []
+        self.latitudes: List[float] = []
+        self.longitudes: List[float] = []
+        self.radii: List[float] = []
+        self.half_lats: List[float] = []
+        self.half_lons: List[float] = []
+        self.shapes: List[Optional[PreparedPolygon]] = []
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.unindexed: List[int] = []
+
+        for zone in zones:
+            name = zone.get("name", "unknown")
+            if zone.get("polygon") is not None:
+                try:
+                    shape = PreparedPolygon(zone["polygon"])
+                except (TypeError, ValueError, IndexError) as e:
+                    _LOGGER.warning(f"Polygon zone '{name}' is invalid, skipping: {e}")
+                    continue
+                half_lat, half_lon = shape.half_extent
+                self._add(name, shape.center_lat, shape.center_lon, shape.equivalent_radius,
+                          half_lat, half_lon, shape)
+                continue
+            if zone.get("latitude") is None or zone.get("longitude") is None:
+                _LOGGER.warning(f"Zone '{name}' has no coordinates, skipping")
+                continue
+            latitude = float(zone["latitude"])
+            radius = parse_radius(zone.get("radius", DEFAULT_RADIUS))
+            d_lat, d_lon = degree_extents(latitude, radius)
+            self._add(name, latitude, float(zone["longitude"]), radius, d_lat, d_lon)
+
+        # Columnar copies for batch classification
+        self.lat_array = np.asarray(self.latitudes, dtype=float)
+        self.lon_array = np.asarray(self.longitudes, dtype=float)
+        self.radius_array = np.asarray(self.radii, dtype=float)
+        self.half_lat_array = np.asarray(self.half_lats, dtype=float)
+        self.half_lon_array = np.asarray(self.half_lons, dtype=float)
+        self.name_array = np.asarray(self.names, dtype=object)
+        self.polygon_mask = np.asarray([shape is not None for shape in self.shapes], dtype=bool)
+
+    def _add(
+        self, name: str, latitude: float, longitude: float, radius: float,
+        d_lat: float, d_lon: float, shape: Optional[PreparedPolygon] = None
+    ) -> None:
+        i = len(self.names)
+        self.names.append(name)
+        self.latitudes.append(latitude)
+        self.longitudes.append(longitude)
+        self.radii.append(radius)
+        self.half_lats.append(d_lat)
+        self.half_lons.append(d_lon)
+        self.shapes.append(shape)
+
+        if abs(longitude) + d_lon >= 180.0:
+            # Wraps the antimeridian or covers a pole
+            self.unindexed.append(i)
+            return
+        lat0, lon0 = _cell(latitude - d_lat, longitude - d_lon)
+        lat1, lon1 = _cell(latitude + d_lat, longitude + d_lon)
+        if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) > MAX_INDEXED_CELLS:
+            self.unindexed.append(i)
+            return
+        for cell_lat in range(lat0, lat1 + 1):
+            for cell_lon in range(lon0, lon1 + 1):
+                self.cells.setdefault((cell_lat, cell_lon), []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def circles(self) -> List[Tuple]:
+        """
+        Sorted (name, latitude, longitude, radius) of every zone.
+
+        Polygons are given by their bounding circle plus a digest of their
+        vertices, so reshaping one inside the same bounds still counts as a
+        change.
+        """
+        return sorted(
+            (name, lat, lon, radius) if shape is None
+            else (name, lat, lon, shape.bounding_radius, shape.digest)
+            for name, lat, lon, radius, shape in zip(
+                self.names, self.latitudes, self.longitudes, self.radii, self.shapes
+            )
+        )
+
+    def candidates(self, latitude: float, longitude: float) -> List[int]:
+        """Indexes of zones that may contain the point."""
+        indexed = self.cells.get(_cell(latitude, longitude))
+        if not self.unindexed:
+            return indexed or []
+        return (indexed or []) + self.unindexed
+
 
 class ZoneDetector:
     """Detects if a location is within Home Assistant zones."""
@@ -20,48 +167,28 @@ class ZoneDetector:
             zones: List of zone dictionaries from HA zone registry
         """
         self.zones = zones
+        self.index = ZoneIndex(zones)
         _LOGGER.info(f"Initialized with {len(zones)} zones")
         for zone in zones:
             name = zone.get("name", "unknown")
+            if zone.get("polygon") is not None:
+                _LOGGER.info(f"  Zone: {name} polygon with {len(zone['polygon'])} rings")
+                continue
             lat = zone.get("latitude")
             lon = zone.get("longitude")
             radius = zone.get("radius", 100)
             coords = format_coordinates(lat, lon, precision=5)
             _LOGGER.info(f"  Zone: {name} @ {coords} radius={radius}m")
 
-    def _calculate_distance(
-        self, lat1: float, lon1: float, lat2: float, lon2: float
-    ) -> float:
-        """
-        Calculate distance between two coordinates using Haversine formula.
-
-        Returns:
-            Distance in meters
-        """
-        # Earth radius in meters
-        R = 6371000
-
-        # Convert to radians
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-
-        # Haversine formula
-        a = (
-            math.sin(delta_phi / 2) ** 2 +
-            math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-        )
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-        return R * c
-
     def check_zone(
         self, latitude: float, longitude: float
     ) -> Tuple[bool, Optional[str]]:
         """
         Check if location is within any zone.
 
+        When zones overlap the smallest one containing the point wins, so a
+        room-sized zone inside a neighbourhood zone is reported as itself.
+
         Args:
             latitude: Device latitude
             longitude: Device longitude
@@ -69,61 +196,155 @@ class ZoneDetector:
         Returns:
             Tuple of (in_zone (bool), zone_name (str or None))
         """
-        if not self.zones:
+        index = self.index
+        if not len(index):
             _LOGGER.warning("No zones loaded for zone detection")
             return False, None
 
-        closest_zone = None
-        closest_distance = float('inf')
-        
-        for zone in self.zones:
-            zone_lat = zone.get("latitude")
-            zone_lon = zone.get("longitude")
-            zone_radius_raw = zone.get("radius", 100)
-            zone_name = zone.get("name", "unknown")
-            
-            # Handle radius that might be string like "100m" or "100"
-            if isinstance(zone_radius_raw, str):
-                zone_radius = float(zone_radius_raw.replace('m', '').strip())
+        best = None
+        best_key = None
+        for i in index.candidates(latitude, longitude):
+            shape = index.shapes[i]
+            if shape is not None and not shape.contains(latitude, longitude):
+                continue
+            distance = haversine(
+                latitude, longitude, index.latitudes[i], index.longitudes[i]
+            )
+            inside = shape is not None or distance <= index.radii[i]
+            if inside and (best_key is None or (index.radii[i], distance) < best_key):
+                best = i
+                best_key = (index.radii[i], distance)
+
+        # Runs for every fix: only format the message when DEBUG is on
+        if best is None:
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Device at %s is not in any zone", LazyCoordinates(latitude, longitude))
+            return False, None
+
+        zone_name = index.names[best]
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "Device at %s is in zone '%s' (distance: %.1fm, radius: %sm)",
+                LazyCoordinates(latitude, longitude), zone_name, best_key[1], best_key[0]
+            )
+        return True, zone_name
+
+    def distance_outside_zone(
+        self, zone_name: str, latitude: float, longitude: float
+    ) -> Optional[float]:
+        """
+        Meters between a point and a zone's edge.
+
+        Returns:
+            Distance outside the zone's radius or polygon edge (negative when
+            inside), or None if no zone has that name
+        """
+        index = self.index
+        best = None
+        for i, name in enumerate(index.names):
+            if name != zone_name:
+                continue
+            if index.shapes[i] is not None:
+                outside = index.shapes[i].distance_outside(latitude, longitude)
             else:
-                zone_radius = float(zone_radius_raw) if zone_radius_raw else 100.0
+                outside = haversine(
+                    latitude, longitude, index.latitudes[i], index.longitudes[i]
+                ) - index.radii[i]
+            best = outside if best is None else min(best, outside)
+        return best
+
+    def check_zones_batch(
+        self, latitudes: Sequence[float], longitudes: Sequence[float]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classify many points at once, with the same rules as check_zone.
+
+        Points are sorted by latitude and compared by broadcasting in chunks,
+        each against only the zones whose latitude band it overlaps, with at
+        most BATCH_PAIRS point-zone pairs per chunk. A cheap bounding-box test
+        on each pair runs first, and great-circle distances are only computed
+        for the pairs that pass it; pairs with polygon zones get a
+        point-in-polygon test instead of the radius check.
+
+        Args:
+            latitudes: Point latitudes
+            longitudes: Point longitudes
+
+        Returns:
+            Tuple of (in_zone bool array, zone name object array with None
+            outside zones)
+        """
+        index = self.index
+        lat = np.asarray(latitudes, dtype=float)
+        lon = np.asarray(longitudes, dtype=float)
+        in_zone = np.zeros(lat.size, dtype=bool)
+        names = np.full(lat.size, None, dtype=object)
+        if not len(index) or not lat.size:
+            return in_zone, names
+
+        # Bounding box half-sizes in degrees (see geo.degree_extents)
+        half_lat = index.half_lat_array
+        half_lon = index.half_lon_array
 
-            if zone_lat is None or zone_lon is None:
-                _LOGGER.warning(f"Zone '{zone_name}' has no coordinates, skipping")
+        # Sorted by latitude, each chunk only meets the zones of its band
+        order = np.argsort(lat, kind="stable")
+        lat_low = index.lat_array - half_lat
+        lat_high = index.lat_array + half_lat
+        step = min(BATCH_POINTS, max(1, BATCH_PAIRS // len(index)))
+        for start in range(0, lat.size, step):
+            chunk = order[start:start + step]
+            chunk_lat = lat[chunk]
+            chunk_lon = lon[chunk]
+            band = np.flatnonzero((lat_high >= chunk_lat[0]) & (lat_low <= chunk_lat[-1]))
+            if not band.size:
                 continue
 
-            # Calculate distance from device to zone center
-            distance = self._calculate_distance(
-                latitude, longitude, zone_lat, zone_lon
-            )
+            d_lat = np.abs(chunk_lat[:, None] - index.lat_array[band][None, :])
+            # Longitude difference wrapped to [-180, 180)
+            d_lon = np.abs((chunk_lon[:, None] - index.lon_array[band][None, :] + 180.0) % 360.0 - 180.0)
+            points, zones = np.nonzero((d_lat <= half_lat[band]) & (d_lon <= half_lon[band]))
+            if not points.size:
+                continue
+            zones = band[zones]
 
-            # Log zone check without exposing exact coordinates
-            _LOGGER.debug(
-                f"Zone '{zone_name}': distance={distance:.1f}m, radius={zone_radius}m"
+            distance = haversine_np(
+                chunk_lat[points], chunk_lon[points], index.lat_array[zones], index.lon_array[zones]
             )
-            
-            # Track closest zone
-            if distance < closest_distance:
-                closest_distance = distance
-                closest_zone = zone_name
-
-            # Check if within zone radius
-            if distance <= zone_radius:
-                coords = format_coordinates(latitude, longitude, precision=5)
-                _LOGGER.info(
-                    f"Device at {coords} is in zone "
-                    f"'{zone_name}' (distance: {distance:.1f}m, radius: {zone_radius}m)"
-                )
-                return True, zone_name
-
-        coords = format_coordinates(latitude, longitude, precision=5)
-        _LOGGER.info(
-            f"Device at {coords} is not in any zone. "
-            f"Closest: '{closest_zone}' at {closest_distance:.1f}m"
-        )
-        return False, None
+            inside = distance <= index.radius_array[zones]
+            polygon = index.polygon_mask[zones]
+            if polygon.any():
+                # Polygon pairs passed the bounding box; test the shape itself
+                for zone in np.unique(zones[polygon]):
+                    pairs = polygon & (zones == zone)
+                    inside[pairs] = index.shapes[zone].contains_many(
+                        chunk_lat[points[pairs]], chunk_lon[points[pairs]]
+                    )
+            points, zones, distance = points[inside], zones[inside], distance[inside]
+            if not points.size:
+                continue
+
+            # Per point, the smallest containing zone (closest on ties)
+            ranked = np.lexsort((distance, index.radius_array[zones], points))
+            points, zones = points[ranked], zones[ranked]
+            first = np.ones(points.size, dtype=bool)
+            first[1:] = points[1:] != points[:-1]
+            hit = chunk[points[first]]
+            in_zone[hit] = True
+            names[hit] = index.name_array[zones[first]]
+
+        return in_zone, names
 
-    def update_zones(self, zones: List[Dict]):
-        """Update zone list."""
+    def update_zones(self, zones: List[Dict]) -> bool:
+        """
+        Update zone list and rebuild the index.
+
+        Returns:
+            True if any zone was added, removed, moved or resized
+        """
+        index = ZoneIndex(zones)
+        changed = index.circles() != self.index.circles()
+        # Built before it is published so concurrent lookups never see a partial index
+        self.index = index
         self.zones = zones
-        _LOGGER.info(f"Updated zones: {len(zones)} zones")
+        _LOGGER.info(f"Updated zones: {len(zones)} zones{' (changed)' if changed else ''}")
+        return changed
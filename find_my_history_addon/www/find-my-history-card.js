@@ -57,7 +57,7 @@ class FindMyHistoryCard extends HTMLElement {
       
       const apiUrl = this.config.api_url || 'http://localhost:8080';
       const response = await fetch(
-        `${apiUrl}/api/locations?device_id=${device}&start=${startTime.toISOString()}&end=${endTime.toISOString()}&limit=10000`
+        `${apiUrl}/api/locations?device_id=${device}&start=${startTime.toISOString()}&end=${endTime.toISOString()}&limit=10000&resolution=auto&max_points=10000`
       );
 
       if (!response.ok) {
@@ -76,6 +76,7 @@ class FindMyHistoryCard extends HTMLElement {
       this.currentTime = new Date(this.locations[this.locations.length - 1].time);
       this.render();
       this.updateMap();
+      this.subscribeLive(apiUrl, device);
 
     } catch (error) {
       console.error('Error loading location data:', error);
@@ -83,6 +84,35 @@ class FindMyHistoryCard extends HTMLElement {
     }
   }
 
+  subscribeLive(apiUrl, device) {
+    // New fixes arrive over one idle event stream instead of re-fetching the range
+    if (this.liveStream && this.liveDevice === device) return;
+    this.unsubscribeLive();
+    this.liveDevice = device;
+    this.liveStream = new EventSource(`${apiUrl}/api/stream?device_id=${encodeURIComponent(device)}`);
+    this.liveStream.addEventListener('location', (event) => {
+      const location = JSON.parse(event.data);
+      const atLatest = this.locations.length === 0 ||
+        this.currentTime >= new Date(this.locations[this.locations.length - 1].time);
+      this.locations.push(location);
+      if (atLatest) {
+        this.currentTime = new Date(location.time);
+      }
+      this.updateMap();
+    });
+  }
+
+  unsubscribeLive() {
+    if (this.liveStream) {
+      this.liveStream.close();
+      this.liveStream = null;
+    }
+  }
+
+  disconnectedCallback() {
+    this.unsubscribeLive();
+  }
+
   getStartTime(endTime) {
     const range = this.config.default_time_range || '24h';
     const hours = this.parseTimeRange(range);
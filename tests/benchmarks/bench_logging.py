@@ -0,0 +1,168 @@
+"""
+Microbenchmark of the logging pipeline's per-message cost.
+
+Run from the repository root:
+
+    python tests/benchmarks/bench_logging.py [--count 50000]
+
+Reports nanoseconds per message for:
+- SecureLogFormatter.format with masking off and on, next to the previous
+  two-pass masking for comparison
+- the cost seen by the logging thread with a direct console handler versus
+  the queue handler used by setup_secure_logging (output goes to a pipe
+  drained by another thread, like the add-on's stdout)
+- a disabled DEBUG call with an eager f-string versus lazy %-formatting
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "find_my_history_addon"))
+
+from find_my_history.log_utils import (  # noqa: E402
+    LazyCoordinates,
+    SecureLogFormatter,
+    format_coordinates,
+)
+
+FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Masking as done before the single-pass pattern, for comparison
+_COORD = re.compile(r'\((-?\d+\.\d{4,}),\s*(-?\d+\.\d{4,})\)')
+_TOKEN = re.compile(r'\b([a-zA-Z0-9]{20,})\b')
+
+
+def _two_pass(message: str) -> str:
+    message = _COORD.sub(
+        lambda m: f"({float(m.group(1)):.2f}**, {float(m.group(2)):.2f}**)", message
+    )
+    return _TOKEN.sub(lambda m: f"{m.group(1)[:4]}***", message)
+
+
+def _record(i: int) -> logging.LogRecord:
+    return logging.LogRecord(
+        "find_my_history.main", logging.INFO, __file__, 0,
+        "Stored location for %s (%s): %s - %s",
+        ("device_tracker.iphone", "iPhone",
+         LazyCoordinates(54.8985 + i * 1e-5, 23.9036, precision=4), "unknown location"),
+        None,
+    )
+
+
+def _per_message(fn, count: int, repeat: int = 5) -> float:
+    """Best of `repeat` runs, in nanoseconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for i in range(count):
+            fn(i)
+        best = min(best, time.perf_counter() - started)
+    return best / count * 1e9
+
+
+def _pipe_sink():
+    """Writable text stream whose data is read and discarded by a thread."""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        while os.read(read_fd, 65536):
+            pass
+        os.close(read_fd)
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, "w")
+
+
+def bench_formatter(count: int) -> None:
+    plain = SecureLogFormatter(FORMAT, mask_sensitive=False)
+    masked = SecureLogFormatter(FORMAT, mask_sensitive=True)
+    records = [_record(i) for i in range(count)]
+
+    print("SecureLogFormatter.format")
+    print(f"  masking off          {_per_message(lambda i: plain.format(records[i]), count):8.0f} ns")
+    print(f"  masking on (1 pass)  {_per_message(lambda i: masked.format(records[i]), count):8.0f} ns")
+    print(f"  masking on (2 pass)  {_per_message(lambda i: _two_pass(plain.format(records[i])), count):8.0f} ns")
+
+
+def bench_handlers(count: int, burst: int = 10) -> None:
+    """
+    Time log calls in small bursts, letting the queue drain in between.
+
+    That's how the polling loop logs (a line per device, then it sleeps), so
+    only the work done on the calling thread is measured.
+    """
+    sink = _pipe_sink()
+    print(f"Logger.info on the calling thread, bursts of {burst} (masking on)")
+    for label, use_queue in (("direct handler", False), ("queue handler", True)):
+        logger = logging.getLogger(f"bench.{label}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        console = logging.StreamHandler(sink)
+        console.setFormatter(SecureLogFormatter(FORMAT, mask_sensitive=True))
+        log_queue = queue.Queue()
+        listener = None
+        if use_queue:
+            logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            listener = logging.handlers.QueueListener(log_queue, console)
+            listener.start()
+        else:
+            logger.addHandler(console)
+
+        best = float("inf")
+        for _ in range(5):
+            elapsed = 0.0
+            for start in range(0, count, burst):
+                started = time.perf_counter()
+                for i in range(start, start + burst):
+                    logger.info(
+                        "Stored location for %s (%s): %s - %s", "device_tracker.iphone", "iPhone",
+                        LazyCoordinates(54.8985 + i * 1e-5, 23.9036, precision=4), "unknown location"
+                    )
+                elapsed += time.perf_counter() - started
+                log_queue.join()
+            best = min(best, elapsed)
+        if listener is not None:
+            listener.stop()
+        print(f"  {label:20s} {best / count * 1e9:8.0f} ns")
+    sink.close()
+
+
+def bench_disabled(count: int) -> None:
+    logger = logging.getLogger("bench.disabled")
+    logger.setLevel(logging.INFO)
+    print("Disabled DEBUG call")
+    eager = _per_message(lambda i: logger.debug(
+        f"Device at {format_coordinates(54.8985 + i * 1e-5, 23.9036)} is not in any zone"
+    ), count)
+    lazy = _per_message(lambda i: logger.debug(
+        "Device at %s is not in any zone", LazyCoordinates(54.8985 + i * 1e-5, 23.9036)
+    ), count)
+    guarded = _per_message(
+        lambda i: logger.isEnabledFor(logging.DEBUG) and logger.debug(
+            "Device at %s is not in any zone", LazyCoordinates(54.8985 + i * 1e-5, 23.9036)
+        ), count
+    )
+    print(f"  eager f-string       {eager:8.0f} ns")
+    print(f"  lazy %-format        {lazy:8.0f} ns")
+    print(f"  isEnabledFor guard   {guarded:8.0f} ns")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=50000, help="Messages per case")
+    args = parser.parse_args()
+    bench_formatter(args.count)
+    bench_handlers(args.count)
+    bench_disabled(args.count)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 """Integration tests for API endpoints."""
 
+import json
 import pytest
-from aiohttp.test_utils import AioHTTPTestCase, make_mocked_request
-from unittest.mock import Mock
+from datetime import datetime
+from aiohttp import ClientSession, FormData
+from aiohttp.test_utils import AioHTTPTestCase, TestServer, make_mocked_request
+from unittest.mock import AsyncMock, Mock
 from find_my_history.api import LocationHistoryAPI
+from find_my_history.device_index import LastKnownIndex
+from find_my_history.geocoder import Geocoder
+from find_my_history.hot_window import HotWindow
 
 
 @pytest.fixture
@@ -36,6 +42,7 @@ def mock_ha_client():
 def mock_influxdb_client():
     """Mock InfluxDB client."""
     client = Mock()
+    client.last_known = LastKnownIndex()
     client.query_locations = Mock(return_value=[])
     client.get_statistics = Mock(return_value={
         "total_locations": 10,
@@ -46,9 +53,10 @@ def mock_influxdb_client():
 
 
 @pytest.fixture
-def api_server(mock_ha_client, mock_influxdb_client):
+def api_server(mock_ha_client, mock_influxdb_client, tmp_path):
     """Create API server instance."""
-    return LocationHistoryAPI(mock_ha_client, mock_influxdb_client, port=8090)
+    geocoder = Geocoder(cache_path=str(tmp_path / "geocode.sqlite"))
+    return LocationHistoryAPI(mock_ha_client, mock_influxdb_client, port=8090, geocoder=geocoder)
 
 
 @pytest.mark.asyncio
@@ -86,6 +94,24 @@ class TestLocationHistoryAPI:
             data = await response.json()
             assert "devices" in data
 
+    async def test_devices_endpoint_without_ha(self, api_server, mock_ha_client, mock_influxdb_client):
+        """Test device list is served from the last-known index when HA is down."""
+        mock_ha_client.get_all_device_trackers.return_value = []
+        mock_influxdb_client.last_known.update(
+            "device_tracker.ipad", datetime(2025, 1, 27, 10, 0, 0),
+            {"device_name": "iPad", "latitude": 54.7, "longitude": 25.2, "zone_name": None},
+        )
+
+        request = make_mocked_request("GET", "/api/devices")
+        response = await api_server.get_devices(request)
+        assert response.status == 200
+
+        devices = json.loads(response.body)["devices"]
+        ipad = next(d for d in devices if d["entity_id"] == "device_tracker.ipad")
+        assert ipad["name"] == "iPad"
+        assert ipad["last_location"]["latitude"] == 54.7
+        mock_influxdb_client.get_unique_devices.assert_not_called()
+
     async def test_zones_endpoint(self, api_server):
         """Test zones list endpoint."""
         request = make_mocked_request("GET", "/api/zones")
@@ -147,3 +173,451 @@ class TestLocationHistoryAPI:
             assert response.status == 200
             data = await response.json()
             assert "total_locations" in data or "stats" in data
+
+    async def test_locations_motion_param(self, api_server, mock_influxdb_client):
+        """Test motion=true asks for annotated rows."""
+        request = make_mocked_request("GET", "/api/locations?device_id=device_tracker.iphone&motion=true")
+        response = await api_server.get_locations(request)
+        assert response.status == 200
+        assert mock_influxdb_client.query_locations.call_args.kwargs["annotate"] is True
+
+    async def test_locations_auto_resolution(self, api_server, mock_influxdb_client):
+        """Test resolution=auto buckets long ranges to fit max_points."""
+        request = make_mocked_request(
+            "GET",
+            "/api/locations?device_id=device_tracker.iphone&start=2025-01-01T00:00:00Z&end=2025-01-31T00:00:00Z&resolution=auto&max_points=10000"
+        )
+        response = await api_server.get_locations(request)
+        assert response.status == 200
+        assert json.loads(response.body)["resolution"] == 300
+        assert mock_influxdb_client.query_locations.call_args.kwargs["every"] == 300
+
+    async def test_locations_auto_resolution_all_devices(self, api_server, mock_influxdb_client):
+        """Test resolution=auto splits max_points between devices when device_id is omitted."""
+        for i in range(4):
+            mock_influxdb_client.last_known.update(
+                f"device_tracker.phone_{i}", datetime(2025, 1, 31), {"latitude": 54.9, "longitude": 23.9}
+            )
+        request = make_mocked_request(
+            "GET",
+            "/api/locations?start=2025-01-01T00:00:00Z&end=2025-01-31T00:00:00Z&resolution=auto&max_points=10000"
+        )
+        response = await api_server.get_locations(request)
+        assert response.status == 200
+        # 2500 rows per device: 30 days at 30 minutes is 1440 buckets each
+        assert json.loads(response.body)["resolution"] == 1800
+        assert mock_influxdb_client.query_locations.call_args.kwargs["every"] == 1800
+
+    async def test_locations_invalid_resolution(self, api_server):
+        """Test unparseable resolutions are rejected."""
+        request = make_mocked_request("GET", "/api/locations?resolution=fast")
+        response = await api_server.get_locations(request)
+        assert response.status == 400
+
+    async def test_heatmap_endpoint(self, api_server, mock_influxdb_client):
+        """Test heatmap endpoint bins stored fixes."""
+        mock_influxdb_client.query_columns = Mock(return_value={
+            "time": [1737972000.0, 1737972600.0],
+            "device_id": ["device_tracker.iphone"] * 2,
+            "zone_name": ["home"] * 2,
+            "latitude": [54.8985, 54.8985],
+            "longitude": [23.9036, 23.9036],
+        })
+
+        request = make_mocked_request(
+            "GET",
+            "/api/heatmap?device_id=device_tracker.iphone&start=2025-01-27T00:00:00Z&end=2025-01-27T23:59:59Z&precision=7"
+        )
+        response = await api_server.get_heatmap(request)
+        assert response.status == 200
+        data = json.loads(response.body)
+        assert data["precision"] == 7
+        assert len(data["cells"]) == 1
+
+        # Closed ranges are served from cache
+        await api_server.get_heatmap(request)
+        assert mock_influxdb_client.query_columns.call_count == 1
+
+    async def test_heatmap_invalid_precision(self, api_server):
+        """Test heatmap rejects out-of-range precision."""
+        request = make_mocked_request("GET", "/api/heatmap?precision=12")
+        response = await api_server.get_heatmap(request)
+        assert response.status == 400
+
+    async def test_places_endpoint(self, api_server, mock_influxdb_client):
+        """Test places endpoint clusters stored fixes."""
+        mock_influxdb_client.query_columns = Mock(return_value={
+            "time": [1737972000.0 + i * 300 for i in range(6)],
+            "device_id": ["device_tracker.iphone"] * 6,
+            "zone_name": ["home"] * 6,
+            "latitude": [54.8985] * 6,
+            "longitude": [23.9036] * 6,
+        })
+
+        request = make_mocked_request(
+            "GET",
+            "/api/places?start=2025-01-27T00:00:00Z&end=2025-01-27T23:59:59Z"
+        )
+        response = await api_server.get_places(request)
+        assert response.status == 200
+        data = json.loads(response.body)
+        assert len(data["places"]) == 1
+        assert data["places"][0]["zone_name"] == "home"
+
+        await api_server.get_places(request)
+        assert mock_influxdb_client.query_columns.call_count == 1
+
+    async def test_places_invalid_eps(self, api_server):
+        """Test places rejects a non-positive radius."""
+        request = make_mocked_request("GET", "/api/places?eps=0")
+        response = await api_server.get_places(request)
+        assert response.status == 400
+
+    async def test_geocode_endpoint(self, api_server):
+        """Test geocode endpoint returns the proxied place."""
+        api_server.geocoder.lookup = AsyncMock(return_value={
+            "primary": "Laisvės al. 10", "secondary": "Kaunas",
+            "latitude": 54.8985, "longitude": 23.9036, "cached": True,
+        })
+        request = make_mocked_request("GET", "/api/geocode?lat=54.8985&lon=23.9036")
+        response = await api_server.get_geocode(request)
+        assert response.status == 200
+        assert json.loads(response.body)["primary"] == "Laisvės al. 10"
+
+    async def test_geocode_requires_coordinates(self, api_server):
+        """Test geocode rejects missing coordinates."""
+        request = make_mocked_request("GET", "/api/geocode?lat=54.8985")
+        response = await api_server.get_geocode(request)
+        assert response.status == 400
+
+    async def test_tile_layers_without_proxy(self, api_server):
+        """Test the UI gets upstream templates when the proxy is off."""
+        response = await api_server.get_tile_layers(make_mocked_request("GET", "/api/tiles"))
+        data = json.loads(response.body)
+        assert data["proxied"] is False
+        assert {layer["name"] for layer in data["layers"]} == {"street", "satellite"}
+
+    async def test_tile_endpoint(self, api_server):
+        """Test tiles are served through the proxy with cache headers."""
+        api_server.tile_proxy = Mock()
+        api_server.tile_proxy.get_tile = AsyncMock(
+            return_value=(b"png", {"content_type": "image/png", "etag": '"v1"'})
+        )
+        request = make_mocked_request(
+            "GET", "/tiles/street/5/17/10.png",
+            match_info={"layer": "street", "z": "5", "x": "17", "y": "10.png"}
+        )
+        response = await api_server.get_tile(request)
+        assert response.status == 200
+        assert response.body == b"png"
+        assert response.headers["ETag"] == '"v1"'
+        api_server.tile_proxy.get_tile.assert_awaited_with("street", 5, 17, 10)
+
+    async def test_stream_endpoint(self, api_server):
+        """Test the event stream pushes newly written fixes for subscribed devices."""
+        server = TestServer(api_server.app)
+        await server.start_server()
+        try:
+            async with ClientSession() as session:
+                async with session.get(server.make_url("/api/stream?device_id=device_tracker.iphone")) as response:
+                    assert response.headers["Content-Type"] == "text/event-stream"
+                    assert await response.content.readline() == b"retry: 5000\n"
+                    await response.content.readline()
+
+                    fix = {"latitude": 54.8985, "longitude": 23.9036, "zone_name": "home"}
+                    api_server.broadcaster.on_write("device_tracker.ipad", datetime(2025, 1, 27, 10, 0), fix)
+                    api_server.broadcaster.on_write("device_tracker.iphone", datetime(2025, 1, 27, 10, 0), fix)
+
+                    assert await response.content.readline() == b"event: location\n"
+                    data = json.loads((await response.content.readline())[len(b"data: "):])
+                    assert data["device_id"] == "device_tracker.iphone"
+        finally:
+            await server.close()
+
+    async def test_metrics_endpoint(self, api_server, mock_influxdb_client):
+        """Test /metrics reports per-route handler latency and cache state."""
+        mock_influxdb_client.hot_window = HotWindow(10)
+        server = TestServer(api_server.app)
+        await server.start_server()
+        try:
+            async with ClientSession() as session:
+                async with session.get(server.make_url("/health")) as response:
+                    assert response.status == 200
+                async with session.get(server.make_url("/metrics")) as response:
+                    assert response.status == 200
+                    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                    text = await response.text()
+        finally:
+            await server.close()
+
+        assert (
+            'find_my_history_api_request_duration_seconds_count{method="GET",route="/health",status="200"}'
+            in text
+        )
+        assert 'find_my_history_cache_hits_total{cache="heatmap"} 0' in text
+        assert 'find_my_history_queue_depth{queue="stream"} 0' in text
+
+    async def test_playback_endpoint(self, api_server, mock_influxdb_client):
+        """Test playback returns a bounded number of frames."""
+        mock_influxdb_client.query_columns = Mock(return_value={
+            "time": [1737972000.0 + i * 60 for i in range(100)],
+            "device_id": ["device_tracker.iphone"] * 100,
+            "zone_name": ["unknown"] * 100,
+            "latitude": [54.0 + i * 0.001 for i in range(100)],
+            "longitude": [23.9] * 100,
+        })
+        request = make_mocked_request(
+            "GET",
+            "/api/playback?device_id=device_tracker.iphone&start=2025-01-27T00:00:00Z&end=2025-01-27T23:59:59Z&frames=50"
+        )
+        response = await api_server.get_playback(request)
+        assert response.status == 200
+        data = json.loads(response.body)
+        assert data["frame_count"] == 50
+        assert len(data["frames"]["latitude"]) == 50
+
+    async def test_playback_rejects_too_many_frames(self, api_server):
+        """Test playback refuses unbounded payloads."""
+        request = make_mocked_request(
+            "GET",
+            "/api/playback?device_id=device_tracker.iphone&start=2025-01-01T00:00:00Z&end=2025-01-31T00:00:00Z&step=1"
+        )
+        response = await api_server.get_playback(request)
+        assert response.status == 400
+
+    async def test_export_endpoint(self, api_server, mock_influxdb_client):
+        """Test export streams every requested device."""
+        def iter_locations(device_id, start_time, end_time):
+            yield {
+                "time": "2025-01-27T10:00:00+00:00", "device_id": device_id,
+                "latitude": 54.8985, "longitude": 23.9036, "zone_name": "home",
+            }
+        mock_influxdb_client.iter_locations = Mock(side_effect=iter_locations)
+
+        server = TestServer(api_server.app)
+        await server.start_server()
+        try:
+            async with ClientSession() as session:
+                url = server.make_url(
+                    "/api/export?format=csv&device_id=device_tracker.iphone,device_tracker.ipad"
+                    "&start=2025-01-27T00:00:00Z&end=2025-01-28T00:00:00Z"
+                )
+                async with session.get(url) as response:
+                    assert response.status == 200
+                    assert "attachment" in response.headers["Content-Disposition"]
+                    lines = (await response.text()).strip().splitlines()
+        finally:
+            await server.close()
+
+        assert len(lines) == 3
+        assert mock_influxdb_client.iter_locations.call_count == 2
+
+    async def test_export_invalid_format(self, api_server):
+        """Test unknown export formats are rejected."""
+        response = await api_server.export_locations(make_mocked_request("GET", "/api/export?format=kml"))
+        assert response.status == 400
+
+    async def test_import_endpoint(self, api_server, mock_influxdb_client):
+        """Test a multipart GPX upload is imported and caches are cleared."""
+        mock_influxdb_client.write_locations = Mock(side_effect=lambda rows: len(rows))
+        api_server.heatmap_cache.clear = Mock()
+        gpx = (
+            '<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+            '<trkpt lat="54.8985" lon="23.9036"><time>2025-01-27T10:00:00Z</time></trkpt>'
+            '</trkseg></trk></gpx>'
+        )
+        form = FormData()
+        form.add_field("file", gpx.encode(), filename="track.gpx")
+
+        server = TestServer(api_server.app)
+        await server.start_server()
+        try:
+            async with ClientSession() as session:
+                url = server.make_url("/api/import?device_id=device_tracker.iphone")
+                async with session.post(url, data=form) as response:
+                    assert response.status == 200
+                    summary = await response.json()
+                async with session.get(server.make_url("/api/import")) as response:
+                    status = (await response.json())["import"]
+        finally:
+            await server.close()
+
+        assert summary["imported"] == 1
+        assert status["state"] == "done"
+        api_server.heatmap_cache.clear.assert_called()
+        written = mock_influxdb_client.write_locations.call_args[0][0]
+        assert written[0]["device_id"] == "device_tracker.iphone"
+
+    async def test_import_requires_format(self, api_server):
+        """Test a raw upload without a format is rejected."""
+        server = TestServer(api_server.app)
+        await server.start_server()
+        try:
+            async with ClientSession() as session:
+                async with session.post(server.make_url("/api/import"), data=b"lat,lon") as response:
+                    assert response.status == 400
+        finally:
+            await server.close()
+
+    async def test_backfill_endpoint(self, api_server):
+        """Test backfill runs for the requested devices and clears caches."""
+        api_server.backfiller.run = Mock(return_value={"state": "done", "written": 3})
+        api_server.places_cache.clear = Mock()
+
+        request = make_mocked_request("POST", "/api/backfill?days=2&device_id=device_tracker.iphone")
+        response = await api_server.start_backfill(request)
+
+        assert response.status == 200
+        assert json.loads(response.body)["written"] == 3
+        devices = api_server.backfiller.run.call_args[0][0]
+        assert [d["entity_id"] for d in devices] == ["device_tracker.iphone"]
+        assert api_server.backfiller.run.call_args[1]["days"] == 2
+        api_server.places_cache.clear.assert_called_once()
+
+    async def test_backfill_already_running(self, api_server):
+        """Test a concurrent backfill is refused."""
+        api_server.backfiller.run = Mock(return_value=None)
+        response = await api_server.start_backfill(
+            make_mocked_request("POST", "/api/backfill?device_id=device_tracker.iphone")
+        )
+        assert response.status == 409
+
+    async def test_backfill_invalid_days(self, api_server):
+        """Test out-of-range days are rejected."""
+        response = await api_server.start_backfill(make_mocked_request("POST", "/api/backfill?days=0"))
+        assert response.status == 400
+
+    async def test_transitions_endpoint(self, api_server, mock_influxdb_client):
+        """Test transitions endpoint passes filters to the indexed query."""
+        mock_influxdb_client.query_transitions = Mock(return_value=[
+            {"device_id": "device_tracker.iphone", "zone_name": "home", "event": "exit"},
+        ])
+
+        request = make_mocked_request("GET", "/api/transitions?zone=home&event=exit&limit=1")
+        response = await api_server.get_transitions(request)
+
+        assert response.status == 200
+        assert json.loads(response.body)["transitions"][0]["event"] == "exit"
+        kwargs = mock_influxdb_client.query_transitions.call_args[1]
+        assert (kwargs["zone_name"], kwargs["event"], kwargs["limit"]) == ("home", "exit", 1)
+
+        bad = await api_server.get_transitions(make_mocked_request("GET", "/api/transitions?event=left"))
+        assert bad.status == 400
+
+    async def test_transitions_are_streamed(self, mock_ha_client, mock_influxdb_client):
+        """Test committed transitions are published to stream subscribers."""
+        tracker = Mock()
+        api = LocationHistoryAPI(
+            mock_ha_client, mock_influxdb_client, port=8090, transition_tracker=tracker
+        )
+        subscription = api.broadcaster.subscribe()
+        listener = tracker.add_listener.call_args[0][0]
+        listener("device_tracker.iphone", {
+            "event": "enter", "zone_name": "home", "time": datetime(2025, 1, 27, 8, 0),
+            "latitude": 54.8985, "longitude": 23.9036, "dwell_seconds": None,
+        })
+
+        event = subscription.queue.get_nowait()
+        assert event["type"] == "transition"
+        assert event["time"] == "2025-01-27T08:00:00"
+
+    async def test_device_changes_are_streamed(self, api_server):
+        """Test device preference changes reach stream subscribers filtered by device."""
+        subscription = api_server.broadcaster.subscribe(["device_tracker.iphone"])
+
+        api_server.publish_device_change(
+            {"event": "added", "entity_id": "device_tracker.iphone", "interval_minutes": 5}
+        )
+        api_server.publish_device_change(
+            {"event": "added", "entity_id": "device_tracker.ipad", "interval_minutes": 5}
+        )
+
+        event = subscription.queue.get_nowait()
+        assert event["type"] == "device"
+        assert event["event"] == "added"
+        assert event["device_id"] == "device_tracker.iphone"
+        assert subscription.queue.empty()
+
+    async def test_reclassify_status_endpoint(self, mock_ha_client, mock_influxdb_client):
+        """Test reclassify status is reported and rewrites clear caches."""
+        reclassifier = Mock()
+        reclassifier.stats = Mock(return_value={"state": "idle", "job": None})
+        api = LocationHistoryAPI(
+            mock_ha_client, mock_influxdb_client, port=8090, reclassifier=reclassifier
+        )
+
+        response = await api.get_reclassify_status(make_mocked_request("GET", "/api/reclassify"))
+
+        assert response.status == 200
+        assert json.loads(response.body)["reclassify"]["state"] == "idle"
+        reclassifier.add_listener.assert_called_once_with(api.invalidate_caches)
+
+    async def test_scheduler_status_endpoint(self, mock_ha_client, mock_influxdb_client):
+        """Test the polling schedule is reported per device."""
+        scheduler = Mock()
+        scheduler.stats = Mock(return_value={"device_tracker.iphone": {"consecutive_failures": 2}})
+        api = LocationHistoryAPI(mock_ha_client, mock_influxdb_client, port=8090, scheduler=scheduler)
+
+        response = await api.get_scheduler_status(make_mocked_request("GET", "/api/scheduler"))
+
+        assert response.status == 200
+        body = json.loads(response.body)
+        assert body["devices"]["device_tracker.iphone"]["consecutive_failures"] == 2
+
+    async def test_visits_endpoint(self, api_server, mock_influxdb_client):
+        """Test visits endpoint runs stay-point detection over stored fixes."""
+        mock_influxdb_client.query_columns = Mock(return_value={
+            "time": [1737972000.0, 1737972600.0, 1737973200.0],
+            "device_id": ["device_tracker.iphone"] * 3,
+            "zone_name": ["home"] * 3,
+            "latitude": [54.8985, 54.8985, 54.8986],
+            "longitude": [23.9036, 23.9036, 23.9036],
+        })
+
+        request = make_mocked_request(
+            "GET",
+            "/api/visits?device_id=device_tracker.iphone&start=2025-01-27T00:00:00Z&end=2025-01-27T23:59:59Z"
+        )
+        response = await api_server.get_visits(request)
+        assert response.status == 200
+        visits = json.loads(response.body)["visits"]
+        assert len(visits) == 1
+        assert visits[0]["zone_name"] == "home"
+        assert visits[0]["duration_seconds"] == 1200
+
+    async def test_visits_without_tracker_query_influx(self, mock_ha_client, mock_influxdb_client, tmp_path):
+        """Test a server that doesn't track visits (api_server) reads recent ranges from InfluxDB."""
+        api = LocationHistoryAPI(
+            mock_ha_client, mock_influxdb_client, port=8090,
+            geocoder=Geocoder(cache_path=str(tmp_path / "geocode.sqlite")), track_visits=False
+        )
+        mock_influxdb_client.query_columns = Mock(return_value={
+            "time": [], "device_id": [], "zone_name": [], "latitude": [], "longitude": [],
+        })
+        start = datetime.utcnow().isoformat()
+
+        request = make_mocked_request("GET", f"/api/visits?device_id=device_tracker.iphone&start={start}")
+        response = await api.get_visits(request)
+
+        assert response.status == 200
+        assert api.visit_tracker is None
+        mock_influxdb_client.query_columns.assert_called_once()
+        api.invalidate_caches()
+
+    async def test_visits_requires_device(self, api_server):
+        """Test visits endpoint requires device_id."""
+        request = make_mocked_request("GET", "/api/visits")
+        response = await api_server.get_visits(request)
+        assert response.status == 400
+
+    async def test_trips_endpoint(self, api_server, mock_influxdb_client):
+        """Test trips endpoint serves stored trips."""
+        mock_influxdb_client.query_trips = Mock(return_value=[
+            {"device_id": "device_tracker.iphone", "distance_m": 91000.0},
+        ])
+
+        request = make_mocked_request("GET", "/api/trips?device_id=device_tracker.iphone")
+        response = await api_server.get_trips(request)
+        assert response.status == 200
+        assert len(json.loads(response.body)["trips"]) == 1
+        mock_influxdb_client.query_locations.assert_not_called()
@@ -0,0 +1,61 @@
+"""Unit tests for aggregates module."""
+
+import pytest
+from datetime import datetime, timedelta
+from find_my_history.aggregates import flux_duration, parse_every, plan_resolution
+
+
+class TestParseEvery:
+    """Test bucket size parsing."""
+
+    @pytest.mark.parametrize("value,seconds", [
+        ("5m", 300), ("1h", 3600), ("2d", 172800), ("90", 90), (600, 600), ("30s", 30),
+    ])
+    def test_valid(self, value, seconds):
+        """Test durations with and without units."""
+        assert parse_every(value) == seconds
+
+    @pytest.mark.parametrize("value", ["", "5x", "-5m", "0", "m"])
+    def test_invalid(self, value):
+        """Test bad durations are rejected."""
+        with pytest.raises(ValueError):
+            parse_every(value)
+
+
+class TestFluxDuration:
+    """Test Flux duration formatting."""
+
+    def test_largest_whole_unit(self):
+        """Test seconds are formatted with the largest exact unit."""
+        assert flux_duration(86400) == "1d"
+        assert flux_duration(10800) == "3h"
+        assert flux_duration(300) == "5m"
+        assert flux_duration(90) == "90s"
+
+
+class TestPlanResolution:
+    """Test the resolution planner."""
+
+    END = datetime(2025, 1, 31)
+
+    def test_short_range_is_raw(self):
+        """Test ranges that fit at full polling density stay raw."""
+        assert plan_resolution(self.END - timedelta(days=1), self.END, max_points=10000) is None
+
+    def test_month_fits_budget(self):
+        """Test 30 days at 10k points picks 5 minute buckets."""
+        step = plan_resolution(self.END - timedelta(days=30), self.END, max_points=10000)
+        assert step == 300
+        assert 30 * 86400 / step <= 10000
+
+    def test_devices_share_budget(self):
+        """Test the budget is split between devices."""
+        single = plan_resolution(self.END - timedelta(days=30), self.END, max_points=10000)
+        several = plan_resolution(self.END - timedelta(days=30), self.END, max_points=10000, devices=4)
+        assert several > single
+
+    def test_beyond_ladder(self):
+        """Test very long ranges grow in whole days."""
+        step = plan_resolution(self.END - timedelta(days=3650), self.END, max_points=100)
+        assert step % 86400 == 0
+        assert 3650 * 86400 / step <= 100
@@ -0,0 +1,140 @@
+"""Unit tests for backfill module."""
+
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from find_my_history.backfill import Backfiller, history_points, split_window
+from find_my_history.ha_client import HomeAssistantClient
+from find_my_history.zone_detector import ZoneDetector
+
+
+END = datetime(2025, 1, 27, 12, 0, tzinfo=timezone.utc)
+
+
+def state(minutes_before_end, latitude=54.8985, longitude=23.9036):
+    stamp = (END - timedelta(minutes=minutes_before_end)).isoformat()
+    return {
+        "entity_id": "device_tracker.iphone",
+        "state": "not_home",
+        "attributes": {
+            "latitude": latitude, "longitude": longitude,
+            "gps_accuracy": 10, "friendly_name": "iPhone", "battery_level": 80,
+        },
+        "last_changed": stamp,
+        "last_updated": stamp,
+    }
+
+
+@pytest.fixture
+def ha_stand_in():
+    """Local HTTP server answering /api/history/period like HA's recorder."""
+    history = [state(m) for m in range(600, 0, -10)]
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            start = datetime.fromisoformat(url.path.rsplit("/", 1)[1])
+            end = datetime.fromisoformat(query["end_time"][0])
+            requests.append((start, end))
+            # Like HA: the state current at start, then changes within the period
+            before = [s for s in history if datetime.fromisoformat(s["last_updated"]) <= start]
+            inside = [
+                s for s in history
+                if start < datetime.fromisoformat(s["last_updated"]) < end
+            ]
+            body = json.dumps([before[-1:] + inside]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_history_points_skips_states_without_location():
+    """Test recorder states become rows with their recorded time."""
+    rows = history_points("device_tracker.iphone", [state(5), {"attributes": {}, "last_updated": END.isoformat()}])
+    assert len(rows) == 1
+    assert rows[0]["time"] == (END - timedelta(minutes=5)).timestamp()
+    assert rows[0]["accuracy"] == 10
+
+
+def test_split_window():
+    """Test long gaps are fetched in bounded windows."""
+    windows = split_window(END - timedelta(hours=30), END)
+    assert len(windows) == 2
+    assert windows[0][1] == windows[1][0]
+
+
+class TestBackfiller:
+    """Test Backfiller against a local HA stand-in."""
+
+    def test_backfills_only_gaps(self, ha_stand_in):
+        """Test only gap windows are fetched and only points inside gaps written."""
+        url, requests = ha_stand_in
+        influx = Mock()
+        gaps = [
+            (END - timedelta(hours=5), END - timedelta(hours=4)),
+            (END - timedelta(minutes=35), END),
+        ]
+        influx.find_gaps = Mock(return_value=gaps)
+        influx.write_locations = Mock(side_effect=lambda rows: len(rows))
+        zones = [{"name": "Home", "latitude": 54.8985, "longitude": 23.9036, "radius": 100}]
+
+        backfiller = Backfiller(
+            HomeAssistantClient(url, "token"), influx, ZoneDetector(zones), batch_size=4
+        )
+        summary = backfiller.run(
+            [{"entity_id": "device_tracker.iphone", "interval_minutes": 5}], days=1, end_time=END
+        )
+
+        assert sorted(requests) == sorted(gaps)
+        assert influx.find_gaps.call_args[0][3] == 600
+        # 5 fixes strictly inside the first gap, 3 inside the second
+        assert summary["fetched"] == 8
+        assert summary["written"] == 8
+        assert summary["failed_windows"] == 0
+        assert influx.write_locations.call_count == 2
+        written = [row for call in influx.write_locations.call_args_list for row in call[0][0]]
+        assert all(row["zone_name"] == "Home" and row["in_zone"] for row in written)
+        assert backfiller.status["state"] == "done"
+
+    def test_failed_window_is_counted(self):
+        """Test an unreachable recorder doesn't abort the backfill."""
+        ha_client = Mock()
+        ha_client.get_history = Mock(return_value=None)
+        influx = Mock()
+        influx.find_gaps = Mock(return_value=[(END - timedelta(hours=1), END)])
+
+        summary = Backfiller(ha_client, influx).run(
+            [{"entity_id": "device_tracker.iphone"}], days=1, end_time=END
+        )
+
+        assert summary["failed_windows"] == 1
+        assert summary["written"] == 0
+        influx.write_locations.assert_not_called()
+
+    def test_single_run_at_a_time(self):
+        """Test a second backfill while one runs is refused."""
+        backfiller = Backfiller(Mock(), Mock())
+        backfiller._lock.acquire()
+        try:
+            assert backfiller.run([{"entity_id": "device_tracker.iphone"}]) is None
+        finally:
+            backfiller._lock.release()
@@ -0,0 +1,82 @@
+"""Unit tests for broadcaster module."""
+
+import asyncio
+from datetime import datetime
+from find_my_history.broadcaster import Broadcaster
+
+
+FIX = {"latitude": 54.8985, "longitude": 23.9036, "zone_name": "home", "in_zone": True}
+
+
+class TestBroadcaster:
+    """Test live event fan-out."""
+
+    async def test_fan_out(self):
+        """Test every subscriber receives a published fix."""
+        broadcaster = Broadcaster()
+        first = broadcaster.subscribe()
+        second = broadcaster.subscribe()
+
+        broadcaster.on_write("device_tracker.iphone", datetime(2025, 1, 27, 10, 0), FIX)
+
+        for subscription in (first, second):
+            event = subscription.queue.get_nowait()
+            assert event["type"] == "location"
+            assert event["device_id"] == "device_tracker.iphone"
+            assert event["time"] == "2025-01-27T10:00:00+00:00"
+
+    async def test_device_filter(self):
+        """Test subscribers only get their devices."""
+        broadcaster = Broadcaster()
+        subscription = broadcaster.subscribe(["device_tracker.ipad"])
+
+        broadcaster.on_write("device_tracker.iphone", datetime(2025, 1, 27, 10, 0), FIX)
+        broadcaster.on_write("device_tracker.ipad", datetime(2025, 1, 27, 10, 0), FIX)
+
+        assert subscription.queue.qsize() == 1
+        assert subscription.queue.get_nowait()["device_id"] == "device_tracker.ipad"
+
+    async def test_zone_change_event(self):
+        """Test a zone change publishes a zone event after the fix."""
+        broadcaster = Broadcaster()
+        subscription = broadcaster.subscribe()
+
+        broadcaster.on_write("d", datetime(2025, 1, 27, 10, 0), FIX)
+        broadcaster.on_write("d", datetime(2025, 1, 27, 10, 5), dict(FIX, zone_name="unknown"))
+
+        events = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        assert [e["type"] for e in events] == ["location", "location", "zone"]
+        assert events[2]["from_zone"] == "home"
+        assert events[2]["to_zone"] == "unknown"
+
+    async def test_slow_consumer_dropped(self):
+        """Test a subscriber whose queue fills up is dropped."""
+        broadcaster = Broadcaster(max_queue=2)
+        slow = broadcaster.subscribe()
+        fast = broadcaster.subscribe()
+
+        for minute in range(3):
+            broadcaster.on_write("d", datetime(2025, 1, 27, 10, minute), FIX)
+            while not fast.queue.empty():
+                fast.queue.get_nowait()
+
+        assert slow.dropped
+        assert not fast.dropped
+        events = [slow.queue.get_nowait() for _ in range(slow.queue.qsize())]
+        assert events[-1]["type"] == "dropped"
+        assert broadcaster.stats()["subscribers"] == 1
+
+    async def test_publish_from_another_thread(self):
+        """Test fixes written on another thread are delivered on the loop."""
+        broadcaster = Broadcaster()
+        subscription = broadcaster.subscribe()
+
+        await asyncio.get_running_loop().run_in_executor(
+            None, broadcaster.on_write, "d", datetime(2025, 1, 27, 10, 0), FIX
+        )
+        event = await asyncio.wait_for(subscription.queue.get(), 1)
+        assert event["device_id"] == "d"
+
+    def test_publish_without_subscribers(self):
+        """Test publishing before anyone subscribed is a no-op."""
+        Broadcaster().on_write("d", datetime(2025, 1, 27, 10, 0), FIX)
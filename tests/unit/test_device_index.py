@@ -0,0 +1,62 @@
+"""Unit tests for device_index module."""
+
+from datetime import datetime, timedelta, timezone
+from find_my_history.device_index import LastKnownIndex
+
+
+class TestLastKnownIndex:
+    """Test LastKnownIndex class."""
+
+    def test_update_and_get(self, sample_location_data):
+        """Test a written fix is indexed."""
+        index = LastKnownIndex()
+        now = datetime(2025, 1, 27, 10, 0, 0)
+        index.update("device_tracker.iphone", now, dict(sample_location_data, in_zone=True, zone_name="home"))
+
+        entry = index.get("device_tracker.iphone")
+        assert entry["latitude"] == 54.8985
+        assert entry["zone_name"] == "home"
+        assert entry["battery_level"] == 85
+        assert entry["time"] == "2025-01-27T10:00:00+00:00"
+
+    def test_time_is_reported_in_utc(self, sample_location_data):
+        """Test aware fixes in other zones are reported as UTC with an offset."""
+        index = LastKnownIndex()
+        local = datetime(2025, 1, 27, 12, 0, 0, tzinfo=timezone(timedelta(hours=2)))
+        index.update("device_tracker.iphone", local, sample_location_data)
+
+        assert index.get("device_tracker.iphone")["time"] == "2025-01-27T10:00:00+00:00"
+
+    def test_older_fix_ignored(self, sample_location_data):
+        """Test an older fix does not replace a newer one."""
+        index = LastKnownIndex()
+        now = datetime(2025, 1, 27, 10, 0, 0)
+        index.update("device_tracker.iphone", now, sample_location_data)
+        changed = index.update(
+            "device_tracker.iphone", now - timedelta(minutes=5),
+            dict(sample_location_data, latitude=1.0)
+        )
+
+        assert changed is False
+        assert index.get("device_tracker.iphone")["latitude"] == 54.8985
+
+    def test_seed_does_not_override_newer(self, sample_location_data):
+        """Test seeding keeps entries written after startup."""
+        index = LastKnownIndex()
+        now = datetime(2025, 1, 27, 10, 0, 0)
+        index.update("device_tracker.iphone", now, sample_location_data)
+
+        seeded = index.seed([
+            dict(sample_location_data, device_id="device_tracker.iphone",
+                 time=now - timedelta(hours=1), latitude=1.0),
+            dict(sample_location_data, device_id="device_tracker.ipad",
+                 time=now - timedelta(hours=1)),
+        ])
+
+        assert seeded == 1
+        assert len(index) == 2
+        assert index.get("device_tracker.iphone")["latitude"] == 54.8985
+
+    def test_get_unknown_device(self):
+        """Test unknown devices return None."""
+        assert LastKnownIndex().get("device_tracker.unknown") is None
@@ -4,7 +4,10 @@ import pytest
 import json
 import os
 import tempfile
+import threading
+import time
 from pathlib import Path
+from unittest.mock import Mock, patch
 from find_my_history.device_prefs import DevicePreferences, get_device_prefs, DEFAULT_PREFS_PATH
 
 
@@ -141,6 +144,7 @@ class TestDevicePreferences:
             # Create first instance and add device
             prefs1 = DevicePreferences(prefs_path)
             prefs1.add_device("device_tracker.iphone", interval_minutes=10)
+            prefs1.flush()
             
             # Create second instance and verify
             prefs2 = DevicePreferences(prefs_path)
@@ -155,6 +159,7 @@ class TestDevicePreferences:
             
             # Add device
             prefs.add_device("device_tracker.iphone")
+            prefs.flush()
             
             # Manually modify file
             with open(prefs_path, 'r') as f:
@@ -181,6 +186,200 @@ class TestDevicePreferences:
             prefs = DevicePreferences(prefs_path)
             assert prefs.get_tracked_devices() == []
 
+    def test_writes_are_delayed_and_coalesced(self):
+        """Test that a burst of changes is written once, after the delay."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=60)
+
+            with patch("find_my_history.device_prefs.atomic_write_json") as write:
+                prefs.add_device("device_tracker.iphone", interval_minutes=5)
+                prefs.add_device("device_tracker.ipad", interval_minutes=5)
+                prefs.set_interval("device_tracker.iphone", 15)
+                assert write.call_count == 0
+
+                assert prefs.flush() is True
+                assert write.call_count == 1
+                data = write.call_args[0][1]
+                assert data["tracked_devices"] == ["device_tracker.iphone", "device_tracker.ipad"]
+                assert data["device_intervals"]["device_tracker.iphone"] == 15
+
+                # Nothing pending, nothing written
+                assert prefs.flush() is False
+                assert write.call_count == 1
+
+    def test_timer_writes_pending_changes(self):
+        """Test that pending changes reach the disk without an explicit flush."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=0.05)
+
+            prefs.add_device("device_tracker.iphone")
+            deadline = time.monotonic() + 5
+            while not os.path.exists(prefs_path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            with open(prefs_path) as f:
+                assert json.load(f)["tracked_devices"] == ["device_tracker.iphone"]
+
+    def test_batch_writes_once(self):
+        """Test that a batch of changes costs a single write when it exits."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=0)
+
+            with patch("find_my_history.device_prefs.atomic_write_json") as write:
+                with prefs.batch():
+                    for i in range(20):
+                        prefs.add_device(f"device_tracker.phone_{i}")
+                    with prefs.batch():
+                        prefs.set_interval("device_tracker.phone_0", 30)
+                    assert write.call_count == 0
+                assert write.call_count == 1
+
+            assert len(prefs.get_tracked_devices()) == 20
+
+    def test_zero_delay_writes_immediately(self):
+        """Test that save_delay=0 writes on every change."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=0)
+
+            prefs.add_device("device_tracker.iphone", interval_minutes=10)
+
+            assert DevicePreferences(prefs_path).get_interval("device_tracker.iphone") == 10
+
+    def test_unchanged_interval_is_not_written(self):
+        """Test that setting the same interval doesn't mark prefs dirty."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=60)
+            prefs.add_device("device_tracker.iphone", interval_minutes=5)
+            prefs.flush()
+
+            prefs.set_interval("device_tracker.iphone", 5)
+            assert prefs.flush() is False
+
+    def test_failed_write_keeps_previous_file(self):
+        """Test that a failed save leaves the old file intact and stays pending."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=60)
+            prefs.add_device("device_tracker.iphone")
+            prefs.flush()
+
+            prefs.add_device("device_tracker.ipad")
+            with patch("find_my_history.persistence.json.dump", side_effect=OSError("disk full")):
+                assert prefs.flush() is False
+
+            with open(prefs_path) as f:
+                assert json.load(f)["tracked_devices"] == ["device_tracker.iphone"]
+            assert os.listdir(tmpdir) == ["prefs.json"]
+
+            # Still pending, so the next flush retries
+            assert prefs.flush() is True
+            assert DevicePreferences(prefs_path).is_tracked("device_tracker.ipad")
+
+    def test_listeners_receive_change_events(self):
+        """Test add, interval change and removal are published to listeners."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs = DevicePreferences(os.path.join(tmpdir, "prefs.json"), save_delay=60)
+            events = []
+            prefs.add_listener(events.append)
+
+            prefs.add_device("device_tracker.iphone", interval_minutes=5)
+            prefs.add_device("device_tracker.iphone", interval_minutes=5)  # no-op
+            prefs.set_interval("device_tracker.iphone", 10)
+            prefs.set_interval("device_tracker.iphone", 10)  # unchanged
+            prefs.set_interval("device_tracker.ipad", 10)  # not tracked
+            prefs.remove_device("device_tracker.iphone")
+
+            assert events == [
+                {"event": "added", "entity_id": "device_tracker.iphone", "interval_minutes": 5},
+                {"event": "interval", "entity_id": "device_tracker.iphone", "interval_minutes": 10},
+                {"event": "removed", "entity_id": "device_tracker.iphone", "interval_minutes": 10},
+            ]
+
+            prefs.remove_listener(events.append)
+            prefs.add_device("device_tracker.ipad")
+            assert len(events) == 3
+
+    def test_failing_listener_does_not_block_others(self):
+        """Test a listener raising doesn't stop the change or other listeners."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs = DevicePreferences(os.path.join(tmpdir, "prefs.json"), save_delay=60)
+            events = []
+            prefs.add_listener(Mock(side_effect=RuntimeError("boom")))
+            prefs.add_listener(events.append)
+
+            assert prefs.add_device("device_tracker.iphone") is True
+            assert len(events) == 1
+
+    def test_check_for_changes_reloads_external_edits(self):
+        """Test an edit by another process is detected and published as events."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=0)
+            prefs.add_device("device_tracker.iphone", interval_minutes=5)
+            prefs.add_device("device_tracker.ipad", interval_minutes=5)
+            events = []
+            prefs.add_listener(events.append)
+
+            # Our own write isn't reported
+            assert prefs.check_for_changes() is False
+
+            with open(prefs_path, "w") as f:
+                json.dump({
+                    "tracked_devices": ["device_tracker.iphone", "device_tracker.watch"],
+                    "device_intervals": {"device_tracker.iphone": 15, "device_tracker.watch": 5},
+                }, f)
+            # Make sure the mtime moves even on coarse-grained filesystems
+            stat = os.stat(prefs_path)
+            os.utime(prefs_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+            assert prefs.check_for_changes() is True
+            assert {(e["event"], e["entity_id"]) for e in events} == {
+                ("removed", "device_tracker.ipad"),
+                ("added", "device_tracker.watch"),
+                ("interval", "device_tracker.iphone"),
+            }
+            assert prefs.is_tracked("device_tracker.watch")
+            assert not prefs.is_tracked("device_tracker.ipad")
+            assert prefs.check_for_changes() is False
+
+    def test_deleted_file_keeps_preferences(self):
+        """Test a deleted file doesn't untrack everything."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=0)
+            prefs.add_device("device_tracker.iphone")
+
+            os.remove(prefs_path)
+
+            assert prefs.check_for_changes() is False
+            assert prefs.is_tracked("device_tracker.iphone")
+
+    def test_watcher_thread_picks_up_edits(self):
+        """Test start_watching reloads the file in the background."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefs_path = os.path.join(tmpdir, "prefs.json")
+            prefs = DevicePreferences(prefs_path, save_delay=0)
+            prefs.add_device("device_tracker.iphone")
+            added = threading.Event()
+            prefs.add_listener(lambda event: event["event"] == "added" and added.set())
+
+            prefs.start_watching(interval=0.02)
+            try:
+                with open(prefs_path, "w") as f:
+                    json.dump({"tracked_devices": ["device_tracker.iphone", "device_tracker.ipad"],
+                               "device_intervals": {}}, f)
+                stat = os.stat(prefs_path)
+                os.utime(prefs_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+                assert added.wait(5)
+            finally:
+                prefs.stop_watching()
+            assert prefs.is_tracked("device_tracker.ipad")
+
     def test_get_device_prefs_singleton(self):
         """Test get_device_prefs returns singleton instance."""
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -0,0 +1,84 @@
+"""Unit tests for export module."""
+
+import csv
+import gzip
+import io
+import json
+import pytest
+import xml.etree.ElementTree as ET
+from find_my_history.export import export_chunks
+
+
+ROWS = [
+    {
+        "time": "2025-01-27T10:00:00+00:00", "device_id": "device_tracker.iphone",
+        "device_name": "iPhone", "latitude": 54.8985, "longitude": 23.9036,
+        "altitude": 80.0, "battery_level": 85, "in_zone": True, "zone_name": "home",
+    },
+    {
+        "time": "2025-01-27T10:05:00+00:00", "device_id": "device_tracker.iphone",
+        "device_name": "iPhone", "latitude": 54.9, "longitude": 23.91,
+        "altitude": None, "battery_level": 84, "in_zone": False, "zone_name": "unknown",
+    },
+]
+
+
+def render(fmt, tracks, compress=False):
+    return b"".join(export_chunks(fmt, tracks, compress=compress))
+
+
+class TestExport:
+    """Test export formats."""
+
+    def test_gpx(self):
+        """Test GPX has one track per device with its points."""
+        data = render("gpx", [("device_tracker.iphone", iter(ROWS)), ("device_tracker.ipad", iter([]))])
+        ns = {"gpx": "http://www.topografix.com/GPX/1/1"}
+        root = ET.fromstring(data)
+        tracks = root.findall("gpx:trk", ns)
+        assert len(tracks) == 1
+        assert tracks[0].find("gpx:name", ns).text == "iPhone"
+        points = tracks[0].findall("gpx:trkseg/gpx:trkpt", ns)
+        assert [p.get("lat") for p in points] == ["54.8985", "54.9"]
+        assert points[0].find("gpx:ele", ns).text == "80.0"
+
+    def test_geojson(self):
+        """Test GeoJSON is a valid FeatureCollection of points."""
+        data = json.loads(render("geojson", [("device_tracker.iphone", iter(ROWS))]))
+        assert data["type"] == "FeatureCollection"
+        assert data["features"][0]["geometry"]["coordinates"] == [23.9036, 54.8985, 80.0]
+        assert data["features"][1]["properties"]["zone_name"] == "unknown"
+
+    def test_geojson_empty(self):
+        """Test an export without points is still valid JSON."""
+        assert json.loads(render("geojson", []))["features"] == []
+
+    def test_csv(self):
+        """Test CSV has a header and one row per fix."""
+        rows = list(csv.DictReader(io.StringIO(render("csv", [("d", iter(ROWS))]).decode())))
+        assert len(rows) == 2
+        assert rows[0]["battery_level"] == "85"
+        assert rows[1]["altitude"] == ""
+
+    def test_gzip(self):
+        """Test gzip output decompresses to the plain export."""
+        plain = render("csv", [("d", iter(ROWS))])
+        assert gzip.decompress(render("csv", [("d", iter(ROWS))], compress=True)) == plain
+
+    def test_streams_lazily(self):
+        """Test rows are consumed as chunks are produced, not up front."""
+        consumed = []
+
+        def rows():
+            for i in range(100000):
+                consumed.append(i)
+                yield dict(ROWS[0], latitude=54 + i * 1e-6)
+
+        chunks = export_chunks("csv", [("d", rows())])
+        next(chunks)
+        assert len(consumed) < 100000
+
+    def test_unknown_format(self):
+        """Test unknown formats are rejected."""
+        with pytest.raises(ValueError):
+            render("kml", [])
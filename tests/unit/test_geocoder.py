@@ -0,0 +1,170 @@
+"""Unit tests for geocoder module."""
+
+import asyncio
+import threading
+import time
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from find_my_history.geocoder import Geocoder, format_place
+
+
+NOMINATIM_RESPONSE = {
+    "name": "",
+    "address": {"road": "Laisvės al.", "house_number": "10", "city": "Kaunas"},
+}
+
+
+@pytest.fixture
+async def upstream():
+    """Local stand-in for Nominatim and Overpass that counts requests."""
+    calls = {"reverse": 0, "overpass": 0}
+
+    async def reverse(request):
+        calls["reverse"] += 1
+        await asyncio.sleep(0.05)
+        return web.json_response(NOMINATIM_RESPONSE)
+
+    async def overpass(request):
+        calls["overpass"] += 1
+        return web.json_response({"elements": [{"tags": {"name": "Coffee Inn"}}]})
+
+    async def broken(request):
+        return web.Response(status=503)
+
+    app = web.Application()
+    app.router.add_get("/reverse", reverse)
+    app.router.add_post("/interpreter", overpass)
+    app.router.add_get("/broken", broken)
+    server = TestServer(app)
+    await server.start_server()
+    server.calls = calls
+    yield server
+    await server.close()
+
+
+def make_geocoder(upstream, tmp_path, **kwargs):
+    """Geocoder pointed at the stand-in server."""
+    kwargs.setdefault("min_interval", 0)
+    kwargs.setdefault("overpass_url", None)
+    return Geocoder(
+        cache_path=str(tmp_path / "geocode.sqlite"),
+        geocoder_url=str(upstream.make_url("/reverse")),
+        **kwargs
+    )
+
+
+class TestFormatPlace:
+    """Test display name formatting."""
+
+    def test_street_address(self):
+        """Test street and house number are combined."""
+        place = format_place(NOMINATIM_RESPONSE, None, 54.9, 23.9)
+        assert place == {"primary": "Laisvės al. 10", "secondary": "Kaunas"}
+
+    def test_poi_wins(self):
+        """Test a nearby POI becomes the primary line."""
+        place = format_place(NOMINATIM_RESPONSE, "Coffee Inn", 54.9, 23.9)
+        assert place == {"primary": "Coffee Inn", "secondary": "Laisvės al. 10"}
+
+    def test_nothing_known(self):
+        """Test coordinates are shown when nothing is known."""
+        place = format_place({}, None, 54.9, 23.9)
+        assert place == {"primary": "Unknown", "secondary": "54.9000, 23.9000"}
+
+
+class TestGeocoder:
+    """Test the caching, coalescing, rate-limited geocoder."""
+
+    async def test_lookup_is_cached(self, upstream, tmp_path):
+        """Test a second lookup nearby is answered from cache."""
+        geocoder = make_geocoder(upstream, tmp_path)
+        first = await geocoder.lookup(54.89851, 23.90361)
+        second = await geocoder.lookup(54.89849, 23.90359)
+        await geocoder.close()
+
+        assert first["primary"] == "Laisvės al. 10"
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert upstream.calls["reverse"] == 1
+
+    async def test_concurrent_lookups_are_coalesced(self, upstream, tmp_path):
+        """Test simultaneous lookups of one spot share an upstream request."""
+        geocoder = make_geocoder(upstream, tmp_path)
+        places = await asyncio.gather(*[geocoder.lookup(54.8985, 23.9036) for _ in range(5)])
+        await geocoder.close()
+
+        assert all(p["primary"] == "Laisvės al. 10" for p in places)
+        assert upstream.calls["reverse"] == 1
+
+    async def test_cache_access_runs_off_the_event_loop(self, upstream, tmp_path):
+        """Test SQLite reads and writes happen in the executor, not on the loop thread."""
+        geocoder = make_geocoder(upstream, tmp_path)
+        threads = []
+        for name in ("get_cached", "_store"):
+            original = getattr(geocoder, name)
+
+            def spy(*args, _original=original, _name=name):
+                threads.append((_name, threading.current_thread()))
+                return _original(*args)
+
+            setattr(geocoder, name, spy)
+
+        await geocoder.lookup(54.8985, 23.9036)
+        await geocoder.lookup(54.8985, 23.9036)
+        await geocoder.close()
+
+        # lookup miss, worker re-check, store, then the cached second lookup
+        assert [name for name, _ in threads] == ["get_cached", "get_cached", "_store", "get_cached"]
+        assert all(thread is not threading.current_thread() for _, thread in threads)
+
+    async def test_cache_persists(self, upstream, tmp_path):
+        """Test cached places survive a restart."""
+        geocoder = make_geocoder(upstream, tmp_path)
+        await geocoder.lookup(54.8985, 23.9036)
+        await geocoder.close()
+
+        restarted = make_geocoder(upstream, tmp_path)
+        place = await restarted.lookup(54.8985, 23.9036)
+        await restarted.close()
+
+        assert place["cached"] is True
+        assert upstream.calls["reverse"] == 1
+
+    async def test_requests_are_rate_limited(self, upstream, tmp_path):
+        """Test upstream requests are spaced by min_interval."""
+        geocoder = make_geocoder(upstream, tmp_path, min_interval=0.3)
+        started = time.monotonic()
+        await asyncio.gather(
+            geocoder.lookup(54.8985, 23.9036),
+            geocoder.lookup(54.6872, 25.2797),
+            geocoder.lookup(54.9000, 23.9000),
+        )
+        elapsed = time.monotonic() - started
+        await geocoder.close()
+
+        assert upstream.calls["reverse"] == 3
+        assert elapsed >= 0.6
+
+    async def test_overpass_poi(self, upstream, tmp_path):
+        """Test a nearby POI from Overpass names the place."""
+        geocoder = make_geocoder(
+            upstream, tmp_path, overpass_url=str(upstream.make_url("/interpreter"))
+        )
+        place = await geocoder.lookup(54.8985, 23.9036)
+        await geocoder.close()
+
+        assert place["primary"] == "Coffee Inn"
+        assert upstream.calls["overpass"] == 1
+
+    async def test_upstream_failure_not_cached(self, upstream, tmp_path):
+        """Test failed lookups return None and are retried later."""
+        geocoder = Geocoder(
+            cache_path=str(tmp_path / "geocode.sqlite"),
+            geocoder_url=str(upstream.make_url("/broken")),
+            overpass_url=None,
+            min_interval=0
+        )
+        assert await geocoder.lookup(54.8985, 23.9036) is None
+        assert geocoder.stats()["entries"] == 0
+        await geocoder.close()
@@ -2,8 +2,10 @@
 
 import pytest
 import requests
+from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 from find_my_history.ha_client import HomeAssistantClient
+from find_my_history.metrics import HA_REQUEST_SECONDS
 
 
 class TestHomeAssistantClient:
@@ -52,6 +54,25 @@ class TestHomeAssistantClient:
         
         assert result is None
 
+    @patch('find_my_history.ha_client.requests.request')
+    def test_request_latency_is_recorded(self, mock_request):
+        """Test requests are timed under a short endpoint label and their status."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"state": "home"}
+        mock_request.return_value = mock_response
+        ok = HA_REQUEST_SECONDS.labels("/api/states", "200")
+        failed = HA_REQUEST_SECONDS.labels("/api/states", "error")
+        ok_before, failed_before = sum(ok.snapshot()[0]), sum(failed.snapshot()[0])
+
+        client = HomeAssistantClient("http://test-ha:8123", "test-token")
+        client.get_device_tracker_state("device_tracker.iphone")
+        mock_request.side_effect = requests.exceptions.RequestException("Connection error")
+        client.get_device_tracker_state("device_tracker.iphone")
+
+        assert sum(ok.snapshot()[0]) == ok_before + 1
+        assert sum(failed.snapshot()[0]) == failed_before + 1
+
     @patch('find_my_history.ha_client.requests.request')
     def test_get_all_device_trackers(self, mock_request):
         """Test getting all device trackers."""
@@ -173,3 +194,30 @@ class TestHomeAssistantClient:
         result = client.get_device_tracker_state("device_tracker.iphone")
         
         assert result is None
+
+    @patch('find_my_history.ha_client.requests.request')
+    def test_get_history(self, mock_request):
+        """Test recorder history is requested for one entity and unwrapped."""
+        mock_response = Mock()
+        mock_response.json.return_value = [[{"entity_id": "device_tracker.iphone", "state": "home"}]]
+        mock_response.raise_for_status = Mock()
+        mock_request.return_value = mock_response
+
+        client = HomeAssistantClient("http://test-ha:8123", "test-token")
+        result = client.get_history(
+            "device_tracker.iphone", datetime(2025, 1, 27), datetime(2025, 1, 28)
+        )
+
+        assert result == [{"entity_id": "device_tracker.iphone", "state": "home"}]
+        args, kwargs = mock_request.call_args
+        assert args[1] == "http://test-ha:8123/api/history/period/2025-01-27T00:00:00+00:00"
+        assert kwargs["params"]["filter_entity_id"] == "device_tracker.iphone"
+        assert kwargs["params"]["end_time"] == "2025-01-28T00:00:00+00:00"
+
+    @patch('find_my_history.ha_client.requests.request')
+    def test_get_history_error(self, mock_request):
+        """Test a failed history request is distinguishable from no history."""
+        mock_request.side_effect = requests.exceptions.RequestException("Connection error")
+
+        client = HomeAssistantClient("http://test-ha:8123", "test-token")
+        assert client.get_history("device_tracker.iphone", datetime(2025, 1, 27), datetime(2025, 1, 28)) is None
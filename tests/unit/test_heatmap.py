@@ -0,0 +1,79 @@
+"""Unit tests for heatmap module."""
+
+import numpy as np
+from find_my_history.heatmap import bin_heatmap, build_heatmap, dwell_times
+
+
+class TestDwellTimes:
+    """Test dwell time computation."""
+
+    def test_time_until_next_fix(self):
+        """Test each fix holds until the next one."""
+        dwell = dwell_times(np.array([0.0, 60.0, 180.0]), end_time=200.0)
+        assert dwell.tolist() == [60.0, 120.0, 20.0]
+
+    def test_gap_is_capped(self):
+        """Test long gaps are capped at max_gap."""
+        dwell = dwell_times(np.array([0.0, 10000.0]), end_time=10000.0, max_gap=1800)
+        assert dwell.tolist() == [1800.0, 0.0]
+
+    def test_device_boundaries(self):
+        """Test dwell does not run across devices."""
+        dwell = dwell_times(
+            np.array([0.0, 60.0, 0.0, 30.0]),
+            device_ids=["a", "a", "b", "b"],
+            end_time=100.0
+        )
+        assert dwell.tolist() == [60.0, 40.0, 30.0, 70.0]
+
+
+class TestBinHeatmap:
+    """Test heatmap binning."""
+
+    def test_weights_by_dwell_not_count(self):
+        """Test a cell with one long stay outweighs a cell with many short fixes."""
+        cells = bin_heatmap(
+            [54.8985, 54.8985, 54.8985, 54.6872],
+            [23.9036, 23.9036, 23.9036, 25.2797],
+            [10, 10, 10, 3600],
+            precision=7
+        )
+
+        assert len(cells) == 2
+        assert cells[0]["points"] == 1
+        assert cells[0]["dwell_seconds"] == 3600
+        assert cells[0]["weight"] == 1.0
+        assert cells[1]["points"] == 3
+
+    def test_geohash_encoding(self):
+        """Test cells are labelled with standard geohashes."""
+        cells = bin_heatmap([57.64911], [10.40744], [1], precision=9)
+        assert cells[0]["geohash"] == "u4pruydqq"
+
+    def test_precision_controls_cell_size(self):
+        """Test coarser precision merges nearby points."""
+        lat = [54.80, 54.81]
+        lon = [23.80, 23.81]
+        assert len(bin_heatmap(lat, lon, [1, 1], precision=7)) == 2
+        assert len(bin_heatmap(lat, lon, [1, 1], precision=4)) == 1
+
+    def test_empty(self):
+        """Test empty input."""
+        assert bin_heatmap([], [], [], precision=7) == []
+
+
+class TestBuildHeatmap:
+    """Test heatmap building from query columns."""
+
+    def test_build_heatmap(self):
+        """Test totals are reported."""
+        heatmap = build_heatmap({
+            "time": [0.0, 600.0],
+            "device_id": ["device_tracker.iphone"] * 2,
+            "latitude": [54.8985, 54.8985],
+            "longitude": [23.9036, 23.9036],
+        }, end_time=900.0)
+
+        assert heatmap["total_points"] == 2
+        assert heatmap["total_dwell_seconds"] == 900.0
+        assert len(heatmap["cells"]) == 1
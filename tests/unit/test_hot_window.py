@@ -0,0 +1,213 @@
+"""Unit tests for hot_window module."""
+
+from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta, timezone
+from find_my_history.hot_window import HotWindow
+from find_my_history.influxdb_client import InfluxDBLocationClient
+
+
+def _fix(lat=54.8985, lon=23.9036, **extra):
+    fix = {"device_name": "iPhone", "latitude": lat, "longitude": lon}
+    fix.update(extra)
+    return fix
+
+
+class TestHotWindow:
+    """Test HotWindow class."""
+
+    def test_query_inside_window(self):
+        """Test range inside the window is answered from memory."""
+        window = HotWindow(depth=10)
+        now = datetime.utcnow() + timedelta(minutes=1)
+        window.add("device_tracker.iphone", now, _fix(battery_level=80, in_zone=True, zone_name="home"))
+
+        rows = window.query("device_tracker.iphone", now - timedelta(seconds=1), now + timedelta(seconds=1))
+
+        assert len(rows) == 1
+        assert rows[0]["device_id"] == "device_tracker.iphone"
+        assert rows[0]["battery_level"] == 80
+        assert rows[0]["zone_name"] == "home"
+        assert rows[0]["in_zone"] is True
+        assert "accuracy" not in rows[0]
+
+    def test_query_before_process_start_misses(self):
+        """Test range starting before the window's coverage is not answered."""
+        window = HotWindow(depth=10)
+        now = datetime.utcnow()
+        window.add("device_tracker.iphone", now, _fix())
+
+        assert window.query("device_tracker.iphone", now - timedelta(days=1), now) is None
+        assert window.stats()["misses"] == 1
+
+    def test_eviction_moves_coverage(self):
+        """Test ring keeps the newest fixes and coverage follows evictions."""
+        window = HotWindow(depth=3)
+        base = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=1)
+        for i in range(5):
+            window.add("device_tracker.iphone", base + timedelta(seconds=i), _fix(lat=50.0 + i))
+
+        assert window.query("device_tracker.iphone", base, base + timedelta(seconds=10)) is None
+
+        rows = window.query("device_tracker.iphone", base + timedelta(seconds=2), base + timedelta(seconds=10))
+        assert [r["latitude"] for r in rows] == [52.0, 53.0, 54.0]
+
+    def test_out_of_order_insert(self):
+        """Test late fixes are kept in time order."""
+        window = HotWindow(depth=5)
+        base = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=1)
+        window.add("device_tracker.iphone", base + timedelta(seconds=2), _fix(lat=2.0))
+        window.add("device_tracker.iphone", base + timedelta(seconds=1), _fix(lat=1.0))
+        window.add("device_tracker.iphone", base + timedelta(seconds=3), _fix(lat=3.0))
+
+        rows = window.query("device_tracker.iphone", base, base + timedelta(seconds=10))
+        assert [r["latitude"] for r in rows] == [1.0, 2.0, 3.0]
+
+    def test_limit_and_timezone_aware_bounds(self):
+        """Test limit is applied and aware datetimes compare with naive writes."""
+        window = HotWindow(depth=10)
+        base = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=1)
+        for i in range(4):
+            window.add("device_tracker.iphone", base + timedelta(seconds=i), _fix())
+
+        start = base.replace(tzinfo=timezone.utc)
+        rows = window.query("device_tracker.iphone", start, start + timedelta(seconds=10), limit=2)
+        assert len(rows) == 2
+
+    def test_disabled_window(self):
+        """Test depth 0 disables the window."""
+        window = HotWindow(depth=0)
+        now = datetime.utcnow()
+        window.add("device_tracker.iphone", now, _fix())
+        assert window.query("device_tracker.iphone", now, now) is None
+
+    def test_invalidate(self):
+        """Test invalidation drops coverage."""
+        window = HotWindow(depth=10)
+        now = datetime.utcnow()
+        window.add("device_tracker.iphone", now, _fix())
+        window.invalidate("device_tracker.iphone")
+        assert window.query("device_tracker.iphone", now - timedelta(seconds=1), now) is None
+
+    def test_invalidate_device_without_ring(self):
+        """Test invalidating a device the window hasn't seen stops it answering from memory."""
+        window = HotWindow(depth=10)
+        now = datetime.utcnow().replace(microsecond=0)
+        window.invalidate("device_tracker.ipad")
+
+        assert window.query("device_tracker.ipad", now, now + timedelta(minutes=1)) is None
+        assert not window.covers("device_tracker.ipad", now)
+
+        # A later live fix starts the ring at the floor, not at process start
+        later = now + timedelta(minutes=1)
+        window.add("device_tracker.ipad", later, _fix())
+        assert window.query("device_tracker.ipad", now, later) is None
+        assert len(window.query("device_tracker.ipad", later, later)) == 1
+
+    def test_stats_reports_memory(self):
+        """Test stats include per-device memory usage."""
+        window = HotWindow(depth=100)
+        window.add("device_tracker.iphone", datetime.utcnow(), _fix())
+        stats = window.stats()
+        assert stats["points"] == 1
+        assert stats["devices"] == 1
+        assert stats["memory_bytes"] >= 100 * 8 * 6
+
+
+class TestInfluxDBHotWindow:
+    """Test hot window integration in InfluxDBLocationClient."""
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_query_served_from_memory(self, mock_client_class):
+        """Test recent ranges skip the database after a write."""
+        mock_client = MagicMock()
+        mock_query_api = MagicMock()
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        now = datetime.utcnow() + timedelta(minutes=1)
+        client.write_location(
+            device_id="device_tracker.iphone",
+            device_name="iPhone",
+            latitude=54.8985,
+            longitude=23.9036,
+            timestamp=now
+        )
+
+        locations = client.query_locations(
+            device_id="device_tracker.iphone",
+            start_time=now - timedelta(seconds=1),
+            end_time=now + timedelta(seconds=1)
+        )
+
+        assert len(locations) == 1
+        mock_query_api.query.assert_not_called()
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_reader_without_window_queries_influx(self, mock_client_class):
+        """Test a process that doesn't write points (api_server) always reads from InfluxDB."""
+        mock_client = MagicMock()
+        mock_query_api = MagicMock()
+        mock_query_api.query.return_value = []
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass",
+            hot_window_depth=0
+        )
+        # Range starts after the client was created, with no local writes
+        now = datetime.utcnow() + timedelta(minutes=1)
+
+        client.query_locations(
+            device_id="device_tracker.iphone",
+            start_time=now,
+            end_time=now + timedelta(minutes=5)
+        )
+
+        mock_query_api.query.assert_called_once()
+        assert client.hot_window.stats()["hits"] == 0
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_bulk_write_for_new_device_queries_influx(self, mock_client_class):
+        """Test fixes bulk written for a device not yet in the window are read from InfluxDB."""
+        mock_client = MagicMock()
+        mock_query_api = MagicMock()
+        mock_query_api.query.return_value = []
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        now = datetime.utcnow()
+        client.write_locations([{
+            "device_id": "device_tracker.ipad",
+            "device_name": "iPad",
+            "latitude": 54.8985,
+            "longitude": 23.9036,
+            "time": now,
+        }])
+
+        client.query_locations(
+            device_id="device_tracker.ipad",
+            start_time=now,
+            end_time=now + timedelta(seconds=1)
+        )
+
+        mock_query_api.query.assert_called_once()
+        assert client.hot_window.stats()["hits"] == 0
@@ -0,0 +1,207 @@
+"""Unit tests for importer module."""
+
+import io
+import json
+import pytest
+from unittest.mock import Mock
+from find_my_history.export import export_chunks
+from find_my_history.importer import (
+    classify_rows,
+    detect_format,
+    import_file,
+    import_stream,
+    iter_geojson,
+    iter_gpx,
+    parse_time,
+)
+from find_my_history.zone_detector import ZoneDetector
+
+
+GPX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><name>Phone</name><trkseg>
+    <trkpt lat="54.8985" lon="23.9036"><ele>80</ele><time>2025-01-27T10:00:00Z</time></trkpt>
+    <trkpt lat="54.9000" lon="23.9100"><time>2025-01-27T10:05:00Z</time></trkpt>
+    <trkpt lat="54.9100" lon="23.9200"></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+ZONES = [
+    {"name": "Home", "latitude": 54.8985, "longitude": 23.9036, "radius": "100m"},
+    {"name": "Work", "latitude": 54.6872, "longitude": 25.2797, "radius": 200},
+]
+
+
+@pytest.fixture
+def influx():
+    client = Mock()
+    client.write_locations = Mock(side_effect=lambda rows: len(rows))
+    return client
+
+
+class TestParsers:
+    """Test format parsers."""
+
+    def test_detect_format(self):
+        """Test formats are detected from file names."""
+        assert detect_format("track.GPX") == "gpx"
+        assert detect_format("history.json.gz") == "geojson"
+        assert detect_format("points.csv") == "csv"
+        assert detect_format("notes.txt") is None
+
+    def test_parse_time(self):
+        """Test ISO, epoch seconds and epoch milliseconds."""
+        assert parse_time("1970-01-01T00:01:00Z") == 60
+        assert parse_time("60") == 60
+        assert parse_time(1737972000000) == 1737972000
+        assert parse_time("yesterday") is None
+
+    def test_gpx_points(self):
+        """Test GPX track points carry time, elevation and the track name."""
+        points = list(iter_gpx(io.BytesIO(GPX)))
+        assert len(points) == 3
+        assert points[0]["altitude"] == "80"
+        assert points[0]["device_name"] == "Phone"
+        assert "time" not in points[2]
+
+    def test_geojson_streams_large_collection(self, monkeypatch):
+        """Test features spanning read boundaries decode correctly."""
+        monkeypatch.setattr("find_my_history.importer.READ_SIZE", 17)
+        features = [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [23.0 + i / 100, 54.0]},
+             "properties": {"time": 1700000000 + i}}
+            for i in range(50)
+        ]
+        text = json.dumps({"type": "FeatureCollection", "features": features})
+        points = list(iter_geojson(io.StringIO(text)))
+        assert len(points) == 50
+        assert points[49]["longitude"] == pytest.approx(23.49)
+
+    def test_geojson_linestring_with_coord_times(self):
+        """Test LineString features with coordTimes yield one point per vertex."""
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": [[23.9, 54.8], [23.91, 54.81]]},
+            "properties": {"coordTimes": ["2025-01-27T10:00:00Z", "2025-01-27T10:01:00Z"]},
+        }
+        points = list(iter_geojson(io.StringIO(json.dumps(feature) + "\n")))
+        assert [p["latitude"] for p in points] == [54.8, 54.81]
+
+    def test_geojson_large_single_feature_decodes_once(self, monkeypatch):
+        """Test a multi-MB LineString is collected across reads and decoded once."""
+        count = 100_000
+        feature = {
+            "type": "Feature",
+            "geometry": {
+                "type": "LineString",
+                "coordinates": [[23.9 + i * 1e-6, 54.8 + i * 1e-6] for i in range(count)],
+            },
+            "properties": {"coordTimes": [1700000000 + i for i in range(count)]},
+        }
+        text = json.dumps({"type": "FeatureCollection", "features": [feature, feature]})
+        assert len(text) > 4 * 1024 * 1024
+        decodes = []
+        raw_decode = json.JSONDecoder.raw_decode
+        monkeypatch.setattr(
+            json.JSONDecoder, "raw_decode",
+            lambda self, *args, **kwargs: decodes.append(1) or raw_decode(self, *args, **kwargs),
+        )
+
+        points = list(iter_geojson(io.StringIO(text)))
+
+        assert len(points) == 2 * count
+        assert len(decodes) == 2
+
+    def test_geojson_strings_with_brackets_and_escapes(self, monkeypatch):
+        """Test brackets, quotes and backslashes inside strings don't end a feature early."""
+        monkeypatch.setattr("find_my_history.importer.READ_SIZE", 3)
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [23.9, 54.8]},
+            "properties": {"time": 1700000000, "device_name": 'a}]"\\[{\\'},
+        }
+        text = json.dumps(feature) + "\n" + json.dumps(feature)
+        points = list(iter_geojson(io.StringIO(text)))
+        assert [p["device_name"] for p in points] == [feature["properties"]["device_name"]] * 2
+
+    def test_oversized_geojson_value_fails_early(self, monkeypatch):
+        """Test an unterminated value stops at MAX_VALUE_SIZE instead of buffering to EOF."""
+        monkeypatch.setattr("find_my_history.importer.MAX_VALUE_SIZE", 1024)
+        monkeypatch.setattr("find_my_history.importer.READ_SIZE", 100)
+        stream = io.StringIO('{"type": "Feature", "x": [' + "1, " * 100_000)
+        with pytest.raises(ValueError, match="larger than"):
+            list(iter_geojson(stream))
+        assert stream.tell() < 2048
+
+    def test_truncated_geojson(self):
+        """Test an unterminated collection is reported."""
+        with pytest.raises(ValueError):
+            list(iter_geojson(io.StringIO('{"type": "FeatureCollection", "features": [{"type": ')))
+
+
+class TestClassifyRows:
+    """Test batch zone classification of rows."""
+
+    def test_sets_zone_fields(self):
+        """Test rows get in_zone and zone_name from one batch lookup."""
+        rows = [{"latitude": 54.8985, "longitude": 23.9036}, {"latitude": 55.5, "longitude": 24.0}]
+        classify_rows(ZoneDetector(ZONES), rows)
+        assert [(r["in_zone"], r["zone_name"]) for r in rows] == [(True, "Home"), (False, None)]
+
+    def test_no_detector(self):
+        """Test points stay unclassified without zones."""
+        rows = [{"latitude": 1.0, "longitude": 2.0}]
+        classify_rows(None, rows)
+        assert rows[0]["in_zone"] is False and rows[0]["zone_name"] is None
+
+
+class TestImport:
+    """Test the import pipeline."""
+
+    def test_gpx_import_batches(self, influx):
+        """Test points are classified, batched and untimed points skipped."""
+        progress = []
+        summary = import_stream(
+            io.BytesIO(GPX), "gpx", influx, ZoneDetector(ZONES),
+            device_id="device_tracker.phone", batch_size=1, progress=progress.append
+        )
+        assert summary["imported"] == 2
+        assert summary["skipped"] == 1
+        assert summary["in_zone"] == 1
+        assert summary["devices"] == ["device_tracker.phone"]
+        assert influx.write_locations.call_count == 2
+        first = influx.write_locations.call_args_list[0][0][0][0]
+        assert first["zone_name"] == "Home" and first["in_zone"] is True
+        assert first["device_name"] == "Phone"
+        assert [p["imported"] for p in progress] == [1, 2]
+
+    def test_rows_without_device_are_skipped(self, influx):
+        """Test points need a device id from the file or the caller."""
+        summary = import_stream(io.BytesIO(GPX), "gpx", influx)
+        assert summary["imported"] == 0
+        assert summary["skipped"] == 3
+
+    def test_export_round_trip(self, influx, tmp_path):
+        """Test a gzipped CSV export imports back with its device ids."""
+        rows = [
+            {"time": "2025-01-27T10:00:00+00:00", "device_id": "device_tracker.a",
+             "latitude": 54.1, "longitude": 23.1, "battery_level": 50},
+            {"time": "2025-01-27T10:05:00+00:00", "device_id": "device_tracker.b",
+             "latitude": 54.2, "longitude": 23.2},
+        ]
+        path = tmp_path / "export.csv.gz"
+        path.write_bytes(b"".join(export_chunks("csv", [("x", iter(rows))], compress=True)))
+
+        summary = import_file(str(path), influx_client=influx)
+
+        assert summary["imported"] == 2
+        assert summary["devices"] == ["device_tracker.a", "device_tracker.b"]
+        written = influx.write_locations.call_args[0][0]
+        assert written[0]["battery_level"] == 50
+        assert written[1]["zone_name"] is None
+
+    def test_unknown_format(self, influx):
+        """Test unknown formats are rejected."""
+        with pytest.raises(ValueError):
+            import_stream(io.BytesIO(b""), "kml", influx)
@@ -2,8 +2,8 @@
 
 import pytest
 from unittest.mock import Mock, MagicMock, patch
-from datetime import datetime, timedelta
-from find_my_history.influxdb_client import InfluxDBLocationClient
+from datetime import datetime, timedelta, timezone
+from find_my_history.influxdb_client import InfluxDBLocationClient, location_line
 
 
 class TestInfluxDBLocationClient:
@@ -247,3 +247,416 @@ class TestInfluxDBLocationClient:
         
         assert result is True
         mock_write_api.write.assert_called_once()
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_seed_last_known(self, mock_client_class):
+        """Test seeding the last-known index from a last() query."""
+        mock_client = MagicMock()
+        mock_query_api = MagicMock()
+
+        def _record(field, value, time, zone_name):
+            record = MagicMock()
+            record.get_field.return_value = field
+            record.get_value.return_value = value
+            record.get_time.return_value = time
+            record.values = {
+                "device_id": "device_tracker.iphone",
+                "device_name": "iPhone",
+                "in_zone": "true" if zone_name != "unknown" else "false",
+                "zone_name": zone_name,
+            }
+            return record
+
+        old = datetime(2025, 1, 27, 9, 0, 0)
+        new = datetime(2025, 1, 27, 10, 0, 0)
+        mock_table = MagicMock()
+        mock_table.records = [
+            _record("latitude", 54.0, old, "unknown"),
+            _record("longitude", 23.0, old, "unknown"),
+            _record("latitude", 54.8985, new, "home"),
+            _record("longitude", 23.9036, new, "home"),
+            _record("battery_level", 85, new, "home"),
+        ]
+        mock_query_api.query.return_value = [mock_table]
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+
+        assert client.seed_last_known() == 1
+        entry = client.last_known.get("device_tracker.iphone")
+        assert entry["latitude"] == 54.8985
+        assert entry["zone_name"] == "home"
+        assert entry["in_zone"] is True
+        assert entry["battery_level"] == 85
+        assert "last()" in mock_query_api.query.call_args[0][0]
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_write_listeners(self, mock_client_class):
+        """Test write listeners run after writes and can't fail them."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        listener = Mock()
+        client.add_write_listener(Mock(side_effect=Exception("boom")))
+        client.add_write_listener(listener)
+
+        result = client.write_location(
+            device_id="device_tracker.iphone",
+            device_name="iPhone",
+            latitude=54.8985,
+            longitude=23.9036,
+            zone_name="home",
+            in_zone=True
+        )
+
+        assert result is True
+        device_id, timestamp, fix = listener.call_args[0]
+        assert device_id == "device_tracker.iphone"
+        assert fix["zone_name"] == "home"
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_write_and_query_trips(self, mock_client_class):
+        """Test trips are written to and read from their own measurement."""
+        mock_client = MagicMock()
+        mock_write_api = MagicMock()
+        mock_query_api = MagicMock()
+        mock_client.write_api.return_value = mock_write_api
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        record = MagicMock()
+        record.get_time.return_value = datetime(2025, 1, 27, 8, 25, 0)
+        record.values = {
+            "device_id": "device_tracker.iphone",
+            "start_zone": "home",
+            "end_zone": "work",
+            "end_time": 1737966600,
+            "distance_m": 91000.0,
+            "duration_seconds": 1500.0,
+        }
+        table = MagicMock()
+        table.records = [record]
+        mock_query_api.query.return_value = [table]
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+
+        assert client.write_trip("device_tracker.iphone", {
+            "start_time": datetime(2025, 1, 27, 8, 25, 0),
+            "end_time": datetime(2025, 1, 27, 8, 50, 0),
+            "duration_seconds": 1500.0,
+            "distance_m": 91000.0,
+            "avg_speed_kmh": 218.4,
+            "max_speed_kmh": 250.0,
+            "points": 5,
+            "start_latitude": 54.8985,
+            "start_longitude": 23.9036,
+            "start_zone": "home",
+            "end_latitude": 54.6872,
+            "end_longitude": 25.2797,
+            "end_zone": "work",
+        }) is True
+        mock_write_api.write.assert_called_once()
+
+        trips = client.query_trips(device_id="device_tracker.iphone")
+        assert len(trips) == 1
+        assert trips[0]["start"]["zone_name"] == "home"
+        assert trips[0]["end"]["zone_name"] == "work"
+        assert trips[0]["end_time"].startswith("2025-01-27T08:30:00")
+        assert 'device_trip' in mock_query_api.query.call_args[0][0]
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_query_aggregated(self, mock_client_class):
+        """Test aggregateWindow results are merged into one row per bucket."""
+        mock_client = MagicMock()
+        mock_query_api = MagicMock()
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        bucket_time = datetime(2025, 1, 27, 10, 0, 0)
+
+        def record(result, field, value, zone_name="home"):
+            rec = MagicMock()
+            rec.get_time.return_value = bucket_time
+            rec.get_field.return_value = field
+            rec.get_value.return_value = value
+            rec.values = {"result": result, "device_id": "device_tracker.iphone", "zone_name": zone_name}
+            return rec
+
+        table = MagicMock()
+        table.records = [
+            record("position", "latitude", 54.8985),
+            record("position", "longitude", 23.9036),
+            record("zones", "latitude", 3, zone_name="home"),
+            record("zones", "latitude", 1, zone_name="unknown"),
+            record("battery_min", "battery_level", 40),
+            record("battery_max", "battery_level", 55),
+        ]
+        mock_query_api.query.return_value = [table]
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        locations = client.query_locations(device_id="device_tracker.iphone", every=300)
+
+        assert locations == [{
+            "time": bucket_time.isoformat(),
+            "device_id": "device_tracker.iphone",
+            "count": 4,
+            "resolution": 300,
+            "latitude": 54.8985,
+            "longitude": 23.9036,
+            "battery_min": 40,
+            "battery_max": 55,
+            "zone_name": "home",
+            "in_zone": True,
+        }]
+        query = mock_query_api.query.call_args[0][0]
+        assert "aggregateWindow(every: 5m" in query
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_iter_locations_pages(self, mock_client_class):
+        """Test iter_locations streams one query per page of time."""
+        mock_client = MagicMock()
+        mock_query_api = MagicMock()
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        record = MagicMock()
+        record.get_time.return_value = datetime(2025, 1, 27, 10, 0, 0)
+        record.values = {"latitude": 54.8985, "longitude": 23.9036, "zone_name": "home", "in_zone": "true"}
+        mock_query_api.query_stream.side_effect = lambda query: iter([record])
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        rows = list(client.iter_locations(
+            "device_tracker.iphone", datetime(2025, 1, 25), datetime(2025, 1, 28)
+        ))
+
+        assert mock_query_api.query_stream.call_count == 3
+        assert len(rows) == 3
+        assert rows[0]["in_zone"] is True
+        assert rows[0]["device_id"] == "device_tracker.iphone"
+
+    def test_location_line_escapes(self):
+        """Test line protocol escaping of tags and string fields."""
+        line = location_line({
+            "device_id": "device_tracker.phone",
+            "device_name": "My Phone, 2",
+            "time": 1737972000.7,
+            "latitude": 54.8985,
+            "longitude": 23.9036,
+            "battery_level": 80.0,
+            "battery_state": 'not "charging"',
+            "in_zone": True,
+            "zone_name": "home",
+        })
+        assert line == (
+            "device_location,device_id=device_tracker.phone,device_name=My\\ Phone\\,\\ 2,"
+            "in_zone=true,zone_name=home "
+            'latitude=54.8985,longitude=23.9036,battery_level=80i,battery_state="not \\"charging\\"" '
+            "1737972000"
+        )
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_write_locations_batch(self, mock_client_class):
+        """Test a batch is one write and keeps in-memory indexes consistent."""
+        mock_client = MagicMock()
+        mock_write_api = MagicMock()
+        mock_client.write_api.return_value = mock_write_api
+        mock_client_class.return_value = mock_client
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        client.hot_window.invalidate = Mock()
+        rows = [
+            {"device_id": "device_tracker.phone", "time": 1737972000 + i * 60,
+             "latitude": 54.0 + i, "longitude": 23.0}
+            for i in range(3)
+        ]
+
+        assert client.write_locations(rows) == 3
+        assert client.write_locations([]) == 0
+
+        mock_write_api.write.assert_called_once()
+        assert len(mock_write_api.write.call_args[1]["record"]) == 3
+        client.hot_window.invalidate.assert_called_once_with("device_tracker.phone")
+        assert client.last_known.get("device_tracker.phone")["latitude"] == 56.0
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_find_gaps(self, mock_client_class):
+        """Test gaps between fixes plus the stretch after the last fix."""
+        mock_client = MagicMock()
+        mock_query_api = MagicMock()
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        def record(result, time, **values):
+            r = MagicMock()
+            r.get_time.return_value = time
+            r.values = dict(values, result=result)
+            return r
+
+        start = datetime(2025, 1, 27, 0, 0, tzinfo=timezone.utc)
+        table = MagicMock()
+        table.records = [
+            record("gaps", start + timedelta(hours=3), elapsed=7200),
+            record("first", start + timedelta(minutes=1)),
+            record("last", start + timedelta(hours=10)),
+        ]
+        mock_query_api.query.return_value = [table]
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        gaps = client.find_gaps("device_tracker.iphone", start, start + timedelta(hours=12), 600)
+
+        assert gaps == [
+            (start + timedelta(hours=1), start + timedelta(hours=3)),
+            (start + timedelta(hours=10), start + timedelta(hours=12)),
+        ]
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_find_gaps_no_data(self, mock_client_class):
+        """Test a device without fixes has one gap covering the range."""
+        mock_client = MagicMock()
+        mock_client.query_api.return_value.query.return_value = []
+        mock_client_class.return_value = mock_client
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        start = datetime(2025, 1, 27, tzinfo=timezone.utc)
+        end = start + timedelta(days=1)
+        assert client.find_gaps("device_tracker.iphone", start, end, 600) == [(start, end)]
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_iter_zone_candidates_and_delete(self, mock_client_class):
+        """Test the box filter is pushed into Flux and deletes are scoped to a device."""
+        mock_client = MagicMock()
+        mock_query_api = MagicMock()
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        record = MagicMock()
+        record.get_time.return_value = datetime(2025, 1, 27, 10, 0, 0, tzinfo=timezone.utc)
+        record.values = {"latitude": 54.8985, "longitude": 23.9036, "zone_name": None}
+        mock_query_api.query_stream.return_value = iter([record])
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+        start = datetime(2025, 1, 27, tzinfo=timezone.utc)
+        end = start + timedelta(days=1)
+        points = list(client.iter_zone_candidates(
+            "device_tracker.iphone", start, end, [(54.0, 55.0, 23.0, 24.0)]
+        ))
+        query = mock_query_api.query_stream.call_args[0][0]
+
+        assert points == [(1737972000.0, 54.8985, 23.9036, "unknown")]
+        assert "r.latitude >= 54.0 and r.latitude <= 55.0" in query
+        assert list(client.iter_zone_candidates("device_tracker.iphone", start, end, [])) == []
+
+        client.delete_locations("device_tracker.iphone", start, end)
+        args = mock_client.delete_api.return_value.delete.call_args[0]
+        assert args[:2] == (start, end)
+        assert 'device_id="device_tracker.iphone"' in args[2]
+
+    @patch('find_my_history.influxdb_client.InfluxDBClient')
+    def test_write_and_query_transitions(self, mock_client_class):
+        """Test zone transitions are tagged for indexed lookups."""
+        mock_client = MagicMock()
+        mock_write_api = MagicMock()
+        mock_query_api = MagicMock()
+        mock_client.write_api.return_value = mock_write_api
+        mock_client.query_api.return_value = mock_query_api
+        mock_client_class.return_value = mock_client
+
+        record = MagicMock()
+        record.get_time.return_value = datetime(2025, 1, 27, 8, 10, 0, tzinfo=timezone.utc)
+        record.values = {
+            "device_id": "device_tracker.iphone",
+            "zone_name": "home",
+            "event": "exit",
+            "latitude": 54.9,
+            "longitude": 23.9,
+            "dwell_seconds": 3600.0,
+        }
+        table = MagicMock()
+        table.records = [record]
+        mock_query_api.query.return_value = [table]
+
+        client = InfluxDBLocationClient(
+            host="test-influxdb",
+            port=8086,
+            database="test_db",
+            username="test_user",
+            password="test_pass"
+        )
+
+        assert client.write_transition("device_tracker.iphone", {
+            "event": "exit",
+            "zone_name": "home",
+            "time": datetime(2025, 1, 27, 8, 10, 0, tzinfo=timezone.utc),
+            "latitude": 54.9,
+            "longitude": 23.9,
+            "dwell_seconds": 3600.0,
+        }) is True
+        point = mock_write_api.write.call_args[1]["record"]
+        line = point.to_line_protocol()
+        assert line.startswith("zone_transition,device_id=device_tracker.iphone,event=exit,zone_name=home ")
+        assert "dwell_seconds=3600" in line
+
+        transitions = client.query_transitions(
+            device_id="device_tracker.iphone", zone_name="home", event="exit", limit=1
+        )
+        query = mock_query_api.query.call_args[0][0]
+        assert transitions[0]["dwell_seconds"] == 3600.0
+        assert 'r.zone_name == "home"' in query
+        assert 'r.event == "exit"' in query
+        assert "limit(n: 1)" in query
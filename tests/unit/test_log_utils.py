@@ -1,7 +1,21 @@
 """Unit tests for log_utils module."""
 
+import logging
+import logging.handlers
+import sys
+
 import pytest
-from find_my_history.log_utils import format_coordinates, setup_secure_logging
+from find_my_history import log_utils
+from find_my_history.log_utils import (
+    LazyCoordinates,
+    SecureLogFormatter,
+    format_coordinates,
+    setup_secure_logging,
+)
+
+
+def _record(msg, *args, exc_info=None):
+    return logging.LogRecord("find_my_history.main", logging.INFO, __file__, 0, msg, args, exc_info)
 
 
 class TestLogUtils:
@@ -34,3 +48,60 @@ class TestLogUtils:
         # Should not raise exception
         setup_secure_logging(level=20)  # INFO level
         assert True  # If we get here, setup worked
+
+    def test_setup_uses_queue_listener(self):
+        """Test records are handed to a background listener."""
+        root = setup_secure_logging(level=logging.INFO)
+        try:
+            assert isinstance(root.handlers[0], logging.handlers.QueueHandler)
+            assert log_utils._queue_listener is not None
+        finally:
+            setup_secure_logging(level=logging.INFO, use_queue=False)
+        assert log_utils._queue_listener is None
+        assert isinstance(root.handlers[0], logging.StreamHandler)
+
+    def test_lazy_coordinates(self):
+        """Test lazy coordinates format like format_coordinates."""
+        assert str(LazyCoordinates(54.8985123, 23.9036789, precision=4)) == format_coordinates(
+            54.8985123, 23.9036789, precision=4
+        )
+
+
+class TestSecureLogFormatter:
+    """Test masking of sensitive data."""
+
+    def test_masks_coordinates_and_tokens(self):
+        """Test coordinates and tokens in one message are both masked."""
+        formatter = SecureLogFormatter("%(message)s")
+        message = formatter.format(_record(
+            "Token abcdefghijklmnopqrstuvwxyz123456 for %s at %s",
+            "device_tracker.iphone", LazyCoordinates(54.89851, 23.90367),
+        ))
+        assert message == "Token abcd*** for device_tracker.iphone at (54.90**, 23.90**)"
+
+    def test_masks_coordinates_without_tokens(self):
+        """Test coordinates are masked when no token candidate is present."""
+        formatter = SecureLogFormatter("%(message)s")
+        assert formatter.format(_record("at (54.89851, -23.90367)")) == "at (54.90**, -23.90**)"
+
+    def test_leaves_prefix_and_short_values(self):
+        """Test only the message is masked and short values are kept."""
+        formatter = SecureLogFormatter("%(name)s %(message)s")
+        message = formatter.format(_record("Updated zones: 2 zones (1.5, 2.5) iPhone_12"))
+        assert message == "find_my_history.main Updated zones: 2 zones (1.5, 2.5) iPhone_12"
+
+    def test_masking_disabled(self):
+        """Test messages pass through unchanged when masking is off."""
+        formatter = SecureLogFormatter("%(message)s", mask_sensitive=False)
+        assert formatter.format(_record("at (54.89851, 23.90367)")) == "at (54.89851, 23.90367)"
+
+    def test_masks_tracebacks(self):
+        """Test exception text is masked like the message."""
+        formatter = SecureLogFormatter("%(message)s")
+        try:
+            raise ValueError("bad token abcdefghijklmnopqrstuvwxyz123456")
+        except ValueError:
+            record = _record("failed", exc_info=sys.exc_info())
+        message = formatter.format(record)
+        assert "abcd***" in message
+        assert "abcdefghijklmnopqrstuvwxyz123456" not in message
@@ -0,0 +1,133 @@
+"""Unit tests for metrics module."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from find_my_history.metrics import (
+    INFLUX_ERRORS,
+    INFLUX_QUERY_SECONDS,
+    INFLUX_WRITE_SECONDS,
+    InstrumentedQueryApi,
+    InstrumentedWriteApi,
+    Registry,
+    gauge,
+)
+
+
+class TestMetrics:
+    """Test counters, histograms and the exposition format."""
+
+    def test_counter_with_labels(self):
+        """Test labelled counters render one sample per label set."""
+        registry = Registry()
+        polls = registry.counter("polls_total", "Polls", ("result",))
+
+        polls.labels("stored").inc()
+        polls.labels("stored").inc(2)
+        polls.labels("no_state").inc()
+
+        text = registry.render()
+        assert "# TYPE polls_total counter" in text
+        assert 'polls_total{result="stored"} 3' in text
+        assert 'polls_total{result="no_state"} 1' in text
+
+    def test_labels_are_checked(self):
+        """Test a wrong number of label values is rejected."""
+        counter = Registry().counter("polls_total", "Polls", ("result",))
+        with pytest.raises(ValueError):
+            counter.labels("stored", "extra")
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test observations land in le buckets with sum and count."""
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+        latency.observe(0.05)
+        latency.observe(0.1)  # inclusive upper bound
+        latency.observe(0.5)
+        latency.observe(3.0)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 2' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert "latency_seconds_sum 3.65" in text
+        assert "latency_seconds_count 4" in text
+
+    def test_register_same_name_returns_existing(self):
+        """Test re-registering a name (e.g. on module reload) reuses the metric."""
+        registry = Registry()
+        first = registry.counter("polls_total", "Polls")
+        assert registry.counter("polls_total", "Polls") is first
+
+    def test_label_values_are_escaped(self):
+        """Test quotes and backslashes in label values are escaped."""
+        text = gauge("depth", "Depth", [({"queue": 'a"b\\c'}, 2)])
+        assert 'depth{queue="a\\"b\\\\c"} 2' in text
+        assert "# TYPE depth gauge" in text
+
+    def test_extra_families_are_appended(self):
+        """Test scrape-time families are rendered after registered metrics."""
+        registry = Registry()
+        registry.counter("polls_total", "Polls").inc()
+        text = registry.render([gauge("depth", "Depth", [({}, 5)])])
+        assert text.index("polls_total 1") < text.index("depth 5")
+
+
+class TestInstrumentedApis:
+    """Test the InfluxDB API wrappers."""
+
+    def test_write_is_timed_and_forwarded(self):
+        """Test writes reach the wrapped API and are observed."""
+        wrapped = MagicMock()
+        api = InstrumentedWriteApi(wrapped)
+        before = INFLUX_WRITE_SECONDS.labels().snapshot()[0]
+
+        api.write(bucket="b", record="line")
+
+        wrapped.write.assert_called_once_with(bucket="b", record="line")
+        assert sum(INFLUX_WRITE_SECONDS.labels().snapshot()[0]) == sum(before) + 1
+        # Anything else passes straight through
+        api.close()
+        wrapped.close.assert_called_once()
+
+    def test_write_errors_are_counted(self):
+        """Test failed writes are counted and re-raised."""
+        wrapped = MagicMock()
+        wrapped.write.side_effect = Exception("down")
+        api = InstrumentedWriteApi(wrapped)
+        errors = INFLUX_ERRORS.labels("write")
+        before = errors.value
+
+        with pytest.raises(Exception):
+            api.write(bucket="b", record="line")
+
+        assert errors.value == before + 1
+
+    def test_query_stream_is_timed_until_exhausted(self):
+        """Test streamed queries are observed once, after the last record."""
+        wrapped = MagicMock()
+        wrapped.query_stream.return_value = iter([1, 2, 3])
+        api = InstrumentedQueryApi(wrapped)
+        stream = INFLUX_QUERY_SECONDS.labels("query_stream")
+        before = sum(stream.snapshot()[0])
+
+        with patch("find_my_history.metrics.time.perf_counter", side_effect=[10.0, 12.5]):
+            records = api.query_stream("flux")
+            assert sum(stream.snapshot()[0]) == before
+            assert list(records) == [1, 2, 3]
+
+        counts, _ = stream.snapshot()
+        assert sum(counts) == before + 1
+
+    def test_query_is_timed(self):
+        """Test table queries are observed."""
+        wrapped = MagicMock()
+        wrapped.query.return_value = ["table"]
+        api = InstrumentedQueryApi(wrapped)
+        query = INFLUX_QUERY_SECONDS.labels("query")
+        before = sum(query.snapshot()[0])
+
+        assert api.query("flux") == ["table"]
+        assert sum(query.snapshot()[0]) == before + 1
@@ -0,0 +1,68 @@
+"""Unit tests for motion module."""
+
+import pytest
+import numpy as np
+from find_my_history.motion import annotate_motion, classify_speeds
+
+
+def _row(time, lat, lon, device_id="device_tracker.iphone", accuracy=5.0):
+    return {
+        "time": time,
+        "device_id": device_id,
+        "latitude": lat,
+        "longitude": lon,
+        "accuracy": accuracy,
+    }
+
+
+class TestClassifySpeeds:
+    """Test motion classes."""
+
+    def test_thresholds(self):
+        """Test speeds map to the expected classes."""
+        classes = classify_speeds(np.array([0.0, 4.0, 15.0, 60.0]))
+        assert classes.tolist() == ["stationary", "walking", "cycling", "driving"]
+
+
+class TestAnnotateMotion:
+    """Test per-point motion annotation."""
+
+    def test_empty(self):
+        """Test empty input is returned unchanged."""
+        assert annotate_motion([]) == []
+
+    def test_first_point_has_no_motion(self):
+        """Test the first row of a device has no previous point."""
+        rows = annotate_motion([_row("2025-01-27T10:00:00+00:00", 54.8985, 23.9036)])
+        assert rows[0]["distance_from_prev"] is None
+        assert rows[0]["motion"] is None
+
+    def test_driving_north(self):
+        """Test distance, speed and heading for a fast northbound move."""
+        rows = annotate_motion([
+            _row("2025-01-27T10:00:00+00:00", 54.0000, 23.9036),
+            _row("2025-01-27T10:01:00+00:00", 54.0090, 23.9036),
+        ])
+        assert rows[1]["distance_from_prev"] == pytest.approx(1000.8, abs=1)
+        assert rows[1]["speed_kmh"] == pytest.approx(60, abs=0.5)
+        assert rows[1]["heading"] == pytest.approx(0, abs=0.1)
+        assert rows[1]["motion"] == "driving"
+
+    def test_jitter_is_stationary(self):
+        """Test small moves within accuracy count as stationary."""
+        rows = annotate_motion([
+            _row("2025-01-27T10:00:00Z", 54.8985, 23.9036),
+            _row("2025-01-27T10:00:05Z", 54.8986, 23.9036, accuracy=30.0),
+        ])
+        assert rows[1]["motion"] == "stationary"
+
+    def test_devices_are_independent(self):
+        """Test rows are compared with the same device's previous row."""
+        rows = annotate_motion([
+            _row("2025-01-27T10:00:00Z", 54.0, 23.0, device_id="a"),
+            _row("2025-01-27T10:00:30Z", 55.0, 25.0, device_id="b"),
+            _row("2025-01-27T10:10:00Z", 54.0, 23.0045, device_id="a"),
+        ])
+        assert rows[1]["motion"] is None
+        assert rows[2]["heading"] == pytest.approx(90, abs=0.1)
+        assert rows[2]["motion"] == "walking"
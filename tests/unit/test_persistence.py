@@ -0,0 +1,37 @@
+"""Unit tests for persistence module."""
+
+import os
+
+from find_my_history.persistence import atomic_write_json, read_json
+
+
+class TestPersistence:
+    """Test crash-safe JSON state files."""
+
+    def test_round_trip(self, tmp_path):
+        """Test written data reads back and no temp files are left."""
+        path = str(tmp_path / "state" / "data.json")
+        atomic_write_json(path, {"a": [1, 2]})
+        atomic_write_json(path, {"a": [3]})
+
+        assert read_json(path) == {"a": [3]}
+        assert os.listdir(tmp_path / "state") == ["data.json"]
+
+    def test_failed_write_keeps_old_file(self, tmp_path):
+        """Test a write that fails midway leaves the previous content."""
+        path = str(tmp_path / "data.json")
+        atomic_write_json(path, {"ok": True})
+        try:
+            atomic_write_json(path, {"bad": object()})
+        except TypeError:
+            pass
+
+        assert read_json(path) == {"ok": True}
+        assert os.listdir(tmp_path) == ["data.json"]
+
+    def test_read_missing_or_corrupt(self, tmp_path):
+        """Test unusable files return the default."""
+        path = tmp_path / "data.json"
+        assert read_json(str(path), {}) == {}
+        path.write_text("{not json")
+        assert read_json(str(path), []) == []
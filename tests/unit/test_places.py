@@ -0,0 +1,70 @@
+"""Unit tests for places module."""
+
+import pytest
+from find_my_history.places import cluster_places
+
+
+def _columns(fixes, device_id="device_tracker.iphone"):
+    """Build query_columns-style output from (time, lat, lon, zone) tuples."""
+    return {
+        "time": [f[0] for f in fixes],
+        "device_id": [device_id] * len(fixes),
+        "zone_name": [f[3] for f in fixes],
+        "latitude": [f[1] for f in fixes],
+        "longitude": [f[2] for f in fixes],
+    }
+
+
+HOME = (54.8985, 23.9036)
+WORK = (54.6872, 25.2797)
+
+
+class TestClusterPlaces:
+    """Test place clustering."""
+
+    def test_empty(self):
+        """Test no fixes yield no places."""
+        assert cluster_places(_columns([])) == []
+
+    def test_ranks_by_visits(self):
+        """Test a place visited twice ranks above a longer single stay."""
+        fixes = []
+        t = 0.0
+        # Home, work (long), home again
+        for lat, lon, zone, count in [
+            (*HOME, "home", 4), (*WORK, "unknown", 20), (*HOME, "home", 4)
+        ]:
+            for _ in range(count):
+                fixes.append((t, lat, lon, zone))
+                t += 300
+            t += 3600
+
+        places = cluster_places(_columns(fixes), end_time=t)
+
+        assert [p["zone_name"] for p in places] == ["home", "unknown"]
+        assert places[0]["visits"] == 2
+        assert places[1]["visits"] == 1
+        assert places[1]["dwell_seconds"] > places[0]["dwell_seconds"]
+        assert places[0]["first_seen"] == "1970-01-01T00:00:00+00:00"
+        assert places[1]["last_seen"] == "1970-01-01T02:50:00+00:00"
+
+    def test_transit_fixes_are_ignored(self):
+        """Test fixes while moving fast don't form places."""
+        fixes = [(i * 60.0, HOME[0] + i * 0.01, HOME[1], "unknown") for i in range(30)]
+        assert cluster_places(_columns(fixes), end_time=1800.0) == []
+
+    def test_short_stop_below_min_dwell(self):
+        """Test a brief stop isn't a place."""
+        fixes = [(0.0, *HOME, "home"), (60.0, *HOME, "home")]
+        assert cluster_places(_columns(fixes), end_time=120.0, min_dwell=600) == []
+
+    def test_nearby_fixes_merge(self):
+        """Test fixes spread over adjacent grid cells form one place."""
+        fixes = [
+            (i * 300.0, HOME[0] + (i % 3) * 0.0006, HOME[1], "home")
+            for i in range(12)
+        ]
+        places = cluster_places(_columns(fixes), end_time=3600.0, eps=100)
+        assert len(places) == 1
+        assert places[0]["points"] == 12
+        assert places[0]["latitude"] == pytest.approx(HOME[0] + 0.0006, abs=1e-4)
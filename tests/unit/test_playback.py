@@ -0,0 +1,81 @@
+"""Unit tests for playback module."""
+
+import pytest
+import numpy as np
+from find_my_history.playback import MAX_FRAMES, build_playback, frame_times, resample_track
+
+
+class TestFrameTimes:
+    """Test frame spacing."""
+
+    def test_fixed_frame_count(self):
+        """Test frames are spread evenly over the range."""
+        assert frame_times(0, 100, frames=5).tolist() == [0, 25, 50, 75, 100]
+
+    def test_fixed_step(self):
+        """Test a step produces frames at that spacing."""
+        assert frame_times(0, 100, step=30).tolist() == [0, 30, 60, 90]
+
+    def test_bounded(self):
+        """Test requests beyond MAX_FRAMES are rejected."""
+        with pytest.raises(ValueError):
+            frame_times(0, 30 * 86400, step=60)
+        with pytest.raises(ValueError):
+            frame_times(0, 100, frames=MAX_FRAMES + 1)
+
+
+class TestResampleTrack:
+    """Test track resampling."""
+
+    def test_interpolates_between_fixes(self):
+        """Test positions are interpolated linearly while moving."""
+        frames = resample_track(
+            [0, 600], [54.0, 54.1], [23.0, 23.0], ["unknown", "unknown"],
+            np.array([0.0, 300.0, 600.0]), min_visit=10**9
+        )
+        assert frames["latitude"] == [54.0, 54.05, 54.1]
+        assert frames["held"] == [False, False, False]
+
+    def test_long_gap_holds_last_fix(self):
+        """Test no straight line is drawn across a data gap."""
+        frames = resample_track(
+            [0, 7200], [54.0, 54.1], [23.0, 23.0], ["unknown", "unknown"],
+            np.array([3600.0]), max_gap=1800, min_visit=10**9
+        )
+        assert frames["latitude"] == [54.0]
+        assert frames["held"] == [True]
+
+    def test_visit_holds_centroid(self):
+        """Test frames during a stay sit on the visit centroid."""
+        times = [0, 300, 600, 900]
+        lats = [54.00000, 54.00010, 53.99990, 54.00000]
+        frames = resample_track(
+            times, lats, [23.0] * 4, ["home"] * 4, np.array([150.0, 450.0]), min_visit=300
+        )
+        assert frames["latitude"] == [54.0, 54.0]
+        assert frames["zone_name"] == ["home", "home"]
+        assert all(frames["held"])
+
+
+class TestBuildPlayback:
+    """Test playback payloads."""
+
+    def test_payload(self):
+        """Test frame count and source size are reported."""
+        columns = {
+            "time": [0.0, 600.0],
+            "device_id": ["d", "d"],
+            "zone_name": ["unknown", "unknown"],
+            "latitude": [54.0, 54.1],
+            "longitude": [23.0, 23.0],
+        }
+        playback = build_playback(columns, 0, 600, frames=4)
+        assert playback["frame_count"] == 4
+        assert playback["step_seconds"] == 200
+        assert playback["source_points"] == 2
+        assert len(playback["frames"]["time"]) == 4
+
+    def test_empty_track(self):
+        """Test an empty track produces no frames."""
+        columns = {"time": [], "device_id": [], "zone_name": [], "latitude": [], "longitude": []}
+        assert build_playback(columns, 0, 600, frames=4)["frames"]["time"] == []
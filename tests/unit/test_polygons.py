@@ -0,0 +1,100 @@
+"""Unit tests for polygons module."""
+
+import json
+import math
+
+import numpy as np
+import pytest
+
+from find_my_history.geo import METERS_PER_DEGREE
+from find_my_history.polygons import PreparedPolygon, load_polygon_zones
+
+# 0.01 x 0.01 degree square with a 0.004 degree square hole in the middle
+SQUARE = [[23.90, 54.90], [23.91, 54.90], [23.91, 54.91], [23.90, 54.91], [23.90, 54.90]]
+HOLE = [[23.903, 54.903], [23.903, 54.907], [23.907, 54.907], [23.907, 54.903], [23.903, 54.903]]
+
+# L-shaped building: the notch at the top right is outside
+L_SHAPE = [[0, 0], [2, 0], [2, 1], [1, 1], [1, 2], [0, 2]]
+
+
+class TestPreparedPolygon:
+    """Test prepared point-in-polygon checks."""
+
+    def test_contains_with_hole(self):
+        """Test points in the ring are inside and points in the hole are not."""
+        polygon = PreparedPolygon([SQUARE, HOLE])
+        assert polygon.contains(54.901, 23.901)
+        assert not polygon.contains(54.905, 23.905)
+        assert not polygon.contains(54.92, 23.905)
+
+    def test_concave(self):
+        """Test the notch of a concave polygon is outside."""
+        polygon = PreparedPolygon([L_SHAPE])
+        assert polygon.contains(0.5, 1.5)
+        assert polygon.contains(1.5, 0.5)
+        assert not polygon.contains(1.5, 1.5)
+
+    def test_contains_many_matches_contains(self):
+        """Test the vectorized check agrees with the scalar one."""
+        ring = [[math.cos(a) + 10, math.sin(a) * 0.5 + 50] for a in np.linspace(0, 2 * math.pi, 200)[:-1]]
+        polygon = PreparedPolygon([ring])
+        assert polygon.slabs > 1
+        rng = np.random.default_rng(3)
+        lats = rng.uniform(49.3, 50.7, 2000)
+        lons = rng.uniform(8.8, 11.2, 2000)
+        expected = [polygon.contains(la, lo) for la, lo in zip(lats, lons)]
+        assert polygon.contains_many(lats, lons).tolist() == expected
+        assert 0 < sum(expected) < len(expected)
+
+    def test_area_and_distance(self):
+        """Test area excludes holes and edge distance is signed."""
+        polygon = PreparedPolygon([SQUARE])
+        side_x = 0.01 * METERS_PER_DEGREE * math.cos(math.radians(54.905))
+        assert polygon.area == pytest.approx(side_x * 0.01 * METERS_PER_DEGREE, rel=1e-3)
+        assert PreparedPolygon([SQUARE, HOLE]).area < polygon.area
+        assert polygon.distance_outside(54.905, 23.905) < 0
+        assert polygon.distance_outside(54.911, 23.905) == pytest.approx(111.3, abs=1)
+
+    def test_invalid(self):
+        """Test degenerate rings are rejected."""
+        with pytest.raises(ValueError):
+            PreparedPolygon([[[0, 0], [1, 1]]])
+
+
+class TestLoadPolygonZones:
+    """Test reading zones from GeoJSON."""
+
+    def test_feature_collection(self, tmp_path):
+        """Test Polygon and MultiPolygon features become named zones."""
+        path = tmp_path / "zones.geojson"
+        path.write_text(json.dumps({"type": "FeatureCollection", "features": [
+            {"type": "Feature", "properties": {"name": "campus"},
+             "geometry": {"type": "Polygon", "coordinates": [SQUARE]}},
+            {"type": "Feature", "properties": {"name": "parks"},
+             "geometry": {"type": "MultiPolygon", "coordinates": [[SQUARE], [L_SHAPE]]}},
+            {"type": "Feature", "properties": {"name": "pin"},
+             "geometry": {"type": "Point", "coordinates": [23.9, 54.9]}},
+        ]}))
+
+        zones = load_polygon_zones(str(path))
+
+        assert [zone["name"] for zone in zones] == ["campus", "parks", "parks"]
+        assert zones[0]["polygon"] == [SQUARE]
+
+    def test_missing_or_invalid(self, tmp_path):
+        """Test unreadable files give no zones."""
+        assert load_polygon_zones(str(tmp_path / "missing.geojson")) == []
+        path = tmp_path / "bad.geojson"
+        path.write_text("{")
+        assert load_polygon_zones(str(path)) == []
+
+    def test_non_object_geojson(self, tmp_path):
+        """Test a file whose top level isn't an object gives no zones instead of raising."""
+        path = tmp_path / "array.geojson"
+        path.write_text(json.dumps([{"type": "Polygon", "coordinates": [SQUARE]}]))
+        assert load_polygon_zones(str(path)) == []
+
+        path.write_text(json.dumps({"type": "FeatureCollection", "features": [
+            "campus", {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [SQUARE]}},
+        ]}))
+        assert [zone["name"] for zone in load_polygon_zones(str(path))] == ["polygon_2"]
@@ -0,0 +1,190 @@
+"""Unit tests for reclassify module."""
+
+import math
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+import pytest
+
+from find_my_history.geo import EARTH_RADIUS, haversine
+from find_my_history.reclassify import CHUNK_SECONDS, Reclassifier, changed_boxes, circle_box
+from find_my_history.zone_detector import ZoneDetector
+
+
+HOME = {"name": "home", "latitude": 54.8985, "longitude": 23.9036, "radius": 100}
+OFFICE = {"name": "office", "latitude": 54.9100, "longitude": 23.9100, "radius": 200}
+
+DAY = 1737936000  # 2025-01-27 00:00 UTC
+
+
+def stored(epoch, latitude, longitude, zone_name):
+    return {
+        "time": datetime.fromtimestamp(epoch, timezone.utc).isoformat(),
+        "device_id": "device_tracker.iphone",
+        "device_name": "iPhone",
+        "latitude": latitude,
+        "longitude": longitude,
+        "in_zone": zone_name != "unknown",
+        "zone_name": zone_name,
+    }
+
+
+@pytest.fixture
+def history():
+    """Two days of fixes; only the second day has a point at the office."""
+    return [
+        stored(DAY + 3600, 54.8985, 23.9036, "home"),
+        stored(DAY + CHUNK_SECONDS + 3600, 54.8985, 23.9036, "home"),
+        stored(DAY + CHUNK_SECONDS + 7200, 54.9101, 23.9101, "unknown"),
+    ]
+
+
+@pytest.fixture
+def influx(history):
+    client = Mock()
+    client.get_unique_devices = Mock(return_value=["device_tracker.iphone"])
+
+    def candidates(device_id, start, end, boxes):
+        for row in history:
+            if any(b[0] <= row["latitude"] <= b[1] and b[2] <= row["longitude"] <= b[3]
+                   for b in boxes):
+                epoch = datetime.fromisoformat(row["time"]).timestamp()
+                yield epoch, row["latitude"], row["longitude"], row["zone_name"]
+
+    def locations(device_id, start, end):
+        for row in history:
+            if start <= datetime.fromisoformat(row["time"]) < end:
+                yield dict(row)
+
+    client.iter_zone_candidates = Mock(side_effect=candidates)
+    client.iter_locations = Mock(side_effect=locations)
+    client.write_locations = Mock(side_effect=len)
+    return client
+
+
+def make(influx, tmp_path, zones):
+    detector = ZoneDetector(zones)
+    return detector, Reclassifier(influx, detector, state_path=str(tmp_path / "state.json"), throttle=0)
+
+
+class TestReclassifier:
+    """Test retroactive zone reclassification."""
+
+    def test_first_update_only_records_zones(self, influx, tmp_path):
+        """Test the first zone set is taken as the baseline."""
+        _, reclassifier = make(influx, tmp_path, [HOME])
+        reclassifier.start = Mock()
+
+        assert reclassifier.update([HOME]) is False
+        assert reclassifier.stats()["state"] == "idle"
+        influx.get_unique_devices.assert_not_called()
+
+    def test_added_zone_rewrites_affected_day(self, influx, tmp_path):
+        """Test only the day with a point in the new zone is rewritten."""
+        detector, reclassifier = make(influx, tmp_path, [HOME])
+        reclassifier.start = Mock()
+        reclassifier.update([HOME])
+
+        detector.update_zones([HOME, OFFICE])
+        assert reclassifier.update([HOME, OFFICE]) is True
+        reclassifier.run_until_idle()
+
+        influx.delete_locations.assert_called_once()
+        _, start, end = influx.delete_locations.call_args[0]
+        assert start == datetime.fromtimestamp(DAY + CHUNK_SECONDS, timezone.utc)
+        assert end < datetime.fromtimestamp(DAY + 2 * CHUNK_SECONDS, timezone.utc)
+        rows = influx.write_locations.call_args[0][0]
+        assert [row["zone_name"] for row in rows] == ["home", "office"]
+        assert rows[1]["in_zone"] is True
+        assert rows[0]["time"] == DAY + CHUNK_SECONDS + 3600
+
+        stats = reclassifier.stats()
+        assert stats["state"] == "idle"
+        assert stats["job"] is None
+
+    def test_listeners_run_after_rewrite(self, influx, tmp_path):
+        """Test listeners (cache invalidation) run once per rewritten chunk."""
+        detector, reclassifier = make(influx, tmp_path, [HOME])
+        reclassifier.start = Mock()
+        listener = Mock()
+        reclassifier.add_listener(listener)
+        reclassifier.update([HOME])
+        detector.update_zones([HOME, OFFICE])
+        reclassifier.update([HOME, OFFICE])
+        reclassifier.run_until_idle()
+
+        listener.assert_called_once()
+
+    def test_resumes_checkpointed_rewrite(self, influx, tmp_path):
+        """Test a job interrupted between checkpoint and delete resumes."""
+        detector, reclassifier = make(influx, tmp_path, [HOME])
+        reclassifier.start = Mock()
+        reclassifier.update([HOME])
+        detector.update_zones([HOME, OFFICE])
+        reclassifier.update([HOME, OFFICE])
+        # Run until the reclassified day is checkpointed, then "crash"
+        while (reclassifier._state.get("job") or {}).get("pending") is None:
+            reclassifier.step()
+        influx.delete_locations.assert_not_called()
+
+        _, resumed = make(influx, tmp_path, [HOME, OFFICE])
+        assert resumed.stats()["state"] == "pending"
+        resumed.run_until_idle()
+
+        influx.delete_locations.assert_called_once()
+        rows = influx.write_locations.call_args[0][0]
+        assert [row["zone_name"] for row in rows] == ["home", "office"]
+        assert resumed.stats()["job"] is None
+
+    def test_unchanged_points_are_not_rewritten(self, influx, tmp_path):
+        """Test a zone change that affects no stored point writes nothing."""
+        far = {"name": "far", "latitude": 10.0, "longitude": 10.0, "radius": 100}
+        detector, reclassifier = make(influx, tmp_path, [HOME])
+        reclassifier.start = Mock()
+        reclassifier.update([HOME])
+        detector.update_zones([HOME, far])
+        reclassifier.update([HOME, far])
+        reclassifier.run_until_idle()
+
+        influx.delete_locations.assert_not_called()
+        influx.write_locations.assert_not_called()
+
+    def test_background_worker(self, influx, tmp_path):
+        """Test update starts a worker that finishes the job."""
+        detector, reclassifier = make(influx, tmp_path, [HOME])
+        reclassifier.update([HOME])
+        detector.update_zones([HOME, OFFICE])
+        reclassifier.update([HOME, OFFICE])
+        reclassifier._thread.join(timeout=5)
+
+        assert reclassifier.stats()["state"] == "idle"
+        influx.delete_locations.assert_called_once()
+
+
+def test_changed_boxes():
+    """Test only added, removed, moved or resized circles produce boxes."""
+    home = ["home", 54.8985, 23.9036, 100.0]
+    office = ["office", 54.91, 23.91, 200.0]
+    assert changed_boxes([home], [home]) == []
+    assert len(changed_boxes([home], [home, office])) == 1
+    assert len(changed_boxes([home, office], [home, ["office", 54.91, 23.91, 300.0]])) == 2
+    campus = ["campus", 54.9, 23.9, 500.0, "digest-a"]
+    assert len(changed_boxes([campus], [campus[:4] + ["digest-b"]])) == 2
+
+
+def test_circle_box_contains_circle():
+    """Test a zone box spans its radius in both directions."""
+    min_lat, max_lat, min_lon, max_lon = circle_box(54.8985, 23.9036, 1000)
+    assert min_lat < 54.8985 - 0.0089 and max_lat > 54.8985 + 0.0089
+    assert min_lon < 23.9036 - 0.0155 and max_lon > 23.9036 + 0.0155
+
+
+def test_circle_box_holds_points_at_the_edge():
+    """Test points just inside the radius, measured with haversine, are inside the box."""
+    min_lat, max_lat, min_lon, max_lon = circle_box(54.8985, 23.9036, 1000)
+    for bearing in range(0, 360, 15):
+        d = math.degrees(999.5 / EARTH_RADIUS)
+        lat = 54.8985 + d * math.cos(math.radians(bearing))
+        lon = 23.9036 + d * math.sin(math.radians(bearing)) / math.cos(math.radians(lat))
+        assert haversine(54.8985, 23.9036, lat, lon) <= 1000
+        assert min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
@@ -0,0 +1,45 @@
+"""Unit tests for result_cache module."""
+
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from find_my_history.result_cache import ClosedRangeCache
+
+
+class TestClosedRangeCache:
+    """Test ClosedRangeCache class."""
+
+    def test_closed_range_is_cached(self):
+        """Test results for past ranges are computed once."""
+        cache = ClosedRangeCache("test")
+        compute = Mock(return_value={"cells": []})
+        end = datetime.utcnow() - timedelta(days=1)
+
+        cache.get_or_compute("key", end, compute)
+        cache.get_or_compute("key", end, compute)
+
+        assert compute.call_count == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_open_range_not_cached(self):
+        """Test results for ranges ending now are always recomputed."""
+        cache = ClosedRangeCache("test")
+        compute = Mock(return_value={"cells": []})
+        end = datetime.utcnow()
+
+        cache.get_or_compute("key", end, compute)
+        cache.get_or_compute("key", end, compute)
+
+        assert compute.call_count == 2
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted."""
+        cache = ClosedRangeCache("test", max_entries=2)
+        end = datetime.utcnow() - timedelta(days=1)
+        for key in ("a", "b", "a", "c"):
+            cache.get_or_compute(key, end, lambda: key)
+
+        compute = Mock(return_value="b")
+        cache.get_or_compute("b", end, compute)
+        compute.assert_called_once()
+        assert cache.stats()["entries"] == 2
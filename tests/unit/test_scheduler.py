@@ -0,0 +1,141 @@
+"""Unit tests for scheduler module."""
+
+import json
+import random
+
+import pytest
+
+from find_my_history.scheduler import PollScheduler
+
+
+NOW = 1737972000.0
+IPHONE = {"entity_id": "device_tracker.iphone", "interval_minutes": 5}
+IPAD = {"entity_id": "device_tracker.ipad", "interval_minutes": 10}
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "scheduler_state.json")
+
+
+def restarted(state_path, devices, now, spread=30.0):
+    scheduler = PollScheduler(state_path, startup_spread=spread, rng=random.Random(1))
+    scheduler.restore(devices, now=now)
+    return scheduler
+
+
+class TestPollScheduler:
+    """Test PollScheduler class."""
+
+    def test_new_devices_are_due_at_once(self, state_path):
+        """Test devices without state are polled in the first cycle."""
+        scheduler = PollScheduler(state_path)
+
+        assert scheduler.due([IPHONE, IPAD], now=NOW) == ["device_tracker.iphone", "device_tracker.ipad"]
+        assert scheduler.due([IPHONE, IPAD], now=NOW + 60) == []
+        assert scheduler.due([IPHONE, IPAD], now=NOW + 300) == ["device_tracker.iphone"]
+
+    def test_seconds_until_due(self, state_path):
+        """Test the wait until the next device is due."""
+        scheduler = PollScheduler(state_path)
+        assert scheduler.seconds_until_due([], now=NOW) is None
+        assert scheduler.seconds_until_due([IPHONE], now=NOW) == 0
+
+        scheduler.due([IPHONE, IPAD], now=NOW)
+        assert scheduler.seconds_until_due([IPHONE, IPAD], now=NOW + 100) == 200
+        assert scheduler.seconds_until_due([IPHONE], now=NOW + 400) == 0
+
+    def test_record_outcomes(self, state_path):
+        """Test successes reset and failures count consecutive errors."""
+        scheduler = PollScheduler(state_path)
+        scheduler.due([IPHONE], now=NOW)
+
+        scheduler.record("device_tracker.iphone", False, now=NOW + 1)
+        scheduler.record("device_tracker.iphone", False, now=NOW + 2)
+        stats = scheduler.stats()["device_tracker.iphone"]
+        assert stats["consecutive_failures"] == 2
+        assert stats["last_success"] is None
+
+        scheduler.record("device_tracker.iphone", True, fix_time=NOW, now=NOW + 3)
+        stats = scheduler.stats()["device_tracker.iphone"]
+        assert stats["consecutive_failures"] == 0
+        assert stats["last_fix"] == "2025-01-27T10:00:00+00:00"
+        assert stats["next_poll"] == "2025-01-27T10:05:00+00:00"
+
+        # Recorded after the device was untracked
+        scheduler.forget("device_tracker.iphone")
+        scheduler.record("device_tracker.iphone", True, now=NOW + 4)
+        assert scheduler.stats() == {}
+
+    def test_save_is_compact_and_only_when_changed(self, state_path):
+        """Test state is written without indentation and skipped when unchanged."""
+        scheduler = PollScheduler(state_path)
+        assert scheduler.save() is False
+
+        scheduler.due([IPHONE], now=NOW + 0.25)
+        scheduler.record("device_tracker.iphone", True, fix_time=NOW, now=NOW + 1.5)
+        assert scheduler.save() is True
+        assert scheduler.save() is False
+
+        with open(state_path) as f:
+            text = f.read()
+        assert "\n" not in text
+        assert json.loads(text)["devices"]["device_tracker.iphone"] == {
+            "last_poll": NOW, "last_success": NOW + 2, "last_fix": NOW,
+            "failures": 0, "interval": 300,
+        }
+
+    def test_restore_keeps_schedule_of_devices_not_due(self, state_path):
+        """Test a restart doesn't poll a device before its interval is up."""
+        scheduler = PollScheduler(state_path)
+        scheduler.due([IPHONE], now=NOW)
+        scheduler.save()
+
+        scheduler = restarted(state_path, [IPHONE], now=NOW + 120)
+
+        assert scheduler.due([IPHONE], now=NOW + 120) == []
+        assert scheduler.seconds_until_due([IPHONE], now=NOW + 120) == 180
+        assert scheduler.due([IPHONE], now=NOW + 300) == ["device_tracker.iphone"]
+
+    def test_restore_spreads_overdue_devices(self, state_path):
+        """Test devices that fell due during downtime are jittered, not polled at once."""
+        devices = [{"entity_id": f"device_tracker.phone_{i}", "interval_minutes": 5} for i in range(20)]
+        scheduler = PollScheduler(state_path)
+        scheduler.due(devices, now=NOW)
+        scheduler.save()
+
+        now = NOW + 3 * 3600
+        scheduler = restarted(state_path, devices, now=now, spread=30.0)
+
+        first = scheduler.due(devices, now=now)
+        assert len(first) < len(devices)
+        assert len(scheduler.due(devices, now=now + 30)) == len(devices) - len(first)
+
+    def test_restore_drops_untracked_devices(self, state_path):
+        """Test state of devices removed while stopped is discarded."""
+        scheduler = PollScheduler(state_path)
+        scheduler.due([IPHONE, IPAD], now=NOW)
+        scheduler.save()
+
+        scheduler = restarted(state_path, [IPHONE], now=NOW + 60)
+        scheduler.save()
+
+        assert list(PollScheduler(state_path).stats()) == ["device_tracker.iphone"]
+
+    def test_mark_due(self, state_path):
+        """Test mark_due makes a device due before its interval is up."""
+        scheduler = PollScheduler(state_path)
+        scheduler.due([IPHONE], now=NOW)
+
+        scheduler.mark_due("device_tracker.iphone", now=NOW + 10)
+
+        assert scheduler.due([IPHONE], now=NOW + 10) == ["device_tracker.iphone"]
+
+    def test_unreadable_state_starts_fresh(self, state_path):
+        """Test a corrupt state file is ignored."""
+        with open(state_path, "w") as f:
+            f.write("{not json")
+
+        scheduler = PollScheduler(state_path)
+
+        assert scheduler.due([IPHONE], now=NOW) == ["device_tracker.iphone"]
@@ -0,0 +1,164 @@
+"""Unit tests for tiles module."""
+
+import asyncio
+import threading
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from find_my_history.tiles import TileProxy, merge_tile_layers
+
+
+TILE = b"\x89PNG tile bytes"
+
+
+@pytest.fixture
+async def upstream():
+    """Local tile server stand-in with ETags and a request log."""
+    state = {"requests": [], "max_age": 3600, "fail": False}
+
+    async def tile(request):
+        state["requests"].append((request.path, request.headers.get("If-None-Match")))
+        await asyncio.sleep(0.05)
+        if state["fail"]:
+            return web.Response(status=503)
+        headers = {"ETag": '"v1"', "Cache-Control": f"max-age={state['max_age']}"}
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=TILE, content_type="image/png", headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/{z}/{x}/{y}.png", tile)
+    server = TestServer(app)
+    await server.start_server()
+    server.state = state
+    yield server
+    await server.close()
+
+
+def make_proxy(upstream, tmp_path, **kwargs):
+    """Proxy with one layer pointed at the stand-in."""
+    url = f"http://{upstream.host}:{upstream.port}/{{z}}/{{x}}/{{y}}.png"
+    layers = {"street": {"url": url, "max_zoom": 19}}
+    return TileProxy(layers=layers, cache_dir=str(tmp_path / "tiles"), **kwargs)
+
+
+class TestMergeTileLayers:
+    """Test layer configuration."""
+
+    def test_override_and_add(self):
+        """Test configured entries replace default URLs and add layers."""
+        layers = merge_tile_layers([
+            {"name": "street", "url": "http://tiles.local/{z}/{x}/{y}.png"},
+            {"name": "dark", "url": "http://dark.local/{z}/{x}/{y}.png", "max_zoom": 17},
+            {"name": "broken"},
+        ])
+        assert layers["street"]["url"] == "http://tiles.local/{z}/{x}/{y}.png"
+        assert layers["street"]["attribution"] == "© OpenStreetMap"
+        assert layers["dark"]["max_zoom"] == 17
+        assert "broken" not in layers
+        assert "satellite" in layers
+
+
+class TestTileProxy:
+    """Test the caching tile proxy."""
+
+    async def test_fresh_tile_served_from_disk(self, upstream, tmp_path):
+        """Test a cached tile doesn't hit the upstream again."""
+        proxy = make_proxy(upstream, tmp_path)
+        body, meta = await proxy.get_tile("street", 5, 17, 10)
+        again, _ = await proxy.get_tile("street", 5, 17, 10)
+        await proxy.close()
+
+        assert body == again == TILE
+        assert meta["etag"] == '"v1"'
+        assert len(upstream.state["requests"]) == 1
+
+    async def test_concurrent_requests_coalesced(self, upstream, tmp_path):
+        """Test simultaneous requests for one tile share a fetch."""
+        proxy = make_proxy(upstream, tmp_path)
+        tiles = await asyncio.gather(*[proxy.get_tile("street", 5, 17, 10) for _ in range(5)])
+        await proxy.close()
+
+        assert all(t[0] == TILE for t in tiles)
+        assert len(upstream.state["requests"]) == 1
+
+    async def test_stale_tile_revalidated(self, upstream, tmp_path):
+        """Test expired tiles are revalidated with their ETag."""
+        upstream.state["max_age"] = 0
+        proxy = make_proxy(upstream, tmp_path)
+        await proxy.get_tile("street", 5, 17, 10)
+        body, _ = await proxy.get_tile("street", 5, 17, 10)
+        await proxy.close()
+
+        assert body == TILE
+        assert upstream.state["requests"][1][1] == '"v1"'
+        assert proxy.stats()["revalidated"] == 1
+
+    async def test_stale_tile_served_when_upstream_fails(self, upstream, tmp_path):
+        """Test a stale tile is returned if the upstream is down."""
+        upstream.state["max_age"] = 0
+        proxy = make_proxy(upstream, tmp_path)
+        await proxy.get_tile("street", 5, 17, 10)
+        upstream.state["fail"] = True
+        body, _ = await proxy.get_tile("street", 5, 17, 10)
+        missing = await proxy.get_tile("street", 5, 17, 11)
+        await proxy.close()
+
+        assert body == TILE
+        assert missing is None
+
+    async def test_lru_eviction(self, upstream, tmp_path):
+        """Test the least recently used tile is evicted beyond the budget."""
+        proxy = make_proxy(upstream, tmp_path, max_bytes=len(TILE) * 2)
+        await proxy.get_tile("street", 5, 0, 0)
+        await proxy.get_tile("street", 5, 0, 1)
+        await proxy.get_tile("street", 5, 0, 0)  # touch
+        await proxy.get_tile("street", 5, 0, 2)
+        await proxy.close()
+
+        assert proxy.stats()["entries"] == 2
+        assert not (tmp_path / "tiles" / "street" / "5" / "0" / "1").exists()
+        assert (tmp_path / "tiles" / "street" / "5" / "0" / "0").exists()
+
+    async def test_index_survives_restart(self, upstream, tmp_path):
+        """Test cached tiles are found again after a restart."""
+        proxy = make_proxy(upstream, tmp_path)
+        await proxy.get_tile("street", 5, 17, 10)
+        await proxy.close()
+
+        restarted = make_proxy(upstream, tmp_path)
+        # The directory is scanned by the first request, not the constructor
+        assert restarted.stats()["entries"] == 0
+        await restarted.get_tile("street", 5, 17, 10)
+        await restarted.close()
+        assert restarted.stats()["entries"] == 1
+        assert len(upstream.state["requests"]) == 1
+
+    async def test_disk_io_runs_off_the_event_loop(self, upstream, tmp_path):
+        """Test cache reads, writes and the index scan run in executor threads."""
+        proxy = make_proxy(upstream, tmp_path)
+        loop_thread = threading.get_ident()
+        threads = []
+        for name in ("_load_index", "_read", "_write", "_touch"):
+            original = getattr(proxy, name)
+
+            def spy(*args, _original=original, **kwargs):
+                threads.append(threading.get_ident())
+                return _original(*args, **kwargs)
+            setattr(proxy, name, spy)
+
+        await proxy.get_tile("street", 5, 17, 10)
+        await proxy.get_tile("street", 5, 17, 10)
+        await proxy.close()
+
+        assert len(threads) == 5  # index, read + write, read + touch
+        assert loop_thread not in threads
+
+    async def test_invalid_requests(self, upstream, tmp_path):
+        """Test unknown layers and out-of-range coordinates are rejected."""
+        proxy = make_proxy(upstream, tmp_path)
+        with pytest.raises(KeyError):
+            await proxy.get_tile("dark", 5, 0, 0)
+        with pytest.raises(ValueError):
+            await proxy.get_tile("street", 2, 4, 0)
+        await proxy.close()
@@ -0,0 +1,98 @@
+"""Unit tests for transitions module."""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+
+import pytest
+
+from find_my_history.transitions import ZoneTransitionTracker
+from find_my_history.zone_detector import ZoneDetector
+
+HOME = {"name": "home", "latitude": 54.8985, "longitude": 23.9036, "radius": 100}
+BEDROOM = {"name": "bedroom", "latitude": 54.8985, "longitude": 23.9036, "radius": 10}
+
+BASE = datetime(2025, 1, 27, 8, 0, tzinfo=timezone.utc)
+
+# Meters per degree of latitude, for placing fixes at a distance north of home
+M = 1 / 111320.0
+
+
+def _fix(meters_north, zone):
+    return {"latitude": HOME["latitude"] + meters_north * M, "longitude": HOME["longitude"], "zone_name": zone}
+
+
+def _feed(tracker, fixes, device_id="device_tracker.iphone"):
+    """Feed (minutes, meters north of home, zone) fixes."""
+    for minutes, meters, zone in fixes:
+        tracker.on_write(device_id, BASE + timedelta(minutes=minutes), _fix(meters, zone))
+
+
+@pytest.fixture
+def tracker():
+    tracker = ZoneTransitionTracker(ZoneDetector([HOME, BEDROOM]))
+    tracker.events = []
+    tracker.add_listener(lambda device_id, event: tracker.events.append(event))
+    return tracker
+
+
+class TestZoneTransitionTracker:
+    """Test the per-device zone state machine."""
+
+    def test_leave_and_return(self, tracker):
+        """Test exit and enter are emitted once, stamped with the first fix of the new state."""
+        _feed(tracker, [
+            (0, 0, "home"), (5, 0, "home"),
+            (10, 500, None), (15, 900, None),
+            (60, 0, "home"), (65, 0, "home"),
+        ])
+
+        assert [(e["event"], e["zone_name"]) for e in tracker.events] == [
+            ("exit", "home"), ("enter", "home"),
+        ]
+        assert tracker.events[0]["time"] == BASE + timedelta(minutes=10)
+        # Entry time of the first fix is unknown, so no dwell
+        assert tracker.events[0]["dwell_seconds"] is None
+        assert tracker.events[1]["time"] == BASE + timedelta(minutes=60)
+
+    def test_dwell_on_exit(self, tracker):
+        """Test an exit after a tracked entry reports the time spent in the zone."""
+        _feed(tracker, [
+            (0, 500, None), (5, 0, "home"), (10, 0, "home"),
+            (70, 500, None), (75, 500, None),
+        ])
+        exit_event = tracker.events[-1]
+        assert exit_event["event"] == "exit"
+        assert exit_event["dwell_seconds"] == 65 * 60
+
+    def test_edge_jitter_does_not_flap(self, tracker):
+        """Test fixes just outside the radius keep the device in the zone."""
+        _feed(tracker, [(0, 0, "home")] + [
+            (minutes, 130 if minutes % 10 else 90, None if minutes % 10 else "home")
+            for minutes in range(5, 120, 5)
+        ])
+        assert tracker.events == []
+
+    def test_single_outlier_is_not_confirmed(self, tracker):
+        """Test one far-away fix isn't enough to leave the zone."""
+        _feed(tracker, [(0, 0, "home"), (5, 2000, None), (10, 0, "home"), (15, 0, "home")])
+        assert tracker.events == []
+
+    def test_nested_zone_entry(self, tracker):
+        """Test entering a smaller zone inside the current one is not suppressed."""
+        _feed(tracker, [(0, 50, "home"), (5, 0, "bedroom"), (10, 0, "bedroom")])
+        assert [(e["event"], e["zone_name"]) for e in tracker.events] == [
+            ("exit", "home"), ("enter", "bedroom"),
+        ]
+
+    def test_late_fixes_ignored(self, tracker):
+        """Test fixes older than the device's last one don't move its state."""
+        _feed(tracker, [(10, 0, "home"), (5, 900, None), (4, 900, None)])
+        assert tracker.events == []
+
+    def test_failing_listener_does_not_break_ingest(self, tracker):
+        """Test a failing listener doesn't stop the others."""
+        broken = Mock(side_effect=RuntimeError("boom"))
+        tracker._listeners.insert(0, broken)
+        _feed(tracker, [(0, 0, "home"), (5, 900, None), (10, 900, None)])
+        broken.assert_called_once()
+        assert len(tracker.events) == 1
@@ -0,0 +1,90 @@
+"""Unit tests for trips module."""
+
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from find_my_history.trips import TripSegmenter
+
+HOME = (54.8985, 23.9036)
+WORK = (54.6872, 25.2797)
+
+
+def _feed(segmenter, base, fixes, device_id="device_tracker.iphone"):
+    """Feed (minutes, lat, lon, zone) fixes."""
+    for minutes, lat, lon, zone in fixes:
+        segmenter.on_write(
+            device_id, base + timedelta(minutes=minutes),
+            {"latitude": lat, "longitude": lon, "zone_name": zone}
+        )
+
+
+def _commute():
+    fixes = [(m, HOME[0], HOME[1], "home") for m in range(0, 30, 5)]
+    for step in range(1, 4):
+        frac = step / 4
+        fixes.append((
+            30 + step * 5,
+            HOME[0] + (WORK[0] - HOME[0]) * frac,
+            HOME[1] + (WORK[1] - HOME[1]) * frac,
+            "unknown",
+        ))
+    fixes += [(m, WORK[0], WORK[1], "work") for m in range(50, 80, 5)]
+    return fixes
+
+
+class TestTripSegmenter:
+    """Test TripSegmenter class."""
+
+    def test_trip_closed_when_settled(self):
+        """Test a trip between two settled places is emitted once."""
+        on_trip = Mock()
+        segmenter = TripSegmenter(on_trip=on_trip)
+        base = datetime(2025, 1, 27, 8, 0, 0)
+
+        _feed(segmenter, base, _commute())
+
+        on_trip.assert_called_once()
+        device_id, trip = on_trip.call_args[0]
+        assert device_id == "device_tracker.iphone"
+        assert trip["start_zone"] == "home"
+        assert trip["end_zone"] == "work"
+        assert trip["start_time"].replace(tzinfo=None) == base + timedelta(minutes=25)
+        assert trip["end_time"].replace(tzinfo=None) == base + timedelta(minutes=50)
+        assert 85000 < trip["distance_m"] < 100000
+        assert trip["avg_speed_kmh"] > 0
+
+    def test_no_trip_for_jitter(self):
+        """Test small movements do not produce trips."""
+        on_trip = Mock()
+        segmenter = TripSegmenter(on_trip=on_trip)
+        base = datetime(2025, 1, 27, 8, 0, 0)
+        fixes = [(m, HOME[0], HOME[1], "home") for m in range(0, 30, 5)]
+        fixes += [(m, HOME[0] + 0.002, HOME[1], "unknown") for m in range(30, 60, 5)]
+
+        _feed(segmenter, base, fixes)
+
+        on_trip.assert_not_called()
+
+    def test_gap_abandons_trip(self):
+        """Test a long data gap abandons the trip in progress."""
+        on_trip = Mock()
+        segmenter = TripSegmenter(on_trip=on_trip)
+        base = datetime(2025, 1, 27, 8, 0, 0)
+        fixes = [(m, HOME[0], HOME[1], "home") for m in range(0, 30, 5)]
+        fixes.append((35, 54.8, 24.2, "unknown"))
+        fixes += [(m, WORK[0], WORK[1], "work") for m in range(300, 330, 5)]
+
+        _feed(segmenter, base, fixes)
+
+        on_trip.assert_not_called()
+
+    def test_devices_are_independent(self):
+        """Test trip state is kept per device."""
+        on_trip = Mock()
+        segmenter = TripSegmenter(on_trip=on_trip)
+        base = datetime(2025, 1, 27, 8, 0, 0)
+
+        _feed(segmenter, base, _commute(), device_id="device_tracker.iphone")
+        _feed(segmenter, base, [(m, HOME[0], HOME[1], "home") for m in range(0, 80, 5)],
+              device_id="device_tracker.ipad")
+
+        assert on_trip.call_count == 1
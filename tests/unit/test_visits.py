@@ -0,0 +1,139 @@
+"""Unit tests for visits module."""
+
+from datetime import datetime, timedelta
+from find_my_history.timeutils import to_epoch
+from find_my_history.visits import StayPointDetector, VisitTracker, detect_visits
+
+HOME = (54.8985, 23.9036)
+WORK = (54.6872, 25.2797)
+
+
+def _track():
+    """Home for 30 minutes, a drive, then work for 20 minutes (one fix per 5 minutes)."""
+    times, lats, lons, zones = [], [], [], []
+    t = 0.0
+    for _ in range(7):
+        times.append(t); lats.append(HOME[0]); lons.append(HOME[1]); zones.append("home")
+        t += 300
+    for step in range(1, 4):
+        frac = step / 4
+        times.append(t)
+        lats.append(HOME[0] + (WORK[0] - HOME[0]) * frac)
+        lons.append(HOME[1] + (WORK[1] - HOME[1]) * frac)
+        zones.append("unknown")
+        t += 300
+    for _ in range(5):
+        times.append(t); lats.append(WORK[0]); lons.append(WORK[1]); zones.append("work")
+        t += 300
+    return times, lats, lons, zones
+
+
+class TestDetectVisits:
+    """Test detect_visits function."""
+
+    def test_detects_home_and_work(self):
+        """Test stays are detected and movement is skipped."""
+        visits = detect_visits(*_track())
+
+        assert [v["zone_name"] for v in visits] == ["home", "work"]
+        assert visits[0]["duration_seconds"] == 1800
+        assert visits[0]["points"] == 7
+        assert visits[0]["departed"] is not None
+        assert visits[0]["open"] is False
+        assert visits[1]["open"] is True
+        assert visits[1]["in_zone"] is True
+
+    def test_min_duration_zero_returns_every_segment(self):
+        """Test every fix belongs to a segment when min_duration is 0."""
+        visits = detect_visits(*_track(), min_duration=0)
+        assert sum(v["points"] for v in visits) == len(_track()[0])
+
+    def test_jitter_within_radius(self):
+        """Test GPS jitter stays within one visit."""
+        visits = detect_visits(
+            [0, 300, 600],
+            [HOME[0], HOME[0] + 0.0003, HOME[0] - 0.0003],
+            [HOME[1], HOME[1], HOME[1]],
+        )
+        assert len(visits) == 1
+        assert visits[0]["points"] == 3
+
+    def test_departure_not_set_after_long_gap(self):
+        """Test departure is unknown when the next fix comes after a long gap."""
+        detector = StayPointDetector()
+        detector.add(0, *HOME)
+        visit = detector.add(10 * 3600, *WORK)
+        assert visit["departed"] is None
+
+    def test_empty_track(self):
+        """Test empty input."""
+        assert detect_visits([], [], []) == []
+
+
+class TestVisitTracker:
+    """Test VisitTracker class."""
+
+    def test_incremental_visits(self):
+        """Test visits are built from written fixes."""
+        tracker = VisitTracker()
+        base = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=1)
+        times, lats, lons, zones = _track()
+        for t, lat, lon, zone in zip(times, lats, lons, zones):
+            tracker.on_write(
+                "device_tracker.iphone", base + timedelta(seconds=t),
+                {"latitude": lat, "longitude": lon, "zone_name": zone}
+            )
+
+        visits = tracker.visits("device_tracker.iphone", base, base + timedelta(hours=2))
+        assert [v["zone_name"] for v in visits] == ["home", "work"]
+        assert [v["duration_seconds"] for v in visits] == [
+            v["duration_seconds"] for v in detect_visits(times, lats, lons, zones)
+        ]
+
+    def test_range_before_tracking_not_covered(self):
+        """Test ranges starting before tracking began return None."""
+        tracker = VisitTracker()
+        now = datetime.utcnow()
+        assert tracker.visits("device_tracker.iphone", now - timedelta(days=1), now) is None
+
+    def test_late_fix_moves_coverage(self):
+        """Test a late fix stops the tracker vouching for earlier ranges."""
+        tracker = VisitTracker()
+        base = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=1)
+        fix = {"latitude": HOME[0], "longitude": HOME[1]}
+        tracker.on_write("device_tracker.iphone", base + timedelta(minutes=10), fix)
+        tracker.on_write("device_tracker.iphone", base, fix)
+
+        assert tracker.visits("device_tracker.iphone", base, base + timedelta(hours=1)) is None
+
+    def test_invalidate_drops_coverage(self):
+        """Test points written behind the tracker's back make it fall back to InfluxDB."""
+        tracker = VisitTracker()
+        base = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=30)
+        tracker._started_at = to_epoch(base) - 3600
+        fix = {"latitude": HOME[0], "longitude": HOME[1]}
+        tracker.on_write("device_tracker.iphone", base, fix)
+        tracker.on_write("device_tracker.ipad", base, fix)
+        assert tracker.visits("device_tracker.iphone", base, base + timedelta(hours=1)) == []
+
+        tracker.invalidate("device_tracker.iphone")
+
+        assert tracker.visits("device_tracker.iphone", base, base + timedelta(hours=1)) is None
+        assert tracker.visits("device_tracker.ipad", base, base + timedelta(hours=1)) == []
+
+        tracker.invalidate()
+        assert tracker.visits("device_tracker.ipad", base, base + timedelta(hours=1)) is None
+
+    def test_invalidate_covers_unseen_devices(self):
+        """Test a device first written by an import isn't answered as having no visits."""
+        tracker = VisitTracker()
+        now = datetime.utcnow().replace(microsecond=0)
+        tracker._started_at = to_epoch(now) - 3600
+        fix = {"latitude": HOME[0], "longitude": HOME[1]}
+        tracker.on_write("device_tracker.iphone", now, fix)
+
+        # Import wrote post-start fixes for a device the tracker has never seen
+        tracker.invalidate()
+
+        assert tracker.visits("device_tracker.ipad", now - timedelta(minutes=30), now) is None
+        assert tracker.visits("device_tracker.ipad", now, now + timedelta(hours=1)) is None
@@ -1,7 +1,11 @@
 """Unit tests for zone_detector module."""
 
+import math
+import numpy as np
 import pytest
-from find_my_history.zone_detector import ZoneDetector
+from find_my_history import zone_detector
+from find_my_history.geo import EARTH_RADIUS, haversine
+from find_my_history.zone_detector import ZoneDetector, parse_radius
 
 
 class TestZoneDetector:
@@ -53,8 +57,8 @@ class TestZoneDetector:
         assert in_zone is False
         assert zone_name is None
 
-    def test_check_zone_multiple_zones_closest(self, sample_zones):
-        """Test zone detection when device is in multiple zones (should return first match)."""
+    def test_check_zone_multiple_zones_smallest(self, sample_zones):
+        """Test zone detection when device is in multiple zones (smallest zone wins)."""
         # Create overlapping zones
         zones = [
             {"name": "zone1", "latitude": 54.8985, "longitude": 23.9036, "radius": 200},
@@ -65,7 +69,7 @@ class TestZoneDetector:
         # Device at center of both zones
         in_zone, zone_name = detector.check_zone(54.8985, 23.9036)
         assert in_zone is True
-        assert zone_name == "zone1"  # First match
+        assert zone_name == "zone2"  # Smallest containing zone
 
     def test_check_zone_string_radius(self):
         """Test zone detection with string radius value."""
@@ -100,24 +104,36 @@ class TestZoneDetector:
         assert len(detector.zones) == 1
         assert detector.zones[0]["name"] == "new_zone"
 
-    def test_distance_calculation_accuracy(self, sample_zones):
-        """Test Haversine distance calculation accuracy."""
+    def test_update_zones_reports_changes(self, sample_zones):
+        """Test update_zones tells whether any zone circle changed."""
         detector = ZoneDetector(sample_zones)
-        
+        assert detector.update_zones([dict(zone) for zone in sample_zones]) is False
+
+        moved = [dict(zone) for zone in sample_zones]
+        moved[0]["radius"] = 250
+        assert detector.update_zones(moved) is True
+
+    def test_distance_outside_zone(self, sample_zones):
+        """Test distance to a named zone's edge."""
+        detector = ZoneDetector(sample_zones)
+        assert detector.distance_outside_zone("home", 54.8985, 23.9036) == pytest.approx(-100)
+        assert detector.distance_outside_zone("home", 54.8985 + 200 / 111320, 23.9036) == pytest.approx(100, abs=1)
+        assert detector.distance_outside_zone("nowhere", 54.8985, 23.9036) is None
+
+    def test_distance_calculation_accuracy(self):
+        """Test Haversine distance calculation accuracy."""
         # Calculate distance between two known points
         # Home: 54.8985, 23.9036
         # Work: 54.6872, 25.2797
         # Approximate distance: ~91km
-        distance = detector._calculate_distance(54.8985, 23.9036, 54.6872, 25.2797)
+        distance = haversine(54.8985, 23.9036, 54.6872, 25.2797)
         
         # Should be approximately 91km (allowing 5% error)
         assert 86000 < distance < 96000
 
-    def test_distance_calculation_same_point(self, sample_zones):
+    def test_distance_calculation_same_point(self):
         """Test distance calculation for same point."""
-        detector = ZoneDetector(sample_zones)
-        
-        distance = detector._calculate_distance(54.8985, 23.9036, 54.8985, 23.9036)
+        distance = haversine(54.8985, 23.9036, 54.8985, 23.9036)
         assert distance == pytest.approx(0, abs=1)  # Should be 0 (within 1m)
 
     @pytest.mark.parametrize("lat,lon,expected_zone", [
@@ -136,3 +152,181 @@ class TestZoneDetector:
         else:
             assert in_zone is False
             assert zone_name is None
+
+    def test_nested_zone_inside_large_zone(self):
+        """Test a small zone listed after a large one containing it still wins."""
+        zones = [
+            {"name": "city", "latitude": 54.90, "longitude": 23.90, "radius": 5000},
+            {"name": "office", "latitude": 54.91, "longitude": 23.91, "radius": 50},
+        ]
+        detector = ZoneDetector(zones)
+        assert detector.check_zone(54.91, 23.91) == (True, "office")
+        assert detector.check_zone(54.905, 23.90) == (True, "city")
+
+    def test_parse_radius(self):
+        """Test radii are parsed once from numbers and strings."""
+        assert parse_radius("150m") == 150.0
+        assert parse_radius(75) == 75.0
+        assert parse_radius(None) == 100.0
+        assert parse_radius("wide") == 100.0
+
+    def test_index_prefilters_candidates(self):
+        """Test distant zones are not distance-checked."""
+        zones = [
+            {"name": f"poi{i}", "latitude": 50 + i * 0.05, "longitude": 20.0, "radius": 100}
+            for i in range(300)
+        ]
+        detector = ZoneDetector(zones)
+        assert len(detector.index.candidates(50.0, 20.0)) == 1
+        assert detector.check_zone(50 + 150 * 0.05, 20.0) == (True, "poi150")
+
+    def test_huge_zone_is_unindexed(self):
+        """Test zones too large for the grid are still found."""
+        zones = [{"name": "country", "latitude": 55.0, "longitude": 24.0, "radius": 200000}]
+        detector = ZoneDetector(zones)
+        assert detector.index.unindexed == [0]
+        assert detector.check_zone(55.5, 24.5) == (True, "country")
+
+    def test_zone_at_cell_edge(self):
+        """Test a point in a neighbouring grid cell of the zone center is found."""
+        # Zone centered just below a cell boundary, point just above it
+        zones = [{"name": "edge", "latitude": 54.8999, "longitude": 23.9, "radius": 100}]
+        detector = ZoneDetector(zones)
+        assert detector.check_zone(54.9003, 23.9) == (True, "edge")
+
+    def test_point_near_radius_in_next_cell(self):
+        """Test a point just inside the radius is found when it lies past the zone's cells."""
+        # 999.5 m north of the center crosses the 54.91 cell boundary
+        zones = [{"name": "big", "latitude": 54.901014, "longitude": 23.9, "radius": 1000}]
+        detector = ZoneDetector(zones)
+        latitude = 54.901014 + math.degrees(999.5 / EARTH_RADIUS)
+        assert latitude > 54.91
+        assert detector.check_zone(latitude, 23.9) == (True, "big")
+
+    def test_antimeridian_zone(self):
+        """Test zones wrapping the antimeridian are matched from both sides."""
+        zones = [{"name": "dateline", "latitude": 0.0, "longitude": 179.9995, "radius": 200}]
+        detector = ZoneDetector(zones)
+        assert detector.check_zone(0.0, -179.9995) == (True, "dateline")
+
+
+class TestPolygonZones:
+    """Test polygon zones in the shared zone index."""
+
+    CAMPUS = {"name": "campus", "polygon": [[
+        [23.90, 54.90], [23.92, 54.90], [23.92, 54.901], [23.90, 54.901], [23.90, 54.90],
+    ]]}
+
+    def test_check_zone(self):
+        """Test polygons are matched by shape, not by their bounding circle."""
+        detector = ZoneDetector([self.CAMPUS])
+        assert detector.check_zone(54.9005, 23.919) == (True, "campus")
+        # Inside the bounding circle but outside the long, thin polygon
+        assert detector.check_zone(54.903, 23.91) == (False, None)
+
+    def test_smallest_zone_wins(self):
+        """Test a circle inside a large polygon wins, and the polygon beats a larger circle."""
+        zones = [
+            self.CAMPUS,
+            {"name": "lab", "latitude": 54.9005, "longitude": 23.91, "radius": 30},
+            {"name": "district", "latitude": 54.90, "longitude": 23.91, "radius": 3000},
+        ]
+        detector = ZoneDetector(zones)
+        assert detector.check_zone(54.9005, 23.91) == (True, "lab")
+        assert detector.check_zone(54.9005, 23.919) == (True, "campus")
+        assert detector.check_zone(54.903, 23.91) == (True, "district")
+
+    def test_batch_matches_check_zone(self):
+        """Test batch classification agrees with the per-point lookup for polygons."""
+        zones = [self.CAMPUS, {"name": "lab", "latitude": 54.9005, "longitude": 23.91, "radius": 30}]
+        detector = ZoneDetector(zones)
+        rng = np.random.default_rng(2)
+        lats = 54.9005 + rng.normal(0, 0.002, 1000)
+        lons = 23.91 + rng.normal(0, 0.01, 1000)
+
+        in_zone, names = detector.check_zones_batch(lats, lons)
+
+        expected = [detector.check_zone(la, lo) for la, lo in zip(lats, lons)]
+        assert names.tolist() == [name for _, name in expected]
+        assert {"campus", "lab", None} <= set(names.tolist())
+
+    def test_reshape_counts_as_change(self):
+        """Test moving a vertex inside the same bounds is reported as a change."""
+        detector = ZoneDetector([self.CAMPUS])
+        reshaped = {"name": "campus", "polygon": [[
+            [23.90, 54.90], [23.92, 54.90], [23.91, 54.901], [23.90, 54.901], [23.90, 54.90],
+        ]]}
+        assert detector.update_zones([self.CAMPUS]) is False
+        assert detector.update_zones([reshaped]) is True
+
+    def test_distance_outside_polygon(self):
+        """Test distance to a polygon zone's edge."""
+        detector = ZoneDetector([self.CAMPUS])
+        assert detector.distance_outside_zone("campus", 54.9005, 23.91) < 0
+        assert detector.distance_outside_zone("campus", 54.9015, 23.91) == pytest.approx(55.7, abs=1)
+
+    def test_invalid_polygon_skipped(self):
+        """Test a degenerate polygon is skipped."""
+        detector = ZoneDetector([{"name": "bad", "polygon": [[[23.9, 54.9]]]}])
+        assert len(detector.index) == 0
+
+
+class TestCheckZonesBatch:
+    """Test batch zone classification."""
+
+    ZONES = [
+        {"name": "city", "latitude": 54.90, "longitude": 23.90, "radius": 5000},
+        {"name": "office", "latitude": 54.91, "longitude": 23.91, "radius": "50m"},
+        {"name": "dateline", "latitude": 0.0, "longitude": 179.9995, "radius": 200},
+        {"name": "invalid", "latitude": None, "longitude": None},
+    ]
+
+    def test_matches_check_zone(self):
+        """Test batch results agree with the per-point lookup."""
+        detector = ZoneDetector(self.ZONES)
+        rng = np.random.default_rng(1)
+        lats = np.concatenate([54.9 + rng.normal(0, 0.03, 500), [54.91, 0.0, 0.0, 10.0]])
+        lons = np.concatenate([23.9 + rng.normal(0, 0.05, 500), [23.91, -179.9995, 179.999, 10.0]])
+
+        in_zone, names = detector.check_zones_batch(lats, lons)
+
+        expected = [detector.check_zone(la, lo) for la, lo in zip(lats, lons)]
+        assert in_zone.tolist() == [flag for flag, _ in expected]
+        assert names.tolist() == [name for _, name in expected]
+        assert {"city", "office", "dateline", None} <= set(names.tolist())
+
+    def test_matches_check_zone_at_boundary(self):
+        """Test batch and per-point lookups agree for points just inside and outside a radius."""
+        zones = [{"name": "big", "latitude": 54.901014, "longitude": 23.9, "radius": 1000}]
+        detector = ZoneDetector(zones)
+        bearings = np.radians(np.arange(0, 360, 15))
+        lats, lons = [], []
+        for distance in (999.5, 1000.5):
+            d = math.degrees(distance / EARTH_RADIUS)
+            lats.extend(54.901014 + d * np.cos(bearings))
+            lons.extend(23.9 + d * np.sin(bearings) / math.cos(math.radians(54.901014)))
+
+        in_zone, names = detector.check_zones_batch(lats, lons)
+
+        expected = [detector.check_zone(la, lo) for la, lo in zip(lats, lons)]
+        assert in_zone.tolist() == [flag for flag, _ in expected]
+        assert names.tolist() == [name for _, name in expected]
+        assert in_zone[:len(bearings)].all()
+
+    def test_chunking(self, monkeypatch):
+        """Test results are the same when work is split into small chunks."""
+        detector = ZoneDetector(self.ZONES)
+        lats = np.linspace(54.85, 54.95, 101)
+        lons = np.linspace(23.85, 23.95, 101)
+        whole = detector.check_zones_batch(lats, lons)
+        monkeypatch.setattr(zone_detector, "BATCH_PAIRS", 7)
+        chunked = detector.check_zones_batch(lats, lons)
+        assert whole[0].tolist() == chunked[0].tolist()
+        assert whole[1].tolist() == chunked[1].tolist()
+
+    def test_empty_inputs(self):
+        """Test no points or no zones classify as outside."""
+        in_zone, names = ZoneDetector([]).check_zones_batch([54.9], [23.9])
+        assert in_zone.tolist() == [False] and names.tolist() == [None]
+        in_zone, names = ZoneDetector(self.ZONES).check_zones_batch([], [])
+        assert in_zone.size == 0 and names.size == 0